@@ -0,0 +1,65 @@
+"""Scaling of sharded VectorGridWorld stepping with the number of threads.
+
+Usage, with NeuGym installed::
+
+    python benchmarks/vector_sharding.py --num-envs 4000000 --threads 1 2 4 8 16 32 64
+
+Reports the environment steps per second of an unsharded batch, then of the
+same batch split into shards of ``--shard-size`` environments stepped on
+each number of threads.
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from neugym.environment import GridWorld, VectorGridWorld, slip_kernel
+
+
+def build_world(size):
+    W = GridWorld((size, size))
+    W.set_transition_kernel(0, slip_kernel(W.actions, 0.1))
+    W.add_object((0, size - 1, size - 1), reward=1, prob=0.8)
+    W.init_agent((0, 0, 0))
+    return W
+
+
+def steps_per_second(envs, actions, num_steps):
+    envs.reset()
+    envs.step(actions[0])
+    start = time.perf_counter()
+    for t in range(num_steps):
+        envs.step(actions[t % len(actions)])
+    return envs.num_envs * num_steps / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--num-envs", type=int, default=1000000)
+    parser.add_argument("--shard-size", type=int, default=65536)
+    parser.add_argument("--threads", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--size", type=int, default=20)
+    args = parser.parse_args()
+
+    W = build_world(args.size)
+    rng = np.random.default_rng(0)
+    actions = rng.integers(len(W.actions), size=(4, args.num_envs))
+
+    envs = VectorGridWorld(W, args.num_envs, max_steps=100, rng=0)
+    base = steps_per_second(envs, actions, args.steps)
+    print("{:>8} {:>14} {:>8}".format("threads", "steps/s", "speedup"))
+    print("{:>8} {:>14.3e} {:>8.2f}".format("-", base, 1.0))
+    for num_threads in args.threads:
+        envs = VectorGridWorld(W, args.num_envs, max_steps=100, rng=0,
+                               shard_size=args.shard_size, num_threads=num_threads)
+        rate = steps_per_second(envs, actions, args.steps)
+        envs.close()
+        print("{:>8} {:>14.3e} {:>8.2f}".format(num_threads, rate, rate / base))
+
+
+if __name__ == "__main__":
+    main()
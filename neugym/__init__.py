@@ -9,3 +9,4 @@ __version__ = '0.1.4'
 from neugym.exception import *
 from neugym.utils import *
 from neugym import environment
+from neugym import algorithms
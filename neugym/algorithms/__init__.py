@@ -0,0 +1,11 @@
+"""Algorithms working on NeuGym environments."""
+
+from .options import *
+from .successor import *
+from .learning import *
+from .likelihood import *
+from .fitting import *
+from .replay import *
+from .planning import *
+from .evaluation import *
+from .irl import *
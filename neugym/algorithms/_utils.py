@@ -0,0 +1,48 @@
+import numpy as np
+
+
+def _as_compiled(env):
+    # Accept both GridWorld and CompiledWorld objects.
+    if hasattr(env, "compile"):
+        return env.compile()
+    return env
+
+
+def _policy_array(compiled, policy):
+    num_states, num_actions = compiled.next_state.shape
+    if isinstance(policy, str):
+        if policy == "uniform":
+            return np.full((num_states, num_actions), 1 / num_actions)
+        elif policy == "random_walk":
+            moving = compiled.next_state != np.arange(num_states)[:, None]
+            stuck = ~moving.any(axis=1)
+            moving[stuck] = True
+            return moving / moving.sum(axis=1, keepdims=True)
+        else:
+            msg = "Unrecognized policy '{}', 'uniform', 'random_walk' " \
+                  "or an array expected".format(policy)
+            raise ValueError(msg)
+
+    policy = np.asarray(policy, dtype=float)
+    if policy.shape[-2:] != (num_states, num_actions):
+        msg = "Policy of shape (..., {}, {}) expected, got {}".format(
+            num_states, num_actions, policy.shape)
+        raise ValueError(msg)
+    if np.any(policy < 0) or not np.allclose(policy.sum(axis=-1), 1):
+        msg = "Policy rows should be probability distributions"
+        raise ValueError(msg)
+    return policy
+
+
+def _policy_transition(compiled, policy):
+    # Sparse state-to-state transition matrix under a policy of shape (S, A).
+    import scipy.sparse as sp
+
+    num_states, num_actions = compiled.next_state.shape
+    executed = np.einsum('sa,sab->sb', policy, compiled.kernels[compiled.kernel_index])
+    P = sp.csr_matrix((executed.ravel(),
+                       (np.repeat(np.arange(num_states), num_actions),
+                        compiled.next_state.ravel())),
+                      shape=(num_states, num_states))
+    P.eliminate_zeros()
+    return P
@@ -0,0 +1,266 @@
+"""Evaluation of many tabular policies at once."""
+
+import time
+import warnings
+
+import numpy as np
+
+from ._utils import _as_compiled, _policy_array
+
+__all__ = [
+    "PolicyEvaluation",
+    "evaluate_policies"
+]
+
+_METHODS = ("iterative", "direct")
+
+# Maximum number of unknowns of one block-diagonal direct solve.
+_DIRECT_BLOCK_SIZE = 200000
+
+
+class PolicyEvaluation:
+    """Values of a stack of policies, with solver diagnostics.
+
+    Attributes
+    ----------
+    values : numpy.ndarray of shape (K, S)
+        State values of each policy.
+
+    method : str
+        Solver used, ``"iterative"`` or ``"direct"``.
+
+    iterations : numpy.ndarray of shape (K,)
+        Number of fixed-point iterations of each policy, zero for the
+        direct solver.
+
+    residuals : numpy.ndarray of shape (K,)
+        Maximum absolute Bellman residual of the values of each policy.
+
+    converged : numpy.ndarray of shape (K,)
+        Whether the iterations of each policy converged within tolerance,
+        always True for the direct solver.
+
+    setup_time : float
+        Time taken to build the shared structure and the per-policy
+        transition weights, in seconds.
+
+    solve_time : float
+        Time taken by the solver, in seconds.
+    """
+
+    def __init__(self, values, q_values, method, iterations, residuals, converged,
+                 setup_time, solve_time):
+        self.values = values
+        self._q_values = q_values
+        self.method = method
+        self.iterations = iterations
+        self.residuals = residuals
+        self.converged = converged
+        self.setup_time = setup_time
+        self.solve_time = solve_time
+
+    @property
+    def num_policies(self):
+        """Number of evaluated policies ``K``."""
+        return len(self.values)
+
+    def q_values(self):
+        """Get the action values of each policy.
+
+        Returns
+        -------
+        q_values : numpy.ndarray of shape (K, S, A)
+            Expected return of taking each action at each state, then
+            following the policy.
+        """
+        return self._q_values(self.values)
+
+    def __repr__(self):
+        return "PolicyEvaluation(num_policies={}, method='{}', converged={}/{}, " \
+               "max_residual={:.3g}, setup_time={:.3g}, solve_time={:.3g})".format(
+                   self.num_policies, self.method, int(self.converged.sum()),
+                   self.num_policies, self.residuals.max(initial=0), self.setup_time,
+                   self.solve_time)
+
+
+def evaluate_policies(env, policies, gamma=0.95, method="iterative", tol=1e-8,
+                      max_iter=10000):
+    r"""Compute the state values of many policies together.
+
+    The values of policy $\pi_k$ solve the Bellman equation
+
+    .. math::
+
+        V_k = r_{\pi_k} + \gamma C_{\pi_k} V_k,
+
+    where $r_{\pi_k}$ is the expected reward of each state and
+    $C_{\pi_k}$ the probability of moving between states without the trial
+    ending, i.e. transitions into states with an object are cut (transition
+    kernels included, see ``CompiledWorld.expected_reward()``).
+
+    All the policies share the sparsity pattern of the world transitions,
+    which is built once: the transition weights of all the policies are
+    then computed with one array operation. The ``"iterative"`` solver runs
+    batched fixed-point iterations over all the policies at once, leaving
+    out the converged ones, and the ``"direct"`` solver factorizes the
+    block-diagonal system of many policies at once with a sparse LU
+    decomposition.
+
+    Parameters
+    ----------
+    env : GridWorld or CompiledWorld
+        Gridworld environment.
+
+    policies : array_like of shape (K, S, A), (S, A), (K, S) or (S,)
+        Probability of taking each action at each state under each policy,
+        or, for integer arrays, the action index of deterministic policies.
+
+    gamma : float (default: 0.95)
+        Discount factor.
+
+    method : str {"iterative", "direct"} (default: "iterative")
+        Solver.
+
+    tol : float (default: 1e-8)
+        Tolerance of the iterative solver, on the maximum change of the
+        values in one iteration.
+
+    max_iter : int (default: 10000)
+        Maximum number of iterations of the iterative solver.
+
+    Returns
+    -------
+    evaluation : PolicyEvaluation
+        Values of the policies and diagnostics. A ``RuntimeWarning`` is
+        issued if some of the iterations did not converge.
+
+    Examples
+    --------
+    >>> W = GridWorld((10, 10))
+    >>> W.add_object((0, 9, 9), reward=1, prob=1)
+    >>> C = W.compile()
+    >>> policies = rng.dirichlet(np.ones(C.num_actions), size=(300, C.num_states))
+    >>> evaluation = evaluate_policies(W, policies, gamma=0.9)
+    >>> evaluation.values.shape
+    (300, 100)
+    """
+    import scipy.sparse as sp
+    from scipy.sparse.linalg import splu
+
+    if not 0 <= gamma < 1:
+        msg = "Discount factor in [0, 1) expected, got {}".format(gamma)
+        raise ValueError(msg)
+    if method not in _METHODS:
+        msg = "Unrecognized method '{}', 'iterative' or 'direct' expected".format(method)
+        raise ValueError(msg)
+
+    start = time.perf_counter()
+    compiled = _as_compiled(env)
+    num_states, num_actions = compiled.next_state.shape
+    policies = _policy_stack(compiled, policies)
+    num_policies = len(policies)
+
+    # Executed action probabilities, expected rewards and continuation
+    # weights of each policy, transitions listed as (state, executed action).
+    kernels = compiled.kernels[compiled.kernel_index]
+    reward = compiled.expected_reward()
+    executed = np.einsum('ksa,sab->ksb', policies, kernels)
+    r_pi = np.einsum('ksa,sa->ks', policies, reward)
+    cont = executed * ~compiled.terminal[compiled.next_state]
+    next_state = compiled.next_state.ravel()
+
+    def bellman(values, weights, r):
+        # r + gamma * C V for policies stacked along the first axis.
+        nxt = np.take(values, next_state, axis=1).reshape(len(values), num_states, num_actions)
+        return r + gamma * np.einsum('ksb,ksb->ks', weights, nxt)
+
+    if method == "iterative":
+        setup_time = time.perf_counter() - start
+        start = time.perf_counter()
+        values = np.zeros((num_policies, num_states))
+        iterations = np.zeros(num_policies, dtype=np.int64)
+        converged = np.zeros(num_policies, dtype=bool)
+        active = np.arange(num_policies)
+        for _ in range(max_iter):
+            new = bellman(values[active], cont[active], r_pi[active])
+            change = np.abs(new - values[active]).max(axis=1, initial=0)
+            values[active] = new
+            iterations[active] += 1
+            done = change < tol
+            converged[active[done]] = True
+            active = active[~done]
+            if len(active) == 0:
+                break
+    else:
+        # Shared pattern of I - gamma C: one entry per transition, then the
+        # diagonal. Duplicate entries are summed by the sparse map G.
+        rows = np.concatenate([np.repeat(np.arange(num_states), num_actions),
+                               np.arange(num_states)])
+        cols = np.concatenate([next_state, np.arange(num_states)])
+        keys, inverse = np.unique(rows * num_states + cols, return_inverse=True)
+        nnz = len(keys)
+        indices = keys % num_states
+        indptr = np.zeros(num_states + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum(np.bincount(keys // num_states, minlength=num_states))
+        G = sp.csr_matrix((np.ones(len(rows)), (inverse, np.arange(len(rows)))),
+                          shape=(nnz, len(rows)))
+        entries = np.concatenate([-gamma * cont.reshape(num_policies, -1),
+                                  np.ones((num_policies, num_states))], axis=1)
+        data = np.asarray((G @ entries.T).T)
+        setup_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        values = np.zeros((num_policies, num_states))
+        chunk = max(1, _DIRECT_BLOCK_SIZE // num_states)
+        for k in range(0, num_policies, chunk):
+            block = np.arange(k, min(k + chunk, num_policies))
+            n = len(block)
+            block_indptr = np.concatenate([
+                (indptr[:-1][None, :] + nnz * np.arange(n)[:, None]).ravel(), [n * nnz]])
+            block_indices = (indices[None, :] + num_states * np.arange(n)[:, None]).ravel()
+            A = sp.csr_matrix((data[block].ravel(), block_indices, block_indptr),
+                              shape=(n * num_states, n * num_states))
+            values[block] = splu(A.tocsc()).solve(r_pi[block].ravel()).reshape(n, num_states)
+        iterations = np.zeros(num_policies, dtype=np.int64)
+        converged = np.ones(num_policies, dtype=bool)
+    solve_time = time.perf_counter() - start
+
+    residuals = np.abs(bellman(values, cont, r_pi) - values).max(axis=1, initial=0)
+    if not converged.all():
+        msg = "Evaluation of {} policies did not converge in {} iterations".format(
+            int((~converged).sum()), max_iter)
+        warnings.warn(RuntimeWarning(msg))
+
+    def q_values(values):
+        # Values after each executed action, weighted by the transition kernels.
+        executed_reward = compiled.move_reward + \
+            compiled.object_expected_reward()[compiled.next_state]
+        after = executed_reward + gamma * np.take(values, compiled.next_state, axis=1) * \
+            ~compiled.terminal[compiled.next_state]
+        return np.einsum('sab,ksb->ksa', kernels, after)
+
+    return PolicyEvaluation(values, q_values, method, iterations, residuals, converged,
+                            setup_time, solve_time)
+
+
+def _policy_stack(compiled, policies):
+    # Policies of shape (K, S, A), from stochastic or deterministic policies.
+    num_states, num_actions = compiled.next_state.shape
+    policies = np.asarray(policies)
+    if np.issubdtype(policies.dtype, np.integer):
+        if policies.shape[-1:] != (num_states,) or policies.ndim > 2:
+            msg = "Deterministic policies of shape (K, {}) expected, got {}".format(
+                num_states, policies.shape)
+            raise ValueError(msg)
+        if policies.min(initial=0) < 0 or policies.max(initial=0) >= num_actions:
+            msg = "Action index out of range [0, {})".format(num_actions)
+            raise ValueError(msg)
+        policies = (policies[..., None] == np.arange(num_actions)).astype(float)
+    policies = _policy_array(compiled, policies)
+    if policies.ndim == 2:
+        policies = policies[None]
+    elif policies.ndim != 3:
+        msg = "Policies of shape (K, {}, {}) expected, got {}".format(
+            num_states, num_actions, policies.shape)
+        raise ValueError(msg)
+    return policies
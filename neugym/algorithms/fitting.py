@@ -0,0 +1,393 @@
+"""Maximum-likelihood fitting of learning models to recorded behavior."""
+
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from ._utils import _as_compiled
+from .likelihood import choice_log_likelihood
+
+__all__ = [
+    "LearningModel",
+    "FitResult",
+    "fit_models",
+    "best_fits"
+]
+
+_DEFAULT_BOUNDS = {
+    "alpha": (0.0, 1.0),
+    "beta": (0.0, 20.0),
+    "gamma": (0.0, 1.0)
+}
+
+# Compiled world and behavior data of the current worker process.
+_worker_state = {}
+
+
+class LearningModel:
+    """A softmax learning model with free and fixed parameters.
+
+    Parameters
+    ----------
+    algorithm : str {"q_learning", "sarsa"} (default: "q_learning")
+        Learning rule, see ``choice_log_likelihood()``.
+
+    bounds : dict (optional, default: None)
+        Bounds ``(low, high)`` of the free parameters among ``"alpha"``,
+        ``"beta"`` and ``"gamma"``. Parameters not given here nor in
+        ``fixed`` are free, with default bounds ``alpha`` in [0, 1],
+        ``beta`` in [0, 20] and ``gamma`` in [0, 1].
+
+    fixed : dict (optional, default: None)
+        Values of the fixed parameters.
+
+    name : str (optional, default: None)
+        Name of the model, ``algorithm`` if not provided.
+
+    Examples
+    --------
+    >>> model = LearningModel("q_learning", fixed={"gamma": 0.9}, name="q_fixed_gamma")
+    >>> model.free_params
+    ['alpha', 'beta']
+    """
+
+    def __init__(self, algorithm="q_learning", bounds=None, fixed=None, name=None):
+        if algorithm not in ("q_learning", "sarsa"):
+            msg = "Unrecognized algorithm '{}', 'q_learning' or 'sarsa' expected".format(algorithm)
+            raise ValueError(msg)
+        bounds = {} if bounds is None else dict(bounds)
+        fixed = {} if fixed is None else dict(fixed)
+        for param in list(bounds) + list(fixed):
+            if param not in _DEFAULT_BOUNDS:
+                msg = "Unrecognized parameter '{}', expected one of {}".format(
+                    param, list(_DEFAULT_BOUNDS))
+                raise ValueError(msg)
+
+        self.algorithm = algorithm
+        self.name = algorithm if name is None else name
+        self.fixed = {param: float(value) for param, value in fixed.items()}
+        self.bounds = {}
+        for param, default in _DEFAULT_BOUNDS.items():
+            if param not in self.fixed:
+                low, high = bounds.get(param, default)
+                self.bounds[param] = (float(low), float(high))
+
+    @property
+    def free_params(self):
+        """Names of the free parameters."""
+        return list(self.bounds)
+
+    def key(self):
+        """Get a string identifying the model, used as a cache key.
+
+        Returns
+        -------
+        key : str
+            JSON description of the model.
+        """
+        return json.dumps([self.name, self.algorithm, self.bounds, self.fixed], sort_keys=True)
+
+    def __repr__(self):
+        return "LearningModel(name='{}', algorithm='{}', free_params={}, fixed={})".format(
+            self.name, self.algorithm, self.free_params, self.fixed)
+
+
+class FitResult:
+    """Result of one maximum-likelihood fitting job.
+
+    Attributes
+    ----------
+    subject : int
+        Index of the subject.
+
+    model : str
+        Name of the model.
+
+    restart : int
+        Index of the random restart.
+
+    params : dict
+        Fitted parameters, fixed parameters included.
+
+    nll : float
+        Negative log-likelihood at the fitted parameters.
+
+    success : bool
+        Whether the optimizer converged.
+
+    num_evals : int
+        Number of likelihood evaluations.
+
+    elapsed : float
+        Time taken by the job in seconds.
+
+    cached : bool
+        Whether the result was loaded from the cache.
+    """
+
+    def __init__(self, subject, model, restart, params, nll, success, num_evals,
+                 elapsed, cached=False):
+        self.subject = subject
+        self.model = model
+        self.restart = restart
+        self.params = params
+        self.nll = nll
+        self.success = success
+        self.num_evals = num_evals
+        self.elapsed = elapsed
+        self.cached = cached
+
+    def to_dict(self):
+        """Convert the result to a JSON serializable dict."""
+        return {
+            "subject": self.subject,
+            "model": self.model,
+            "restart": self.restart,
+            "params": self.params,
+            "nll": self.nll,
+            "success": self.success,
+            "num_evals": self.num_evals,
+            "elapsed": self.elapsed
+        }
+
+    @classmethod
+    def from_dict(cls, d, cached=False):
+        """Build a result from a dict created by ``FitResult.to_dict()``."""
+        return cls(cached=cached, **d)
+
+    def __repr__(self):
+        return "FitResult(subject={}, model='{}', restart={}, nll={:.4f}, params={})".format(
+            self.subject, self.model, self.restart, self.nll, self.params)
+
+
+def fit_models(env, data, models="q_learning", num_restarts=10, subjects=None,
+               cache_dir=None, num_workers=None, seed=0, callback=None, verbose=False):
+    """Fit learning models to each subject with random restarts.
+
+    Each ``(subject, model, restart)`` combination is one job: the negative
+    log-likelihood of the subject's behavior is minimized with L-BFGS-B from
+    a random starting point within the parameter bounds. Starting points
+    only depend on ``seed``, the subject's data, the model and the restart
+    index, so the results do not depend on the job scheduling nor on the
+    order of the subjects.
+
+    Jobs are run in a local process pool. If ``cache_dir`` is given, each
+    finished job is saved there, keyed by the hash of the subject's data
+    (``BehaviorData.digest()``), the model, the world fingerprint
+    (``CompiledWorld.fingerprint()``), the restart index and ``seed``.
+    Interrupted or extended sweeps (e.g. more restarts or subjects) then
+    only run the missing jobs.
+
+    Parameters
+    ----------
+    env : GridWorld or CompiledWorld
+        Gridworld environment of the recordings.
+
+    data : BehaviorData
+        Recorded behavior.
+
+    models : str, LearningModel, or list of them (default: "q_learning")
+        Models to fit, strings are algorithm names with default bounds.
+
+    num_restarts : int (default: 10)
+        Number of random restarts per subject and model.
+
+    subjects : array_like of ints (optional, default: None)
+        Indices of the subjects to fit, all subjects if not provided.
+
+    cache_dir : str (optional, default: None)
+        Directory of the result cache, created if missing. Results are not
+        cached if not provided.
+
+    num_workers : int (optional, default: None)
+        Number of worker processes, the number of processors if not provided.
+        With ``num_workers=1`` jobs are run in the current process.
+
+    seed : int (default: 0)
+        Seed of the random starting points.
+
+    callback : callable (optional, default: None)
+        Called as ``callback(result, num_done, num_jobs)`` after each job.
+
+    verbose : bool (default: False)
+        Whether to print the progress and timing of each job.
+
+    Returns
+    -------
+    results : list of FitResult
+        Results of all the jobs, ordered by subject, model and restart.
+
+    See Also
+    --------
+    best_fits : Select the best restart of each subject and model.
+
+    Examples
+    --------
+    >>> data = BehaviorData.from_records(W, records)
+    >>> models = ["q_learning", LearningModel("sarsa", fixed={"gamma": 0.9})]
+    >>> results = fit_models(W, data, models, num_restarts=20, cache_dir="fits")
+    >>> best = best_fits(results)
+    """
+    compiled = _as_compiled(env)
+    if isinstance(models, (str, LearningModel)):
+        models = [models]
+    models = [LearningModel(m) if isinstance(m, str) else m for m in models]
+    if len(set(m.name for m in models)) != len(models):
+        msg = "Model names should be unique, got {}".format([m.name for m in models])
+        raise ValueError(msg)
+    if subjects is None:
+        subjects = range(data.num_subjects)
+    subjects = [int(i) for i in subjects]
+
+    fingerprint = compiled.fingerprint()
+    digests = {i: data.subset(i).digest() for i in subjects}
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+
+    # Collect jobs, loading finished ones from the cache.
+    results = {}
+    pending = []
+    for i in subjects:
+        for model in models:
+            for restart in range(num_restarts):
+                key = _job_key(digests[i], model, fingerprint, restart, seed)
+                job = (i, model, restart, key)
+                cached = _load_cached(cache_dir, key)
+                if cached is not None:
+                    # Keys do not depend on the subject index, e.g. when the
+                    # subjects are reordered or have the same data.
+                    cached.subject = i
+                    results[(i, restart, model.name)] = cached
+                else:
+                    pending.append(job)
+
+    num_jobs = len(results) + len(pending)
+    num_done = 0
+    for result in list(results.values()):
+        num_done += 1
+        _report(result, num_done, num_jobs, callback, verbose)
+
+    def finish(job, result):
+        nonlocal num_done
+        _save_cached(cache_dir, job[3], result)
+        results[(job[0], job[2], job[1].name)] = result
+        num_done += 1
+        _report(result, num_done, num_jobs, callback, verbose)
+
+    if pending:
+        if num_workers == 1:
+            _init_worker(compiled, data)
+            try:
+                for job in pending:
+                    finish(job, _run_job(job[:3], digests[job[0]], seed))
+            finally:
+                _worker_state.clear()
+        else:
+            with ProcessPoolExecutor(max_workers=num_workers, initializer=_init_worker,
+                                     initargs=(compiled, data)) as executor:
+                futures = {executor.submit(_run_job, job[:3], digests[job[0]], seed): job
+                           for job in pending}
+                for future in as_completed(futures):
+                    finish(futures[future], future.result())
+
+    model_order = {m.name: k for k, m in enumerate(models)}
+    return sorted(results.values(), key=lambda r: (r.subject, model_order[r.model], r.restart))
+
+
+def best_fits(results):
+    """Select the best restart of each subject and model.
+
+    Parameters
+    ----------
+    results : list of FitResult
+        Results of ``fit_models()``.
+
+    Returns
+    -------
+    best : dict
+        Result with the lowest negative log-likelihood, keyed by
+        ``(subject, model)``.
+    """
+    best = {}
+    for result in results:
+        key = (result.subject, result.model)
+        if key not in best or result.nll < best[key].nll:
+            best[key] = result
+    return best
+
+
+def _job_key(digest, model, fingerprint, restart, seed):
+    description = json.dumps([digest, model.key(), fingerprint, restart, seed])
+    return hashlib.sha256(description.encode()).hexdigest()
+
+
+def _load_cached(cache_dir, key):
+    if cache_dir is None:
+        return None
+    filename = os.path.join(cache_dir, key + ".json")
+    try:
+        with open(filename) as f:
+            return FitResult.from_dict(json.load(f), cached=True)
+    except (OSError, ValueError, TypeError):
+        return None
+
+
+def _save_cached(cache_dir, key, result):
+    if cache_dir is None:
+        return
+    filename = os.path.join(cache_dir, key + ".json")
+    # Write atomically, so that interrupted sweeps leave no partial file.
+    tmp_filename = "{}.{}.tmp".format(filename, os.getpid())
+    with open(tmp_filename, "w") as f:
+        json.dump(result.to_dict(), f)
+    os.replace(tmp_filename, filename)
+
+
+def _report(result, num_done, num_jobs, callback, verbose):
+    if verbose:
+        print("[{}/{}] subject {}, model '{}', restart {}: nll={:.4f}, {:.2f}s{}".format(
+            num_done, num_jobs, result.subject, result.model, result.restart, result.nll,
+            result.elapsed, " (cached)" if result.cached else ""))
+    if callback is not None:
+        callback(result, num_done, num_jobs)
+
+
+def _init_worker(compiled, data):
+    _worker_state["compiled"] = compiled
+    _worker_state["data"] = data
+
+
+def _run_job(job, digest, seed):
+    from scipy.optimize import minimize
+
+    subject, model, restart = job
+    compiled = _worker_state["compiled"]
+    data = _worker_state["data"].subset(subject)
+    start_time = time.perf_counter()
+
+    names = model.free_params
+    bounds = [model.bounds[name] for name in names]
+    model_seed = int(hashlib.sha256(model.key().encode()).hexdigest()[:8], 16)
+    rng = np.random.default_rng([seed, int(digest[:8], 16), restart, model_seed])
+    x0 = np.array([rng.uniform(low, high) for low, high in bounds])
+
+    def nll(x):
+        params = dict(model.fixed)
+        params.update(zip(names, x))
+        return -choice_log_likelihood(compiled, data, algorithm=model.algorithm,
+                                      **params).sum()
+
+    if names:
+        res = minimize(nll, x0, method="L-BFGS-B", bounds=bounds)
+        x, value, success, num_evals = res.x, float(res.fun), bool(res.success), int(res.nfev)
+    else:
+        x, value, success, num_evals = x0, float(nll(x0)), True, 1
+
+    params = dict(model.fixed)
+    params.update({name: float(v) for name, v in zip(names, x)})
+    return FitResult(subject, model.name, restart, params, value, success, num_evals,
+                     time.perf_counter() - start_time)
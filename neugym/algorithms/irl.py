@@ -0,0 +1,409 @@
+"""Maximum-entropy inverse reinforcement learning on gridworld environments."""
+
+import numpy as np
+
+from ._utils import _as_compiled
+from .likelihood import BehaviorData
+
+__all__ = [
+    "state_features",
+    "MaxEntIRL"
+]
+
+_FEATURES = ("altitude", "object_proximity", "area")
+
+
+def state_features(env, features=_FEATURES):
+    """Compute features of the states of a gridworld environment.
+
+    The available features are
+
+    - ``"altitude"``: altitude of the state.
+    - ``"object_proximity"``: ``1 / (1 + d)``, where ``d`` is the smallest
+      number of moves from the state to a state with an object, zero if
+      no object can be reached.
+    - ``"area"``: one indicator column per area, named ``"area_<i>"``.
+
+    Parameters
+    ----------
+    env : GridWorld or CompiledWorld
+        Gridworld environment.
+
+    features : sequence of str (default: ("altitude", "object_proximity", "area"))
+        Features to compute.
+
+    Returns
+    -------
+    phi : numpy.ndarray of shape (S, F)
+        Feature matrix.
+
+    names : list of str
+        Name of each column of ``phi``.
+    """
+    import scipy.sparse as sp
+    from scipy.sparse.csgraph import dijkstra
+
+    compiled = _as_compiled(env)
+    num_states, num_actions = compiled.next_state.shape
+    columns = []
+    names = []
+    for feature in features:
+        if feature == "altitude":
+            columns.append(compiled.altitude[:, None])
+            names.append(feature)
+        elif feature == "object_proximity":
+            proximity = np.zeros(num_states)
+            objects = np.flatnonzero(compiled.terminal)
+            if len(objects) > 0:
+                # Distances to the nearest object, along reversed moves.
+                moves = sp.csr_matrix((np.ones(num_states * num_actions),
+                                       (compiled.next_state.ravel(),
+                                        np.repeat(np.arange(num_states), num_actions))),
+                                      shape=(num_states, num_states))
+                distance = dijkstra(moves, indices=objects, unweighted=True, min_only=True)
+                reachable = np.isfinite(distance)
+                proximity[reachable] = 1 / (1 + distance[reachable])
+            columns.append(proximity[:, None])
+            names.append(feature)
+        elif feature == "area":
+            num_areas = len(compiled.area_shapes)
+            columns.append((compiled.coords[:, 0:1] == np.arange(num_areas)).astype(float))
+            names.extend("area_{}".format(i) for i in range(num_areas))
+        else:
+            msg = "Unrecognized feature '{}', expected one of {}".format(feature, list(_FEATURES))
+            raise ValueError(msg)
+    return np.concatenate(columns, axis=1), names
+
+
+class MaxEntIRL:
+    r"""Maximum-entropy inverse reinforcement learning of state rewards.
+
+    Demonstrations are explained by a linear state reward
+    $r_\theta(s) = \phi(s)^\top \theta$ and the maximum-entropy (soft
+    optimal) policy under it, $\pi(a | s) = \exp(Q(s, a) - V(s))$, where
+
+    .. math::
+
+        Q(s, a) = r_\theta(s) + \gamma \sum_{s'} P(s' | s, a) V(s'), \quad
+        V(s) = \log \sum_a \exp Q(s, a),
+
+    and $V(s) = r_\theta(s)$ at states with an object, which end trials.
+    The weights $\theta$ are fitted by gradient ascent on the likelihood of
+    the demonstrations, whose gradient is the difference between the
+    empirical feature counts of the demonstrated trials and the feature
+    counts expected under the soft optimal policy, from the expected state
+    visitation frequencies of trials with the same start states and lengths.
+
+    The transition matrix of the world is built once, and soft value
+    iteration and the visitation frequencies are computed with sparse
+    matrix products, for a batch of ``K`` reward functions at once (e.g.
+    one per subject). Soft value iteration starts from the values of the
+    previous gradient step.
+
+    Parameters
+    ----------
+    env : GridWorld or CompiledWorld
+        Gridworld environment.
+
+    features : sequence of str or numpy.ndarray of shape (S, F)
+        State features, see ``state_features()``, or a feature matrix,
+        by default ``("altitude", "object_proximity", "area")``.
+
+    gamma : float (default: 0.99)
+        Discount factor of soft value iteration.
+
+    tol : float (default: 1e-6)
+        Tolerance of soft value iteration.
+
+    max_iter : int (default: 10000)
+        Maximum number of iterations of soft value iteration.
+
+    cache : WorldCache (optional, default: None)
+        Cache of the compiled world, when ``env`` is a ``GridWorld``.
+
+    Attributes
+    ----------
+    phi : numpy.ndarray of shape (S, F)
+        Feature matrix.
+
+    feature_names : list of str
+        Name of each feature.
+
+    weights : numpy.ndarray of shape (K, F)
+        Fitted reward weights, None before fitting.
+
+    gradient_norms : list of numpy.ndarray of shape (K,)
+        Norm of the gradient at each step of the last fit.
+
+    Examples
+    --------
+    >>> W = GridWorld((8, 8))
+    >>> W.add_object((0, 7, 7), reward=1, prob=1)
+    >>> irl = MaxEntIRL(W, features=("object_proximity",))
+    >>> data = BehaviorData.from_records(W, records)
+    >>> weights = irl.fit(data, by_subject=True)
+    >>> rewards = irl.rewards()
+    """
+
+    def __init__(self, env, features=_FEATURES, gamma=0.99, tol=1e-6, max_iter=10000,
+                 cache=None):
+        if not 0 <= gamma < 1:
+            msg = "Discount factor in [0, 1) expected, got {}".format(gamma)
+            raise ValueError(msg)
+
+        if cache is not None:
+            if not hasattr(env, "compile"):
+                msg = "'cache' requires a GridWorld environment, got {}".format(
+                    type(env).__name__)
+                raise ValueError(msg)
+            self.compiled = env.compile(cache=cache)
+        else:
+            self.compiled = _as_compiled(env)
+        num_states, num_actions = self.compiled.next_state.shape
+        if isinstance(features, np.ndarray):
+            if features.ndim != 2 or features.shape[0] != num_states:
+                msg = "Feature matrix of shape ({}, F) expected, got {}".format(
+                    num_states, features.shape)
+                raise ValueError(msg)
+            self.phi = features.astype(float)
+            self.feature_names = ["feature_{}".format(i) for i in range(features.shape[1])]
+        else:
+            self.phi, self.feature_names = state_features(self.compiled, features)
+        self.gamma = float(gamma)
+        self.tol = tol
+        self.max_iter = max_iter
+        self.weights = None
+        self.gradient_norms = []
+
+        self._P = self.compiled.transition_matrix()
+        self._PT = self._P.T.tocsr()
+        self._terminal = self.compiled.terminal
+        self._values = None
+
+    def soft_value_iteration(self, rewards, values=None):
+        """Compute the soft optimal values and policies of state rewards.
+
+        Parameters
+        ----------
+        rewards : array_like of shape (K, S) or (S,)
+            State rewards.
+
+        values : numpy.ndarray of shape (K, S) (optional, default: None)
+            Initial values, zero if not provided.
+
+        Returns
+        -------
+        values : numpy.ndarray of shape (K, S)
+            Soft state values.
+
+        policy : numpy.ndarray of shape (K, S, A)
+            Maximum-entropy policies.
+        """
+        rewards = np.atleast_2d(np.asarray(rewards, dtype=float))
+        num_states, num_actions = self.compiled.next_state.shape
+        r = rewards.T
+        V = np.zeros_like(r) if values is None else np.array(values, dtype=float).T
+        terminal = self._terminal
+        for _ in range(self.max_iter):
+            Q = r[:, None, :] + self.gamma * (self._P @ V).reshape(num_states, num_actions, -1)
+            Q_max = Q.max(axis=1)
+            V_next = Q_max + np.log(np.exp(Q - Q_max[:, None, :]).sum(axis=1))
+            V_next[terminal] = r[terminal]
+            change = np.max(np.abs(V_next - V), initial=0)
+            V = V_next
+            if change < self.tol:
+                break
+        else:
+            msg = "Soft value iteration did not converge in {} iterations".format(self.max_iter)
+            raise RuntimeError(msg)
+
+        policy = np.exp(Q - V[:, None, :])
+        policy[terminal] = 1 / num_actions
+        return V.T, policy.transpose(2, 0, 1)
+
+    def state_visitation(self, policy, start, survival):
+        """Compute expected state visitation frequencies.
+
+        Parameters
+        ----------
+        policy : numpy.ndarray of shape (K, S, A)
+            Policies.
+
+        start : numpy.ndarray of shape (K, S)
+            Distributions of the start states.
+
+        survival : numpy.ndarray of shape (K, T)
+            Fraction of the trials visiting more than ``t`` states, i.e.
+            the weight of the state distribution after ``t`` steps.
+
+        Returns
+        -------
+        frequencies : numpy.ndarray of shape (K, S)
+            Expected number of visits of each state in one trial, states
+            with an object included.
+        """
+        num_states, num_actions = self.compiled.next_state.shape
+        policy = np.asarray(policy).transpose(1, 2, 0)
+        D = np.asarray(start, dtype=float).T.copy()
+        survival = np.asarray(survival, dtype=float)
+        continuing = ~self._terminal[:, None]
+        frequencies = np.zeros_like(D)
+        for t in range(survival.shape[1]):
+            frequencies += survival[:, t] * D
+            if t + 1 < survival.shape[1]:
+                flow = (policy * (D * continuing)[:, None, :]).reshape(
+                    num_states * num_actions, -1)
+                D = self._PT @ flow
+        return frequencies.T
+
+    def fit(self, demonstrations, by_subject=False, lr=0.1, num_iter=200, l2=0.0, tol=1e-4):
+        """Fit the reward weights to demonstrations.
+
+        Parameters
+        ----------
+        demonstrations : BehaviorData or list of array_like of ints
+            Recorded behavior, or trials as sequences of visited state ids.
+            The states with an object reached at the end of the trials of
+            ``BehaviorData`` are inferred from the recorded next states,
+            or the last actions.
+
+        by_subject : bool (default: False)
+            Whether to fit one reward per subject of ``BehaviorData``, all
+            together, or one reward to all the trials.
+
+        lr : float (default: 0.1)
+            Learning rate of the Adam optimizer.
+
+        num_iter : int (default: 200)
+            Maximum number of gradient steps.
+
+        l2 : float (default: 0.0)
+            L2 penalty on the weights.
+
+        tol : float (default: 1e-4)
+            Tolerance on the norm of the gradient of every reward.
+
+        Returns
+        -------
+        weights : numpy.ndarray of shape (K, F)
+            Fitted reward weights, ``K`` being the number of subjects if
+            ``by_subject``, else one.
+        """
+        empirical, start, survival = self._demonstration_stats(demonstrations, by_subject)
+        features = empirical @ self.phi
+
+        num_rewards, num_features = len(start), self.phi.shape[1]
+        weights = np.zeros((num_rewards, num_features))
+        m = np.zeros_like(weights)
+        v = np.zeros_like(weights)
+        values = None
+        self.gradient_norms = []
+        for k in range(1, num_iter + 1):
+            values, policy = self.soft_value_iteration(weights @ self.phi.T, values)
+            expected = self.state_visitation(policy, start, survival) @ self.phi
+            gradient = features - expected - l2 * weights
+            norms = np.linalg.norm(gradient, axis=1)
+            self.gradient_norms.append(norms)
+            if np.all(norms < tol):
+                break
+            # Adam ascent step.
+            m = 0.9 * m + 0.1 * gradient
+            v = 0.999 * v + 0.001 * gradient ** 2
+            weights = weights + lr * (m / (1 - 0.9 ** k)) / (np.sqrt(v / (1 - 0.999 ** k)) + 1e-8)
+
+        self.weights = weights
+        self._values = values
+        return weights
+
+    def rewards(self):
+        """Get the fitted state rewards.
+
+        Returns
+        -------
+        rewards : numpy.ndarray of shape (K, S)
+            Reward of each state.
+        """
+        if self.weights is None:
+            msg = "Rewards are not fitted yet, see 'MaxEntIRL.fit()'"
+            raise RuntimeError(msg)
+        return self.weights @ self.phi.T
+
+    def policy(self):
+        """Get the maximum-entropy policies of the fitted rewards.
+
+        Returns
+        -------
+        policy : numpy.ndarray of shape (K, S, A)
+            Probability of taking each action at each state.
+        """
+        return self.soft_value_iteration(self.rewards(), self._values)[1]
+
+    def _demonstration_stats(self, demonstrations, by_subject):
+        # Visits per trial, start state distributions and survival weights
+        # of the trials of each group of demonstrations.
+        num_states = self.compiled.num_states
+        if isinstance(demonstrations, BehaviorData):
+            data = demonstrations
+            num_subjects = data.num_subjects
+            mask = data.mask
+            starts = mask & np.concatenate([np.ones((num_subjects, 1), dtype=bool),
+                                            data.dones[:, :-1]], axis=1)
+            trials = np.cumsum(starts.ravel()) - 1
+            valid = mask.ravel()
+
+            # Object states reached at the end of the trials.
+            arrival = np.where(self._terminal[data.next_states], data.next_states,
+                               self.compiled.next_state[data.states, data.actions])
+            arrived = (mask & data.dones & self._terminal[arrival]).ravel()
+
+            visited = np.concatenate([data.states.ravel()[valid], arrival.ravel()[arrived]])
+            visit_trials = np.concatenate([trials[valid], trials[arrived]])
+            num_trials = int(starts.sum())
+            trial_groups = np.repeat(np.arange(num_subjects), starts.sum(axis=1)) \
+                if by_subject else np.zeros(num_trials, dtype=np.int64)
+            start_states = data.states[starts]
+        else:
+            if by_subject:
+                msg = "'by_subject' requires BehaviorData demonstrations"
+                raise ValueError(msg)
+            trajectories = [np.asarray(t, dtype=np.int64).ravel() for t in demonstrations]
+            trajectories = [t for t in trajectories if len(t) > 0]
+            num_trials = len(trajectories)
+            if num_trials == 0:
+                msg = "No demonstrated trial"
+                raise ValueError(msg)
+            visited = np.concatenate(trajectories)
+            if visited.min() < 0 or visited.max() >= num_states:
+                msg = "State index out of range [0, {})".format(num_states)
+                raise ValueError(msg)
+            visit_trials = np.repeat(np.arange(num_trials), [len(t) for t in trajectories])
+            trial_groups = np.zeros(num_trials, dtype=np.int64)
+            start_states = np.array([t[0] for t in trajectories])
+
+        if num_trials == 0:
+            msg = "No demonstrated trial"
+            raise ValueError(msg)
+        num_groups = int(trial_groups.max()) + 1
+        trials_per_group = np.bincount(trial_groups, minlength=num_groups).astype(float)
+        if np.any(trials_per_group == 0):
+            msg = "Every subject should have at least one trial"
+            raise ValueError(msg)
+
+        empirical = np.zeros((num_groups, num_states))
+        np.add.at(empirical, (trial_groups[visit_trials], visited), 1)
+        empirical /= trials_per_group[:, None]
+
+        start = np.zeros((num_groups, num_states))
+        np.add.at(start, (trial_groups, start_states), 1)
+        start /= trials_per_group[:, None]
+
+        lengths = np.bincount(visit_trials, minlength=num_trials)
+        histogram = np.zeros((num_groups, lengths.max() + 1))
+        np.add.at(histogram, (trial_groups, lengths), 1)
+        # Fraction of the trials longer than t.
+        survival = 1 - np.cumsum(histogram, axis=1)[:, :-1] / trials_per_group[:, None]
+        return empirical, start, survival
+
+    def __repr__(self):
+        return "MaxEntIRL(num_states={}, features={}, gamma={})".format(
+            self.compiled.num_states, self.feature_names, self.gamma)
@@ -0,0 +1,314 @@
+"""Tabular learners trained in batch on gridworld environments."""
+
+import numpy as np
+
+from ._utils import _as_compiled
+
+__all__ = [
+    "BatchedLearner"
+]
+
+_ALGORITHMS = ("q_learning", "sarsa")
+_EXPLORATIONS = ("epsilon_greedy", "softmax")
+
+
+class BatchedLearner:
+    r"""A population of tabular learners trained at the same time.
+
+    The Q-tables of ``N`` agents are kept in a single array of shape
+    ``(N, S, A)``, and action selection, temporal-difference updates and
+    eligibility traces are vectorized across agents. Each agent moves in its
+    own copy of the same world, stepped together with ``CompiledWorld.step()``.
+    Hyperparameters can be given per agent, e.g. for hyperparameter sweeps.
+
+    The supported learning rules are
+
+    - ``"q_learning"``: Q-learning, or Watkins's Q($\lambda$) if ``lam > 0``.
+    - ``"sarsa"``: SARSA, or SARSA($\lambda$) (TD($\lambda$) control) if ``lam > 0``.
+
+    and Dyna-Q planning is enabled when ``planning_steps > 0``, where each
+    agent replays ``planning_steps`` previously experienced transitions from
+    its learned (last observed) model after each real step.
+
+    Parameters
+    ----------
+    env : GridWorld or CompiledWorld
+        Gridworld environment.
+
+    num_agents : int
+        Number of agents ``N``.
+
+    algorithm : str {"q_learning", "sarsa"} (default: "q_learning")
+        Learning rule.
+
+    exploration : str {"epsilon_greedy", "softmax"} (default: "epsilon_greedy")
+        Action selection rule.
+
+    alpha : float or array_like of shape (N,) (default: 0.1)
+        Learning rates.
+
+    gamma : float or array_like of shape (N,) (default: 0.95)
+        Discount factors.
+
+    epsilon : float or array_like of shape (N,) (default: 0.1)
+        Exploration rates of epsilon-greedy action selection.
+
+    beta : float or array_like of shape (N,) (default: 1.0)
+        Inverse temperatures of softmax action selection.
+
+    lam : float or array_like of shape (N,) (default: 0.0)
+        Decay rates of the (accumulating) eligibility traces.
+
+    planning_steps : int (default: 0)
+        Number of Dyna planning updates per real step.
+
+    init_states : array_like of shape (N, 3) (optional, default: None)
+        Initial state coordinates of the agents. If not provided, the
+        initial state of the ``env`` agent is used, or ``(0, 0, 0)``.
+
+    rng : int or numpy.random.Generator (optional, default: None)
+        Random number generator or seed.
+
+    Examples
+    --------
+    Sweep learning rates over 1000 Q-learning agents.
+
+    >>> W = GridWorld((5, 5))
+    >>> W.add_object((0, 4, 4), reward=1, prob=1)
+    >>> learner = BatchedLearner(W, 1000, alpha=np.linspace(0.01, 1, 1000))
+    >>> rewards, dones = learner.run(500)
+    >>> rewards.shape
+    (500, 1000)
+    """
+
+    def __init__(self, env, num_agents, algorithm="q_learning", exploration="epsilon_greedy",
+                 alpha=0.1, gamma=0.95, epsilon=0.1, beta=1.0, lam=0.0,
+                 planning_steps=0, init_states=None, rng=None):
+        if algorithm not in _ALGORITHMS:
+            msg = "Unrecognized algorithm '{}', expected one of {}".format(
+                algorithm, list(_ALGORITHMS))
+            raise ValueError(msg)
+        if exploration not in _EXPLORATIONS:
+            msg = "Unrecognized exploration '{}', expected one of {}".format(
+                exploration, list(_EXPLORATIONS))
+            raise ValueError(msg)
+
+        self.compiled = _as_compiled(env)
+        self.num_agents = num_agents
+        self.algorithm = algorithm
+        self.exploration = exploration
+        self.alpha = self._per_agent(alpha)
+        self.gamma = self._per_agent(gamma)
+        self.epsilon = self._per_agent(epsilon)
+        self.beta = self._per_agent(beta)
+        self.lam = self._per_agent(lam)
+        self.planning_steps = planning_steps
+        self.rng = np.random.default_rng(rng)
+
+        if init_states is None:
+            agent = getattr(env, "_agent", None)
+            init_states = [(0, 0, 0) if agent is None else agent.init_state]
+        init_states = self.compiled.state_indices(init_states)
+        self.init_states = np.broadcast_to(init_states, (num_agents,)).copy()
+
+        num_states, num_actions = self.compiled.next_state.shape
+        self.q_values = np.zeros((num_agents, num_states, num_actions))
+        self.traces = np.zeros_like(self.q_values) if np.any(self.lam > 0) else None
+        self.states = self.init_states.copy()
+        self.actions = None
+        self._agent_idx = np.arange(num_agents)
+
+        if planning_steps > 0:
+            # Learned model and experienced state-action pairs of each agent.
+            self.model_next = np.zeros((num_agents, num_states, num_actions), dtype=np.int64)
+            self.model_reward = np.zeros((num_agents, num_states, num_actions))
+            self.model_done = np.zeros((num_agents, num_states, num_actions), dtype=bool)
+            self.model_seen = np.zeros((num_agents, num_states * num_actions), dtype=bool)
+            self.history = np.zeros((num_agents, num_states * num_actions), dtype=np.int64)
+            self.history_size = np.zeros(num_agents, dtype=np.int64)
+
+    def _per_agent(self, value):
+        return np.broadcast_to(np.asarray(value, dtype=float), (self.num_agents,)).copy()
+
+    def select_actions(self, states, u=None):
+        """Select one action per agent with the exploration rule.
+
+        Parameters
+        ----------
+        states : numpy.ndarray of shape (N,)
+            Current state id of each agent.
+
+        u : numpy.ndarray of shape (2, N) (optional, default: None)
+            Uniform random numbers to use, drawn if not provided.
+
+        Returns
+        -------
+        actions : numpy.ndarray of shape (N,)
+            Selected action index of each agent.
+        """
+        if u is None:
+            u = self.rng.random((2, self.num_agents))
+        q = self.q_values[self._agent_idx, states]
+        num_actions = q.shape[1]
+
+        if self.exploration == "epsilon_greedy":
+            # Random tie breaking among greedy actions.
+            greedy = q == q.max(axis=1, keepdims=True)
+            cdf = np.cumsum(greedy / greedy.sum(axis=1, keepdims=True), axis=1)
+            actions = (u[1][:, None] >= cdf).sum(axis=1)
+            explore = u[0] < self.epsilon
+            random_actions = (u[1] * num_actions).astype(np.int64)
+            actions = np.where(explore, random_actions, actions)
+        else:
+            prob = self.action_probabilities(states)
+            actions = (u[1][:, None] >= np.cumsum(prob, axis=1)).sum(axis=1)
+        return np.minimum(actions, num_actions - 1)
+
+    def action_probabilities(self, states):
+        """Get the action selection probabilities of each agent.
+
+        Parameters
+        ----------
+        states : numpy.ndarray of shape (N,)
+            Current state id of each agent.
+
+        Returns
+        -------
+        prob : numpy.ndarray of shape (N, A)
+            Probability of selecting each action.
+        """
+        q = self.q_values[self._agent_idx, states]
+        num_actions = q.shape[1]
+        if self.exploration == "epsilon_greedy":
+            greedy = q == q.max(axis=1, keepdims=True)
+            prob = greedy / greedy.sum(axis=1, keepdims=True) * (1 - self.epsilon[:, None])
+            return prob + self.epsilon[:, None] / num_actions
+        else:
+            logits = self.beta[:, None] * (q - q.max(axis=1, keepdims=True))
+            prob = np.exp(logits)
+            return prob / prob.sum(axis=1, keepdims=True)
+
+    def step(self):
+        """Make all the agents act, learn, and plan once.
+
+        Returns
+        -------
+        rewards : numpy.ndarray of shape (N,)
+            Reward of each agent.
+
+        dones : numpy.ndarray of shape (N,)
+            Whether the trial of each agent ends. Agents ending their trials
+            are sent back to their initial states.
+        """
+        idx = self._agent_idx
+        states = self.states
+        actions = self.actions if self.actions is not None else self.select_actions(states)
+
+        next_states, rewards, dones = self.compiled.step(states, actions, self.rng)
+        restart = np.where(dones, self.init_states, next_states)
+        commit = self.algorithm == "sarsa" or self.traces is not None
+        next_actions = self.select_actions(restart) if commit else None
+
+        # Temporal-difference errors.
+        q_next = self.q_values[idx, next_states]
+        if self.algorithm == "q_learning":
+            bootstrap = q_next.max(axis=1)
+        else:
+            bootstrap = q_next[idx, np.where(dones, 0, next_actions)]
+        target = rewards + self.gamma * np.where(dones, 0, bootstrap)
+        delta = target - self.q_values[idx, states, actions]
+
+        if self.traces is None:
+            self.q_values[idx, states, actions] += self.alpha * delta
+        else:
+            self.traces[idx, states, actions] += 1
+            self.q_values += (self.alpha * delta)[:, None, None] * self.traces
+            decay = self.gamma * self.lam
+            if self.algorithm == "q_learning":
+                # Watkins's Q(lambda) cuts the traces after exploratory actions.
+                q_restart = self.q_values[idx, restart]
+                greedy = q_restart[idx, next_actions] == q_restart.max(axis=1)
+                decay = np.where(greedy, decay, 0)
+            decay = np.where(dones, 0, decay)
+            self.traces *= decay[:, None, None]
+
+        if self.planning_steps > 0:
+            self._update_model(states, actions, next_states, rewards, dones)
+            self._plan()
+
+        # On-policy and trace updates commit to the next action in advance.
+        self.states = restart
+        self.actions = next_actions
+        return rewards, dones
+
+    def _update_model(self, states, actions, next_states, rewards, dones):
+        idx = self._agent_idx
+        self.model_next[idx, states, actions] = next_states
+        self.model_reward[idx, states, actions] = rewards
+        self.model_done[idx, states, actions] = dones
+
+        pair = states * self.q_values.shape[2] + actions
+        new = ~self.model_seen[idx, pair]
+        self.model_seen[idx, pair] = True
+        self.history[idx[new], self.history_size[new]] = pair[new]
+        self.history_size += new
+
+    def _plan(self):
+        idx = self._agent_idx
+        num_actions = self.q_values.shape[2]
+        u = self.rng.random((self.planning_steps, self.num_agents))
+        for k in range(self.planning_steps):
+            pair = self.history[idx, (u[k] * self.history_size).astype(np.int64)]
+            s, a = pair // num_actions, pair % num_actions
+            s_next = self.model_next[idx, s, a]
+            bootstrap = self.q_values[idx, s_next].max(axis=1)
+            target = self.model_reward[idx, s, a] + \
+                self.gamma * np.where(self.model_done[idx, s, a], 0, bootstrap)
+            self.q_values[idx, s, a] += self.alpha * (target - self.q_values[idx, s, a])
+
+    def run(self, num_steps):
+        """Train all the agents for a number of steps.
+
+        Parameters
+        ----------
+        num_steps : int
+            Number of steps.
+
+        Returns
+        -------
+        rewards : numpy.ndarray of shape (num_steps, N)
+            Reward of each agent at each step.
+
+        dones : numpy.ndarray of shape (num_steps, N)
+            Whether the trial of each agent ends at each step.
+        """
+        rewards = np.zeros((num_steps, self.num_agents))
+        dones = np.zeros((num_steps, self.num_agents), dtype=bool)
+        for t in range(num_steps):
+            rewards[t], dones[t] = self.step()
+        return rewards, dones
+
+    def reset(self):
+        """Send all the agents back to their initial states.
+
+        Learned Q-values and models are kept, eligibility traces are cleared.
+        """
+        self.states = self.init_states.copy()
+        self.actions = None
+        if self.traces is not None:
+            self.traces[:] = 0
+
+    def greedy_policy(self):
+        """Get the greedy action of each agent at each state.
+
+        Returns
+        -------
+        policy : numpy.ndarray of shape (N, S)
+            Greedy action index.
+        """
+        return self.q_values.argmax(axis=2)
+
+    def __repr__(self):
+        return "BatchedLearner(num_agents={}, algorithm='{}', exploration='{}', " \
+               "planning_steps={})".format(self.num_agents, self.algorithm,
+                                           self.exploration, self.planning_steps)
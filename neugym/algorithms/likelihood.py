@@ -0,0 +1,316 @@
+"""Choice likelihood of learning models on recorded behavior."""
+
+import hashlib
+
+import numpy as np
+
+from ._utils import _as_compiled
+
+__all__ = [
+    "BehaviorData",
+    "choice_log_likelihood"
+]
+
+
+class BehaviorData:
+    """Recorded behavior of many subjects, padded to a common length.
+
+    Each subject has one sequence of steps (sessions of a subject can be
+    concatenated, learning then carries over between sessions). Step ``t``
+    of subject ``i`` is the choice of action ``actions[i, t]`` at state
+    ``states[i, t]``, followed by reward ``rewards[i, t]`` and state
+    ``next_states[i, t]``. If ``dones[i, t]`` is True, the trial ends with
+    this step and the value of ``next_states[i, t]`` is not bootstrapped.
+
+    Parameters
+    ----------
+    states : array_like of ints of shape (M, T)
+        State ids.
+
+    actions : array_like of ints of shape (M, T)
+        Action indices.
+
+    rewards : array_like of shape (M, T)
+        Rewards.
+
+    next_states : array_like of ints of shape (M, T)
+        Ids of the states reached.
+
+    dones : array_like of bools of shape (M, T)
+        Whether each step ends a trial.
+
+    mask : array_like of bools of shape (M, T) (optional, default: None)
+        Valid (not padded) steps, all steps are valid if not provided.
+
+    See Also
+    --------
+    BehaviorData.from_records : Build from recorded coordinates and actions.
+    """
+
+    def __init__(self, states, actions, rewards, next_states, dones, mask=None):
+        self.states = np.asarray(states, dtype=np.int64)
+        shape = self.states.shape
+        if len(shape) != 2:
+            msg = "Data of shape (num_subjects, num_steps) expected, got {}".format(shape)
+            raise ValueError(msg)
+
+        self.actions = np.asarray(actions, dtype=np.int64)
+        self.rewards = np.asarray(rewards, dtype=float)
+        self.next_states = np.asarray(next_states, dtype=np.int64)
+        self.dones = np.asarray(dones, dtype=bool)
+        if mask is None:
+            mask = np.ones(shape, dtype=bool)
+        self.mask = np.asarray(mask, dtype=bool)
+        for name in ("actions", "rewards", "next_states", "dones", "mask"):
+            if getattr(self, name).shape != shape:
+                msg = "Shape of '{}' {} does not match states {}".format(
+                    name, getattr(self, name).shape, shape)
+                raise ValueError(msg)
+
+    @classmethod
+    def from_records(cls, env, records):
+        """Build behavior data from recorded steps of each subject.
+
+        Unless given with each step, a trial is considered to end when the
+        action moves the agent to a state with an object, when the state of
+        the next step cannot be reached from the current state with any
+        action (i.e. the trial was interrupted), and with the last step of
+        each subject. The state following each step is the state of the next
+        step, or the state the action moves the agent to if the step ends a
+        trial.
+
+        Parameters
+        ----------
+        env : GridWorld or CompiledWorld
+            Gridworld environment of the recordings.
+
+        records : list of sequences
+            One sequence per subject, of ``(state, action, reward)`` or
+            ``(state, action, reward, done)`` steps, with ``state`` a
+            coordinate and ``action`` a ``(dx, dy)`` tuple or an action index.
+
+        Returns
+        -------
+        data : BehaviorData
+            Padded behavior data.
+
+        Examples
+        --------
+        >>> W = GridWorld((1, 3))
+        >>> W.add_object((0, 0, 2), reward=1, prob=1)
+        >>> records = [[((0, 0, 0), (0, 1), 0), ((0, 0, 1), (0, 1), 1), ((0, 0, 0), (0, 0), 0)]]
+        >>> data = BehaviorData.from_records(W, records)
+        >>> data.dones
+        array([[False,  True,  True]])
+        >>> data.next_states
+        array([[1, 2, 0]])
+        """
+        compiled = _as_compiled(env)
+        num_subjects = len(records)
+        num_steps = max([len(r) for r in records] + [0])
+        states = np.zeros((num_subjects, num_steps), dtype=np.int64)
+        actions = np.zeros((num_subjects, num_steps), dtype=np.int64)
+        rewards = np.zeros((num_subjects, num_steps))
+        dones = np.zeros((num_subjects, num_steps), dtype=bool)
+        next_states = np.zeros((num_subjects, num_steps), dtype=np.int64)
+        mask = np.zeros((num_subjects, num_steps), dtype=bool)
+
+        for i, record in enumerate(records):
+            n = len(record)
+            if n == 0:
+                continue
+            steps = list(zip(*record))
+            states[i, :n] = compiled.state_indices([tuple(s) for s in steps[0]])
+            action = np.array(steps[1], dtype=np.int64)
+            actions[i, :n] = compiled.action_indices(action)
+            rewards[i, :n] = steps[2]
+            mask[i, :n] = True
+            moved = compiled.next_state[states[i, :n], actions[i, :n]]
+            if len(steps) > 3:
+                dones[i, :n] = steps[3]
+            else:
+                reachable = np.any(compiled.next_state[states[i, :n - 1]] ==
+                                   states[i, 1:n, None], axis=1)
+                dones[i, :n - 1] = compiled.terminal[moved[:-1]] | ~reachable
+            dones[i, n - 1] = True
+            next_states[i, :n - 1] = states[i, 1:n]
+            next_states[i, :n] = np.where(dones[i, :n], moved, next_states[i, :n])
+
+        return cls(states, actions, rewards, next_states, dones, mask)
+
+    @property
+    def num_subjects(self):
+        """Number of subjects ``M``."""
+        return self.states.shape[0]
+
+    @property
+    def num_steps(self):
+        """Padded number of steps ``T``."""
+        return self.states.shape[1]
+
+    def subset(self, subjects):
+        """Select some subjects.
+
+        Parameters
+        ----------
+        subjects : int or array_like of ints
+            Indices of the subjects.
+
+        Returns
+        -------
+        data : BehaviorData
+            Behavior data of the selected subjects.
+        """
+        subjects = np.atleast_1d(subjects)
+        return BehaviorData(self.states[subjects], self.actions[subjects],
+                            self.rewards[subjects], self.next_states[subjects],
+                            self.dones[subjects], self.mask[subjects])
+
+    def digest(self):
+        """Get a hash of the valid recorded steps.
+
+        Padding, and next states of steps ending a trial, do not change
+        the digest.
+
+        Returns
+        -------
+        digest : str
+            Hexadecimal SHA-256 digest.
+        """
+        h = hashlib.sha256()
+        lengths = self.mask.sum(axis=1)
+        h.update(lengths.astype(np.int64).tobytes())
+        for array in (self.states, self.actions, self.rewards, self.dones):
+            h.update(np.ascontiguousarray(array[self.mask]).tobytes())
+        # Next states of trial ends are never used.
+        h.update(np.ascontiguousarray(self.next_states[self.mask & ~self.dones]).tobytes())
+        return h.hexdigest()
+
+    def __repr__(self):
+        return "BehaviorData(num_subjects={}, num_steps={}, num_valid_steps={})".format(
+            self.num_subjects, self.num_steps, int(self.mask.sum()))
+
+
+def choice_log_likelihood(env, data, alpha, beta, gamma=0.95, algorithm="q_learning",
+                          init_value=0.0, chunk_size=None):
+    r"""Compute choice log-probabilities of softmax learners on recorded behavior.
+
+    The learning rule is replayed on the recorded steps of every subject
+    for every parameter setting at the same time, with Q-values kept in an
+    array of shape ``(P, M, S, A)``. The log-probability of each recorded
+    choice is
+
+    .. math::
+
+        \log \pi(a_t | s_t) = \beta Q(s_t, a_t) - \log \sum_a \exp(\beta Q(s_t, a))
+
+    and Q-values are updated after each choice with
+
+    .. math::
+
+        Q(s_t, a_t) \leftarrow Q(s_t, a_t) + \alpha \left(r_t +
+        \gamma (1 - d_t) \, Q(s_{t+1}, \cdot) - Q(s_t, a_t) \right)
+
+    where $Q(s_{t+1}, \cdot)$ is the maximum Q-value for ``"q_learning"``,
+    and the Q-value of the next recorded action for ``"sarsa"``.
+
+    Parameters
+    ----------
+    env : GridWorld or CompiledWorld
+        Gridworld environment of the recordings.
+
+    data : BehaviorData
+        Recorded behavior of ``M`` subjects.
+
+    alpha : float or array_like of shape (P,) or (P, M)
+        Learning rates, shared by all subjects or given per subject.
+
+    beta : float or array_like of shape (P,) or (P, M)
+        Inverse temperatures.
+
+    gamma : float or array_like of shape (P,) or (P, M) (default: 0.95)
+        Discount factors.
+
+    algorithm : str {"q_learning", "sarsa"} (default: "q_learning")
+        Learning rule.
+
+    init_value : float (default: 0.0)
+        Initial Q-value.
+
+    chunk_size : int (optional, default: None)
+        Number of subjects replayed at the same time, bounding the memory
+        used by Q-values to ``P * chunk_size * S * A`` floats. All subjects
+        are replayed at the same time if not provided.
+
+    Returns
+    -------
+    log_prob : numpy.ndarray of shape (P, M, T)
+        Log-probability of each recorded choice, zero on padded steps.
+        Sum over the last axis for the log-likelihood of each subject.
+
+    Examples
+    --------
+    Evaluate a grid of learning rates on the records of 100 subjects.
+
+    >>> data = BehaviorData.from_records(W, records)
+    >>> alpha = np.linspace(0.05, 1, 20)
+    >>> ll = choice_log_likelihood(W, data, alpha=alpha, beta=3.0).sum(axis=-1)
+    >>> ll.shape
+    (20, 100)
+    """
+    if algorithm not in ("q_learning", "sarsa"):
+        msg = "Unrecognized algorithm '{}', 'q_learning' or 'sarsa' expected".format(algorithm)
+        raise ValueError(msg)
+
+    compiled = _as_compiled(env)
+    num_subjects, num_steps = data.states.shape
+    params = [np.asarray(p, dtype=float) for p in (alpha, beta, gamma)]
+    params = [p.reshape(-1, 1) if p.ndim < 2 else p for p in params]
+    try:
+        num_params = np.broadcast(*params).shape[0]
+        alpha, beta, gamma = [np.broadcast_to(p, (num_params, num_subjects)) for p in params]
+    except ValueError:
+        msg = "Parameters of shape (P,) or (P, {}) expected, got {}".format(
+            num_subjects, [p.shape for p in params])
+        raise ValueError(msg) from None
+
+    if chunk_size is None:
+        chunk_size = max(num_subjects, 1)
+    log_prob = np.zeros((num_params, num_subjects, num_steps))
+    for start in range(0, num_subjects, chunk_size):
+        chunk = slice(start, start + chunk_size)
+        log_prob[:, chunk] = _replay(compiled, data, chunk, alpha[:, chunk], beta[:, chunk],
+                                     gamma[:, chunk], algorithm, init_value)
+    return log_prob
+
+
+def _replay(compiled, data, chunk, alpha, beta, gamma, algorithm, init_value):
+    num_params, num_subjects = alpha.shape
+    num_steps = data.num_steps
+    q = np.full((num_params, num_subjects) + compiled.next_state.shape, init_value)
+    p_idx = np.arange(num_params)[:, None]
+    m_idx = np.arange(num_subjects)[None, :]
+
+    states, actions = data.states[chunk], data.actions[chunk]
+    rewards, next_states = data.rewards[chunk], data.next_states[chunk]
+    dones, mask = data.dones[chunk], data.mask[chunk]
+    next_actions = np.concatenate([actions[:, 1:], actions[:, -1:]], axis=1)
+
+    log_prob = np.zeros((num_params, num_subjects, num_steps))
+    for t in range(num_steps):
+        s, a = states[:, t], actions[:, t]
+        q_s = q[p_idx, m_idx, s]
+        logits = beta[..., None] * q_s
+        logits -= logits.max(axis=-1, keepdims=True)
+        log_z = np.log(np.exp(logits).sum(axis=-1))
+        log_prob[:, :, t] = np.where(mask[:, t], logits[p_idx, m_idx, a] - log_z, 0)
+
+        q_next = q[p_idx, m_idx, next_states[:, t]]
+        if algorithm == "q_learning":
+            bootstrap = q_next.max(axis=-1)
+        else:
+            bootstrap = q_next[p_idx, m_idx, next_actions[:, t]]
+        target = rewards[:, t] + gamma * np.where(dones[:, t], 0, bootstrap)
+        delta = target - q_s[p_idx, m_idx, a]
+        q[p_idx, m_idx, s, a] += np.where(mask[:, t], alpha * delta, 0)
+    return log_prob
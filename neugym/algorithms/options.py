@@ -0,0 +1,221 @@
+"""Option models for hierarchical planning over gridworld areas."""
+
+import numpy as np
+
+__all__ = [
+    "OptionModel",
+    "OptionModels"
+]
+
+
+class OptionModel:
+    r"""Multi-step option models of one area.
+
+    Subgoals of an area are its doorway states (states from which an
+    inter-area path can be taken) and the states with an object.
+    For each pair of subgoals ``(i, j)``, the option "go to subgoal ``j``"
+    started at subgoal ``i`` follows the shortest path toward ``j`` within the
+    area, and terminates when reaching ``j``, reaching an object, or leaving
+    the area (e.g. slipping through a doorway). Its model is
+
+    .. math::
+
+        R(i, j) = E \left[ \sum_{t=0}^{\tau - 1} \gamma^t r_t \right], \quad
+        P(i, j, o) = E \left[ \gamma^\tau 1(s_\tau = o) \right]
+
+    where $\tau$ is the option duration, whose distribution is also given.
+    Options started at their own subgoal terminate immediately.
+
+    Attributes
+    ----------
+    area : int
+        Index of the area.
+
+    gamma : float
+        Discount factor.
+
+    subgoals : numpy.ndarray of shape (G,)
+        State ids of the subgoals.
+
+    outcomes : numpy.ndarray of shape (O,)
+        State ids where the options can terminate, i.e. the subgoals
+        followed by the states of other areas reachable from the area.
+
+    reward : numpy.ndarray of shape (G, G)
+        Expected discounted reward of each option from each subgoal.
+
+    termination : numpy.ndarray of shape (G, G, O)
+        Discounted probability of terminating at each outcome state.
+
+    duration : numpy.ndarray of shape (G, G, max_duration + 1)
+        Probability that each option lasts exactly ``k`` steps, the
+        probability of lasting longer than ``max_duration`` steps is
+        ``1 - duration.sum(axis=-1)``.
+    """
+
+    def __init__(self, area, gamma, subgoals, outcomes, reward, termination, duration):
+        self.area = area
+        self.gamma = gamma
+        self.subgoals = subgoals
+        self.outcomes = outcomes
+        self.reward = reward
+        self.termination = termination
+        self.duration = duration
+
+    def __repr__(self):
+        return "OptionModel(area={}, num_subgoals={}, num_outcomes={}, gamma={})".format(
+            self.area, len(self.subgoals), len(self.outcomes), self.gamma)
+
+
+class OptionModels:
+    """Per-area cache of option models of a gridworld environment.
+
+    Option models are computed on first access to an area, and recomputed
+    only when the area or one of its neighbor areas (altitude, blocks,
+    objects, paths, or transition kernels) has been modified since.
+
+    Parameters
+    ----------
+    env : GridWorld
+        Gridworld environment.
+
+    gamma : float (default: 0.95)
+        Discount factor.
+
+    max_duration : int (default: 100)
+        Maximum option duration of the duration distributions.
+
+    Examples
+    --------
+    >>> W = GridWorld()
+    >>> W.add_area((5, 5))
+    >>> W.add_path((0, 0, 0), (1, 0, 0))
+    >>> W.add_object((1, 4, 4), reward=1, prob=1)
+    >>> models = OptionModels(W, gamma=0.9)
+    >>> M = models[1]
+    >>> M.reward.shape
+    (2, 2)
+    """
+
+    def __init__(self, env, gamma=0.95, max_duration=100):
+        if not 0 <= gamma < 1:
+            msg = "Discount factor in [0, 1) expected, got {}".format(gamma)
+            raise ValueError(msg)
+
+        self.env = env
+        self.gamma = gamma
+        self.max_duration = max_duration
+        self._cache = {}
+
+    def __getitem__(self, area):
+        return self.get(area)
+
+    def get(self, area):
+        """Get the option model of one area.
+
+        Parameters
+        ----------
+        area : int or str
+            Index or name of the area.
+
+        Returns
+        -------
+        model : OptionModel
+            Option model of the area.
+        """
+        area_idx = self.env._area_index(area)
+        stamp = self.env._area_stamps.get(area_idx)
+        cached = self._cache.get(area_idx)
+        if cached is not None and stamp is not None and cached[0] == stamp:
+            return cached[1]
+
+        model = _compute_option_model(self.env.compile(), area_idx,
+                                      self.gamma, self.max_duration)
+        self._cache[area_idx] = (stamp, model)
+        return model
+
+    def clear(self):
+        """Remove all cached option models."""
+        self._cache.clear()
+
+
+def _compute_option_model(compiled, area_idx, gamma, max_duration):
+    import scipy.sparse as sp
+    from scipy.sparse.csgraph import shortest_path
+    from scipy.sparse.linalg import splu
+
+    area_slice = compiled.area_slice(area_idx)
+    offset = area_slice.start
+    n = area_slice.stop - area_slice.start
+    next_state = compiled.next_state[area_slice]
+    num_actions = next_state.shape[1]
+    inside = (next_state >= offset) & (next_state < area_slice.stop)
+    local_next = np.where(inside, next_state - offset, -1)
+    blocked = compiled.blocked[area_slice]
+    has_obj = compiled.terminal[area_slice]
+
+    # Subgoals and outcomes.
+    doorway = ~blocked & np.any(~inside, axis=1)
+    subgoals = np.flatnonzero(doorway | has_obj)
+    external = np.unique(next_state[~inside])
+    outcomes = np.concatenate([subgoals + offset, external])
+    outcome_col = np.full(compiled.num_states, -1, dtype=np.int64)
+    outcome_col[outcomes] = np.arange(len(outcomes))
+    num_goals = len(subgoals)
+
+    # Shortest distances toward each subgoal within the area.
+    s_idx = np.repeat(np.arange(n), num_actions)
+    t_idx = local_next.ravel()
+    keep = (t_idx >= 0) & (t_idx != s_idx) & ~blocked[s_idx]
+    graph = sp.csr_matrix((np.ones(keep.sum()), (t_idx[keep], s_idx[keep])), shape=(n, n))
+    dist = shortest_path(graph, directed=True, unweighted=True, indices=subgoals)
+    dist = dist.reshape(num_goals, n)
+
+    # Expected step reward of each executed action.
+    step_reward = compiled.move_reward[area_slice] + \
+        compiled.object_expected_reward()[next_state]
+    kernels = compiled.kernels[compiled.kernel_index[area_slice]]
+    stay = compiled.actions.index((0, 0)) if (0, 0) in compiled.actions else 0
+
+    reward = np.zeros((num_goals, num_goals))
+    termination = np.zeros((num_goals, num_goals, len(outcomes)))
+    duration = np.zeros((num_goals, num_goals, max_duration + 1))
+    for j in range(num_goals):
+        # Greedy policy on the shortest distances.
+        d = np.where(local_next >= 0, dist[j][np.maximum(local_next, 0)], np.inf)
+        policy = np.where(np.isfinite(d).any(axis=1), d.argmin(axis=1), stay)
+        prob = kernels[np.arange(n), policy]
+        r = (prob * step_reward).sum(axis=1)
+
+        # Entering the goal, an object, or another area terminates the option.
+        absorbing = has_obj.copy()
+        absorbing[subgoals[j]] = True
+        to_transient = (local_next >= 0) & ~absorbing[np.maximum(local_next, 0)]
+        rows = np.broadcast_to(np.arange(n)[:, None], prob.shape)
+        Q = sp.csr_matrix((prob[to_transient], (rows[to_transient], local_next[to_transient])),
+                          shape=(n, n))
+        B = sp.csr_matrix((prob[~to_transient],
+                           (rows[~to_transient], outcome_col[next_state[~to_transient]])),
+                          shape=(n, len(outcomes)))
+
+        lu = splu(sp.csc_matrix(sp.identity(n) - gamma * Q))
+        solution = lu.solve(np.column_stack([r, gamma * B.toarray()]))
+        reward[:, j] = solution[subgoals, 0]
+        termination[:, j] = solution[subgoals, 1:]
+
+        alive = np.ones(n)
+        for k in range(1, max_duration + 1):
+            next_alive = Q @ alive
+            duration[:, j, k] = (alive - next_alive)[subgoals]
+            alive = next_alive
+
+    # Options started at their own subgoal terminate immediately.
+    diag = np.arange(num_goals)
+    reward[diag, diag] = 0
+    termination[diag, diag] = 0
+    termination[diag, diag, diag] = 1
+    duration[diag, diag] = 0
+    duration[diag, diag, 0] = 1
+
+    return OptionModel(area_idx, gamma, subgoals + offset, outcomes,
+                       reward, termination, duration)
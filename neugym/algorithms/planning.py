@@ -0,0 +1,523 @@
+"""Model-based planning with prioritized sweeping and Dyna updates."""
+
+import heapq
+
+import numpy as np
+
+from ._utils import _as_compiled
+
+__all__ = [
+    "TabularModel",
+    "PrioritizedSweeping"
+]
+
+
+class TabularModel:
+    r"""Tabular model of the dynamics of a gridworld environment.
+
+    A model gives, for each state-action pair, its expected reward and up
+    to ``max_outcomes`` possible next states, with their probability and
+    the probability that the trial ends there. It is either the exact model
+    of a world (see ``TabularModel.from_world()``), or learned from
+    observed transitions (see ``TabularModel.update()``) as maximum
+    likelihood estimates from counts.
+
+    State-action pairs are identified by ``pair = state * A + action``, and
+    the outcomes of all pairs are stored in arrays of shape ``(S * A, M)``.
+    A reverse transition table gives the predecessors of each state, i.e.
+    the pairs that lead to it, including pairs crossing inter-area paths.
+    It is kept up to date as new outcomes are observed.
+
+    Parameters
+    ----------
+    num_states : int
+        Number of states ``S``.
+
+    num_actions : int
+        Number of actions ``A``.
+
+    max_outcomes : int (optional, default: None)
+        Maximum number of distinct next states of a state-action pair
+        ``M``, ``A`` if not provided, which covers gridworld dynamics with
+        any transition kernel.
+
+    Attributes
+    ----------
+    outcomes : numpy.ndarray of shape (S * A, M)
+        Ids of the next states of each pair, ``-1`` for unused slots.
+
+    counts : numpy.ndarray of shape (S * A, M)
+        Number of observations of each outcome (probabilities for exact models).
+
+    done_counts : numpy.ndarray of shape (S * A, M)
+        Number of observations of each outcome which ended a trial.
+
+    pair_counts : numpy.ndarray of shape (S * A,)
+        Number of observations of each pair (ones for exact models).
+
+    reward : numpy.ndarray of shape (S * A,)
+        Expected reward of each pair.
+
+    probability : numpy.ndarray of shape (S * A, M)
+        Probability of each outcome.
+
+    continuation : numpy.ndarray of shape (S * A, M)
+        Probability of each outcome without the trial ending.
+
+    Examples
+    --------
+    >>> model = TabularModel(C.num_states, C.num_actions)
+    >>> next_states, rewards, dones = C.step(states, actions, rng)
+    >>> model.update(states, actions, rewards, next_states, dones)
+    >>> model.predecessors(next_states[0])
+    """
+
+    def __init__(self, num_states, num_actions, max_outcomes=None):
+        if max_outcomes is None:
+            max_outcomes = num_actions
+        if num_states < 1 or num_actions < 1 or max_outcomes < 1:
+            msg = "Positive 'num_states', 'num_actions' and 'max_outcomes' expected, " \
+                  "got {}, {} and {}".format(num_states, num_actions, max_outcomes)
+            raise ValueError(msg)
+
+        self.num_states = int(num_states)
+        self.num_actions = int(num_actions)
+        self.max_outcomes = int(max_outcomes)
+        self.exact = False
+
+        num_pairs = self.num_states * self.num_actions
+        self.outcomes = np.full((num_pairs, self.max_outcomes), -1, dtype=np.int64)
+        self.counts = np.zeros((num_pairs, self.max_outcomes))
+        self.done_counts = np.zeros((num_pairs, self.max_outcomes))
+        self.pair_counts = np.zeros(num_pairs)
+        self.reward_sum = np.zeros(num_pairs)
+        self.reward = np.zeros(num_pairs)
+        self.probability = np.zeros((num_pairs, self.max_outcomes))
+        self.continuation = np.zeros((num_pairs, self.max_outcomes))
+
+        # Reverse transition table: the slots (pair * M + outcome) leading to
+        # each state, in CSR format, and the slots filled since it was built.
+        self._rebuild_size = max(256, int(np.sqrt(num_pairs * self.max_outcomes)))
+        self._build_predecessors()
+
+    @classmethod
+    def from_world(cls, env):
+        """Get the exact model of a gridworld environment.
+
+        Transition kernels are taken into account, and trials end when
+        entering a state with an object.
+
+        Parameters
+        ----------
+        env : GridWorld or CompiledWorld
+            Gridworld environment.
+
+        Returns
+        -------
+        model : TabularModel
+            Exact model, which cannot be updated.
+        """
+        compiled = _as_compiled(env)
+        num_states, num_actions = compiled.next_state.shape
+        model = cls(num_states, num_actions)
+        model.exact = True
+
+        # Merge the executed actions of each pair leading to the same state
+        # into the slot of the first of them.
+        next_state = compiled.next_state
+        same = next_state[:, :, None] == next_state[:, None, :]
+        first = same.argmax(axis=2)
+        merge = first[:, :, None] == np.arange(num_actions)
+        prob = np.einsum('sab,sbc->sac', compiled.kernels[compiled.kernel_index], merge)
+        prob = prob.reshape(-1, num_actions)
+
+        outcomes = np.repeat(next_state, num_actions, axis=0)
+        model.outcomes = np.where(prob > 0, outcomes, -1)
+        model.counts = prob
+        model.done_counts = prob * compiled.terminal[outcomes]
+        model.pair_counts = np.ones(len(prob))
+        model.reward_sum = compiled.expected_reward().ravel()
+        model.reward = model.reward_sum.copy()
+        model.probability = prob.copy()
+        model.continuation = prob - model.done_counts
+        model._build_predecessors()
+        return model
+
+    @property
+    def num_pairs(self):
+        """Number of state-action pairs."""
+        return self.num_states * self.num_actions
+
+    def _build_predecessors(self):
+        outcomes = self.outcomes.ravel()
+        filled = np.flatnonzero(outcomes >= 0)
+        order = np.argsort(outcomes[filled], kind="stable")
+        self._pred_slots = filled[order]
+        self._pred_indptr = np.zeros(self.num_states + 1, dtype=np.int64)
+        self._pred_indptr[1:] = np.cumsum(np.bincount(outcomes[filled],
+                                                      minlength=self.num_states))
+        self._pending = np.zeros(0, dtype=np.int64)
+
+    def _predecessor_slots(self, state):
+        slots = self._pred_slots[self._pred_indptr[state]:self._pred_indptr[state + 1]]
+        if len(self._pending) > 0:
+            pending = self._pending[self.outcomes.ravel()[self._pending] == state]
+            if len(pending) > 0:
+                slots = np.concatenate([slots, pending])
+        return slots
+
+    def predecessors(self, state):
+        """Get the state-action pairs leading to a state.
+
+        Parameters
+        ----------
+        state : int
+            Id of the state.
+
+        Returns
+        -------
+        states : numpy.ndarray of ints
+            Ids of the predecessor states.
+
+        actions : numpy.ndarray of ints
+            Indices of the actions leading from each predecessor to ``state``
+            with non-zero probability.
+        """
+        pairs = np.unique(self._predecessor_slots(state) // self.max_outcomes)
+        return pairs // self.num_actions, pairs % self.num_actions
+
+    def update(self, states, actions, rewards, next_states, dones):
+        """Update the learned model with observed transitions.
+
+        Parameters
+        ----------
+        states, actions : array_like of ints
+            Ids of the states and indices of the actions.
+
+        rewards : array_like of floats
+            Rewards of the transitions.
+
+        next_states : array_like of ints
+            Ids of the next states.
+
+        dones : array_like of bools
+            Whether each trial ends.
+
+        Returns
+        -------
+        pairs : numpy.ndarray of ints
+            Sorted ids of the updated state-action pairs.
+        """
+        if self.exact:
+            msg = "Exact models cannot be updated"
+            raise RuntimeError(msg)
+        states = np.atleast_1d(np.asarray(states, dtype=np.int64))
+        actions = np.atleast_1d(np.asarray(actions, dtype=np.int64))
+        rewards = np.atleast_1d(np.asarray(rewards, dtype=float))
+        next_states = np.atleast_1d(np.asarray(next_states, dtype=np.int64))
+        dones = np.atleast_1d(np.asarray(dones, dtype=bool))
+        for name, values, bound in (("State", states, self.num_states),
+                                    ("Action", actions, self.num_actions),
+                                    ("Next state", next_states, self.num_states)):
+            if values.min(initial=0) < 0 or values.max(initial=0) >= bound:
+                msg = "{} index out of range [0, {})".format(name, bound)
+                raise ValueError(msg)
+        pairs = states * self.num_actions + actions
+
+        # Slots of the outcomes, filling free slots for new outcomes.
+        match = self.outcomes[pairs] == next_states[:, None]
+        found = match.any(axis=1)
+        slots = match.argmax(axis=1)
+        new_slots = []
+        for i in np.flatnonzero(~found):
+            row = self.outcomes[pairs[i]]
+            known = np.flatnonzero(row == next_states[i])
+            if len(known) == 0:
+                free = np.flatnonzero(row < 0)
+                if len(free) == 0:
+                    msg = "More than {} outcomes observed for state {} and action {}, " \
+                          "increase 'max_outcomes'".format(self.max_outcomes, states[i],
+                                                           actions[i])
+                    raise RuntimeError(msg)
+                known = free[:1]
+                row[known[0]] = next_states[i]
+                new_slots.append(pairs[i] * self.max_outcomes + known[0])
+            slots[i] = known[0]
+
+        np.add.at(self.counts, (pairs, slots), 1)
+        np.add.at(self.done_counts, (pairs, slots), dones)
+        np.add.at(self.pair_counts, pairs, 1)
+        np.add.at(self.reward_sum, pairs, rewards)
+
+        pairs = np.unique(pairs)
+        total = self.pair_counts[pairs]
+        self.reward[pairs] = self.reward_sum[pairs] / total
+        self.probability[pairs] = self.counts[pairs] / total[:, None]
+        self.continuation[pairs] = (self.counts[pairs] - self.done_counts[pairs]) / total[:, None]
+
+        if len(new_slots) > 0:
+            self._pending = np.append(self._pending, new_slots)
+            if len(self._pending) >= self._rebuild_size:
+                self._build_predecessors()
+        return pairs
+
+    def __repr__(self):
+        return "TabularModel(num_states={}, num_actions={}, max_outcomes={}, exact={})".format(
+            self.num_states, self.num_actions, self.max_outcomes, self.exact)
+
+
+class PrioritizedSweeping:
+    r"""Planning agent updating its action values from a tabular model.
+
+    Action values are updated with full expected backups from the model
+
+    .. math::
+
+        Q(s, a) \leftarrow r(s, a) + \gamma \sum_{s'} c(s' | s, a) \max_{a'} Q(s', a'),
+
+    where $c(s' | s, a)$ is the probability of moving to $s'$ without the
+    trial ending (``TabularModel.continuation``). Pairs are updated in
+    order of priority, the magnitude of the change of their value, from a
+    priority queue: after each update of a state value, the priorities of
+    its predecessors are updated from the reverse transition table of the
+    model, and the ones above ``theta`` are queued (prioritized sweeping).
+    Experienced pairs can also be updated in random order, as in Dyna-Q
+    (see ``PrioritizedSweeping.dyna()``).
+
+    The backup of each pair is kept up to date as the state values change,
+    so that each update only costs the number of predecessors of the
+    updated state, independently of the size of the world.
+
+    Parameters
+    ----------
+    model : TabularModel
+        Exact or learned model, learned models are updated by
+        ``PrioritizedSweeping.observe()``.
+
+    gamma : float (default: 0.95)
+        Discount factor.
+
+    theta : float (default: 1e-4)
+        Minimum priority of the queued pairs.
+
+    q_values : numpy.ndarray of shape (S, A) (optional, default: None)
+        Initial action values, zero if not provided.
+
+    Attributes
+    ----------
+    q_values : numpy.ndarray of shape (S, A)
+        Action values.
+
+    values : numpy.ndarray of shape (S,)
+        State values, the maximum action value of each state.
+
+    Examples
+    --------
+    >>> C = W.compile()
+    >>> planner = PrioritizedSweeping(TabularModel(C.num_states, C.num_actions))
+    >>> state = C.state_index((0, 0, 0))
+    >>> for t in range(1000):
+    ...     action = planner.q_values[state].argmax() if rng.random() > 0.1 \
+    ...         else rng.integers(C.num_actions)
+    ...     next_states, rewards, dones = C.step([state], [action], rng)
+    ...     planner.observe(state, action, rewards[0], next_states[0], dones[0])
+    ...     planner.plan(1000)
+    ...     state = 0 if dones[0] else next_states[0]
+    """
+
+    def __init__(self, model, gamma=0.95, theta=1e-4, q_values=None):
+        if not 0 <= gamma <= 1:
+            msg = "'gamma' in [0, 1] expected, got {}".format(gamma)
+            raise ValueError(msg)
+        if theta < 0:
+            msg = "Non-negative 'theta' expected, got {}".format(theta)
+            raise ValueError(msg)
+
+        self.model = model
+        self.gamma = float(gamma)
+        self.theta = float(theta)
+
+        shape = (model.num_states, model.num_actions)
+        if q_values is None:
+            self.q_values = np.zeros(shape)
+        else:
+            self.q_values = np.array(q_values, dtype=float)
+            if self.q_values.shape != shape:
+                msg = "Action values of shape {} expected, got {}".format(
+                    shape, self.q_values.shape)
+                raise ValueError(msg)
+        self.values = self.q_values.max(axis=1)
+        self._q = self.q_values.reshape(-1)
+        self._priority = np.zeros(model.num_pairs)
+        self._queue = []
+        self._refresh()
+
+    def _refresh(self):
+        # Backups of all pairs from the current state values.
+        model = self.model
+        self._backup = model.reward + self.gamma * \
+            (model.continuation * self.values[np.maximum(model.outcomes, 0)]).sum(axis=1)
+
+    def _push(self, pairs):
+        errors = np.abs(self._backup[pairs] - self._q[pairs])
+        mask = (errors > self.theta) & (errors > self._priority[pairs])
+        if mask.any():
+            pairs, errors = pairs[mask], errors[mask]
+            self._priority[pairs] = errors
+            for pair, error in zip(pairs.tolist(), errors.tolist()):
+                heapq.heappush(self._queue, (-error, pair))
+
+    def _pop(self):
+        while self._queue:
+            error, pair = heapq.heappop(self._queue)
+            # Entries whose priority was raised since are outdated.
+            if self._priority[pair] == -error:
+                self._priority[pair] = 0
+                return pair
+        return None
+
+    def _update(self, pair):
+        # Full backup of one pair, propagated to the backups of the predecessors.
+        model = self.model
+        state = pair // model.num_actions
+        self._q[pair] = self._backup[pair]
+        value = self.q_values[state].max()
+        delta = value - self.values[state]
+        if delta != 0:
+            self.values[state] = value
+            slots = model._predecessor_slots(state)
+            pairs = slots // model.max_outcomes
+            self._backup[pairs] += self.gamma * delta * model.continuation.ravel()[slots]
+            self._push(pairs)
+
+    @property
+    def queue_size(self):
+        """Number of queued state-action pairs."""
+        return int(np.count_nonzero(self._priority))
+
+    def observe(self, states, actions, rewards, next_states, dones):
+        """Observe real transitions and queue the surprising pairs.
+
+        Learned models are updated with the transitions, and the observed
+        pairs are queued if their priority is above ``theta``.
+
+        Parameters
+        ----------
+        states, actions : int or array_like of ints
+            Ids of the states and indices of the actions.
+
+        rewards : float or array_like of floats
+            Rewards of the transitions.
+
+        next_states : int or array_like of ints
+            Ids of the next states.
+
+        dones : bool or array_like of bools
+            Whether each trial ends.
+        """
+        model = self.model
+        if model.exact:
+            pairs = np.atleast_1d(np.asarray(states, dtype=np.int64)) * model.num_actions + \
+                np.atleast_1d(np.asarray(actions, dtype=np.int64))
+        else:
+            pairs = model.update(states, actions, rewards, next_states, dones)
+            self._backup[pairs] = model.reward[pairs] + self.gamma * \
+                (model.continuation[pairs] *
+                 self.values[np.maximum(model.outcomes[pairs], 0)]).sum(axis=1)
+        self._push(pairs)
+
+    def plan(self, num_updates):
+        """Update the pairs of highest priority.
+
+        Parameters
+        ----------
+        num_updates : int
+            Maximum number of updates.
+
+        Returns
+        -------
+        num_updates : int
+            Number of updates made, fewer than requested if the queue
+            became empty.
+        """
+        for k in range(num_updates):
+            pair = self._pop()
+            if pair is None:
+                return k
+            self._update(pair)
+        if len(self._queue) > 4 * self.model.num_pairs:
+            self._compact()
+        return num_updates
+
+    def _compact(self):
+        pairs = np.flatnonzero(self._priority)
+        self._queue = list(zip((-self._priority[pairs]).tolist(), pairs.tolist()))
+        heapq.heapify(self._queue)
+
+    def sweep(self, max_updates=None):
+        """Plan until no pair has a priority above ``theta``.
+
+        All the pairs are queued first, so that with an exact model and a
+        small ``theta`` the action values converge to the optimal ones, as
+        with value iteration.
+
+        Parameters
+        ----------
+        max_updates : int (optional, default: None)
+            Maximum number of updates, no limit if None.
+
+        Returns
+        -------
+        num_updates : int
+            Number of updates made.
+        """
+        self._refresh()
+        self._push(np.arange(self.model.num_pairs))
+        num_updates = 0
+        while max_updates is None or num_updates < max_updates:
+            batch = 100000 if max_updates is None else min(100000, max_updates - num_updates)
+            done = self.plan(batch)
+            num_updates += done
+            if done < batch:
+                break
+        return num_updates
+
+    def dyna(self, num_updates, rng=None):
+        """Update experienced pairs chosen uniformly at random (Dyna-Q planning).
+
+        Parameters
+        ----------
+        num_updates : int
+            Number of updates.
+
+        rng : int or numpy.random.Generator (optional, default: None)
+            Random number generator or seed.
+
+        Returns
+        -------
+        pairs : numpy.ndarray of ints
+            Ids of the updated pairs, in order.
+        """
+        rng = np.random.default_rng(rng)
+        experienced = np.flatnonzero(self.model.pair_counts)
+        if len(experienced) == 0:
+            return np.zeros(0, dtype=np.int64)
+        pairs = experienced[rng.integers(len(experienced), size=num_updates)]
+        self._priority[pairs] = 0
+        for pair in pairs.tolist():
+            self._update(pair)
+        return pairs
+
+    def greedy_policy(self):
+        """Get the greedy action at each state.
+
+        Returns
+        -------
+        policy : numpy.ndarray of shape (S,)
+            Greedy action index.
+        """
+        return self.q_values.argmax(axis=1)
+
+    def __repr__(self):
+        return "PrioritizedSweeping(num_states={}, gamma={}, theta={}, queue_size={})".format(
+            self.model.num_states, self.gamma, self.theta, self.queue_size)
@@ -0,0 +1,380 @@
+"""Array-backed experience replay of batched gridworld transitions."""
+
+import numpy as np
+
+__all__ = [
+    "ReplayBuffer"
+]
+
+# Arrays of a replay buffer saved by ReplayBuffer.save().
+_ARRAYS = ("states", "actions", "rewards", "next_states", "dones")
+
+
+class _SumTree:
+    """Binary tree of priority sums stored in one array.
+
+    Leaf ``i`` is stored at ``tree[size + i]`` and node ``j`` holds the sum
+    of nodes ``2 * j`` and ``2 * j + 1``, so that the root ``tree[1]`` is
+    the total priority. Updates and sampling are vectorized level by level.
+    """
+
+    def __init__(self, capacity):
+        self.size = 1 << max(int(capacity - 1).bit_length(), 0)
+        self.depth = self.size.bit_length() - 1
+        self.tree = np.zeros(2 * self.size)
+
+    @property
+    def total(self):
+        return self.tree[1]
+
+    def get(self, indices):
+        return self.tree[self.size + indices]
+
+    def set(self, indices, priorities):
+        nodes = self.size + np.asarray(indices, dtype=np.int64)
+        self.tree[nodes] = priorities
+        for _ in range(self.depth):
+            # Duplicate parents are recomputed to the same sum.
+            nodes >>= 1
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+
+    def set_range(self, start, priorities):
+        # Contiguous leaves, updated with slices.
+        lo = self.size + start
+        hi = lo + len(priorities)
+        self.tree[lo:hi] = priorities
+        for _ in range(self.depth):
+            lo, hi = lo >> 1, ((hi - 1) >> 1) + 1
+            self.tree[lo:hi] = self.tree[2 * lo:2 * hi:2] + self.tree[2 * lo + 1:2 * hi:2]
+
+    def find(self, values):
+        # Leaves where the cumulative sum of priorities reaches ``values``.
+        nodes = np.ones(len(values), dtype=np.int64)
+        for _ in range(self.depth):
+            left = self.tree[2 * nodes]
+            right = values >= left
+            values = np.where(right, values - left, values)
+            nodes = 2 * nodes + right
+        return nodes - self.size
+
+
+class ReplayBuffer:
+    r"""Ring buffer of transitions from batched environments.
+
+    Transitions are stored in preallocated arrays of state ids, action
+    indices, rewards, next state ids and done flags (see ``CompiledWorld``
+    for state ids), as steps of ``num_envs`` parallel environments, e.g.
+    the output of one ``CompiledWorld.step()`` call. Once full, the oldest
+    steps are overwritten.
+
+    Transitions are sampled in batches, either uniformly or in proportion
+    to their priority :math:`p_i^\alpha` (prioritized experience replay,
+    using a sum-tree), and returned with their ``n_step`` discounted
+    return
+
+    .. math::
+
+        R_t = \sum_{k=0}^{m-1} \gamma^k r_{t+k},
+
+    where :math:`m \le n` is cut at the end of a trial or at the latest
+    stored step, and the state and discount :math:`\gamma^m` to bootstrap
+    from.
+
+    Parameters
+    ----------
+    capacity : int
+        Maximum number of stored transitions, a multiple of ``num_envs``.
+
+    num_envs : int (optional, default: 1)
+        Number of parallel environments, i.e. transitions per step.
+
+    n_step : int (optional, default: 1)
+        Number of steps of the sampled returns.
+
+    gamma : float (optional, default: 0.95)
+        Discount factor of the sampled returns.
+
+    prioritized : bool (optional, default: False)
+        Whether to sample transitions in proportion to their priority.
+
+    alpha : float (optional, default: 0.6)
+        Exponent of the priorities, ``0`` for uniform sampling.
+
+    eps : float (optional, default: 1e-6)
+        Constant added to the priorities, so that every transition can be sampled.
+
+    Examples
+    --------
+    >>> C = W.compile()
+    >>> buffer = ReplayBuffer(100000, num_envs=64, n_step=3, prioritized=True)
+    >>> states = np.zeros(64, dtype=int)
+    >>> for _ in range(1000):
+    ...     actions = rng.integers(C.num_actions, size=64)
+    ...     next_states, rewards, dones = C.step(states, actions, rng)
+    ...     buffer.add(states, actions, rewards, next_states, dones)
+    ...     states = np.where(dones, 0, next_states)
+    >>> batch = buffer.sample(256, rng=rng)
+    >>> td_error = batch["rewards"] + batch["discounts"] * \
+    ...     Q[batch["next_states"]].max(axis=1) - Q[batch["states"], batch["actions"]]
+    >>> buffer.update_priorities(batch["indices"], np.abs(td_error))
+    """
+
+    def __init__(self, capacity, num_envs=1, n_step=1, gamma=0.95, prioritized=False,
+                 alpha=0.6, eps=1e-6):
+        if num_envs < 1:
+            msg = "Positive 'num_envs' expected, got {}".format(num_envs)
+            raise ValueError(msg)
+        if capacity < num_envs or capacity % num_envs != 0:
+            msg = "'capacity' should be a positive multiple of 'num_envs' ({}), got {}".format(
+                num_envs, capacity)
+            raise ValueError(msg)
+        if n_step < 1:
+            msg = "Positive 'n_step' expected, got {}".format(n_step)
+            raise ValueError(msg)
+
+        self.capacity = int(capacity)
+        self.num_envs = int(num_envs)
+        self.n_step = int(n_step)
+        self.gamma = float(gamma)
+        self.prioritized = bool(prioritized)
+        self.alpha = float(alpha)
+        self.eps = float(eps)
+
+        self.states = np.zeros(self.capacity, dtype=np.int64)
+        self.actions = np.zeros(self.capacity, dtype=np.int64)
+        self.rewards = np.zeros(self.capacity)
+        self.next_states = np.zeros(self.capacity, dtype=np.int64)
+        self.dones = np.zeros(self.capacity, dtype=bool)
+
+        self._num_rows = self.capacity // self.num_envs
+        self._row = 0
+        self._size = 0
+        self._max_priority = 1.0
+        self._tree = _SumTree(self.capacity) if self.prioritized else None
+
+    def __len__(self):
+        return self._size * self.num_envs
+
+    @property
+    def full(self):
+        """Whether the oldest transitions are being overwritten."""
+        return self._size == self._num_rows
+
+    def add(self, states, actions, rewards, next_states, dones):
+        """Store steps of the parallel environments.
+
+        Parameters
+        ----------
+        states, next_states : array_like of ints of shape (num_envs,) or (T, num_envs)
+            Ids of the states and of the next states.
+
+        actions : array_like of ints of shape (num_envs,) or (T, num_envs)
+            Indices of the actions.
+
+        rewards : array_like of floats of shape (num_envs,) or (T, num_envs)
+            Rewards.
+
+        dones : array_like of bools of shape (num_envs,) or (T, num_envs)
+            Whether each trial ended.
+        """
+        shape = np.shape(states)
+        if len(shape) == 0 or len(shape) > 2 or shape[-1] != self.num_envs:
+            msg = "Steps of shape ({0},) or (T, {0}) expected, got {1}".format(
+                self.num_envs, shape)
+            raise ValueError(msg)
+        num_steps = shape[0] if len(shape) == 2 else 1
+        if num_steps > self._num_rows:
+            # Only the latest steps fit.
+            skip = num_steps - self._num_rows
+            self._row = (self._row + skip) % self._num_rows
+            states, actions, rewards, next_states, dones = \
+                (np.asarray(x)[skip:] for x in (states, actions, rewards, next_states, dones))
+            num_steps = self._num_rows
+
+        # Rows wrap at most once, written in at most two contiguous blocks.
+        values = [np.reshape(x, -1) for x in (states, actions, rewards, next_states, dones)]
+        start = self._row * self.num_envs
+        first = min(num_steps, self._num_rows - self._row) * self.num_envs
+        for lo, hi, offset in ((start, start + first, 0),
+                               (0, num_steps * self.num_envs - first, first)):
+            if hi <= lo:
+                continue
+            for name, value in zip(_ARRAYS, values):
+                getattr(self, name)[lo:hi] = value[offset:offset + hi - lo]
+            if self.prioritized:
+                self._tree.set_range(lo, np.full(hi - lo, self._max_priority ** self.alpha))
+
+        self._row = (self._row + num_steps) % self._num_rows
+        self._size = min(self._size + num_steps, self._num_rows)
+
+    def sample(self, batch_size, beta=0.4, rng=None):
+        r"""Sample a batch of transitions.
+
+        Prioritized sampling is stratified, i.e. one transition is drawn
+        from each of ``batch_size`` equal segments of the total priority.
+
+        Parameters
+        ----------
+        batch_size : int
+            Number of sampled transitions.
+
+        beta : float (optional, default: 0.4)
+            Exponent of the importance sampling weights
+            :math:`w_i \propto (N P(i))^{-\beta}` of prioritized sampling,
+            normalized by the largest weight of the batch.
+
+        rng : int or numpy.random.Generator (optional, default: None)
+            Random number generator or seed.
+
+        Returns
+        -------
+        batch : dict of numpy.ndarray of shape (batch_size,)
+            Sampled transitions, see ``ReplayBuffer.get()``, with the
+            importance sampling ``"weights"`` (ones for uniform sampling).
+        """
+        if self._size == 0:
+            msg = "Unable to sample from an empty replay buffer"
+            raise RuntimeError(msg)
+        rng = np.random.default_rng(rng)
+        num_items = len(self)
+
+        if not self.prioritized:
+            indices = rng.integers(num_items, size=batch_size)
+            batch = self.get(indices)
+            batch["weights"] = np.ones(batch_size)
+            return batch
+
+        total = self._tree.total
+        values = (np.arange(batch_size) + rng.random(batch_size)) * (total / batch_size)
+        indices = np.minimum(self._tree.find(values), num_items - 1)
+        weights = (num_items * self._tree.get(indices) / total) ** -beta
+        batch = self.get(indices)
+        batch["weights"] = weights / weights.max()
+        return batch
+
+    def get(self, indices):
+        """Get stored transitions with their n-step returns.
+
+        Parameters
+        ----------
+        indices : array_like of ints
+            Indices of the transitions, in ``[0, len(buffer))``.
+
+        Returns
+        -------
+        batch : dict of numpy.ndarray
+            Arrays ``"indices"``, ``"states"``, ``"actions"``, the n-step
+            ``"rewards"``, the ``"next_states"`` to bootstrap from, whether
+            a trial ended within the n steps (``"dones"``), and the
+            ``"discounts"`` of the bootstrapped values, zero if done.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        if self.n_step == 1:
+            return {
+                "indices": indices,
+                "states": self.states[indices],
+                "actions": self.actions[indices],
+                "rewards": self.rewards[indices],
+                "next_states": self.next_states[indices],
+                "dones": self.dones[indices],
+                "discounts": self.gamma * ~self.dones[indices]
+            }
+
+        rows, envs = np.divmod(indices, self.num_envs)
+        latest = (self._row - 1) % self._num_rows
+        ahead = (latest - rows) % self._num_rows
+        k = np.arange(self.n_step)
+        window = ((rows[:, None] + k) % self._num_rows) * self.num_envs + envs[:, None]
+
+        dones = self.dones[window]
+        done_before = (np.cumsum(dones, axis=1) - dones) > 0
+        include = (k <= ahead[:, None]) & ~done_before
+        num_included = include.sum(axis=1)
+        last = window[np.arange(len(indices)), num_included - 1]
+
+        returns = np.sum(np.where(include, self.rewards[window], 0) * self.gamma ** k, axis=1)
+        done = self.dones[last]
+        return {
+            "indices": indices,
+            "states": self.states[indices],
+            "actions": self.actions[indices],
+            "rewards": returns,
+            "next_states": self.next_states[last],
+            "dones": done,
+            "discounts": self.gamma ** num_included * ~done
+        }
+
+    def update_priorities(self, indices, priorities):
+        """Set the priorities of transitions, e.g. their absolute TD errors.
+
+        Parameters
+        ----------
+        indices : array_like of ints
+            Indices of the transitions.
+
+        priorities : array_like of floats
+            Non-negative priorities.
+        """
+        if not self.prioritized:
+            msg = "Priorities of a replay buffer with uniform sampling"
+            raise RuntimeError(msg)
+        priorities = np.broadcast_to(np.asarray(priorities, dtype=float), np.shape(indices))
+        if np.any(priorities < 0) or not np.all(np.isfinite(priorities)):
+            msg = "Non-negative finite priorities expected"
+            raise ValueError(msg)
+        priorities = priorities + self.eps
+        self._max_priority = max(self._max_priority, float(priorities.max(initial=0)))
+        self._tree.set(indices, priorities ** self.alpha)
+
+    def clear(self):
+        """Remove all transitions."""
+        self._row = 0
+        self._size = 0
+        self._max_priority = 1.0
+        if self.prioritized:
+            self._tree.tree[:] = 0
+
+    def save(self, file):
+        """Save a snapshot of the buffer in NumPy ``.npz`` format.
+
+        Parameters
+        ----------
+        file : str or file-like object
+            File to write.
+        """
+        config = np.array([self.capacity, self.num_envs, self.n_step, self.prioritized,
+                           self._row, self._size])
+        params = np.array([self.gamma, self.alpha, self.eps, self._max_priority])
+        arrays = {name: getattr(self, name) for name in _ARRAYS}
+        if self.prioritized:
+            arrays["priorities"] = self._tree.get(np.arange(self.capacity))
+        np.savez(file, config=config, params=params, **arrays)
+
+    @classmethod
+    def load(cls, file):
+        """Load a snapshot saved with ``ReplayBuffer.save()``.
+
+        Parameters
+        ----------
+        file : str or file-like object
+            File to read.
+
+        Returns
+        -------
+        buffer : ReplayBuffer
+            Replay buffer.
+        """
+        with np.load(file, allow_pickle=False) as data:
+            capacity, num_envs, n_step, prioritized, row, size = data["config"].tolist()
+            gamma, alpha, eps, max_priority = data["params"].tolist()
+            buffer = cls(capacity, num_envs, n_step, gamma, bool(prioritized), alpha, eps)
+            for name in _ARRAYS:
+                getattr(buffer, name)[:] = data[name]
+            if buffer.prioritized:
+                buffer._tree.set_range(0, data["priorities"])
+        buffer._row, buffer._size, buffer._max_priority = row, size, max_priority
+        return buffer
+
+    def __repr__(self):
+        return "ReplayBuffer(capacity={}, num_envs={}, size={}, n_step={}, prioritized={})".format(
+            self.capacity, self.num_envs, len(self), self.n_step, self.prioritized)
@@ -0,0 +1,173 @@
+"""Successor representation of gridworld environments."""
+
+import numpy as np
+
+from ._utils import _as_compiled, _policy_array, _policy_transition
+
+__all__ = [
+    "successor_representation",
+    "successor_eigenvectors"
+]
+
+
+def successor_representation(env, policy="random_walk", gamma=0.95, states=None,
+                             method="iterative", tol=1e-8, max_iter=10000):
+    r"""Compute the successor representation of a policy.
+
+    The successor representation is
+
+    .. math::
+
+        M = \sum_{t=0}^{\infty} \gamma^t P_\pi^t = (I - \gamma P_\pi)^{-1}
+
+    where $P_\pi$ is the state transition matrix under policy $\pi$
+    (transition kernels included). Objects do not end trials here, i.e.
+    the agent keeps moving after reaching an object.
+
+    Parameters
+    ----------
+    env : GridWorld or CompiledWorld
+        Gridworld environment.
+
+    policy : str {"random_walk", "uniform"} or numpy.ndarray (default: "random_walk")
+        Policy of the agent. ``"uniform"`` takes all actions with the same
+        probability, ``"random_walk"`` takes all the actions that change
+        the state with the same probability. An array of shape ``(S, A)``
+        gives the probability of taking each action at each state.
+
+    gamma : float (default: 0.95)
+        Discount factor.
+
+    states : array_like of ints (optional, default: None)
+        Ids of the start states (rows of $M$) to compute. If not provided,
+        the full matrix is computed, which is only feasible for small worlds.
+
+    method : str {"iterative", "direct"} (default: "iterative")
+        Solve with batched sparse fixed-point iterations over all the
+        requested rows at once, or with a sparse LU decomposition.
+
+    tol : float (default: 1e-8)
+        Tolerance of the iterative solver.
+
+    max_iter : int (default: 10000)
+        Maximum number of iterations of the iterative solver.
+
+    Returns
+    -------
+    M : numpy.ndarray of shape (N, S)
+        Successor representation of the start states, each row can be
+        reshaped per area with ``CompiledWorld.split_areas()``.
+
+    Examples
+    --------
+    >>> W = GridWorld((5, 5))
+    >>> C = W.compile()
+    >>> M = successor_representation(W, gamma=0.9, states=[C.state_index((0, 2, 2))])
+    >>> C.reshape_area(M[0], 0).shape
+    (5, 5)
+    """
+    import scipy.sparse as sp
+    from scipy.sparse.linalg import splu
+
+    if not 0 <= gamma < 1:
+        msg = "Discount factor in [0, 1) expected, got {}".format(gamma)
+        raise ValueError(msg)
+
+    compiled = _as_compiled(env)
+    num_states = compiled.num_states
+    P = _policy_transition(compiled, _policy_array(compiled, policy))
+    if states is None:
+        states = np.arange(num_states)
+    states = np.atleast_1d(np.asarray(states, dtype=np.int64))
+
+    # Rows of M solve (I - gamma P)^T m = e_s.
+    E = np.zeros((num_states, len(states)))
+    E[states, np.arange(len(states))] = 1
+    PT = P.T.tocsr()
+
+    if method == "direct":
+        Y = splu(sp.csc_matrix(sp.identity(num_states) - gamma * PT)).solve(E)
+    elif method == "iterative":
+        Y = E.copy()
+        for _ in range(max_iter):
+            Y_next = E + gamma * (PT @ Y)
+            if np.max(np.abs(Y_next - Y)) < tol:
+                Y = Y_next
+                break
+            Y = Y_next
+        else:
+            msg = "Successor representation did not converge " \
+                  "in {} iterations".format(max_iter)
+            raise RuntimeError(msg)
+    else:
+        msg = "Unrecognized method '{}', 'iterative' or 'direct' expected".format(method)
+        raise ValueError(msg)
+
+    return Y.T
+
+
+def successor_eigenvectors(env, k=10, policy="random_walk", gamma=0.95, by_area=False):
+    r"""Compute the top eigenvectors of the successor representation.
+
+    The successor representation $M = (I - \gamma P_\pi)^{-1}$ shares its
+    eigenvectors with $P_\pi$, and each eigenvalue $\lambda$ of $P_\pi$
+    gives an eigenvalue $1 / (1 - \gamma \lambda)$ of $M$. Eigenvectors are
+    therefore extracted from the sparse matrix $P_\pi$ directly, without
+    forming $M$, which scales to large worlds (e.g. for eigen-options).
+
+    Parameters
+    ----------
+    env : GridWorld or CompiledWorld
+        Gridworld environment.
+
+    k : int (default: 10)
+        Number of eigenvectors to compute.
+
+    policy : str {"random_walk", "uniform"} or numpy.ndarray (default: "random_walk")
+        Policy of the agent, see ``successor_representation()``.
+
+    gamma : float (default: 0.95)
+        Discount factor.
+
+    by_area : bool (default: False)
+        Whether to reshape the eigenvectors per area.
+
+    Returns
+    -------
+    values : numpy.ndarray of shape (k,)
+        Top eigenvalues of the successor representation, in descending order.
+
+    vectors : numpy.ndarray of shape (S, k) or list of numpy.ndarray
+        Corresponding eigenvectors. If ``by_area`` is True, a list with one
+        array of shape ``(m, n, k)`` per area, laid out like
+        ``GridWorld.get_area_altitude()``.
+
+    Examples
+    --------
+    >>> W = GridWorld((10, 10))
+    >>> values, vectors = successor_eigenvectors(W, k=4, by_area=True)
+    >>> vectors[0].shape
+    (10, 10, 4)
+    """
+    from scipy.sparse.linalg import eigs
+
+    compiled = _as_compiled(env)
+    num_states = compiled.num_states
+    if k < 1 or k > num_states:
+        msg = "Number of eigenvectors between 1 and {} expected, got {}".format(num_states, k)
+        raise ValueError(msg)
+
+    P = _policy_transition(compiled, _policy_array(compiled, policy))
+    if k >= num_states - 1:
+        eigvals, eigvecs = np.linalg.eig(P.toarray())
+    else:
+        eigvals, eigvecs = eigs(P, k=k, which='LR')
+
+    order = np.argsort(-eigvals.real)[:k]
+    values = 1 / (1 - gamma * eigvals.real[order])
+    vectors = eigvecs.real[:, order]
+    vectors /= np.linalg.norm(vectors, axis=0)
+
+    if by_area:
+        vectors = compiled.split_areas(vectors)
+    return values, vectors
@@ -1,3 +1,12 @@
 """Classes for NeuGym environment."""
 
 from .gridworld import *
+from .compiled import *
+from .dynamics import *
+from .multiagent import *
+from .accumulator import *
+from .spec import *
+from .generators import *
+from .vector import *
+from .visibility import *
+from .tracking import *
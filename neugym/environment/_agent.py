@@ -1,4 +1,5 @@
 import warnings
+import numpy as np
 
 
 class _Agent:
@@ -32,3 +33,25 @@ class _Agent:
             self.current_state,
             self.init_state
         )
+
+
+class _AgentGroup:
+    def __init__(self, init_states, num_objects):
+        self.init_states = np.array(init_states, dtype=np.int64).reshape(-1, 3)
+        self.current_states = self.init_states.copy()
+        self.consumed = np.zeros((len(self.init_states), num_objects), dtype=bool)
+
+    @property
+    def num_agents(self):
+        return len(self.init_states)
+
+    def reset(self):
+        self.current_states = self.init_states.copy()
+        self.consumed[:] = False
+
+    def __repr__(self):
+        return "AgentGroup(num_agents={}, current_states={}, init_states={})".format(
+            self.num_agents,
+            [tuple(s) for s in self.current_states.tolist()],
+            [tuple(s) for s in self.init_states.tolist()]
+        )
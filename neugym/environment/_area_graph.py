@@ -0,0 +1,66 @@
+import networkx as nx
+
+
+class _AreaGraph:
+    def __init__(self):
+        self.graph = nx.Graph()
+        self.routes = {}
+
+    def add_area(self, area_idx):
+        self.graph.add_node(area_idx)
+
+    def add_path(self, coord_from, coord_to, action):
+        u, v = coord_from[0], coord_to[0]
+        if not self.graph.has_edge(u, v):
+            self.graph.add_edge(u, v, doorways={})
+            self.routes.clear()
+        self.graph.edges[u, v]['doorways'][(coord_from, coord_to)] = action
+
+    def remove_path(self, coord_from, coord_to):
+        u, v = coord_from[0], coord_to[0]
+        doorways = self.graph.edges[u, v]['doorways']
+        if (coord_from, coord_to) in doorways:
+            doorways.pop((coord_from, coord_to))
+        else:
+            doorways.pop((coord_to, coord_from))
+        if len(doorways) == 0:
+            self.graph.remove_edge(u, v)
+            self.routes.clear()
+
+    def rebuild(self, env):
+        self.graph = nx.Graph()
+        self.routes = {}
+        self.graph.add_nodes_from(range(env._num_area + 1))
+        for alias, coord_to in env._path_alias.items():
+            for dx, dy in env._actions:
+                coord_from = (alias[0], alias[1] - dx, alias[2] - dy)
+                if not env._world.has_edge(coord_from, coord_to):
+                    continue
+                u, v = coord_from[0], coord_to[0]
+                if not self.graph.has_edge(u, v):
+                    self.graph.add_edge(u, v, doorways={})
+                doorways = self.graph.edges[u, v]['doorways']
+                if (coord_to, coord_from) not in doorways:
+                    doorways[(coord_from, coord_to)] = (dx, dy)
+                break
+
+    def doorways(self, area_from, area_to):
+        if not self.graph.has_edge(area_from, area_to):
+            return []
+        doorways = []
+        for (coord_from, coord_to), (dx, dy) in \
+                self.graph.edges[area_from, area_to]['doorways'].items():
+            if coord_from[0] == area_from:
+                doorways.append((coord_from, (dx, dy), coord_to))
+            else:
+                doorways.append((coord_to, (-dx, -dy), coord_from))
+        return doorways
+
+    def route(self, area_from, area_to):
+        key = (area_from, area_to)
+        if key not in self.routes:
+            try:
+                self.routes[key] = nx.shortest_path(self.graph, area_from, area_to)
+            except nx.NetworkXNoPath:
+                self.routes[key] = None
+        return self.routes[key]
@@ -0,0 +1,54 @@
+import numpy as np
+
+
+class _Connectivity:
+    def __init__(self):
+        self.parent = []
+        self.area_offsets = []
+        self.area_shapes = []
+        self.dirty = True
+
+    def state_id(self, coord):
+        a, x, y = coord
+        m, n = self.area_shapes[a]
+        return self.area_offsets[a] + x * n + y
+
+    def find(self, i):
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(self, i, j):
+        i, j = self.find(i), self.find(j)
+        if i != j:
+            self.parent[max(i, j)] = min(i, j)
+
+    def add_area(self, shape):
+        # States of a new area are all unblocked and connected.
+        offset = len(self.parent)
+        m, n = shape
+        self.area_offsets.append(offset)
+        self.area_shapes.append((m, n))
+        self.parent.extend([offset] * (m * n))
+
+    def rebuild(self, compiled):
+        from scipy.sparse import csr_matrix
+        from scipy.sparse.csgraph import connected_components
+
+        num_states, num_actions = compiled.next_state.shape
+        rows = np.repeat(np.arange(num_states), num_actions)
+        cols = compiled.next_state.ravel()
+        keep = ~compiled.blocked[rows]
+        graph = csr_matrix((np.ones(keep.sum(), dtype=np.int8), (rows[keep], cols[keep])),
+                           shape=(num_states, num_states))
+        _, labels = connected_components(graph, directed=False)
+
+        # Root of each component is its smallest state id.
+        roots = np.full(labels.max() + 1, num_states, dtype=np.int64)
+        np.minimum.at(roots, labels, np.arange(num_states))
+        self.parent = roots[labels].tolist()
+        self.area_offsets = compiled.area_offsets[:-1].tolist()
+        self.area_shapes = [tuple(s) for s in compiled.area_shapes.tolist()]
+        self.dirty = False
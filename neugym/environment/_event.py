@@ -0,0 +1,38 @@
+import heapq
+
+
+class _EventQueue:
+    def __init__(self):
+        self.heaps = {"time": [], "trial": []}
+        self.count = 0
+
+    def push(self, unit, when, method, args, kwargs):
+        heapq.heappush(self.heaps[unit], (when, self.count, method, args, kwargs))
+        self.count += 1
+
+    def pop_due(self, unit, value):
+        heap = self.heaps[unit]
+        while len(heap) > 0 and heap[0][0] <= value:
+            when, _, method, args, kwargs = heapq.heappop(heap)
+            yield method, args, kwargs
+
+    def clear(self):
+        for heap in self.heaps.values():
+            heap.clear()
+
+    def items(self):
+        events = []
+        for unit, heap in self.heaps.items():
+            for when, count, method, args, kwargs in heap:
+                events.append((count, unit, when, method, args, kwargs))
+        events.sort(key=lambda e: (e[1], e[2], e[0]))
+        return [e[1:] for e in events]
+
+    def __len__(self):
+        return sum(len(heap) for heap in self.heaps.values())
+
+    def __repr__(self):
+        return "EventQueue(time={}, trial={})".format(
+            len(self.heaps["time"]),
+            len(self.heaps["trial"])
+        )
@@ -0,0 +1,40 @@
+import sys
+import types
+
+import numpy as np
+
+# Objects that are not part of the data of an environment.
+_OPAQUE = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType,
+           types.MethodType, types.CodeType)
+
+
+def _deep_sizeof(obj, seen):
+    # Bytes used by an object and everything it references, skipping the
+    # objects already in 'seen' (which is updated), so that shared objects
+    # are only counted once.
+    size = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, _OPAQUE):
+            continue
+        if isinstance(obj, np.ndarray):
+            # Views do not own their data, count the base array instead.
+            if obj.base is not None:
+                stack.append(obj.base)
+        elif isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        else:
+            if hasattr(obj, "__dict__"):
+                stack.append(obj.__dict__)
+            for name in getattr(type(obj), "__slots__", ()):
+                if hasattr(obj, name):
+                    stack.append(getattr(obj, name))
+    return size
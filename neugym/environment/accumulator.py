@@ -0,0 +1,206 @@
+"""Streaming visitation counts of gridworld environments."""
+
+import numpy as np
+
+__all__ = [
+    "OccupancyCounter"
+]
+
+
+class OccupancyCounter:
+    """Streaming state occupancy, action and transition counts.
+
+    Counts are kept in integer arrays indexed by the state ids of a compiled
+    world (see ``CompiledWorld``), i.e. area by area, and are updated in
+    place. A counter can be attached to a ``GridWorld`` (or a
+    ``MultiAgentGridWorld``) with ``GridWorld.attach_counter()`` to record
+    every step, or updated with batches of state ids from batched rollouts,
+    e.g. of ``CompiledWorld.step()``.
+
+    Counters only depend on the world layout (areas, their shapes, and the
+    action space) at creation, which should not change while counting.
+    Counters of the same layout can be merged, e.g. across worker processes.
+
+    Parameters
+    ----------
+    env : GridWorld or CompiledWorld
+        Gridworld environment.
+
+    Attributes
+    ----------
+    state_counts : numpy.ndarray of shape (S,)
+        Number of steps taken from each state.
+
+    action_counts : numpy.ndarray of shape (S, A)
+        Number of times each action was chosen at each state.
+
+    transition_counts : numpy.ndarray of shape (S, A)
+        Number of moves from each state ``s`` to state ``next_state[s, a]``,
+        where ``a`` is the first action leading there. Moves to states that
+        are not one step away (e.g. teleports) are not counted.
+
+    Examples
+    --------
+    >>> W = GridWorld((3, 3))
+    >>> W.init_agent()
+    >>> counter = OccupancyCounter(W)
+    >>> W.attach_counter(counter)
+    >>> for _ in range(100):
+    ...     W.step((0, 1))
+    >>> counter.get_area_occupancy(0)
+    array([[ 1,  1, 98],
+           [ 0,  0,  0],
+           [ 0,  0,  0]])
+    >>> ng.show_area(W, 0, values=counter)
+    """
+
+    def __init__(self, env):
+        compiled = env.compile() if hasattr(env, "compile") else env
+        self.actions = compiled.actions
+        self.area_offsets = compiled.area_offsets.copy()
+        self.area_shapes = compiled.area_shapes.copy()
+        self.next_state = compiled.next_state.copy()
+
+        num_states, num_actions = self.next_state.shape
+        self.state_counts = np.zeros(num_states, dtype=np.int64)
+        self.action_counts = np.zeros((num_states, num_actions), dtype=np.int64)
+        self.transition_counts = np.zeros((num_states, num_actions), dtype=np.int64)
+        self._action_index = {action: i for i, action in enumerate(self.actions)}
+
+    @property
+    def num_steps(self):
+        """Total number of counted steps."""
+        return int(self.state_counts.sum())
+
+    def _state_index(self, coord):
+        a, x, y = coord
+        if 0 <= a < len(self.area_shapes):
+            m, n = self.area_shapes[a]
+            if 0 <= x < m and 0 <= y < n:
+                return int(self.area_offsets[a] + x * n + y)
+        msg = "Coordinate {} out of the counter layout".format(coord)
+        raise ValueError(msg)
+
+    def record(self, state, action, next_state):
+        """Count one step.
+
+        Parameters
+        ----------
+        state : tuple of ints
+            Coordinate of the state.
+
+        action : tuple of ints
+            Chosen action.
+
+        next_state : tuple of ints
+            Coordinate of the state reached.
+        """
+        s = self._state_index(state)
+        a = self._action_index[action]
+        self.state_counts[s] += 1
+        self.action_counts[s, a] += 1
+
+        move = np.flatnonzero(self.next_state[s] == self._state_index(next_state))
+        if len(move) > 0:
+            self.transition_counts[s, move[0]] += 1
+
+    def update(self, states, actions, next_states=None):
+        """Count a batch of steps.
+
+        Parameters
+        ----------
+        states : array_like of ints
+            Ids of the states.
+
+        actions : array_like of ints
+            Indices of the chosen actions.
+
+        next_states : array_like of ints (optional, default: None)
+            Ids of the states reached, transitions are not counted if not provided.
+        """
+        states = np.asarray(states, dtype=np.int64).ravel()
+        actions = np.asarray(actions, dtype=np.int64).ravel()
+        np.add.at(self.state_counts, states, 1)
+        np.add.at(self.action_counts, (states, actions), 1)
+
+        if next_states is not None:
+            next_states = np.asarray(next_states, dtype=np.int64).ravel()
+            match = self.next_state[states] == next_states[:, None]
+            moved = match.any(axis=1)
+            np.add.at(self.transition_counts, (states[moved], match[moved].argmax(axis=1)), 1)
+
+    def merge(self, other):
+        """Add the counts of another counter of the same layout.
+
+        Parameters
+        ----------
+        other : OccupancyCounter
+            Counter to merge.
+
+        Returns
+        -------
+        self : OccupancyCounter
+            This counter, with merged counts.
+        """
+        if not isinstance(other, OccupancyCounter):
+            msg = "OccupancyCounter expected, got '{}'".format(type(other))
+            raise TypeError(msg)
+        if other.actions != self.actions or \
+                not np.array_equal(other.area_shapes, self.area_shapes):
+            msg = "Unable to merge counters of different world layouts"
+            raise ValueError(msg)
+        self.state_counts += other.state_counts
+        self.action_counts += other.action_counts
+        self.transition_counts += other.transition_counts
+        return self
+
+    def __iadd__(self, other):
+        return self.merge(other)
+
+    def reset(self):
+        """Set all counts to zero."""
+        self.state_counts[:] = 0
+        self.action_counts[:] = 0
+        self.transition_counts[:] = 0
+
+    def get_area_occupancy(self, area_idx):
+        """Get the occupancy counts of one area.
+
+        Parameters
+        ----------
+        area_idx : int
+            Index of the area.
+
+        Returns
+        -------
+        occupancy : numpy.ndarray of shape (m, n)
+            Occupancy counts, in the same layout as ``GridWorld.get_area_altitude()``.
+        """
+        if not 0 <= area_idx < len(self.area_shapes):
+            msg = "Area {} not found".format(area_idx)
+            raise ValueError(msg)
+        shape = tuple(int(i) for i in self.area_shapes[area_idx])
+        start, stop = self.area_offsets[area_idx], self.area_offsets[area_idx + 1]
+        return self.state_counts[start:stop].reshape(shape)
+
+    def transition_matrix(self):
+        """Get the transition counts between states.
+
+        Returns
+        -------
+        counts : scipy.sparse.csr_matrix of shape (S, S)
+            Number of moves from each state to each state.
+        """
+        import scipy.sparse as sp
+
+        num_states, num_actions = self.next_state.shape
+        rows = np.repeat(np.arange(num_states), num_actions)
+        counts = sp.csr_matrix((self.transition_counts.ravel(),
+                                (rows, self.next_state.ravel())),
+                               shape=(num_states, num_states))
+        counts.eliminate_zeros()
+        return counts
+
+    def __repr__(self):
+        return "OccupancyCounter(num_states={}, num_steps={})".format(
+            len(self.state_counts), self.num_steps)
@@ -0,0 +1,558 @@
+"""Array representation of a gridworld environment."""
+
+import hashlib
+
+import numpy as np
+
+__all__ = [
+    "CompiledWorld"
+]
+
+# Arrays of a compiled world, in the order of the constructor arguments.
+_ARRAYS = ("coords", "area_offsets", "area_shapes", "next_state", "altitude", "blocked",
+           "object_index", "object_reward", "object_punish", "object_prob",
+           "kernels", "kernel_index")
+
+
+class CompiledWorld:
+    r"""Array representation of a ``GridWorld`` environment.
+
+    A ``CompiledWorld`` is a read-only snapshot of a gridworld environment
+    where every state is given an integer id and every action an integer
+    index, so that the world dynamics can be looked up from NumPy arrays
+    instead of the NetworkX graph. It is created with ``GridWorld.compile()``
+    and should not be instantiated directly.
+
+    State ids are assigned in the order of sorted state coordinates, i.e.
+    states of one area are stored contiguously and in row-major order, so
+    that any per-state array can be reshaped per area in the same way as
+    ``GridWorld.get_area_altitude()``.
+
+    Stochastic transition kernels are stored as a small stack of distinct
+    kernels ``kernels`` of shape ``(K, A, A)`` and a per-state kernel index
+    ``kernel_index``, where ``kernels[k, a, b]`` is the probability that
+    the intended action ``a`` is executed as action ``b``. Kernel ``0`` is
+    always the identity (deterministic) kernel.
+
+    Attributes
+    ----------
+    actions : tuple
+        Action space of the environment, action index ``i`` refers
+        to ``actions[i]``.
+
+    coords : numpy.ndarray of shape (S, 3)
+        Coordinate of each state.
+
+    area_offsets : numpy.ndarray of shape (num_area + 2,)
+        States of area ``i`` have ids ``area_offsets[i]`` to
+        ``area_offsets[i + 1] - 1``.
+
+    area_shapes : numpy.ndarray of shape (num_area + 1, 2)
+        Shape of each area.
+
+    next_state : numpy.ndarray of shape (S, A)
+        Id of the next state when executing each action at each state.
+
+    move_reward : numpy.ndarray of shape (S, A)
+        Movement reward (altitude change) of each state-action pair.
+
+    altitude : numpy.ndarray of shape (S,)
+        Altitude of each state.
+
+    blocked : numpy.ndarray of shape (S,)
+        Whether each state is blocked.
+
+    object_index : numpy.ndarray of shape (S,)
+        Index of the object at each state, ``-1`` if there is no object.
+
+    object_reward, object_punish, object_prob : numpy.ndarray of shape (O,)
+        Attributes of each object.
+
+    kernels : numpy.ndarray of shape (K, A, A)
+        Distinct transition kernels of the world.
+
+    kernel_cdf : numpy.ndarray of shape (K, A, A)
+        Cumulative sum of ``kernels`` along the last axis, used for sampling.
+
+    kernel_index : numpy.ndarray of shape (S,)
+        Index of the transition kernel applied at each state.
+    """
+
+    def __init__(self, actions, coords, area_offsets, area_shapes, next_state,
+                 altitude, blocked, object_index, object_reward, object_punish,
+                 object_prob, kernels, kernel_index):
+        self.actions = actions
+        self.coords = coords
+        self.area_offsets = area_offsets
+        self.area_shapes = area_shapes
+        self.next_state = next_state
+        self.altitude = altitude
+        self.blocked = blocked
+        self.move_reward = altitude[:, None] - altitude[next_state]
+        self.object_index = object_index
+        self.object_reward = object_reward
+        self.object_punish = object_punish
+        self.object_prob = object_prob
+        self.kernels = kernels
+        self.kernel_cdf = np.cumsum(kernels, axis=-1)
+        self.kernel_index = kernel_index
+
+        self._action_index = {action: i for i, action in enumerate(actions)}
+        self._fingerprint = None
+
+    @classmethod
+    def from_gridworld(cls, env):
+        """Build the array representation of a gridworld environment.
+
+        Parameters
+        ----------
+        env : GridWorld
+            Gridworld environment to compile.
+
+        Returns
+        -------
+        compiled : CompiledWorld
+            Array representation of ``env``.
+        """
+        world = env._world
+        actions = env._actions
+
+        coords = np.array(sorted(world.nodes), dtype=np.int64).reshape(-1, 3)
+        num_states = coords.shape[0]
+        area = coords[:, 0]
+
+        num_area = env._num_area + 1
+        area_offsets = np.zeros(num_area + 1, dtype=np.int64)
+        area_offsets[1:] = np.cumsum(np.bincount(area, minlength=num_area))
+        area_shapes = np.stack([
+            np.maximum.reduceat(coords[:, 1], area_offsets[:-1]) + 1,
+            np.maximum.reduceat(coords[:, 2], area_offsets[:-1]) + 1
+        ], axis=1)
+
+        m = area_shapes[area, 0]
+        n = area_shapes[area, 1]
+        node_attr = world.nodes
+        altitude = np.array([node_attr[tuple(c)]['altitude'] for c in coords.tolist()],
+                            dtype=float)
+        blocked = np.array([node_attr[tuple(c)]['blocked'] for c in coords.tolist()],
+                           dtype=bool)
+
+        # Movements within areas.
+        state_ids = np.arange(num_states)
+        next_state = np.empty((num_states, len(actions)), dtype=np.int64)
+        for i, (dx, dy) in enumerate(actions):
+            x = coords[:, 1] + dx
+            y = coords[:, 2] + dy
+            inside = (x >= 0) & (x < m) & (y >= 0) & (y < n)
+            next_state[:, i] = np.where(inside, area_offsets[area] + x * n + y, state_ids)
+
+        # Inter-area movements.
+        def state_id(coord):
+            a, x, y = coord
+            if 0 <= a < num_area and 0 <= x < area_shapes[a, 0] and 0 <= y < area_shapes[a, 1]:
+                return area_offsets[a] + x * area_shapes[a, 1] + y
+            return None
+
+        for alias, coord_to in env._path_alias.items():
+            for i, (dx, dy) in enumerate(actions):
+                source = state_id((alias[0], alias[1] - dx, alias[2] - dy))
+                if source is not None:
+                    next_state[source, i] = state_id(coord_to)
+
+        # Blocked states can not be entered.
+        next_state = np.where(blocked[next_state], state_ids[:, None], next_state)
+
+        # Objects.
+        object_index = np.full(num_states, -1, dtype=np.int64)
+        for i in reversed(range(len(env._objects))):
+            object_index[state_id(env._objects[i].coord)] = i
+        object_reward = np.array([obj.reward for obj in env._objects], dtype=float)
+        object_punish = np.array([obj.punish for obj in env._objects], dtype=float)
+        object_prob = np.array([obj.prob for obj in env._objects], dtype=float)
+
+        # Transition kernels.
+        kernels = [np.eye(len(actions))]
+        kernel_index = np.zeros(num_states, dtype=np.int64)
+        for area_idx, kernel in env._area_kernels.items():
+            kernels.append(kernel)
+            kernel_index[area_offsets[area_idx]:area_offsets[area_idx + 1]] = len(kernels) - 1
+        for coord, kernel in env._state_kernels.items():
+            kernels.append(kernel)
+            kernel_index[state_id(coord)] = len(kernels) - 1
+
+        return cls(actions, coords, area_offsets, area_shapes, next_state,
+                   altitude, blocked, object_index, object_reward, object_punish,
+                   object_prob, np.stack(kernels), kernel_index)
+
+    def save(self, file):
+        """Save the array representation in NumPy ``.npz`` format.
+
+        Parameters
+        ----------
+        file : str or file-like object
+            File to write.
+        """
+        np.savez(file, actions=np.array(self.actions, dtype=np.int64).reshape(-1, 2),
+                 **{name: getattr(self, name) for name in _ARRAYS})
+
+    @classmethod
+    def load(cls, file):
+        """Load an array representation saved with ``CompiledWorld.save()``.
+
+        Parameters
+        ----------
+        file : str or file-like object
+            File to read.
+
+        Returns
+        -------
+        compiled : CompiledWorld
+            Array representation.
+        """
+        with np.load(file, allow_pickle=False) as data:
+            actions = tuple(tuple(int(i) for i in action) for action in data["actions"])
+            return cls(actions, *[data[name] for name in _ARRAYS])
+
+    @property
+    def num_states(self):
+        """Number of states in the world."""
+        return self.coords.shape[0]
+
+    @property
+    def num_actions(self):
+        """Number of actions in the action space."""
+        return len(self.actions)
+
+    @property
+    def terminal(self):
+        """Whether reaching each state ends a trial, i.e. has an object."""
+        return self.object_index >= 0
+
+    @property
+    def stochastic(self):
+        """Whether any state has a non-deterministic transition kernel."""
+        return len(self.kernels) > 1
+
+    def state_index(self, coord):
+        """Get the id of a state from its coordinate.
+
+        Parameters
+        ----------
+        coord : tuple of ints
+            Coordinate of the state.
+
+        Returns
+        -------
+        index : int
+            Id of the state.
+        """
+        a, x, y = coord
+        if 0 <= a < len(self.area_shapes):
+            m, n = self.area_shapes[a]
+            if 0 <= x < m and 0 <= y < n:
+                return int(self.area_offsets[a] + x * n + y)
+        msg = "Coordinate {} out of world".format(coord)
+        raise ValueError(msg)
+
+    def state_indices(self, coords):
+        """Get the ids of many states from their coordinates.
+
+        Parameters
+        ----------
+        coords : array_like of shape (..., 3)
+            Coordinates of the states.
+
+        Returns
+        -------
+        indices : numpy.ndarray of ints
+            Ids of the states.
+        """
+        coords = np.asarray(coords, dtype=np.int64)
+        a, x, y = coords[..., 0], coords[..., 1], coords[..., 2]
+        valid = (a >= 0) & (a < len(self.area_shapes))
+        a = np.where(valid, a, 0)
+        m, n = self.area_shapes[a, 0], self.area_shapes[a, 1]
+        valid &= (x >= 0) & (x < m) & (y >= 0) & (y < n)
+        if not np.all(valid):
+            msg = "Coordinate {} out of world".format(coords[~valid][0].tolist())
+            raise ValueError(msg)
+        return self.area_offsets[a] + x * n + y
+
+    def state_coord(self, index):
+        """Get the coordinate of a state from its id.
+
+        Parameters
+        ----------
+        index : int
+            Id of the state.
+
+        Returns
+        -------
+        coord : tuple of ints
+            Coordinate of the state.
+        """
+        return tuple(int(i) for i in self.coords[index])
+
+    def action_index(self, action):
+        """Get the index of an action.
+
+        Parameters
+        ----------
+        action : tuple of ints
+            Action in the action space.
+
+        Returns
+        -------
+        index : int
+            Index of the action.
+        """
+        try:
+            return self._action_index[action]
+        except KeyError:
+            msg = "Illegal action {}, should be one of {}".format(action, self.actions)
+            raise ValueError(msg) from None
+
+    def action_indices(self, actions):
+        """Get the indices of many actions.
+
+        Parameters
+        ----------
+        actions : array_like of shape (N,) or (N, 2)
+            Action indices, or actions as ``(dx, dy)`` rows.
+
+        Returns
+        -------
+        indices : numpy.ndarray of shape (N,)
+            Indices of the actions.
+        """
+        actions = np.asarray(actions, dtype=np.int64)
+        if actions.ndim == 2 and actions.shape[1] == 2:
+            match = np.all(actions[:, None, :] == np.array(self.actions)[None, :, :], axis=-1)
+            if not np.all(match.any(axis=1)):
+                illegal = actions[~match.any(axis=1)][0]
+                msg = "Illegal action {}, should be one of {}".format(
+                    tuple(illegal.tolist()), self.actions)
+                raise ValueError(msg)
+            return match.argmax(axis=1)
+        if np.any(actions < 0) or np.any(actions >= self.num_actions):
+            msg = "Action index out of range [0, {})".format(self.num_actions)
+            raise ValueError(msg)
+        return actions
+
+    def area_slice(self, area_idx):
+        """Get the range of state ids of one area.
+
+        Parameters
+        ----------
+        area_idx : int
+            Index of the area.
+
+        Returns
+        -------
+        area_slice : slice
+            Slice of the state ids of the area.
+        """
+        return slice(int(self.area_offsets[area_idx]), int(self.area_offsets[area_idx + 1]))
+
+    def reshape_area(self, values, area_idx):
+        """Reshape per-state values of one area to the area shape.
+
+        Parameters
+        ----------
+        values : numpy.ndarray of shape (S, ...)
+            Per-state values of the whole world.
+
+        area_idx : int
+            Index of the area.
+
+        Returns
+        -------
+        area_values : numpy.ndarray of shape (m, n, ...)
+            Values of the area states, in the same layout as
+            ``GridWorld.get_area_altitude()``.
+        """
+        values = np.asarray(values)
+        shape = tuple(int(i) for i in self.area_shapes[area_idx])
+        return values[self.area_slice(area_idx)].reshape(shape + values.shape[1:])
+
+    def split_areas(self, values):
+        """Reshape per-state values of the whole world area by area.
+
+        Parameters
+        ----------
+        values : numpy.ndarray of shape (S, ...)
+            Per-state values of the whole world.
+
+        Returns
+        -------
+        area_values : list of numpy.ndarray
+            Values of each area, see ``CompiledWorld.reshape_area()``.
+        """
+        return [self.reshape_area(values, i) for i in range(len(self.area_shapes))]
+
+    def sample_actions(self, states, actions, rng=None):
+        """Sample the executed actions from the transition kernels.
+
+        Parameters
+        ----------
+        states : array_like of ints
+            Ids of the current states.
+
+        actions : array_like of ints
+            Indices of the intended actions.
+
+        rng : int or numpy.random.Generator (optional, default: None)
+            Random number generator or seed.
+
+        Returns
+        -------
+        executed : numpy.ndarray of ints
+            Indices of the executed actions.
+        """
+        actions = np.asarray(actions)
+        if not self.stochastic:
+            return actions
+        rng = np.random.default_rng(rng)
+        states = np.asarray(states)
+        return self._sample(states, actions, rng.random(np.shape(actions)))
+
+    def _sample(self, states, actions, u):
+        cdf = self.kernel_cdf[self.kernel_index[states], actions]
+        executed = (u[..., None] >= cdf).sum(axis=-1)
+        return np.minimum(executed, self.num_actions - 1)
+
+    def step(self, states, actions, rng=None):
+        """Move a batch of agents at the same time.
+
+        All randomness of the batch (transition kernels and object rewards)
+        is drawn in one vectorized call.
+
+        .. note::
+            Agents ending their trial are not transported back to their
+            initial state, the returned ``next_states`` are the states where
+            the objects are.
+
+        Parameters
+        ----------
+        states : array_like of ints
+            Ids of the current states.
+
+        actions : array_like of ints
+            Indices of the intended actions.
+
+        rng : int or numpy.random.Generator (optional, default: None)
+            Random number generator or seed.
+
+        Returns
+        -------
+        next_states : numpy.ndarray of ints
+            Ids of the next states.
+
+        rewards : numpy.ndarray of floats
+            Rewards of the movements.
+
+        dones : numpy.ndarray of bools
+            Whether each trial ends.
+        """
+        states = np.asarray(states)
+        actions = np.asarray(actions)
+        rng = np.random.default_rng(rng)
+        u = rng.random((2,) + states.shape)
+
+        if self.stochastic:
+            actions = self._sample(states, actions, u[0])
+        next_states = self.next_state[states, actions]
+        rewards = self.move_reward[states, actions]
+
+        obj = self.object_index[next_states]
+        dones = obj >= 0
+        obj = obj[dones]
+        rewards[dones] += np.where(u[1][dones] < self.object_prob[obj],
+                                   self.object_reward[obj],
+                                   self.object_punish[obj])
+        return next_states, rewards, dones
+
+    def object_expected_reward(self):
+        """Get the expected object reward of entering each state.
+
+        Returns
+        -------
+        reward : numpy.ndarray of shape (S,)
+            Expected object reward, zero for states without an object.
+        """
+        reward = np.zeros(self.num_states)
+        has_obj = self.terminal
+        obj = self.object_index[has_obj]
+        reward[has_obj] = self.object_prob[obj] * self.object_reward[obj] + \
+            (1 - self.object_prob[obj]) * self.object_punish[obj]
+        return reward
+
+    def expected_reward(self):
+        """Get the expected reward of each state-action pair.
+
+        Transition kernels are taken into account.
+
+        Returns
+        -------
+        reward : numpy.ndarray of shape (S, A)
+            Expected reward of taking each action at each state.
+        """
+        executed_reward = self.move_reward + self.object_expected_reward()[self.next_state]
+        kernels = self.kernels[self.kernel_index]
+        return np.einsum('sab,sb->sa', kernels, executed_reward)
+
+    def transition_matrix(self):
+        """Get the transition model of the world as a sparse matrix.
+
+        Transition kernels are taken into account. Trials end when entering
+        a state with an object (see ``terminal``), this is not reflected in
+        the transition matrix.
+
+        Returns
+        -------
+        P : scipy.sparse.csr_matrix of shape (S * A, S)
+            Transition probabilities, where ``P[s * A + a, s']`` is the
+            probability of moving to state ``s'`` when taking action ``a``
+            at state ``s``.
+        """
+        import scipy.sparse as sp
+
+        num_states, num_actions = self.next_state.shape
+        kernels = self.kernels[self.kernel_index]
+        rows = np.broadcast_to(np.arange(num_states * num_actions)[:, None],
+                               (num_states * num_actions, num_actions))
+        cols = np.broadcast_to(self.next_state[:, None, :],
+                               (num_states, num_actions, num_actions))
+        P = sp.csr_matrix((kernels.ravel(), (rows.ravel(), cols.ravel())),
+                          shape=(num_states * num_actions, num_states))
+        P.eliminate_zeros()
+        return P
+
+    def fingerprint(self):
+        """Get a hash of the world layout and dynamics.
+
+        Two compiled worlds have the same fingerprint if and only if (up to
+        hash collisions) they have the same actions, states, transitions,
+        altitudes, blocks, objects and transition kernels, which makes the
+        fingerprint usable as a key of on-disk caches.
+
+        Returns
+        -------
+        fingerprint : str
+            Hexadecimal SHA-256 digest.
+        """
+        if self._fingerprint is None:
+            h = hashlib.sha256(repr(self.actions).encode())
+            for array in (self.area_shapes, self.next_state, self.altitude, self.blocked,
+                          self.object_index, self.object_reward, self.object_punish,
+                          self.object_prob, self.kernels, self.kernel_index):
+                array = np.ascontiguousarray(array)
+                h.update("{}{}".format(array.dtype.str, array.shape).encode())
+                h.update(array.tobytes())
+            self._fingerprint = h.hexdigest()
+        return self._fingerprint
+
+    def __repr__(self):
+        return "CompiledWorld(num_states={}, num_actions={}, num_objects={}, " \
+               "num_kernels={})".format(self.num_states, self.num_actions,
+                                        len(self.object_prob), len(self.kernels))
@@ -0,0 +1,98 @@
+"""Transition kernels for stochastic gridworld dynamics."""
+
+import numpy as np
+
+__all__ = [
+    "slip_kernel",
+    "drift_kernel"
+]
+
+
+def slip_kernel(actions, prob):
+    """Build a kernel where actions slip to their neighbouring actions.
+
+    With probability ``1 - prob`` the intended action is executed,
+    otherwise one of the neighbouring actions (the moving actions with the
+    smallest angle to the intended one, e.g. **LEFT** and **RIGHT** are the
+    neighbours of **UP**) is executed with equal probability.
+    The **STAY** action ``(0, 0)`` never slips.
+
+    Parameters
+    ----------
+    actions : tuple
+        Action space of the environment, e.g. ``GridWorld.actions``.
+
+    prob : float
+        Probability of slipping.
+
+    Returns
+    -------
+    kernel : numpy.ndarray of shape (A, A)
+        Transition kernel, where ``kernel[a, b]`` is the probability
+        that the intended action ``a`` is executed as action ``b``.
+
+    Examples
+    --------
+    >>> W = GridWorld()
+    >>> W.add_area((3, 3), name="ice")
+    >>> W.set_transition_kernel("ice", slip_kernel(W.actions, 0.2))
+    """
+    if not 0 <= prob <= 1:
+        msg = "Probability between 0 and 1 expected, got {}".format(prob)
+        raise ValueError(msg)
+
+    vectors = np.array(actions, dtype=float)
+    norms = np.linalg.norm(vectors, axis=1)
+    kernel = np.eye(len(actions))
+    for a in range(len(actions)):
+        if norms[a] == 0:
+            continue
+        moving = (norms > 0) & (np.arange(len(actions)) != a)
+        cos = vectors[moving] @ vectors[a] / (norms[moving] * norms[a])
+        if len(cos) == 0:
+            continue
+        neighbours = np.flatnonzero(moving)[np.isclose(cos, cos.max())]
+        kernel[a, a] = 1 - prob
+        kernel[a, neighbours] += prob / len(neighbours)
+    return kernel
+
+
+def drift_kernel(actions, direction, prob):
+    """Build a kernel where the agent drifts toward one direction.
+
+    With probability ``prob`` the action ``direction`` is executed
+    no matter which action is intended, e.g. a wind or a current.
+
+    Parameters
+    ----------
+    actions : tuple
+        Action space of the environment, e.g. ``GridWorld.actions``.
+
+    direction : tuple of ints
+        Action toward which the agent drifts.
+
+    prob : float
+        Probability of drifting.
+
+    Returns
+    -------
+    kernel : numpy.ndarray of shape (A, A)
+        Transition kernel, where ``kernel[a, b]`` is the probability
+        that the intended action ``a`` is executed as action ``b``.
+
+    Examples
+    --------
+    >>> W = GridWorld()
+    >>> W.add_area((3, 3), name="windy")
+    >>> W.set_transition_kernel("windy", drift_kernel(W.actions, (1, 0), 0.3))
+    """
+    if not 0 <= prob <= 1:
+        msg = "Probability between 0 and 1 expected, got {}".format(prob)
+        raise ValueError(msg)
+    if direction not in actions:
+        msg = "Illegal direction {}, should be one of {}".format(direction, actions)
+        raise ValueError(msg)
+
+    kernel = np.eye(len(actions)) * (1 - prob)
+    kernel[:, actions.index(direction)] += prob
+    return kernel
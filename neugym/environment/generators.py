@@ -0,0 +1,506 @@
+"""Procedural generators of gridworld layouts."""
+
+import numpy as np
+
+from .compiled import CompiledWorld
+
+__all__ = [
+    "perfect_maze",
+    "rooms_world",
+    "open_field",
+    "t_maze",
+    "radial_arm_maze"
+]
+
+# Default action space of GridWorld.
+_ACTIONS = ((0, 0), (1, 0), (-1, 0), (0, 1), (0, -1))
+
+# Number of worlds whose lookup tables are built in one vectorized pass.
+_CHUNK_SIZE = 1024
+
+
+class _Layout:
+    """Area shapes and paths shared by a batch of generated worlds.
+
+    Holds the state indexing and the lookup table of movements ignoring
+    blocked states, in the same layout as ``CompiledWorld.from_gridworld()``.
+    """
+
+    def __init__(self, shapes, paths=()):
+        self.area_shapes = np.array(shapes, dtype=np.int64).reshape(-1, 2)
+        sizes = self.area_shapes[:, 0] * self.area_shapes[:, 1]
+        self.area_offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+        self.area_offsets[1:] = np.cumsum(sizes)
+        self.num_states = int(self.area_offsets[-1])
+
+        area = np.repeat(np.arange(len(sizes)), sizes)
+        local = np.arange(self.num_states) - self.area_offsets[area]
+        m = self.area_shapes[area, 0]
+        n = self.area_shapes[area, 1]
+        self.coords = np.stack([area, local // n, local % n], axis=1)
+
+        state_ids = np.arange(self.num_states)
+        self.next_state = np.empty((self.num_states, len(_ACTIONS)), dtype=np.int64)
+        for i, (dx, dy) in enumerate(_ACTIONS):
+            x = self.coords[:, 1] + dx
+            y = self.coords[:, 2] + dy
+            inside = (x >= 0) & (x < m) & (y >= 0) & (y < n)
+            self.next_state[:, i] = np.where(inside, self.area_offsets[area] + x * n + y,
+                                             state_ids)
+
+        # Paths are registered in both directions, as with GridWorld.add_path().
+        for coord_from, coord_to, (dx, dy) in paths:
+            source = self.state_index(coord_from)
+            target = self.state_index(coord_to)
+            self.next_state[source, _ACTIONS.index((dx, dy))] = target
+            self.next_state[target, _ACTIONS.index((-dx, -dy))] = source
+
+    def state_index(self, coord):
+        a, x, y = coord
+        return int(self.area_offsets[a] + x * self.area_shapes[a, 1] + y)
+
+    def build(self, blocked, altitude, object_states, object_reward,
+              object_punish=None, object_prob=None):
+        """Compile a batch of worlds.
+
+        Arrays have a leading batch axis, ``blocked`` and ``altitude`` are
+        of shape (B, S) and object attributes of shape (B, K).
+        """
+        num_worlds = blocked.shape[0]
+        num_objects = object_states.shape[1]
+        if object_punish is None:
+            object_punish = np.zeros(object_reward.shape)
+        if object_prob is None:
+            object_prob = np.ones(object_reward.shape)
+
+        state_ids = np.arange(self.num_states)
+        kernels = np.eye(len(_ACTIONS))[None]
+        kernel_index = np.zeros(self.num_states, dtype=np.int64)
+
+        worlds = []
+        for start in range(0, num_worlds, _CHUNK_SIZE):
+            stop = min(start + _CHUNK_SIZE, num_worlds)
+            chunk = np.arange(stop - start)[:, None]
+            next_state = np.where(blocked[start:stop][:, self.next_state],
+                                  state_ids[:, None], self.next_state)
+            object_index = np.full((stop - start, self.num_states), -1, dtype=np.int64)
+            object_index[chunk, object_states[start:stop]] = np.arange(num_objects)
+
+            for i, b in enumerate(range(start, stop)):
+                worlds.append(CompiledWorld(
+                    _ACTIONS, self.coords, self.area_offsets, self.area_shapes,
+                    next_state[i].copy(), altitude[b].copy(), blocked[b].copy(),
+                    object_index[i].copy(), object_reward[b].astype(float),
+                    object_punish[b].astype(float), object_prob[b].astype(float),
+                    kernels, kernel_index
+                ))
+        return worlds
+
+
+def _check_batch(num_worlds):
+    if num_worlds is None:
+        return 1
+    if not isinstance(num_worlds, (int, np.integer)) or num_worlds < 1:
+        msg = "Positive integer 'num_worlds' expected, got {}".format(num_worlds)
+        raise ValueError(msg)
+    return int(num_worlds)
+
+
+def _check_shape(shape, odd=False):
+    try:
+        m, n = (int(i) for i in shape)
+    except (TypeError, ValueError):
+        msg = "Tuple of two ints expected for 'shape', got {}".format(shape)
+        raise TypeError(msg) from None
+    if m < 1 or n < 1 or (odd and (m % 2 == 0 or n % 2 == 0)):
+        msg = "{} 'shape' expected, got {}".format(
+            "Positive odd" if odd else "Positive", (m, n))
+        raise ValueError(msg)
+    return m, n
+
+
+def _sample_open_states(blocked, num_objects, rng):
+    # Draw distinct unblocked states uniformly at random for each world.
+    if not isinstance(num_objects, (int, np.integer)) or num_objects < 0:
+        msg = "Non-negative integer 'num_objects' expected, got {}".format(num_objects)
+        raise ValueError(msg)
+    num_open = np.sum(~blocked, axis=1)
+    if np.any(num_open < num_objects):
+        msg = "Unable to place {} objects in a world with {} unblocked states".format(
+            num_objects, num_open.min())
+        raise ValueError(msg)
+    keys = rng.random(blocked.shape)
+    keys[blocked] = 2
+    if num_objects == 0:
+        return np.zeros((blocked.shape[0], 0), dtype=np.int64)
+    return np.argpartition(keys, num_objects - 1, axis=1)[:, :num_objects]
+
+
+def _finish(layout, blocked, altitude, num_objects, reward, num_worlds, rng):
+    object_states = _sample_open_states(blocked, num_objects, rng)
+    object_reward = np.full(object_states.shape, reward, dtype=float)
+    worlds = layout.build(blocked, altitude, object_states, object_reward)
+    return worlds[0] if num_worlds is None else worlds
+
+
+def perfect_maze(shape, num_worlds=None, num_objects=1, reward=1.0, rng=None):
+    """Generate perfect mazes.
+
+    Maze cells are the states at even positions of the origin area, and
+    are connected by unblocking the walls between them along a random
+    spanning tree (randomized Kruskal's algorithm), so that there is
+    exactly one path between any two cells. The spanning trees of the whole
+    batch are drawn in one call, as the minimum spanning forest of the
+    disjoint union of the cell grids with random edge weights.
+
+    Parameters
+    ----------
+    shape : tuple of two odd ints
+        Shape of the origin area, i.e. ``(2 * rows - 1, 2 * cols - 1)``
+        for a maze of ``rows`` by ``cols`` cells.
+
+    num_worlds : int (optional, default: None)
+        Number of worlds to generate, a single world is returned if None.
+
+    num_objects : int (optional, default: 1)
+        Number of objects placed in distinct random unblocked states.
+
+    reward : float (optional, default: 1.0)
+        Reward of the objects, which are always rewarding.
+
+    rng : int or numpy.random.Generator (optional, default: None)
+        Random number generator or seed.
+
+    Returns
+    -------
+    worlds : CompiledWorld or list of CompiledWorld
+        Generated worlds.
+
+    Examples
+    --------
+    >>> mazes = perfect_maze((21, 21), num_worlds=1000, rng=0)
+    >>> W = from_spec(to_spec(mazes[0]))
+    """
+    import scipy.sparse as sp
+    from scipy.sparse.csgraph import minimum_spanning_tree
+
+    m, n = _check_shape(shape, odd=True)
+    batch = _check_batch(num_worlds)
+    rng = np.random.default_rng(rng)
+
+    rows, cols = (m + 1) // 2, (n + 1) // 2
+    num_cells = rows * cols
+    cells = np.arange(num_cells).reshape(rows, cols)
+    edges = np.concatenate([
+        np.stack([cells[:, :-1].ravel(), cells[:, 1:].ravel()], axis=1),
+        np.stack([cells[:-1, :].ravel(), cells[1:, :].ravel()], axis=1)
+    ]).reshape(-1, 2)
+
+    blocked = np.ones((batch, m, n), dtype=bool)
+    blocked[:, ::2, ::2] = False
+    blocked = blocked.reshape(batch, -1)
+    for start in range(0, batch, _CHUNK_SIZE):
+        stop = min(start + _CHUNK_SIZE, batch)
+        if len(edges) == 0:
+            break
+        offset = (np.arange(stop - start) * num_cells)[:, None]
+        weights = rng.random((stop - start, len(edges))) + 1
+        graph = sp.coo_matrix((weights.ravel(),
+                               ((edges[:, 0] + offset).ravel(), (edges[:, 1] + offset).ravel())),
+                              shape=((stop - start) * num_cells,) * 2).tocsr()
+        tree = minimum_spanning_tree(graph).tocoo()
+
+        # Unblock the wall in the middle of each tree edge.
+        world = tree.row // num_cells
+        cell_from, cell_to = tree.row % num_cells, tree.col % num_cells
+        x = cell_from // cols + cell_to // cols
+        y = cell_from % cols + cell_to % cols
+        blocked[start + world, x * n + y] = False
+
+    altitude = np.zeros(blocked.shape)
+    return _finish(_Layout([(m, n)]), blocked, altitude, num_objects, reward, num_worlds, rng)
+
+
+def rooms_world(shape, rooms=(2, 2), num_worlds=None, num_objects=1, reward=1.0, rng=None):
+    """Generate rooms separated by walls with one door between adjacent rooms.
+
+    The origin area is split into a grid of rooms of (nearly) equal sizes
+    by one-state thick walls, and one door is opened at a random position
+    of each wall between two adjacent rooms.
+
+    Parameters
+    ----------
+    shape : tuple of two ints
+        Shape of the origin area.
+
+    rooms : tuple of two ints (optional, default: (2, 2))
+        Number of rows and columns of rooms.
+
+    num_worlds : int (optional, default: None)
+        Number of worlds to generate, a single world is returned if None.
+
+    num_objects : int (optional, default: 1)
+        Number of objects placed in distinct random unblocked states.
+
+    reward : float (optional, default: 1.0)
+        Reward of the objects, which are always rewarding.
+
+    rng : int or numpy.random.Generator (optional, default: None)
+        Random number generator or seed.
+
+    Returns
+    -------
+    worlds : CompiledWorld or list of CompiledWorld
+        Generated worlds.
+
+    Examples
+    --------
+    >>> four_rooms = rooms_world((11, 11), rooms=(2, 2), num_worlds=100, rng=0)
+    """
+    m, n = _check_shape(shape)
+    p, q = _check_shape(rooms)
+    if m < 2 * p - 1 or n < 2 * q - 1:
+        msg = "Shape {} too small for {} rooms".format((m, n), (p, q))
+        raise ValueError(msg)
+    batch = _check_batch(num_worlds)
+    rng = np.random.default_rng(rng)
+
+    # Room k spans rows bounds[k] to bounds[k + 1] - 2, walls are at bounds[k] - 1.
+    row_bounds = np.round(np.arange(p + 1) * (m + 1) / p).astype(np.int64)
+    col_bounds = np.round(np.arange(q + 1) * (n + 1) / q).astype(np.int64)
+
+    blocked = np.zeros((batch, m, n), dtype=bool)
+    blocked[:, row_bounds[1:-1] - 1, :] = True
+    blocked[:, :, col_bounds[1:-1] - 1] = True
+    worlds = np.arange(batch)
+    for i in range(p):
+        for j in range(q):
+            rows = (row_bounds[i], row_bounds[i + 1] - 1)
+            cols = (col_bounds[j], col_bounds[j + 1] - 1)
+            if i + 1 < p:
+                blocked[worlds, rows[1], rng.integers(*cols, size=batch)] = False
+            if j + 1 < q:
+                blocked[worlds, rng.integers(*rows, size=batch), cols[1]] = False
+
+    blocked = blocked.reshape(batch, -1)
+    altitude = np.zeros(blocked.shape)
+    return _finish(_Layout([(m, n)]), blocked, altitude, num_objects, reward, num_worlds, rng)
+
+
+def open_field(shape, obstacle_density=0.1, altitude_noise=0.0, num_worlds=None,
+               num_objects=1, reward=1.0, rng=None):
+    """Generate open fields with random obstacles and altitude noise.
+
+    States of the origin area are blocked independently with probability
+    ``obstacle_density``. Unblocked states that are not connected to the
+    largest connected region are then blocked as well, so that every
+    unblocked state can be reached from every other. Worlds where all the
+    states are blocked are sampled again.
+
+    Parameters
+    ----------
+    shape : tuple of two ints
+        Shape of the origin area.
+
+    obstacle_density : float (optional, default: 0.1)
+        Probability for each state to be blocked, in [0, 1).
+
+    altitude_noise : float (optional, default: 0.0)
+        Standard deviation of the Gaussian altitude of each state.
+
+    num_worlds : int (optional, default: None)
+        Number of worlds to generate, a single world is returned if None.
+
+    num_objects : int (optional, default: 1)
+        Number of objects placed in distinct random unblocked states.
+
+    reward : float (optional, default: 1.0)
+        Reward of the objects, which are always rewarding.
+
+    rng : int or numpy.random.Generator (optional, default: None)
+        Random number generator or seed.
+
+    Returns
+    -------
+    worlds : CompiledWorld or list of CompiledWorld
+        Generated worlds.
+
+    Examples
+    --------
+    >>> fields = open_field((15, 15), obstacle_density=0.2, altitude_noise=0.1,
+    ...                     num_worlds=100, rng=0)
+    """
+    from scipy import ndimage
+
+    m, n = _check_shape(shape)
+    if not 0 <= obstacle_density < 1:
+        msg = "'obstacle_density' in [0, 1) expected, got {}".format(obstacle_density)
+        raise ValueError(msg)
+    if altitude_noise < 0:
+        msg = "Non-negative 'altitude_noise' expected, got {}".format(altitude_noise)
+        raise ValueError(msg)
+    batch = _check_batch(num_worlds)
+    rng = np.random.default_rng(rng)
+
+    structure = np.zeros((3, 3, 3), dtype=bool)
+    structure[1] = ndimage.generate_binary_structure(2, 1)
+    blocked = np.ones((batch, m * n), dtype=bool)
+    pending = np.arange(batch)
+    while len(pending) > 0:
+        k = len(pending)
+        sample = rng.random((k, m, n)) < obstacle_density
+
+        # Label the regions of all worlds at once, without connections across worlds.
+        labels, num_labels = ndimage.label(~sample, structure=structure)
+        labels = labels.reshape(k, -1)
+        sizes = np.bincount(labels.ravel(), minlength=num_labels + 1)
+        label_world = np.zeros(num_labels + 1, dtype=np.int64)
+        label_world[labels] = np.arange(k)[:, None]
+        largest = np.zeros(k, dtype=np.int64)
+        order = np.lexsort((sizes[1:], label_world[1:])) + 1
+        largest[label_world[order]] = order
+        blocked[pending] = labels != largest[:, None]
+
+        # Worlds without any unblocked state (no region) are sampled again.
+        pending = pending[largest == 0]
+
+    altitude = np.zeros(blocked.shape)
+    if altitude_noise > 0:
+        altitude = rng.normal(0, altitude_noise, size=blocked.shape)
+    return _finish(_Layout([(m, n)]), blocked, altitude, num_objects, reward, num_worlds, rng)
+
+
+def t_maze(stem_length=3, arm_length=3, num_worlds=None, reward=1.0, rng=None):
+    """Generate T-mazes with the reward in a random arm.
+
+    The origin area has shape ``(stem_length + 1, 2 * arm_length + 1)``,
+    where only the first row (the arms) and the middle column (the stem)
+    are unblocked. Both arm ends have an object, ending the trial, and the
+    object of a random arm gives ``reward`` while the other gives nothing.
+    Agents usually start at the bottom of the stem, i.e. at
+    ``(0, stem_length, arm_length)``.
+
+    Parameters
+    ----------
+    stem_length : int (optional, default: 3)
+        Number of states of the stem below the arms.
+
+    arm_length : int (optional, default: 3)
+        Number of states of each arm.
+
+    num_worlds : int (optional, default: None)
+        Number of worlds to generate, a single world is returned if None.
+
+    reward : float (optional, default: 1.0)
+        Reward of the rewarded arm.
+
+    rng : int or numpy.random.Generator (optional, default: None)
+        Random number generator or seed.
+
+    Returns
+    -------
+    worlds : CompiledWorld or list of CompiledWorld
+        Generated worlds.
+
+    Examples
+    --------
+    >>> mazes = t_maze(num_worlds=10, rng=0)
+    >>> mazes[0].object_reward
+    array([0., 1.])
+    """
+    stem_length, arm_length = _check_shape((stem_length, arm_length))
+    batch = _check_batch(num_worlds)
+    rng = np.random.default_rng(rng)
+
+    m, n = stem_length + 1, 2 * arm_length + 1
+    layout = _Layout([(m, n)])
+    mask = np.ones((m, n), dtype=bool)
+    mask[0, :] = False
+    mask[:, arm_length] = False
+    blocked = np.broadcast_to(mask.ravel(), (batch, m * n))
+
+    object_states = np.broadcast_to([layout.state_index((0, 0, 0)),
+                                     layout.state_index((0, 0, n - 1))], (batch, 2))
+    object_reward = np.zeros((batch, 2))
+    object_reward[np.arange(batch), rng.integers(2, size=batch)] = reward
+    worlds = layout.build(blocked, np.zeros(blocked.shape), object_states, object_reward)
+    return worlds[0] if num_worlds is None else worlds
+
+
+def radial_arm_maze(num_arms=8, arm_length=3, num_baited=4, num_worlds=None,
+                    reward=1.0, rng=None):
+    """Generate radial arm mazes with randomly baited arms.
+
+    The origin area is a square hub and each arm is an area of shape
+    ``(arm_length, 1)`` or ``(1, arm_length)`` connected by a path to a
+    state at the border of the hub, evenly spread around the hub. Arms are
+    areas ``1`` to ``num_arms``, in clockwise order starting from the top
+    left of the hub. The end of ``num_baited`` random arms has a rewarding
+    object.
+
+    Parameters
+    ----------
+    num_arms : int (optional, default: 8)
+        Number of arms.
+
+    arm_length : int (optional, default: 3)
+        Number of states of each arm.
+
+    num_baited : int (optional, default: 4)
+        Number of arms with a reward at their end.
+
+    num_worlds : int (optional, default: None)
+        Number of worlds to generate, a single world is returned if None.
+
+    reward : float (optional, default: 1.0)
+        Reward of the baits.
+
+    rng : int or numpy.random.Generator (optional, default: None)
+        Random number generator or seed.
+
+    Returns
+    -------
+    worlds : CompiledWorld or list of CompiledWorld
+        Generated worlds.
+
+    Examples
+    --------
+    >>> mazes = radial_arm_maze(num_arms=8, num_baited=4, num_worlds=10, rng=0)
+    >>> mazes[0].num_states
+    28
+    """
+    num_arms, arm_length = _check_shape((num_arms, arm_length))
+    if not 0 <= num_baited <= num_arms:
+        msg = "'num_baited' in [0, {}] expected, got {}".format(num_arms, num_baited)
+        raise ValueError(msg)
+    batch = _check_batch(num_worlds)
+    rng = np.random.default_rng(rng)
+
+    # Doorways around the hub in clockwise order, as (state, outward action).
+    h = -(-num_arms // 4)
+    slots = [((0, y), (-1, 0)) for y in range(h)] + \
+            [((x, h - 1), (0, 1)) for x in range(h)] + \
+            [((h - 1, y), (1, 0)) for y in reversed(range(h))] + \
+            [((x, 0), (0, -1)) for x in reversed(range(h))]
+    slots = [slots[i * 4 * h // num_arms] for i in range(num_arms)]
+
+    shapes = [(h, h)]
+    paths = []
+    ends = []
+    for i, ((x, y), (dx, dy)) in enumerate(slots):
+        # Arms point outwards, entered at their end next to the hub.
+        shape = (arm_length, 1) if dx != 0 else (1, arm_length)
+        near = (0, 0) if dx + dy > 0 else (shape[0] - 1, shape[1] - 1)
+        far = (shape[0] - 1 - near[0], shape[1] - 1 - near[1])
+        shapes.append(shape)
+        paths.append(((0, x, y), (i + 1,) + near, (dx, dy)))
+        ends.append((i + 1,) + far)
+    layout = _Layout(shapes, paths)
+
+    ends = np.array([layout.state_index(end) for end in ends], dtype=np.int64)
+    baited = np.argsort(rng.random((batch, num_arms)), axis=1)[:, :num_baited]
+    object_states = np.sort(ends[baited], axis=1)
+    object_reward = np.full(object_states.shape, reward, dtype=float)
+    blocked = np.zeros((batch, layout.num_states), dtype=bool)
+    worlds = layout.build(blocked, np.zeros(blocked.shape), object_states, object_reward)
+    return worlds[0] if num_worlds is None else worlds
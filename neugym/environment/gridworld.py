@@ -1,6 +1,7 @@
 """Base class for gridworld environment."""
 
 import copy
+import hashlib
 import warnings
 
 import networkx as nx
@@ -8,12 +9,41 @@ import numpy as np
 
 import neugym as ng
 from ._agent import _Agent
+from ._area_graph import _AreaGraph
+from ._connectivity import _Connectivity
+from ._event import _EventQueue
+from ._memory import _deep_sizeof
 from ._object import _Object
+from .compiled import CompiledWorld
 
 __all__ = [
     "GridWorld"
 ]
 
+_SCHEDULABLE = (
+    "add_path",
+    "remove_path",
+    "add_object",
+    "remove_object",
+    "update_object",
+    "block",
+    "unblock",
+    "set_altitude",
+    "set_transition_kernel",
+    "remove_transition_kernel"
+)
+
+_ON_EXCEED = ("raise", "warn")
+
+# Bytes per state of the networkx graph of a grid area, measured once.
+_bytes_per_state = None
+
+# Named action spaces, the von Neumann neighborhood is the default one.
+_ACTION_SETS = {
+    "von_neumann": ((0, 0), (1, 0), (-1, 0), (0, 1), (0, -1)),
+    "moore": ((0, 0), (1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1))
+}
+
 
 class GridWorld:
     r"""Base class for gridworld environment.
@@ -34,10 +64,13 @@ class GridWorld:
     where $R_{move}$ is the movement reward and $A$
     represents the altitude of current state $s$ and next state $s + 1$.
 
-    At each position(state), the agent can choose from 5 ``actions`` to move towards
-    **UP**, **DOWN**, **LEFT**, **RIGHT**, and **STAY** in the same state.
-    When the performed movement would make the agent get out of the world,
-    the agent would be forced to stay in the same state.
+    At each position(state), the agent can choose by default from 5 ``actions``
+    to move towards **UP**, **DOWN**, **LEFT**, **RIGHT**, and **STAY** in the
+    same state. Other action spaces, e.g. with diagonal moves or jumps, can be
+    given when creating the environment. An action ``(dx, dy)`` moves the agent
+    from ``(area, x, y)`` to ``(area, x + dx, y + dy)``, regardless of the states
+    in between. When the performed movement would make the agent get out of
+    the world, the agent would be forced to stay in the same state.
 
     Objects where the agent can get reward are placed at different states
     and each state can only obtain one object. Each object has its own adjustable
@@ -157,7 +190,7 @@ class GridWorld:
     >>> W.reset()
     """
 
-    def __init__(self, origin_shape=None):
+    def __init__(self, origin_shape=None, actions=None):
         """Initialize a gridworld environment.
 
         Parameters
@@ -167,6 +200,13 @@ class GridWorld:
             initialized to be only one state ``(0, 0, 0)``, otherwise it will
             be a rectangular area of shape ``origin_shape``.
 
+        actions : str or sequence of tuples of ints (optional, default: None)
+            Action space of the environment, either ``"von_neumann"`` (**STAY**
+            and the 4 cardinal moves, the default), ``"moore"`` (**STAY**, the
+            4 cardinal and the 4 diagonal moves), or a sequence of distinct
+            moves ``(dx, dy)``, which should contain the reverse move
+            ``(-dx, -dy)`` of each move.
+
         Examples
         --------
         Initialize a gridworld environment by default.
@@ -176,14 +216,39 @@ class GridWorld:
         Manually set origin shape.
 
         >>> W = GridWorld((3, 4))
+
+        Allow diagonal moves and jumps over one state.
+
+        >>> W = GridWorld((5, 5), actions="moore")
+        >>> W = GridWorld((5, 5), actions=[(0, 0), (2, 0), (-2, 0), (0, 2), (0, -2)])
         """
         self._world = nx.Graph()
         self._time = 0
+        self._num_trial = 0
         self._num_area = 0
         self._area_alias = {}
         self._path_alias = {}
         self._objects = []
-        self._actions = ((0, 0), (1, 0), (-1, 0), (0, 1), (0, -1))
+        self._actions = _check_actions(actions)
+        self._action_index = {action: i for i, action in enumerate(self._actions)}
+        self._unit_moves = all(abs(dx) + abs(dy) <= 1 for dx, dy in self._actions)
+        # Incremental connectivity updates only hold when the moves are exactly
+        # the edges of the world graph, i.e. to all the 4 nearest neighbors.
+        self._grid_moves = self._unit_moves and \
+            set(_ACTION_SETS["von_neumann"]) <= set(self._actions) | {(0, 0)}
+        self._area_kernels = {}
+        self._state_kernels = {}
+        self._events = _EventQueue()
+        self._counters = []
+        self._connectivity = _Connectivity()
+        self._area_graph = _AreaGraph()
+        self._area_graph.add_area(0)
+        self._stamp = 0
+        self._area_stamps = {}
+        self._compiled = None
+        self._fingerprint = None
+        self._memory_budget = None
+        self._on_exceed = "raise"
 
         # Add origin.
         if origin_shape is None:
@@ -210,10 +275,14 @@ class GridWorld:
         self._reset_state = {
             "world": None,
             "time": None,
+            "num_trial": None,
             "num_area": None,
             "area_alias": None,
             "path_alias": None,
             "objects": None,
+            "area_kernels": None,
+            "state_kernels": None,
+            "events": None,
             "agent": None
         }
 
@@ -244,9 +313,10 @@ class GridWorld:
         if name in self._area_alias.keys():
             msg = "Alias name already exists, try another name"
             raise RuntimeError(msg)
+        m, n = shape
+        self._check_memory("add_area", num_states=m * n)
 
         # Create new area.
-        m, n = shape
         new_area = nx.grid_2d_graph(m, n)
         mapping = {}
         for coord in new_area.nodes:
@@ -262,6 +332,12 @@ class GridWorld:
         # Add area altitude.
         altitude_mat = np.zeros(shape)
         self.set_altitude(self._num_area, altitude_mat)
+        if not self._grid_moves:
+            self._connectivity.dirty = True
+        elif not self._connectivity.dirty:
+            self._connectivity.add_area(shape)
+        self._area_graph.add_area(self._num_area)
+        self._modified(self._num_area)
 
     def remove_area(self, area):
         """Remove an area from the world.
@@ -356,6 +432,26 @@ class GridWorld:
                 new_objects.append(obj)
         self._objects = new_objects
 
+        # Remove transition kernels in the area to be removed.
+        new_area_kernels = {}
+        for key, value in self._area_kernels.items():
+            if key < area_idx:
+                new_area_kernels[key] = value
+            elif key > area_idx:
+                new_area_kernels[key - 1] = value
+        self._area_kernels = new_area_kernels
+
+        new_state_kernels = {}
+        for key, value in self._state_kernels.items():
+            if key[0] < area_idx:
+                new_state_kernels[key] = value
+            elif key[0] > area_idx:
+                new_state_kernels[tuple([key[0] - 1] + list(key[1:]))] = value
+        self._state_kernels = new_state_kernels
+        self._connectivity.dirty = True
+        self._area_graph.rebuild(self)
+        self._modified()
+
     def add_path(self, coord_from, coord_to, register_action=None):
         """Add a new inter-area connection.
 
@@ -378,9 +474,9 @@ class GridWorld:
         register_action : tuple of ints (optional, default: None)
             Register an action to transport the agent from ``coord_from`` to
             ``coord_to``. If None, possible action to register will
-            be searched in the order of
-            [**UP(1, 0)**, **DOWN(-1, 0)**, **RIGHT(0, 1)**, **LEFT(0, -1)**],
-            and the first possible action will be registered.
+            be searched in the order of ``GridWorld.actions``, e.g.
+            [**UP(1, 0)**, **DOWN(-1, 0)**, **RIGHT(0, 1)**, **LEFT(0, -1)**]
+            by default, and the first possible action will be registered.
 
         Examples
         --------
@@ -401,7 +497,7 @@ class GridWorld:
         if not self._world.has_node(coord_from):
             msg = "'coord_from' coordinate {} out of world".format(coord_from)
             raise ValueError(msg)
-        if self._world.degree(coord_from) == 4:
+        if self._unit_moves and self._world.degree(coord_from) == 4:
             msg = "Maximum number of connections (4) for position " \
                   "{} reached, not allowed to access from it".format(coord_from)
             raise ng.NeuGymConnectivityError(msg)
@@ -413,7 +509,7 @@ class GridWorld:
         if not self._world.has_node(coord_to):
             msg = "'coord_to' coordinate {} out of world".format(coord_to)
             raise ValueError(msg)
-        elif self._world.degree(coord_to) == 4:
+        elif self._unit_moves and self._world.degree(coord_to) == 4:
             msg = "Maximum number of connections (4) for position " \
                   "{} reached, not allowed to access to it".format(coord_to)
             raise ng.NeuGymConnectivityError(msg)
@@ -439,7 +535,8 @@ class GridWorld:
             raise ng.NeuGymConnectivityError(msg)
 
         if register_action is not None:
-            if register_action not in self._actions:
+            register_action = tuple(register_action)
+            if register_action not in self._action_index:
                 msg = "Illegal 'register_action' {}, " \
                       "expected one of {}".format(register_action, self._actions)
                 raise ValueError(msg)
@@ -459,6 +556,17 @@ class GridWorld:
                                [coord_to[1] - dx] +
                                [coord_to[2] - dy])] = coord_from
         self._world.add_edge(coord_from, coord_to)
+        if not self._grid_moves:
+            # Other states may reach the doorways, e.g. with diagonal moves,
+            # or the doorways may not be crossed in both directions.
+            self._connectivity.dirty = True
+        elif not self._connectivity.dirty and \
+                not self._world.nodes[coord_from]['blocked'] and \
+                not self._world.nodes[coord_to]['blocked']:
+            self._connectivity.union(self._connectivity.state_id(coord_from),
+                                     self._connectivity.state_id(coord_to))
+        self._area_graph.add_path(coord_from, coord_to, (dx, dy))
+        self._modified(coord_from[0], coord_to[0])
 
     def remove_path(self, coord_from, coord_to):
         """Remove one inter-area connection from the world.
@@ -512,6 +620,9 @@ class GridWorld:
             for key in remove_list:
                 self._path_alias.pop(key)
             self._world.remove_edge(coord_from, coord_to)
+            self._connectivity.dirty = True
+            self._area_graph.remove_path(coord_from, coord_to)
+            self._modified(coord_from[0], coord_to[0])
 
     def add_object(self, coord, reward, prob, punish=0):
         """Add one object to the world.
@@ -542,6 +653,7 @@ class GridWorld:
         """
         if coord in self._world.nodes:
             self._objects.append(_Object(reward, punish, prob, coord))
+            self._modified(coord[0])
         else:
             msg = "Coordinate {} out of world".format(coord)
             raise ValueError(msg)
@@ -568,6 +680,7 @@ class GridWorld:
                 break
         if pop_idx is not None:
             self._objects.pop(pop_idx)
+            self._modified(coord[0])
         else:
             msg = "No object found at {}".format(coord)
             raise ValueError(msg)
@@ -604,6 +717,7 @@ class GridWorld:
                         msg = "'Object' object doesn't have attribute " \
                               "'{}', ignored".format(key)
                         warnings.warn(RuntimeWarning(msg))
+                self._modified(coord[0])
                 return
 
         msg = "No object found at {}".format(coord)
@@ -675,6 +789,8 @@ class GridWorld:
                 raise RuntimeError(msg)
 
         nx.set_node_attributes(self._world, {coord: True}, 'blocked')
+        self._connectivity.dirty = True
+        self._modified(coord[0])
 
     def unblock(self, coord):
         """Unblock one state.
@@ -694,6 +810,15 @@ class GridWorld:
 
         if coord in self._world.nodes:
             nx.set_node_attributes(self._world, {coord: False}, 'blocked')
+            if not self._grid_moves:
+                self._connectivity.dirty = True
+            elif not self._connectivity.dirty:
+                connectivity = self._connectivity
+                for neighbor in self._world.neighbors(coord):
+                    if not self._world.nodes[neighbor]['blocked']:
+                        connectivity.union(connectivity.state_id(coord),
+                                           connectivity.state_id(neighbor))
+            self._modified(coord[0])
         else:
             msg = "Coordinate {} out of world".format(coord)
             raise ValueError(msg)
@@ -749,6 +874,129 @@ class GridWorld:
                 coord = (area_idx, x, y)
                 altitude_mapping[coord] = altitude_mat[x, y]
         nx.set_node_attributes(self._world, altitude_mapping, 'altitude')
+        self._modified(area_idx)
+
+    def set_transition_kernel(self, where, kernel):
+        """Set a stochastic transition kernel for one area or one state.
+
+        A transition kernel is a matrix of shape ``(A, A)`` where ``A`` is
+        the number of actions, and ``kernel[a, b]`` is the probability that
+        the intended action ``actions[a]`` is executed as action ``actions[b]``
+        (e.g. the agent slips or drifts). Kernels set for a state take
+        precedence over kernels set for its area. States without kernel
+        are deterministic.
+
+        .. note::
+            Useful kernels can be built with ``slip_kernel()`` and
+            ``drift_kernel()``.
+
+        Parameters
+        ----------
+        where : int or str or tuple of ints
+            Index or name of the area, or coordinate of the state
+            to set the kernel.
+
+        kernel : numpy.ndarray
+            Row-stochastic matrix of shape ``(A, A)``.
+
+        Examples
+        --------
+        >>> W = GridWorld()
+        >>> W.add_area((3, 3), name="ice")
+        >>> W.set_transition_kernel("ice", slip_kernel(W.actions, 0.2))
+        >>> W.set_transition_kernel((0, 0, 0), drift_kernel(W.actions, (1, 0), 0.1))
+        """
+        kernel = np.array(kernel, dtype=float)
+        num_actions = len(self._actions)
+        if kernel.shape != (num_actions, num_actions):
+            msg = "Kernel of shape {} expected, got {}".format(
+                (num_actions, num_actions), kernel.shape)
+            raise ValueError(msg)
+        if np.any(kernel < 0) or not np.allclose(kernel.sum(axis=1), 1):
+            msg = "Kernel rows should be probability distributions"
+            raise ValueError(msg)
+
+        key = self._kernel_key(where)
+        if type(key) == tuple:
+            self._state_kernels[key] = kernel
+        else:
+            self._area_kernels[key] = kernel
+        self._modified(key if type(key) == int else key[0])
+
+    def remove_transition_kernel(self, where):
+        """Remove the transition kernel of one area or one state.
+
+        Parameters
+        ----------
+        where : int or str or tuple of ints
+            Index or name of the area, or coordinate of the state
+            to remove the kernel.
+
+        Examples
+        --------
+        >>> W = GridWorld()
+        >>> W.add_area((3, 3))
+        >>> W.set_transition_kernel(1, slip_kernel(W.actions, 0.2))
+        >>> W.remove_transition_kernel(1)
+        """
+        key = self._kernel_key(where)
+        kernels = self._state_kernels if type(key) == tuple else self._area_kernels
+        if key not in kernels:
+            msg = "No transition kernel found at {}".format(where)
+            raise ValueError(msg)
+        kernels.pop(key)
+        self._modified(key if type(key) == int else key[0])
+
+    def get_transition_kernel(self, coord):
+        """Get the transition kernel applied at one state.
+
+        Parameters
+        ----------
+        coord : tuple of ints
+            Coordinate of the state.
+
+        Returns
+        -------
+        kernel : numpy.ndarray
+            Transition kernel of shape ``(A, A)``, identity matrix
+            if the state is deterministic.
+
+        Examples
+        --------
+        >>> W = GridWorld()
+        >>> W.get_transition_kernel((0, 0, 0))
+        array([[1., 0., 0., 0., 0.],
+               [0., 1., 0., 0., 0.],
+               [0., 0., 1., 0., 0.],
+               [0., 0., 0., 1., 0.],
+               [0., 0., 0., 0., 1.]])
+        """
+        if coord not in self._world.nodes:
+            msg = "Coordinate {} out of world".format(coord)
+            raise ValueError(msg)
+
+        kernel = self._state_kernels.get(coord, self._area_kernels.get(coord[0]))
+        if kernel is None:
+            return np.eye(len(self._actions))
+        return kernel.copy()
+
+    def _kernel_key(self, where):
+        if type(where) == tuple:
+            if where not in self._world.nodes:
+                msg = "Coordinate {} out of world".format(where)
+                raise ValueError(msg)
+            return where
+        elif type(where) == str:
+            return self.get_area_index(where)
+        elif type(where) == int:
+            if where > self._num_area or where < 0:
+                msg = "Area {} not found".format(where)
+                raise ValueError(msg)
+            return where
+        else:
+            msg = "int or str for area, or tuple for state coordinate " \
+                  "expected, got '{}'".format(type(where))
+            raise TypeError(msg)
 
     def set_area_name(self, area, name):
         """Set an alias name for an area.
@@ -1025,6 +1273,453 @@ class GridWorld:
             msg = "Unrecognized parameter '{}', 'current' or 'init' expected".format(when)
             raise ValueError(msg)
 
+    def schedule_event(self, when, method, *args, unit="time", **kwargs):
+        """Schedule a modification of the environment.
+
+        The modification ``GridWorld.<method>(*args, **kwargs)`` will be applied
+        at the end of the step where the environment ``time`` (or the number
+        of finished trials ``num_trial``) reaches ``when``, e.g. to reverse
+        object rewards or to move blocks during an experiment. Events scheduled
+        for the same moment are applied in the order of scheduling.
+
+        .. note::
+            - Pending events are part of the reset checkpoint, i.e. after
+              ``GridWorld.reset()`` the events fired since the checkpoint
+              was set will fire again.
+            - If a scheduled modification fails (e.g. blocking the state where
+              the agent is), it will be ignored with a warning.
+
+        Parameters
+        ----------
+        when : int
+            Time (or number of finished trials) to apply the modification.
+
+        method : str {"add_path", "remove_path", "add_object", "remove_object", \
+                      "update_object", "block", "unblock", "set_altitude", \
+                      "set_transition_kernel", "remove_transition_kernel"}
+            Name of the method to call.
+
+        args : positional arguments
+            Positional arguments passed to the method.
+
+        unit : str {"time", "trial"} (default: "time")
+            Whether ``when`` is given in time steps or in finished trials.
+
+        kwargs : keyword arguments
+            Keyword arguments passed to the method.
+
+        Examples
+        --------
+        Reverse reward probabilities after 100 trials.
+
+        >>> W = GridWorld()
+        >>> W.add_area((1, 3))
+        >>> W.add_path((0, 0, 0), (1, 0, 1))
+        >>> W.add_object((1, 0, 0), reward=1, prob=0.8)
+        >>> W.add_object((1, 0, 2), reward=1, prob=0.2)
+        >>> W.schedule_event(100, "update_object", (1, 0, 0), unit="trial", prob=0.2)
+        >>> W.schedule_event(100, "update_object", (1, 0, 2), unit="trial", prob=0.8)
+
+        Block a state at time 50.
+
+        >>> W.schedule_event(50, "block", (1, 0, 2))
+        """
+        if method not in _SCHEDULABLE:
+            msg = "Unable to schedule method '{}', " \
+                  "expected one of {}".format(method, list(_SCHEDULABLE))
+            raise ValueError(msg)
+        if unit not in ("time", "trial"):
+            msg = "Unrecognized unit '{}', 'time' or 'trial' expected".format(unit)
+            raise ValueError(msg)
+
+        self._events.push(unit, when, method, args, kwargs)
+
+    def clear_events(self):
+        """Remove all the scheduled events.
+
+        Examples
+        --------
+        >>> W = GridWorld()
+        >>> W.schedule_event(10, "block", (0, 0, 0))
+        >>> W.clear_events()
+        """
+        self._events.clear()
+
+    def get_scheduled_events(self):
+        """Get the pending scheduled events.
+
+        Returns
+        -------
+        events : list of tuples
+            Pending events ``(unit, when, method, args, kwargs)``,
+            in the order in which they will be applied for each unit.
+
+        Examples
+        --------
+        >>> W = GridWorld()
+        >>> W.schedule_event(10, "block", (0, 0, 0))
+        >>> W.get_scheduled_events()
+        [('time', 10, 'block', ((0, 0, 0),), {})]
+        """
+        return self._events.items()
+
+    def _apply_events(self):
+        if len(self._events) == 0:
+            return
+
+        for unit, value in (("time", self._time), ("trial", self._num_trial)):
+            for method, args, kwargs in self._events.pop_due(unit, value):
+                try:
+                    getattr(self, method)(*args, **kwargs)
+                except (ValueError, RuntimeError, ng.NeuGymException) as e:
+                    msg = "Scheduled event '{}' failed and ignored: {}".format(method, e)
+                    warnings.warn(RuntimeWarning(msg))
+
+    def attach_counter(self, counter):
+        """Attach an occupancy counter recording every step of the agent.
+
+        Parameters
+        ----------
+        counter : OccupancyCounter
+            Counter to attach, created for the current world layout.
+
+        Examples
+        --------
+        >>> W = GridWorld((3, 3))
+        >>> W.init_agent()
+        >>> counter = OccupancyCounter(W)
+        >>> W.attach_counter(counter)
+        >>> W.step((1, 0))
+        ((0, 1, 0), 0.0, False)
+        >>> counter.num_steps
+        1
+        """
+        shapes = [self.get_area_shape(i) for i in range(self._num_area + 1)]
+        if counter.actions != self._actions or \
+                [tuple(int(i) for i in shape) for shape in counter.area_shapes] != shapes:
+            msg = "Counter layout does not match the world layout"
+            raise ValueError(msg)
+        if counter not in self._counters:
+            self._counters.append(counter)
+
+    def detach_counter(self, counter):
+        """Detach an occupancy counter.
+
+        Parameters
+        ----------
+        counter : OccupancyCounter
+            Attached counter.
+        """
+        try:
+            self._counters.remove(counter)
+        except ValueError:
+            msg = "Counter not attached"
+            raise ValueError(msg) from None
+
+    def is_reachable(self, coord_from, coord_to):
+        """Whether the agent can move from one state to another.
+
+        Connectivity is maintained incrementally while the world is modified:
+        ``add_area()``, ``add_path()`` and ``unblock()`` merge connected
+        components, and components are rebuilt once at the next query after
+        modifications that can split them (``block()``, ``remove_path()``,
+        ``remove_area()`` and ``reset()``). Therefore queries cost nearly
+        constant time.
+
+        Parameters
+        ----------
+        coord_from : tuple of ints
+            Coordinate of the start state.
+
+        coord_to : tuple of ints
+            Coordinate of the end state.
+
+        Returns
+        -------
+        reachable : bool
+            Whether ``coord_to`` can be reached from ``coord_from`` without
+            entering blocked states.
+
+        Examples
+        --------
+        >>> W = GridWorld()
+        >>> W.add_area((1, 3))
+        >>> W.add_path((0, 0, 0), (1, 0, 0))
+        >>> W.block((1, 0, 1))
+        >>> W.is_reachable((0, 0, 0), (1, 0, 2))
+        False
+        >>> W.unblock((1, 0, 1))
+        >>> W.is_reachable((0, 0, 0), (1, 0, 2))
+        True
+        """
+        for coord in (coord_from, coord_to):
+            if coord not in self._world.nodes:
+                msg = "Coordinate {} out of world".format(coord)
+                raise ValueError(msg)
+        if coord_from == coord_to:
+            return True
+
+        connectivity = self._get_connectivity()
+        return connectivity.find(connectivity.state_id(coord_from)) == \
+            connectivity.find(connectivity.state_id(coord_to))
+
+    def get_unreachable_objects(self, coord=None):
+        """Get the objects that can not be reached from one state.
+
+        Parameters
+        ----------
+        coord : tuple of ints (optional, default: None)
+            Coordinate of the start state. If not provided, the agent
+            initial state will be used, or ``(0, 0, 0)`` if there is no agent.
+
+        Returns
+        -------
+        coords : list of tuples of ints
+            Coordinates of the unreachable objects.
+
+        Examples
+        --------
+        >>> W = GridWorld()
+        >>> W.add_area((1, 3))
+        >>> W.add_path((0, 0, 0), (1, 0, 0))
+        >>> W.add_object((1, 0, 2), reward=1, prob=1)
+        >>> W.block((1, 0, 1))
+        >>> W.get_unreachable_objects()
+        [(1, 0, 2)]
+        """
+        if coord is None:
+            coord = (0, 0, 0) if self._agent is None else self._agent.init_state
+        if coord not in self._world.nodes:
+            msg = "Coordinate {} out of world".format(coord)
+            raise ValueError(msg)
+
+        connectivity = self._get_connectivity()
+        root = connectivity.find(connectivity.state_id(coord))
+        unreachable = []
+        for obj in self._objects:
+            if obj.coord != coord and \
+                    connectivity.find(connectivity.state_id(obj.coord)) != root:
+                unreachable.append(obj.coord)
+        return unreachable
+
+    def get_doorways(self, area_from, area_to):
+        """Get the inter-area paths leading from one area to another.
+
+        Parameters
+        ----------
+        area_from : int or str
+            Index or name of the area to leave.
+
+        area_to : int or str
+            Index or name of the area to enter.
+
+        Returns
+        -------
+        doorways : list of tuples
+            Doorways ``(coord_from, action, coord_to)``, where taking
+            ``action`` at ``coord_from`` moves the agent to ``coord_to``.
+
+        Examples
+        --------
+        >>> W = GridWorld()
+        >>> W.add_area((2, 2))
+        >>> W.add_path((0, 0, 0), (1, 0, 0), register_action=(0, 1))
+        >>> W.get_doorways(0, 1)
+        [((0, 0, 0), (0, 1), (1, 0, 0))]
+        >>> W.get_doorways(1, 0)
+        [((1, 0, 0), (0, -1), (0, 0, 0))]
+        """
+        return self._area_graph.doorways(self._area_index(area_from),
+                                         self._area_index(area_to))
+
+    def get_area_route(self, area_from, area_to):
+        """Get the shortest route between two areas.
+
+        Routes are searched on the area-level graph, i.e. the number of
+        inter-area paths to go through is minimized, and cached until
+        the area connections change.
+
+        Parameters
+        ----------
+        area_from : int or str
+            Index or name of the start area.
+
+        area_to : int or str
+            Index or name of the end area.
+
+        Returns
+        -------
+        route : list of ints
+            Indices of the areas along the route, including
+            ``area_from`` and ``area_to``.
+
+        Examples
+        --------
+        >>> W = GridWorld()
+        >>> W.add_area((2, 2))
+        >>> W.add_path((0, 0, 0), (1, 0, 0))
+        >>> W.add_area((2, 2), name="Right")
+        >>> W.add_path((1, 1, 1), (2, 0, 0))
+        >>> W.get_area_route(0, "Right")
+        [0, 1, 2]
+        """
+        area_from = self._area_index(area_from)
+        area_to = self._area_index(area_to)
+        route = self._area_graph.route(area_from, area_to)
+        if route is None:
+            msg = "No route found from Area({}) to Area({})".format(area_from, area_to)
+            raise ng.NeuGymConnectivityError(msg)
+        return list(route)
+
+    def _area_index(self, area):
+        if type(area) == str:
+            area_idx = self.get_area_index(area)
+        elif type(area) == int:
+            area_idx = area
+        else:
+            msg = "int for area index or str for area name " \
+                  "expected, got '{}'".format(type(area))
+            raise TypeError(msg)
+
+        if area_idx > self._num_area or area_idx < 0:
+            msg = "Area {} not found".format(area_idx)
+            raise ValueError(msg)
+        return area_idx
+
+    def _install_areas(self, areas):
+        # Replace the world with the given areas, without inter-area paths or
+        # objects, building all the states and within-area connections at
+        # once. Each area is (shape, name, altitude, blocked) with arrays of
+        # the area shape, the first one being the origin.
+        if self._agent is not None or len(self._objects) > 0 or len(self._path_alias) > 0:
+            msg = "Areas can only be installed in a new environment"
+            raise RuntimeError(msg)
+        num_states = sum(m * n for (m, n), _, _, _ in areas)
+        self._check_memory("install_areas", num_states=num_states - len(self._world))
+
+        world = nx.Graph()
+        for a, ((m, n), _, altitude, blocked) in enumerate(areas):
+            xs, ys = np.divmod(np.arange(m * n), n)
+            coords = list(zip([a] * (m * n), xs.tolist(), ys.tolist()))
+            world.add_nodes_from((coord, {'altitude': alt, 'blocked': b}) for coord, alt, b in
+                                 zip(coords, np.ravel(altitude).tolist(),
+                                     np.ravel(blocked).astype(bool).tolist()))
+            grid = np.arange(m * n).reshape(m, n)
+            pairs = np.concatenate([
+                np.stack([grid[:-1, :].ravel(), grid[1:, :].ravel()], axis=1),
+                np.stack([grid[:, :-1].ravel(), grid[:, 1:].ravel()], axis=1)])
+            world.add_edges_from((coords[i], coords[j]) for i, j in pairs.tolist())
+
+        self._world = world
+        self._num_area = len(areas) - 1
+        self._area_alias = {name: a for a, (_, name, _, _) in enumerate(areas)
+                            if name is not None}
+        self._area_kernels = {}
+        self._state_kernels = {}
+        self._connectivity.dirty = True
+        self._area_graph.rebuild(self)
+        self._modified()
+
+    def _modified(self, *areas):
+        # Invalidate the array representation, and stamp the modified areas
+        # (all areas if not given) and their neighbors for per-area caches.
+        self._compiled = None
+        self._stamp += 1
+        if len(areas) == 0:
+            self._area_stamps = dict.fromkeys(range(self._num_area + 1), self._stamp)
+            return
+        for area_idx in areas:
+            self._area_stamps[area_idx] = self._stamp
+            if self._area_graph.graph.has_node(area_idx):
+                for neighbor in self._area_graph.graph.neighbors(area_idx):
+                    self._area_stamps[neighbor] = self._stamp
+
+    def _get_connectivity(self):
+        if self._connectivity.dirty:
+            self._connectivity.rebuild(self.compile())
+        return self._connectivity
+
+    def fingerprint(self):
+        """Get a stable content hash of the gridworld environment.
+
+        The hash covers the action space, areas and their shapes, altitudes,
+        blocks, inter-area paths (with their registered actions), objects
+        and transition kernels. It does not depend on area names, the agent,
+        the time, or scheduled events, and it is the same across Python
+        processes and sessions. The hash is cached until the environment is
+        modified.
+
+        Returns
+        -------
+        fingerprint : str
+            Hexadecimal SHA-256 digest.
+
+        Examples
+        --------
+        >>> W = GridWorld((3, 3))
+        >>> V = GridWorld((3, 3))
+        >>> W.fingerprint() == V.fingerprint()
+        True
+        >>> W.block((0, 1, 1))
+        >>> W.fingerprint() == V.fingerprint()
+        False
+        """
+        if self._fingerprint is not None and self._fingerprint[0] == self._stamp:
+            return self._fingerprint[1]
+
+        h = hashlib.sha256(repr(self._actions).encode())
+        nodes = sorted(self._world.nodes(data=True))
+        h.update(repr([(coord, float(attr['altitude']), bool(attr['blocked']))
+                       for coord, attr in nodes]).encode())
+        h.update(repr(sorted(self._path_alias.items())).encode())
+        h.update(repr([(obj.coord, float(obj.reward), float(obj.punish), float(obj.prob))
+                       for obj in self._objects]).encode())
+        for kernels in (self._area_kernels, self._state_kernels):
+            for key in sorted(kernels):
+                h.update(repr(key).encode())
+                h.update(np.ascontiguousarray(kernels[key], dtype=float).tobytes())
+
+        self._fingerprint = (self._stamp, h.hexdigest())
+        return self._fingerprint[1]
+
+    def compile(self, cache=None):
+        """Get the array representation of the gridworld environment.
+
+        The array representation is cached and rebuilt only when
+        the environment has been modified since the last call.
+
+        Parameters
+        ----------
+        cache : WorldCache (optional, default: None)
+            On-disk cache, where the array representation is loaded from,
+            or saved to after it is built.
+
+        Returns
+        -------
+        compiled : CompiledWorld
+            Array representation of the environment, where each state
+            has an integer id and each action an integer index.
+
+        Examples
+        --------
+        >>> W = GridWorld()
+        >>> W.add_area((2, 2))
+        >>> W.add_path((0, 0, 0), (1, 0, 0))
+        >>> C = W.compile()
+        >>> C.num_states
+        5
+        >>> C.state_coord(C.next_state[C.state_index((0, 0, 0)), C.action_index((1, 0))])
+        (1, 0, 0)
+        """
+        if self._compiled is None:
+            self._check_memory("compile",
+                               extra_bytes=_compiled_bytes(len(self._world), len(self._actions)))
+            if cache is not None:
+                self._compiled = cache.get_compiled(self)
+            else:
+                self._compiled = CompiledWorld.from_gridworld(self)
+        return self._compiled
+
     @property
     def world(self):
         """A copy of ``world`` attribute of the gridworld environment.
@@ -1062,6 +1757,33 @@ class GridWorld:
         """
         return self._world.copy()
 
+    @property
+    def area_graph(self):
+        """A copy of the area-level graph of the gridworld environment.
+
+        ``GridWorld.area_graph`` is a NetworkX Graph object where each node
+        is an area index, and two areas are connected if there is at least one
+        inter-area path between them. Each edge has an attribute ``doorways``,
+        a dictionary mapping each path ``(coord_from, coord_to)`` to its
+        registered action. The graph is maintained while paths and areas
+        are modified, i.e. it does not require scanning ``GridWorld.world``.
+
+        Returns
+        -------
+        area_graph : networkx.Graph
+            Area-level graph of the environment.
+
+        Examples
+        --------
+        >>> W = GridWorld()
+        >>> W.add_area((2, 2))
+        >>> W.add_path((0, 0, 0), (1, 0, 0))
+        >>> G = W.area_graph
+        >>> G.edges[0, 1]['doorways']
+        {((0, 0, 0), (1, 0, 0)): (1, 0)}
+        """
+        return copy.deepcopy(self._area_graph.graph)
+
     @property
     def time(self):
         """Gridworld environment time.
@@ -1087,6 +1809,31 @@ class GridWorld:
         """
         return self._time
 
+    @property
+    def num_trial(self):
+        """Number of trials finished in the gridworld environment.
+
+        A trial finishes each time the agent reaches an object.
+
+        Returns
+        -------
+        num_trial : int
+            Number of finished trials.
+
+        Examples
+        --------
+        >>> W = GridWorld()
+        >>> W.add_area((1, 1))
+        >>> W.add_path((0, 0, 0), (1, 0, 0))
+        >>> W.add_object((1, 0, 0), reward=1, prob=1)
+        >>> W.init_agent()
+        >>> W.step((1, 0))
+        ((1, 0, 0), 1.0, True)
+        >>> W.num_trial
+        1
+        """
+        return self._num_trial
+
     @property
     def num_area(self):
         """Number of areas in the ``world`` of gridworld environment.
@@ -1126,6 +1873,8 @@ class GridWorld:
         >>> W = GridWorld()
         >>> W.actions
         ((0, 0), (1, 0), (-1, 0), (0, 1), (0, -1))
+        >>> GridWorld(actions="moore").actions[5:]
+        ((1, 1), (1, -1), (-1, 1), (-1, -1))
         """
         return self._actions
 
@@ -1150,21 +1899,175 @@ class GridWorld:
         """
         return self._has_reset_checkpoint
 
+    def set_memory_budget(self, max_bytes, on_exceed="raise"):
+        """Set a memory budget of the environment.
+
+        Construction operations which would bring the estimated memory
+        usage of the environment above the budget (``add_area()``,
+        ``set_reset_checkpoint()`` and ``compile()``) are checked before
+        being executed. The estimate counts the states of the world graph
+        and of the reset checkpoint, and the arrays of the array
+        representation, see ``GridWorld.estimate_memory()``.
+
+        Parameters
+        ----------
+        max_bytes : int or None
+            Memory budget in bytes, no budget if None.
+
+        on_exceed : str {"raise", "warn"} (default: "raise")
+            Whether to raise a ``NeuGymMemoryError`` before executing an
+            operation exceeding the budget, or to issue a ``RuntimeWarning``
+            and execute it.
+
+        Examples
+        --------
+        >>> W = GridWorld()
+        >>> W.set_memory_budget(2 ** 20)
+        >>> W.add_area((1000, 1000))
+        Traceback (most recent call last):
+            ...
+        neugym.exception.NeuGymMemoryError: add_area would bring the estimated memory ...
+        """
+        if on_exceed not in _ON_EXCEED:
+            msg = "Unrecognized 'on_exceed' '{}', expected one of {}".format(
+                on_exceed, list(_ON_EXCEED))
+            raise ValueError(msg)
+        if max_bytes is not None and max_bytes <= 0:
+            msg = "Positive 'max_bytes' expected, got {}".format(max_bytes)
+            raise ValueError(msg)
+        self._memory_budget = max_bytes
+        self._on_exceed = on_exceed
+
+    def _estimated_bytes(self):
+        num_states = len(self._world)
+        if self._has_reset_checkpoint:
+            num_states += len(self._reset_state["world"])
+        compiled = 0 if self._compiled is None else _compiled_bytes(
+            self._compiled.num_states, self._compiled.num_actions)
+        return num_states * _graph_bytes_per_state() + compiled
+
+    def _check_memory(self, operation, num_states=0, extra_bytes=0):
+        if self._memory_budget is None:
+            return
+        estimate = self._estimated_bytes() + num_states * _graph_bytes_per_state() + extra_bytes
+        if estimate > self._memory_budget:
+            msg = "{} would bring the estimated memory usage of the environment to {} " \
+                  "bytes, above the budget of {} bytes".format(operation, estimate,
+                                                               self._memory_budget)
+            if self._on_exceed == "raise":
+                raise ng.NeuGymMemoryError(msg)
+            warnings.warn(RuntimeWarning(msg))
+
+    @staticmethod
+    def estimate_memory(shapes, actions=None, reset_checkpoint=False, compiled=False):
+        """Estimate the memory usage of an environment before building it.
+
+        Parameters
+        ----------
+        shapes : sequence of tuples of ints
+            Shape of each area, the origin included.
+
+        actions : str or sequence of tuples of ints (optional, default: None)
+            Action space, see ``GridWorld.__init__()``.
+
+        reset_checkpoint : bool (default: False)
+            Whether a reset checkpoint will be set.
+
+        compiled : bool (default: False)
+            Whether the array representation will be built.
+
+        Returns
+        -------
+        num_bytes : int
+            Estimated memory usage in bytes.
+
+        Examples
+        --------
+        >>> GridWorld.estimate_memory([(100, 100)] * 4, reset_checkpoint=True) > 10 ** 7
+        True
+        """
+        num_states = sum(int(m) * int(n) for m, n in shapes)
+        estimate = num_states * _graph_bytes_per_state() * (2 if reset_checkpoint else 1)
+        if compiled:
+            estimate += _compiled_bytes(num_states, len(_check_actions(actions)))
+        return estimate
+
+    def memory_report(self):
+        """Get the memory usage of the internal structures of the environment.
+
+        Sizes are measured by traversing the objects referenced by each
+        structure, in the order of the report: objects shared by several
+        structures (e.g. by the environment and by its reset checkpoint,
+        until it is modified) are counted in the first one only.
+
+        Returns
+        -------
+        report : dict
+            Bytes used by each structure, with keys
+
+            - ``"world"``: networkx graph of the states.
+            - ``"areas"``: area names and modification stamps.
+            - ``"path_alias"``: registered inter-area paths.
+            - ``"objects"``: objects.
+            - ``"kernels"``: transition kernels.
+            - ``"events"``: scheduled events.
+            - ``"counters"``: attached counters.
+            - ``"agent"``: agent.
+            - ``"connectivity"``: connectivity and area graph indexes.
+            - ``"compiled"``: array representation, if built.
+            - ``"reset_checkpoint"``: copies of the reset checkpoint.
+            - ``"other"``: other attributes.
+            - ``"total"``: sum of the above.
+
+        Examples
+        --------
+        >>> W = GridWorld((100, 100))
+        >>> W.set_reset_checkpoint()
+        >>> report = W.memory_report()
+        >>> report["reset_checkpoint"] > 0.5 * report["world"]
+        True
+        """
+        groups = [
+            ("world", ["_world"]),
+            ("areas", ["_num_area", "_area_alias", "_area_stamps"]),
+            ("path_alias", ["_path_alias"]),
+            ("objects", ["_objects"]),
+            ("kernels", ["_area_kernels", "_state_kernels"]),
+            ("events", ["_events"]),
+            ("counters", ["_counters"]),
+            ("agent", ["_agent"]),
+            ("connectivity", ["_connectivity", "_area_graph"]),
+            ("compiled", ["_compiled"]),
+            ("reset_checkpoint", ["_reset_state"])
+        ]
+        # The environment itself and its attribute dict are not counted.
+        seen = {id(self), id(self.__dict__), id(None)}
+        report = {}
+        for key, names in groups:
+            report[key] = sum(_deep_sizeof(getattr(self, name), seen) for name in names)
+        listed = {name for _, names in groups for name in names}
+        report["other"] = sum(_deep_sizeof(value, seen) for name, value in self.__dict__.items()
+                              if name not in listed)
+        report["total"] = sum(report.values())
+        return report
+
     def step(self, action):
         """Make the agent move toward direction given by ``action``.
 
         .. note::
             - If one movement will cause the agent get out of the world,
               the agent will be forced to stay in the same position (state) instead.
+            - If a transition kernel is set for the current state (see
+              ``GridWorld.set_transition_kernel()``), the executed action is
+              sampled from the kernel row of ``action``.
             - If the agent reaches a state with an object, no matter whether the agent
               gets a reward or punishment from the object, this trial will end and the
               agent will be transported back to its initial state.
 
         Parameters
         ----------
-        action : tuple of ints \
-                 {(0, 0), (1, 0), (-1, 0), (0, 1), (0, -1)}
-            Direction of the agent movement.
+        action : tuple of ints
+            Direction of the agent movement, one of ``GridWorld.actions``.
 
         Returns
         -------
@@ -1186,15 +2089,25 @@ class GridWorld:
         >>> W.step((1, 0))
         ((1, 0, 0), 0.0, False)
         """
-        if action not in self._actions:
+        try:
+            action_idx = self._action_index[action]
+        except (KeyError, TypeError):
             msg = "Illegal action {}, should be one of {}".format(action, self._actions)
-            raise ValueError(msg)
-        else:
-            dx, dy = action
+            raise ValueError(msg) from None
 
         done = False
         reward = 0
         current_state = self._agent.current_state
+        chosen_action = action
+
+        kernel = self._state_kernels.get(current_state,
+                                         self._area_kernels.get(current_state[0]))
+        if kernel is not None:
+            cdf = np.cumsum(kernel[action_idx])
+            executed = np.searchsorted(cdf, np.random.uniform(), side='right')
+            action = self._actions[min(executed, len(self._actions) - 1)]
+        dx, dy = action
+
         next_state = (current_state[0], current_state[1] + dx, current_state[2] + dy)
         if not self._world.has_node(next_state):
             if next_state in self._path_alias.keys():
@@ -1202,11 +2115,11 @@ class GridWorld:
             else:
                 next_state = current_state
 
-        if nx.get_node_attributes(self._world, 'blocked')[next_state]:
+        if self._world.nodes[next_state]['blocked']:
             next_state = current_state
 
-        altitude = nx.get_node_attributes(self._world, 'altitude')
-        reward += altitude[current_state] - altitude[next_state]
+        reward += self._world.nodes[current_state]['altitude'] - \
+            self._world.nodes[next_state]['altitude']
 
         for obj in self._objects:
             if obj.coord == next_state:
@@ -1214,11 +2127,16 @@ class GridWorld:
                 done = True
                 break
 
+        for counter in self._counters:
+            counter.record(current_state, chosen_action, next_state)
+
         self._time += 1
         if done:
+            self._num_trial += 1
             self._agent.reset()
         else:
             self._agent.update(current_state=next_state)
+        self._apply_events()
 
         return next_state, reward, done
 
@@ -1240,6 +2158,10 @@ class GridWorld:
         True
         """
         if not self._has_reset_checkpoint or overwrite:
+            # The checkpoint copies the graph, replacing the previous copy.
+            previous = len(self._reset_state["world"]) if self._has_reset_checkpoint else 0
+            self._check_memory("set_reset_checkpoint",
+                               num_states=len(self._world) - previous)
             for key in self._reset_state.keys():
                 self._reset_state[key] = copy.deepcopy(getattr(self, '_' + key))
                 self._has_reset_checkpoint = True
@@ -1269,12 +2191,17 @@ class GridWorld:
 
         for key, value in self._reset_state.items():
             setattr(self, '_' + key, copy.deepcopy(value))
+        self._connectivity.dirty = True
+        self._area_graph.rebuild(self)
+        self._modified()
 
     def __repr__(self):
         msg = "GridWorld:\n"
         msg += "".join(["=" for _ in range(10)])
         msg += "\n"
         msg += "time: {}\n".format(self.time)
+        if len(self._events) > 0:
+            msg += "scheduled events: {}\n".format(len(self._events))
 
         msg += "areas: \n"
         for i in range(self._num_area + 1):
@@ -1289,18 +2216,9 @@ class GridWorld:
             msg += "inter-area connections: None\n"
         else:
             msg += "inter-area connections:\n"
-            for u, v in self.world.edges():
-                if u[0] == v[0]:
-                    continue
-                else:
-                    for a in self.actions:
-                        dx, dy = a
-                        alias = tuple([u[0]] + [u[1] + dx] + [u[2] + dy])
-                        try:
-                            if self._path_alias[alias] == v:
-                                msg += "\t{} + {} -> {}\n".format(u, a, v)
-                        except KeyError:
-                            continue
+            for u, v in sorted(tuple(sorted(e)) for e in self._area_graph.graph.edges()):
+                for coord_from, a, coord_to in self._area_graph.doorways(u, v):
+                    msg += "\t{} + {} -> {}\n".format(coord_from, a, coord_to)
 
         if len(self._objects) == 0:
             msg += "objects: None\n"
@@ -1315,3 +2233,47 @@ class GridWorld:
         msg += "".join(["=" for _ in range(10)])
 
         return msg
+
+
+def _graph_bytes_per_state():
+    # Measured on a grid area, with its edges and node attributes.
+    global _bytes_per_state
+    if _bytes_per_state is None:
+        W = GridWorld((32, 32))
+        _bytes_per_state = _deep_sizeof(W._world, set()) / len(W._world)
+    return _bytes_per_state
+
+
+def _compiled_bytes(num_states, num_actions):
+    # Per-state arrays of CompiledWorld: coords, next_state, move_reward,
+    # altitude, blocked, object_index and kernel_index.
+    return num_states * (24 + 16 * num_actions + 8 + 1 + 8 + 8)
+
+
+def _check_actions(actions):
+    # Validate an action space, given by name or as a sequence of moves.
+    if actions is None:
+        return _ACTION_SETS["von_neumann"]
+    if isinstance(actions, str):
+        if actions not in _ACTION_SETS:
+            msg = "Unrecognized action space '{}', expected one of {} " \
+                  "or a sequence of actions".format(actions, list(_ACTION_SETS))
+            raise ValueError(msg)
+        return _ACTION_SETS[actions]
+
+    try:
+        checked = tuple((int(dx), int(dy)) for dx, dy in actions)
+    except (TypeError, ValueError):
+        msg = "Sequence of actions (dx, dy) expected, got {}".format(actions)
+        raise TypeError(msg) from None
+    if len(checked) == 0:
+        raise ValueError("Empty action space")
+    if len(set(checked)) != len(checked):
+        msg = "Duplicate actions in action space {}".format(checked)
+        raise ValueError(msg)
+    for dx, dy in checked:
+        if (-dx, -dy) not in checked:
+            msg = "Reverse action {} of action {} not found in action space".format(
+                (-dx, -dy), (dx, dy))
+            raise ValueError(msg)
+    return checked
@@ -0,0 +1,309 @@
+"""Gridworld environment with multiple agents."""
+
+import numpy as np
+
+import neugym as ng
+from ._agent import _AgentGroup
+from .gridworld import GridWorld
+
+__all__ = [
+    "MultiAgentGridWorld"
+]
+
+_COLLISIONS = ("block", "swap", "share")
+
+
+class MultiAgentGridWorld(GridWorld):
+    r"""Gridworld environment with multiple agents moving simultaneously.
+
+    ``MultiAgentGridWorld`` has the same world, objects, and dynamics as
+    ``GridWorld``, but holds ``K`` agents, each with its own initial state.
+    At each step all agents act at the same time and the movements are
+    resolved together with vectorized array operations according to the
+    ``collision`` rule:
+
+    - ``"block"``: each state can hold only one agent. An agent trying to
+      enter a state that stays occupied, or to swap its position with
+      another agent, stays in its current state. When several agents try
+      to enter the same free state, one of them chosen at random gets in.
+    - ``"swap"``: agents can share states, but two agents can not pass
+      through each other (swap their positions).
+    - ``"share"``: agents move independently.
+
+    Each agent collects the object rewards on its own and ends its own trial,
+    i.e. only the agent reaching an object is sent back to its initial state.
+    If ``consume_objects`` is True, each object can be collected only once
+    by each agent until the environment is reset.
+
+    Parameters
+    ----------
+    origin_shape : tuple of ints (optional, default: None)
+        Shape of the world origin, see ``GridWorld``.
+
+    collision : str {"block", "swap", "share"} (default: "block")
+        Collision rule between agents.
+
+    consume_objects : bool (default: False)
+        Whether objects are consumed by each agent once collected.
+
+    rng : int or numpy.random.Generator (optional, default: None)
+        Random number generator or seed for the environment dynamics.
+
+    actions : str or sequence of tuples of ints (optional, default: None)
+        Action space of the environment, see ``GridWorld``.
+
+    Examples
+    --------
+    >>> W = MultiAgentGridWorld((3, 3), collision="block")
+    >>> W.add_object((0, 2, 2), reward=1, prob=1)
+    >>> W.init_agents([(0, 0, 0), (0, 0, 1), (0, 1, 0)])
+    >>> next_states, rewards, dones = W.step([(1, 0), (0, 1), (0, 0)])
+    """
+
+    def __init__(self, origin_shape=None, collision="block", consume_objects=False, rng=None,
+                 actions=None):
+        if collision not in _COLLISIONS:
+            msg = "Invalid collision rule '{}', should be one of {}".format(
+                collision, list(_COLLISIONS))
+            raise ValueError(msg)
+
+        super().__init__(origin_shape, actions=actions)
+        self._collision = collision
+        self._consume_objects = consume_objects
+        self._rng = np.random.default_rng(rng)
+        self._agents = None
+        self._reset_state["agents"] = None
+
+    def init_agents(self, init_coords, overwrite=False):
+        """Initialize all the agents in the world.
+
+        Parameters
+        ----------
+        init_coords : list of tuples of ints
+            Coordinates of the agent initial states, one per agent.
+
+        overwrite : bool (default: False)
+            Whether to overwrite the existing agents.
+
+        Examples
+        --------
+        >>> W = MultiAgentGridWorld((2, 2))
+        >>> W.init_agents([(0, 0, 0), (0, 1, 1)])
+        """
+        if self._agents is not None and not overwrite:
+            raise ng.NeuGymOverwriteError("Agents already exist, "
+                                          "set 'overwrite=True' to overwrite")
+
+        compiled = self.compile()
+        init_coords = np.array(init_coords, dtype=np.int64).reshape(-1, 3)
+        try:
+            init_states = compiled.state_indices(init_coords)
+        except ValueError as e:
+            msg = "Initial state {}".format(str(e)[0].lower() + str(e)[1:])
+            raise ValueError(msg) from None
+        if np.any(compiled.blocked[init_states]):
+            coord = init_coords[compiled.blocked[init_states]][0]
+            msg = "Unable to initialize an agent at a blocked state '{}'".format(tuple(coord))
+            raise RuntimeError(msg)
+        if self._collision == "block" and len(np.unique(init_states)) != len(init_states):
+            msg = "Agents should be initialized at different states " \
+                  "with 'block' collision rule"
+            raise RuntimeError(msg)
+
+        self._agents = _AgentGroup(init_coords, len(self._objects))
+
+    def init_agent(self, init_coord=None, overwrite=False):
+        """Not supported, use ``MultiAgentGridWorld.init_agents()`` instead."""
+        raise ng.NeuGymPermissionError("Use 'init_agents()' to initialize agents "
+                                       "of a multi-agent gridworld")
+
+    def get_agent_state(self, when="current"):
+        """Not supported, use ``MultiAgentGridWorld.get_agent_states()`` instead."""
+        raise ng.NeuGymPermissionError("Use 'get_agent_states()' to get agent states "
+                                       "of a multi-agent gridworld")
+
+    def get_agent_states(self, when="current"):
+        """Get states of all the agents.
+
+        Parameters
+        ----------
+        when : str {"current", "init"} (default: "current")
+            Choose to get the initial ("init") or current ("current") states of the agents.
+
+        Returns
+        -------
+        agent_states : numpy.ndarray of shape (K, 3)
+            Coordinates of the states where the agents stay.
+
+        Examples
+        --------
+        >>> W = MultiAgentGridWorld((2, 2))
+        >>> W.init_agents([(0, 0, 0), (0, 1, 1)])
+        >>> W.get_agent_states()
+        array([[0, 0, 0],
+               [0, 1, 1]])
+        """
+        if when == "current":
+            return self._agents.current_states.copy()
+        elif when == "init":
+            return self._agents.init_states.copy()
+        else:
+            msg = "Unrecognized parameter '{}', 'current' or 'init' expected".format(when)
+            raise ValueError(msg)
+
+    @property
+    def num_agents(self):
+        """Number of agents in the world.
+
+        Returns
+        -------
+        num_agents : int
+            Number of agents, 0 if agents are not initialized.
+        """
+        return 0 if self._agents is None else self._agents.num_agents
+
+    @property
+    def collision(self):
+        """Collision rule between agents.
+
+        Returns
+        -------
+        collision : str
+            One of "block", "swap", "share".
+        """
+        return self._collision
+
+    def block(self, coord):
+        if self._agents is not None:
+            if np.any(np.all(self._agents.current_states == np.array(coord), axis=1)):
+                msg = "Unable to block state '{}', where an agent is currently in".format(coord)
+                raise RuntimeError(msg)
+        super().block(coord)
+
+    block.__doc__ = GridWorld.block.__doc__
+
+    def step(self, actions):
+        """Make all the agents move at the same time.
+
+        Parameters
+        ----------
+        actions : array_like of shape (K,) or (K, 2)
+            Action index, or action ``(dx, dy)``, of each agent.
+
+        Returns
+        -------
+        next_states : numpy.ndarray of shape (K, 3)
+            Next state of each agent after movement (before agents ending
+            their trials are sent back to their initial states).
+
+        rewards : numpy.ndarray of shape (K,)
+            Reward that each agent gets through this movement.
+
+        dones : numpy.ndarray of shape (K,)
+            Whether the trial of each agent ends.
+
+        Examples
+        --------
+        >>> W = MultiAgentGridWorld((1, 3), collision="block")
+        >>> W.init_agents([(0, 0, 0), (0, 0, 2)])
+        >>> next_states, rewards, dones = W.step([(0, 1), (0, -1)])
+        """
+        if self._agents is None:
+            raise RuntimeError("Agents not initialized, use 'init_agents()' first")
+
+        compiled = self.compile()
+        agents = self._agents
+        num_agents = agents.num_agents
+        actions = compiled.action_indices(actions)
+        if actions.shape != (num_agents,):
+            msg = "One action per agent expected, got {} for {} agents".format(
+                len(actions), num_agents)
+            raise ValueError(msg)
+
+        if agents.consumed.shape[1] != len(self._objects):
+            agents.consumed = np.zeros((num_agents, len(self._objects)), dtype=bool)
+
+        current = compiled.state_indices(agents.current_states)
+        chosen_actions = actions
+        u = self._rng.random((3, num_agents))
+        if compiled.stochastic:
+            actions = compiled._sample(current, actions, u[0])
+        proposed = compiled.next_state[current, actions]
+        next_states = _resolve_collisions(current, proposed, self._collision,
+                                          u[1], compiled.num_states)
+        rewards = compiled.altitude[current] - compiled.altitude[next_states]
+
+        obj = compiled.object_index[next_states]
+        dones = obj >= 0
+        if self._consume_objects:
+            dones[dones] = ~agents.consumed[np.flatnonzero(dones), obj[dones]]
+        idx = np.flatnonzero(dones)
+        obj = obj[idx]
+        rewards[idx] += np.where(u[2][idx] < compiled.object_prob[obj],
+                                 compiled.object_reward[obj],
+                                 compiled.object_punish[obj])
+        if self._consume_objects:
+            agents.consumed[idx, obj] = True
+
+        for counter in self._counters:
+            counter.update(current, chosen_actions, next_states)
+
+        self._time += 1
+        self._num_trial += int(dones.sum())
+        next_coords = compiled.coords[next_states]
+        agents.current_states = np.where(dones[:, None], agents.init_states, next_coords)
+        self._apply_events()
+        return next_coords, rewards, dones
+
+    def __repr__(self):
+        msg = super().__repr__()
+        return msg.replace("agent: None\n", "agents: {}\ncollision: {}\n".format(
+            str(self._agents), self._collision))
+
+
+def _resolve_collisions(current, proposed, collision, priority, num_states):
+    """Resolve simultaneous movements of agents.
+
+    Parameters
+    ----------
+    current, proposed : numpy.ndarray of ints
+        Current and proposed next state ids of the agents.
+
+    collision : str {"block", "swap", "share"}
+        Collision rule between agents.
+
+    priority : numpy.ndarray of floats
+        Agents with lower priority value win contested states.
+
+    num_states : int
+        Number of states in the world.
+
+    Returns
+    -------
+    next_states : numpy.ndarray of ints
+        Resolved next state ids.
+    """
+    moving = proposed != current
+    if collision == "share" or not moving.any():
+        return proposed
+
+    edges = current * num_states + proposed
+    while True:
+        # Two agents passing through each other.
+        blocked = moving & np.isin(proposed * num_states + current, edges[moving])
+
+        if collision == "block":
+            # Entering a state held by an agent that does not move.
+            blocked |= moving & np.isin(proposed, current[~moving])
+
+            # Contested states, the agent with the lowest priority value wins.
+            idx = np.flatnonzero(moving & ~blocked)
+            idx = idx[np.lexsort((priority[idx], proposed[idx]))]
+            target = proposed[idx]
+            blocked[idx[1:][target[1:] == target[:-1]]] = True
+
+        if not blocked.any():
+            break
+        moving &= ~blocked
+
+    return np.where(moving, proposed, current)
@@ -0,0 +1,409 @@
+"""Declarative specification of gridworld environments."""
+
+import json
+import os
+
+import numpy as np
+
+import neugym as ng
+from .compiled import CompiledWorld
+from .gridworld import GridWorld
+
+__all__ = [
+    "from_spec",
+    "to_spec",
+    "read_spec",
+    "write_spec"
+]
+
+SPEC_VERSION = 1
+
+
+def from_spec(spec):
+    """Build a gridworld environment from a declarative specification.
+
+    All the areas, with their altitudes and blocked states, are built in one
+    bulk pass instead of one ``GridWorld`` method call per area or block.
+    Paths and objects are then added with ``GridWorld.add_path()`` and
+    ``GridWorld.add_object()``, so that specifications follow the same
+    rules as the methods. The specification is a dict (e.g. loaded from JSON or
+    TOML) of the form
+
+    .. code-block:: python
+
+        {
+            "version": 1,
+            "actions": [[0, 0], [1, 0], [-1, 0], [0, 1], [0, -1]],
+            "areas": [
+                {"shape": [3, 3], "name": "origin"},
+                {"shape": [2, 4], "name": "room",
+                 "altitude": [[0, 0, 1, 1], [0, 0, 1, 2]],
+                 "blocked": [[1, 1]]}
+            ],
+            "paths": [{"from": [0, 2, 2], "to": [1, 0, 0], "action": [1, 0]}],
+            "objects": [{"coord": [1, 1, 3], "reward": 1, "prob": 0.8, "punish": 0}],
+            "kernels": [{"area": 1, "kernel": [[...]]}, {"coord": [0, 1, 1], "kernel": [[...]]}],
+            "agent": [0, 0, 0]
+        }
+
+    where area ``0`` is the origin. Only ``"areas"`` is required. Area
+    ``"altitude"`` is a scalar or an array of the area shape, and area
+    ``"blocked"`` is either a boolean mask of the area shape or a list of
+    ``[x, y]`` positions. Path ``"action"`` is the registered action (see
+    ``GridWorld.add_path()``), the first free action if not given. The
+    action space ``"actions"`` is a list of moves or the name of an action
+    space (see ``GridWorld``), the default one if not given.
+
+    Parameters
+    ----------
+    spec : dict
+        Specification of the environment.
+
+    Returns
+    -------
+    env : GridWorld
+        Gridworld environment.
+
+    Raises
+    ------
+    ValueError
+        If the specification is invalid, with the location of the error.
+
+    See Also
+    --------
+    to_spec : Inverse of ``from_spec()``.
+    read_spec : Build a gridworld environment from a JSON or TOML file.
+
+    Examples
+    --------
+    >>> spec = {
+    ...     "areas": [{"shape": [1, 1]}, {"shape": [2, 2], "name": "room", "blocked": [[1, 1]]}],
+    ...     "paths": [{"from": [0, 0, 0], "to": [1, 0, 0]}],
+    ...     "objects": [{"coord": [1, 0, 1], "reward": 1, "prob": 1}]
+    ... }
+    >>> W = from_spec(spec)
+    >>> W.num_area
+    1
+    """
+    if not isinstance(spec, dict):
+        msg = "Specification of type dict expected, got '{}'".format(type(spec))
+        raise TypeError(msg)
+    version = spec.get("version", SPEC_VERSION)
+    if version != SPEC_VERSION:
+        msg = "Unsupported specification version {}, expected {}".format(version, SPEC_VERSION)
+        raise ValueError(msg)
+
+    try:
+        env = GridWorld(actions=spec.get("actions"))
+    except (TypeError, ValueError) as e:
+        msg = "actions: {}".format(e)
+        raise ValueError(msg) from None
+
+    areas = _validate_areas(spec.get("areas"))
+    shapes = [area[0] for area in areas]
+
+    def check_coord(coord, where):
+        try:
+            a, x, y = (int(i) for i in coord)
+        except (TypeError, ValueError):
+            msg = "{}: coordinate [area, x, y] expected, got {}".format(where, coord)
+            raise ValueError(msg) from None
+        if not (0 <= a < len(shapes) and 0 <= x < shapes[a][0] and 0 <= y < shapes[a][1]):
+            msg = "{}: coordinate {} out of world".format(where, (a, x, y))
+            raise ValueError(msg)
+        return a, x, y
+
+    # Build all the states and within-area connections at once.
+    env._install_areas(areas)
+
+    # Inter-area paths and objects, with the checks of the GridWorld methods.
+    for k, path in enumerate(spec.get("paths", [])):
+        where = "paths[{}]".format(k)
+        coord_from = check_coord(path.get("from"), where + ".from")
+        coord_to = check_coord(path.get("to"), where + ".to")
+        action = path.get("action")
+        try:
+            if action is not None:
+                action = tuple(int(i) for i in action)
+            env.add_path(coord_from, coord_to, register_action=action)
+        except (TypeError, ValueError, ng.NeuGymException) as e:
+            msg = "{}: {}".format(where, e)
+            raise ValueError(msg) from None
+
+    occupied = set()
+    for k, obj in enumerate(spec.get("objects", [])):
+        where = "objects[{}]".format(k)
+        coord = check_coord(obj.get("coord"), where + ".coord")
+        if coord in occupied:
+            msg = "{}: state {} already has an object".format(where, coord)
+            raise ValueError(msg)
+        occupied.add(coord)
+        try:
+            env.add_object(coord, obj["reward"], obj["prob"], obj.get("punish", 0))
+        except KeyError as e:
+            msg = "{}: missing key {}".format(where, e)
+            raise ValueError(msg) from None
+
+    # Transition kernels.
+    kernels = []
+    for k, entry in enumerate(spec.get("kernels", [])):
+        where = "kernels[{}]".format(k)
+        if "area" in entry:
+            key = int(entry["area"])
+            if not 0 <= key < len(shapes):
+                msg = "{}: area {} not found".format(where, key)
+                raise ValueError(msg)
+        else:
+            key = check_coord(entry.get("coord"), where + ".coord")
+        kernels.append((where, key, np.asarray(entry.get("kernel"), dtype=float)))
+
+    agent = None
+    if "agent" in spec:
+        agent = check_coord(spec["agent"], "agent")
+        if env.world.nodes[agent]["blocked"]:
+            msg = "agent: initial state {} is blocked".format(agent)
+            raise ValueError(msg)
+
+    for where, key, kernel in kernels:
+        try:
+            env.set_transition_kernel(key, kernel)
+        except (TypeError, ValueError) as e:
+            msg = "{}: {}".format(where, e)
+            raise ValueError(msg) from None
+    if agent is not None:
+        env.init_agent(agent)
+    return env
+
+
+def _validate_areas(areas):
+    if not isinstance(areas, list) or len(areas) == 0:
+        raise ValueError("areas: non-empty list of areas expected")
+
+    validated = []
+    names = set()
+    for a, area in enumerate(areas):
+        where = "areas[{}]".format(a)
+        name = area.get("name", "origin" if a == 0 else None)
+        if name is not None:
+            if name in names:
+                msg = "{}.name: name '{}' already exists".format(where, name)
+                raise ValueError(msg)
+            names.add(name)
+        try:
+            m, n = (int(i) for i in area["shape"])
+        except (KeyError, TypeError, ValueError):
+            msg = "{}.shape: [m, n] expected".format(where)
+            raise ValueError(msg) from None
+        if m < 1 or n < 1:
+            msg = "{}.shape: positive shape expected, got {}".format(where, (m, n))
+            raise ValueError(msg)
+
+        altitude = np.asarray(area.get("altitude", 0), dtype=float)
+        if altitude.ndim == 0:
+            altitude = np.full((m, n), float(altitude))
+        elif altitude.shape != (m, n):
+            msg = "{}.altitude: shape {} expected, got {}".format(where, (m, n), altitude.shape)
+            raise ValueError(msg)
+
+        # Boolean mask of the area shape, or list of integer [x, y] positions.
+        blocked = np.asarray(area.get("blocked", np.zeros((m, n), dtype=bool)))
+        if blocked.size == 0:
+            blocked = np.zeros((m, n), dtype=bool)
+        elif blocked.dtype.kind in "iu" and blocked.ndim == 2 and blocked.shape[1] == 2:
+            if np.any((blocked < 0) | (blocked >= (m, n))):
+                msg = "{}.blocked: positions out of area of shape {}".format(where, (m, n))
+                raise ValueError(msg)
+            positions = blocked
+            blocked = np.zeros((m, n), dtype=bool)
+            blocked[positions[:, 0], positions[:, 1]] = True
+        elif blocked.shape == (m, n) and blocked.dtype.kind in "biu":
+            blocked = blocked.astype(bool)
+        else:
+            msg = "{}.blocked: boolean mask of shape {} or list of [x, y] " \
+                  "expected".format(where, (m, n))
+            raise ValueError(msg)
+
+        validated.append(((m, n), name, altitude, blocked))
+    return validated
+
+
+def to_spec(env):
+    """Describe a gridworld environment with a declarative specification.
+
+    Parameters
+    ----------
+    env : GridWorld or CompiledWorld
+        Gridworld environment, or its array representation (e.g. generated
+        by ``perfect_maze()``), which has no area names nor agent and
+        whose transition kernels are listed per state.
+
+    Returns
+    -------
+    spec : dict
+        JSON serializable specification of the world, see ``from_spec()``.
+        Blocked states are listed as ``[x, y]`` positions, and altitudes
+        are omitted for flat areas.
+
+    Examples
+    --------
+    >>> W = GridWorld((2, 2))
+    >>> W.add_object((0, 1, 1), reward=1, prob=1)
+    >>> spec = to_spec(W)
+    >>> from_spec(spec).fingerprint() == W.fingerprint()
+    True
+    """
+    if isinstance(env, CompiledWorld):
+        return _compiled_to_spec(env)
+
+    compiled = env.compile()
+    names = {a: name for name, a in env._area_alias.items()}
+    areas = []
+    for a in range(env._num_area + 1):
+        area = {"shape": [int(i) for i in compiled.area_shapes[a]]}
+        if a in names:
+            area["name"] = names[a]
+        altitude = compiled.reshape_area(compiled.altitude, a)
+        if np.any(altitude != 0):
+            area["altitude"] = altitude.tolist()
+        blocked = np.argwhere(compiled.reshape_area(compiled.blocked, a))
+        if len(blocked) > 0:
+            area["blocked"] = blocked.tolist()
+        areas.append(area)
+
+    paths = []
+    for _, _, doorways in env._area_graph.graph.edges(data="doorways"):
+        for (coord_from, coord_to), action in doorways.items():
+            paths.append({"from": list(coord_from), "to": list(coord_to), "action": list(action)})
+    paths.sort(key=lambda p: (p["from"], p["to"]))
+
+    spec = {
+        "version": SPEC_VERSION,
+        "actions": [list(action) for action in env._actions],
+        "areas": areas,
+        "paths": paths,
+        "objects": [{"coord": list(obj.coord), "reward": obj.reward,
+                     "prob": obj.prob, "punish": obj.punish} for obj in env._objects]
+    }
+
+    kernels = [{"area": a, "kernel": np.asarray(k).tolist()}
+               for a, k in sorted(env._area_kernels.items())]
+    kernels += [{"coord": list(c), "kernel": np.asarray(k).tolist()}
+                for c, k in sorted(env._state_kernels.items())]
+    if kernels:
+        spec["kernels"] = kernels
+    if env._agent is not None:
+        spec["agent"] = list(env._agent.init_state)
+    return spec
+
+
+def _compiled_to_spec(compiled):
+    areas = []
+    for a in range(len(compiled.area_shapes)):
+        area = {"shape": [int(i) for i in compiled.area_shapes[a]]}
+        altitude = compiled.reshape_area(compiled.altitude, a)
+        if np.any(altitude != 0):
+            area["altitude"] = altitude.tolist()
+        blocked = np.argwhere(compiled.reshape_area(compiled.blocked, a))
+        if len(blocked) > 0:
+            area["blocked"] = blocked.tolist()
+        areas.append(area)
+
+    # Inter-area moves which the reverse action undoes, i.e. the registered
+    # paths and not other moves into their doorways (e.g. diagonal moves),
+    # each path being listed once in its forward direction.
+    coords = compiled.coords
+    reverse = [compiled.action_index((-dx, -dy)) for dx, dy in compiled.actions]
+    source, action = np.nonzero(coords[compiled.next_state, 0] != coords[:, None, 0])
+    paths = []
+    for s, a in zip(source.tolist(), action.tolist()):
+        coord_from = coords[s].tolist()
+        coord_to = coords[compiled.next_state[s, a]].tolist()
+        if coord_from < coord_to and \
+                compiled.next_state[compiled.next_state[s, a], reverse[a]] == s:
+            paths.append({"from": coord_from, "to": coord_to,
+                          "action": list(compiled.actions[a])})
+    paths.sort(key=lambda p: (p["from"], p["to"]))
+
+    objects = [None] * len(compiled.object_reward)
+    for s in np.flatnonzero(compiled.terminal):
+        i = compiled.object_index[s]
+        objects[i] = {"coord": coords[s].tolist(), "reward": float(compiled.object_reward[i]),
+                      "prob": float(compiled.object_prob[i]),
+                      "punish": float(compiled.object_punish[i])}
+
+    spec = {
+        "version": SPEC_VERSION,
+        "actions": [list(action) for action in compiled.actions],
+        "areas": areas,
+        "paths": paths,
+        "objects": [obj for obj in objects if obj is not None]
+    }
+    kernels = [{"coord": coords[s].tolist(), "kernel": compiled.kernels[k].tolist()}
+               for s, k in enumerate(compiled.kernel_index.tolist()) if k > 0]
+    if kernels:
+        spec["kernels"] = kernels
+    return spec
+
+
+def read_spec(filename):
+    """Build a gridworld environment from a JSON or TOML specification file.
+
+    .. note::
+        Reading TOML files requires Python 3.11+ (``tomllib``) or the
+        ``tomli`` package.
+
+    Parameters
+    ----------
+    filename : str
+        File to read, in TOML format if its extension is ``.toml``,
+        in JSON format otherwise.
+
+    Returns
+    -------
+    env : GridWorld
+        Gridworld environment, see ``from_spec()``.
+    """
+    if os.path.splitext(filename)[1].lower() == ".toml":
+        try:
+            import tomllib
+        except ImportError:
+            try:
+                import tomli as tomllib
+            except ImportError:
+                msg = "Reading TOML files requires Python 3.11+ or the 'tomli' package"
+                raise ImportError(msg) from None
+        with open(filename, "rb") as f:
+            spec = tomllib.load(f)
+    else:
+        with open(filename) as f:
+            spec = json.load(f)
+    return from_spec(spec)
+
+
+def write_spec(env, filename):
+    """Write the specification of a gridworld environment to a JSON or TOML file.
+
+    .. note::
+        Writing TOML files requires the ``tomli_w`` package.
+
+    Parameters
+    ----------
+    env : GridWorld
+        Gridworld environment.
+
+    filename : str
+        File to write, in TOML format if its extension is ``.toml``,
+        in JSON format otherwise.
+    """
+    spec = to_spec(env)
+    if os.path.splitext(filename)[1].lower() == ".toml":
+        try:
+            import tomli_w
+        except ImportError:
+            msg = "Writing TOML files requires the 'tomli_w' package"
+            raise ImportError(msg) from None
+        with open(filename, "wb") as f:
+            tomli_w.dump(spec, f)
+    else:
+        with open(filename, "w") as f:
+            json.dump(spec, f)
@@ -0,0 +1,336 @@
+"""Mapping of continuous tracking coordinates onto gridworld states."""
+
+import itertools
+import os
+
+import numpy as np
+
+__all__ = [
+    "TrackingMap"
+]
+
+# Default number of positions read per chunk when streaming.
+_CHUNK_SIZE = 1000000
+
+
+class TrackingMap:
+    r"""Calibrated mapping of tracked positions to gridworld states.
+
+    Each area of the world is calibrated with an affine transform from the
+    tracking coordinates (e.g. centimetres in the video frame) to the area
+    frame, and with bin edges along each axis of the area frame: a position
+    is in state ``(area, x, y)`` when its transformed coordinates ``(p, q)``
+    fall between ``x_edges[x]`` and ``x_edges[x + 1]``, and between
+    ``y_edges[y]`` and ``y_edges[y + 1]``.
+
+    Positions outside of every calibrated area, but in the row or column of
+    bins just beyond the border of an area where an inter-area path is
+    registered (see ``GridWorld.add_path()``), are doorways: they are mapped
+    to the state at the other end of the path. Other positions are not
+    mapped, and get state id ``-1``.
+
+    Actions are inferred from consecutive states, as the action moving from
+    one state to the next (staying is preferred when the state does not
+    change), ``-1`` if no action does.
+
+    Parameters
+    ----------
+    env : GridWorld or CompiledWorld
+        Gridworld environment.
+
+    Attributes
+    ----------
+    compiled : CompiledWorld
+        Array representation of the environment, see ``CompiledWorld`` for
+        state ids and action indices.
+
+    Examples
+    --------
+    >>> W = GridWorld((4, 6))
+    >>> tracking = TrackingMap(W)
+    >>> # Cells of 10 cm, the arena corner at (20 cm, 35 cm) in the video frame.
+    >>> tracking.set_area(0, x_edges=20 + 10 * np.arange(5), y_edges=35 + 10 * np.arange(7))
+    >>> states, actions, frames = tracking.convert(positions)
+    >>> for states, actions, frames in tracking.stream("session.csv", collapse=True):
+    ...     pass
+    """
+
+    def __init__(self, env):
+        self.compiled = env.compile() if hasattr(env, "compile") else env
+        self._env = env
+        self._areas = {}
+
+        compiled = self.compiled
+        self._pad_shape = compiled.area_shapes.max(axis=0) + 2
+
+        # Doorway cells (area, x, y), beyond the border of an area, and the
+        # states at the other end of their paths.
+        path_alias = getattr(env, "_path_alias", None)
+        if path_alias is not None:
+            cells = np.array(list(path_alias.keys()), dtype=np.int64).reshape(-1, 3)
+            targets = compiled.state_indices(
+                np.array(list(path_alias.values()), dtype=np.int64).reshape(-1, 3))
+        else:
+            coords = compiled.coords
+            moves = np.array(compiled.actions, dtype=np.int64)
+            source, action = np.nonzero(coords[compiled.next_state, 0] != coords[:, None, 0])
+            cells = coords[source] + np.insert(moves[action], 0, 0, axis=1)
+            targets = compiled.next_state[source, action]
+        keys = self._cell_keys(cells[:, 0], cells[:, 1], cells[:, 2])
+        self._door_keys, first = np.unique(keys, return_index=True)
+        self._door_targets = np.asarray(targets, dtype=np.int64)[first]
+
+        actions = list(compiled.actions)
+        self._stay = actions.index((0, 0)) if (0, 0) in actions else None
+
+    def _cell_keys(self, area, x, y):
+        m, n = self._pad_shape
+        return (area * m + x + 1) * n + y + 1
+
+    def set_area(self, area, x_edges=None, y_edges=None, transform=None):
+        """Calibrate the mapping of an area.
+
+        Parameters
+        ----------
+        area : int or str
+            Index of the area, or its name with a ``GridWorld``.
+
+        x_edges : array_like of shape (m + 1,) (optional, default: None)
+            Increasing bin edges of the rows of the area, in the area frame,
+            ``0, 1, ..., m`` if not provided.
+
+        y_edges : array_like of shape (n + 1,) (optional, default: None)
+            Increasing bin edges of the columns of the area, in the area
+            frame, ``0, 1, ..., n`` if not provided.
+
+        transform : array_like of shape (2, 3) (optional, default: None)
+            Affine transform ``[A | b]`` from tracking coordinates ``u`` to
+            the area frame ``A @ u + b``, the identity if not provided.
+        """
+        if hasattr(self._env, "_area_index"):
+            area_idx = self._env._area_index(area)
+        else:
+            area_idx = area
+            if not isinstance(area, (int, np.integer)) or \
+                    area < 0 or area >= len(self.compiled.area_shapes):
+                msg = "Area {} not found".format(area)
+                raise ValueError(msg)
+        m, n = self.compiled.area_shapes[area_idx]
+
+        edges = []
+        for name, values, size in (("x_edges", x_edges, m), ("y_edges", y_edges, n)):
+            values = np.arange(size + 1, dtype=float) if values is None \
+                else np.asarray(values, dtype=float)
+            if values.shape != (size + 1,):
+                msg = "'{}' of shape ({},) expected for area {}, got {}".format(
+                    name, size + 1, area_idx, values.shape)
+                raise ValueError(msg)
+            if np.any(np.diff(values) <= 0):
+                msg = "'{}' should be increasing".format(name)
+                raise ValueError(msg)
+            # Extra bins beyond the border, for doorways.
+            edges.append(np.concatenate([[2 * values[0] - values[1]], values,
+                                         [2 * values[-1] - values[-2]]]))
+
+        transform = np.array([[1, 0, 0], [0, 1, 0]], dtype=float) if transform is None \
+            else np.asarray(transform, dtype=float)
+        if transform.shape != (2, 3):
+            msg = "Affine transform of shape (2, 3) expected, got {}".format(transform.shape)
+            raise ValueError(msg)
+        self._areas[int(area_idx)] = (transform, edges[0], edges[1])
+
+    def state_indices(self, positions):
+        """Map tracked positions to state ids.
+
+        Parameters
+        ----------
+        positions : array_like of shape (N, 2)
+            Tracked positions, NaN for missing positions.
+
+        Returns
+        -------
+        states : numpy.ndarray of shape (N,)
+            State ids, ``-1`` for positions not mapped to any state.
+        """
+        if len(self._areas) == 0:
+            msg = "No area calibrated, see 'TrackingMap.set_area()'"
+            raise RuntimeError(msg)
+        positions = np.asarray(positions, dtype=float)
+        if positions.ndim != 2 or positions.shape[1] != 2:
+            msg = "Positions of shape (N, 2) expected, got {}".format(positions.shape)
+            raise ValueError(msg)
+
+        compiled = self.compiled
+        states = np.full(len(positions), -1, dtype=np.int64)
+        doors = np.full(len(positions), -1, dtype=np.int64)
+        for area_idx, (transform, x_edges, y_edges) in self._areas.items():
+            p = positions @ transform[:, :2].T + transform[:, 2]
+            # Bins -1 and m (n) are beyond the border, NaN falls after the last.
+            x = np.searchsorted(x_edges, p[:, 0], side="right") - 2
+            y = np.searchsorted(y_edges, p[:, 1], side="right") - 2
+            m, n = compiled.area_shapes[area_idx]
+            near = (x >= -1) & (x <= m) & (y >= -1) & (y <= n)
+            inside = near & (x >= 0) & (x < m) & (y >= 0) & (y < n)
+
+            new = inside & (states < 0)
+            states[new] = compiled.area_offsets[area_idx] + x[new] * n + y[new]
+
+            beyond = np.flatnonzero(near & ~inside & (doors < 0))
+            if len(beyond) > 0 and len(self._door_keys) > 0:
+                keys = self._cell_keys(area_idx, x[beyond], y[beyond])
+                pos = np.minimum(np.searchsorted(self._door_keys, keys), len(self._door_keys) - 1)
+                through = self._door_keys[pos] == keys
+                doors[beyond[through]] = self._door_targets[pos[through]]
+        return np.where(states >= 0, states, doors)
+
+    def infer_actions(self, states, next_states):
+        """Infer the actions moving between states.
+
+        Parameters
+        ----------
+        states, next_states : array_like of ints of shape (N,)
+            State ids, ``-1`` for unknown states.
+
+        Returns
+        -------
+        actions : numpy.ndarray of shape (N,)
+            Index of the action moving from each state to the next one,
+            ``-1`` if there is none or a state is unknown.
+        """
+        states = np.asarray(states, dtype=np.int64)
+        next_states = np.asarray(next_states, dtype=np.int64)
+        valid = (states >= 0) & (next_states >= 0)
+        match = self.compiled.next_state[np.maximum(states, 0)] == next_states[:, None]
+        actions = np.where(valid & match.any(axis=1), match.argmax(axis=1), -1)
+        if self._stay is not None:
+            actions[valid & (states == next_states)] = self._stay
+        return actions
+
+    def _chunk(self, states, carry, offset, collapse):
+        # States, actions and frame indices of a chunk, the last frame of
+        # which is carried over to the next chunk to infer its action.
+        frames = offset + np.arange(len(states))
+        if collapse:
+            mapped = states >= 0
+            states, frames = states[mapped], frames[mapped]
+            previous = np.concatenate([[-1 if carry is None else carry[0]], states[:-1]])
+            changed = states != previous
+            states, frames = states[changed], frames[changed]
+        if carry is not None:
+            states = np.concatenate([[carry[0]], states])
+            frames = np.concatenate([[carry[1]], frames])
+        if len(states) == 0:
+            return None, None
+        actions = self.infer_actions(states[:-1], states[1:])
+        return (states[:-1], actions, frames[:-1]), (states[-1], frames[-1])
+
+    def convert(self, positions, collapse=False):
+        """Map tracked positions to states and infer the actions.
+
+        Parameters
+        ----------
+        positions : array_like of shape (N, 2)
+            Tracked positions of consecutive frames.
+
+        collapse : bool (default: False)
+            Whether to keep only the frames where the state changes,
+            unmapped positions being dropped.
+
+        Returns
+        -------
+        states : numpy.ndarray of ints
+            State ids, ``-1`` for positions not mapped to any state.
+
+        actions : numpy.ndarray of ints
+            Index of the action moving to the state of the next (kept)
+            frame, ``-1`` if there is none, and for the last frame.
+
+        frames : numpy.ndarray of ints
+            Indices of the (kept) frames.
+        """
+        return _concatenate(self.stream(np.asarray(positions, dtype=float).reshape(-1, 2),
+                                        collapse=collapse, chunk_size=None))
+
+    def stream(self, source, collapse=False, chunk_size=_CHUNK_SIZE, delimiter=",",
+               usecols=(0, 1), skiprows=0):
+        """Map tracked positions chunk by chunk.
+
+        Chunks are read and converted one at a time, so that recordings
+        larger than memory can be processed. Actions across chunk borders
+        are inferred as with ``TrackingMap.convert()``: the concatenated
+        outputs are the same.
+
+        Parameters
+        ----------
+        source : str, numpy.ndarray or iterable of array_like of shape (N, 2)
+            Tracked positions, as a path to a ``.npy`` file (memory-mapped)
+            or to a delimited text file, an array, or chunks of positions.
+
+        collapse : bool (default: False)
+            Whether to keep only the frames where the state changes, see
+            ``TrackingMap.convert()``.
+
+        chunk_size : int (optional, default: 1000000)
+            Number of positions per chunk read from files and arrays, all
+            at once if None.
+
+        delimiter : str (default: ",")
+            Delimiter of text files.
+
+        usecols : tuple of ints (default: (0, 1))
+            Columns of the positions in text files.
+
+        skiprows : int (default: 0)
+            Number of header lines of text files.
+
+        Yields
+        ------
+        states, actions, frames : numpy.ndarray of ints
+            Outputs of consecutive chunks, see ``TrackingMap.convert()``.
+        """
+        carry = None
+        offset = 0
+        for positions in _read_chunks(source, chunk_size, delimiter, usecols, skiprows):
+            positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+            output, carry = self._chunk(self.state_indices(positions), carry, offset, collapse)
+            offset += len(positions)
+            if output is not None and len(output[0]) > 0:
+                yield output
+        if carry is not None:
+            yield (np.array([carry[0]]), np.array([-1]), np.array([carry[1]]))
+
+    def __repr__(self):
+        return "TrackingMap(num_states={}, calibrated_areas={})".format(
+            self.compiled.num_states, sorted(self._areas))
+
+
+def _read_chunks(source, chunk_size, delimiter, usecols, skiprows):
+    if isinstance(source, (str, os.PathLike)):
+        if str(source).endswith(".npy"):
+            source = np.load(source, mmap_mode="r")
+        else:
+            with open(source) as f:
+                for _ in range(skiprows):
+                    next(f, None)
+                while True:
+                    lines = list(itertools.islice(f, chunk_size or None))
+                    if len(lines) == 0:
+                        return
+                    yield np.loadtxt(lines, delimiter=delimiter, usecols=usecols, ndmin=2)
+                    if chunk_size is None:
+                        return
+
+    if isinstance(source, np.ndarray):
+        step = len(source) if chunk_size is None else chunk_size
+        for start in range(0, len(source), max(step, 1)):
+            yield np.asarray(source[start:start + step])
+    else:
+        for chunk in source:
+            yield chunk
+
+
+def _concatenate(chunks):
+    outputs = list(zip(*chunks))
+    if len(outputs) == 0:
+        return tuple(np.zeros(0, dtype=np.int64) for _ in range(3))
+    return tuple(np.concatenate(output).astype(np.int64) for output in outputs)
@@ -0,0 +1,382 @@
+"""Batched gridworld environment with the vector environment interface."""
+
+import copy
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+__all__ = [
+    "VectorGridWorld"
+]
+
+_OBSERVATIONS = ("index", "coord", "onehot")
+
+
+class VectorGridWorld:
+    r"""Copies of a gridworld environment stepped together.
+
+    ``VectorGridWorld`` follows the common ``reset()`` / ``step()``
+    conventions of vector environments for reinforcement learning. ``N``
+    copies of the same world are stepped together from the lookup tables of
+    its ``CompiledWorld``, with the same dynamics as ``CompiledWorld.step()``.
+
+    A trial is *terminated* when an agent enters a state with an object,
+    and *truncated* when it reaches ``max_steps`` steps without being
+    terminated. Environments are reset automatically in the same step as
+    they end: the returned observation is then the initial state of the
+    next trial, and the last observation of the ended trial is found in
+    ``infos["final_observation"]``, along with the length and the return of
+    the trial in ``infos["episode_length"]`` and ``infos["episode_return"]``
+    (only meaningful where ``terminated | truncated``).
+
+    All outputs are written into arrays allocated once at construction, so
+    that stepping does not allocate any array. The returned arrays are
+    therefore overwritten by the next call to ``step()`` or ``reset()``, and
+    should be copied if kept, unless other arrays are provided with ``out``.
+
+    Large batches can be split into shards of ``shard_size`` environments,
+    stepped in parallel on a pool of ``num_threads`` threads: the array
+    operations of a step release the GIL, so that shards run on separate
+    cores. Each shard draws from its own random stream, spawned from
+    ``rng``, so that outcomes only depend on ``rng`` and ``shard_size``, not
+    on the number of threads.
+
+    Parameters
+    ----------
+    env : GridWorld or CompiledWorld
+        Gridworld environment.
+
+    num_envs : int
+        Number of environment copies ``N``.
+
+    max_steps : int (optional, default: None)
+        Time limit of the trials, no limit if None.
+
+    init_states : array_like of shape (3,) or (N, 3) (optional, default: None)
+        Initial state coordinates of the environments. If not provided, the
+        initial state of the ``env`` agent is used, or ``(0, 0, 0)``.
+
+    observation : str {"index", "coord", "onehot"} (default: "index")
+        Observations, as state ids of shape ``(N,)``, state coordinates of
+        shape ``(N, 3)``, or one-hot vectors of state ids of shape ``(N, S)``.
+
+    rng : int or numpy.random.Generator (optional, default: None)
+        Random number generator or seed.
+
+    shard_size : int (optional, default: None)
+        Number of environments of each shard, no sharding if None.
+
+    num_threads : int (optional, default: None)
+        Number of threads stepping the shards, the number of shards or of
+        CPUs if fewer, if None.
+
+    Examples
+    --------
+    >>> W = GridWorld((5, 5))
+    >>> W.add_object((0, 4, 4), reward=1, prob=1)
+    >>> envs = VectorGridWorld(W, 256, max_steps=50, rng=0)
+    >>> observations, infos = envs.reset()
+    >>> for _ in range(1000):
+    ...     actions = rng.integers(envs.num_actions, size=256)
+    ...     observations, rewards, terminated, truncated, infos = envs.step(actions)
+
+    Step one million environments in shards on 8 threads.
+
+    >>> envs = VectorGridWorld(W, 1000000, rng=0, shard_size=65536, num_threads=8)
+    >>> observations, infos = envs.reset()
+    >>> observations, rewards, terminated, truncated, infos = envs.step(actions)
+    >>> envs.close()
+    """
+
+    def __init__(self, env, num_envs, max_steps=None, init_states=None, observation="index",
+                 rng=None, shard_size=None, num_threads=None):
+        if observation not in _OBSERVATIONS:
+            msg = "Unrecognized observation '{}', expected one of {}".format(
+                observation, list(_OBSERVATIONS))
+            raise ValueError(msg)
+        if num_envs < 1:
+            msg = "Positive 'num_envs' expected, got {}".format(num_envs)
+            raise ValueError(msg)
+        if max_steps is not None and max_steps < 1:
+            msg = "Positive 'max_steps' expected, got {}".format(max_steps)
+            raise ValueError(msg)
+        if shard_size is not None and shard_size < 1:
+            msg = "Positive 'shard_size' expected, got {}".format(shard_size)
+            raise ValueError(msg)
+        if num_threads is not None and num_threads < 1:
+            msg = "Positive 'num_threads' expected, got {}".format(num_threads)
+            raise ValueError(msg)
+
+        compiled = env.compile() if hasattr(env, "compile") else env
+        self.compiled = compiled
+        self.num_envs = int(num_envs)
+        self.max_steps = max_steps
+        self.observation = observation
+        self._rng = np.random.default_rng(rng)
+
+        if init_states is None:
+            agent = getattr(env, "_agent", None)
+            init_states = [(0, 0, 0) if agent is None else agent.init_state]
+        init_states = compiled.state_indices(np.reshape(init_states, (-1, 3)))
+        self.init_states = np.broadcast_to(init_states, (self.num_envs,)).copy()
+
+        # Flattened lookup tables, objects indexed by -1 (no object) get the
+        # last, null entry. Lookups use np.take() in "clip" or "wrap" mode,
+        # which does not buffer its output, with indices known to be valid.
+        num_states, num_actions = compiled.next_state.shape
+        self._next_state = compiled.next_state.ravel()
+        self._move_reward = compiled.move_reward.ravel()
+        self._object_index = compiled.object_index
+        self._object_reward = np.append(compiled.object_reward, 0)
+        self._object_punish = np.append(compiled.object_punish, 0)
+        self._object_prob = np.append(compiled.object_prob, 0)
+        self._kernel_index = compiled.kernel_index * (num_actions * num_actions)
+        self._kernel_cdf = compiled.kernel_cdf.ravel()
+        self._stochastic = compiled.stochastic
+
+        # State of the environments.
+        n = self.num_envs
+        self.states = self.init_states.copy()
+        self.steps = np.zeros(n, dtype=np.int64)
+        self.returns = np.zeros(n)
+
+        # Work and output arrays.
+        self._index = np.empty(n, dtype=np.int64)
+        self._objects = np.empty(n, dtype=np.int64)
+        self._executed = np.empty(n, dtype=np.int64)
+        self._u = np.empty((2, n))
+        self._values = np.empty((2, n))
+        self._success = np.empty(n, dtype=bool)
+        self._done = np.empty(n, dtype=bool)
+        self._onehot_offsets = np.arange(n) * num_states
+
+        self.observations = np.empty(self.observation_shape,
+                                     dtype=np.float32 if observation == "onehot" else np.int64)
+        self.rewards = np.zeros(n)
+        self.terminated = np.zeros(n, dtype=bool)
+        self.truncated = np.zeros(n, dtype=bool)
+        self.infos = {
+            "final_observation": np.zeros_like(self.observations),
+            "episode_length": np.zeros(n, dtype=np.int64),
+            "episode_return": np.zeros(n)
+        }
+
+        self.shard_size = None if shard_size is None else min(int(shard_size), n)
+        self.num_threads = num_threads
+        self._shards = None
+        self._executor = None
+        if self.shard_size is not None:
+            self._shards = [self._shard(start, min(start + self.shard_size, n))
+                            for start in range(0, n, self.shard_size)]
+            if num_threads is None:
+                self.num_threads = min(len(self._shards), os.cpu_count() or 1)
+            self._seed_shards()
+
+    def _shard(self, start, stop):
+        # Environments start:stop, sharing the state and output arrays of the
+        # whole batch, with their own work arrays.
+        shard = copy.copy(self)
+        shard.num_envs = stop - start
+        for name in ("init_states", "states", "steps", "returns", "observations", "rewards",
+                     "terminated", "truncated"):
+            setattr(shard, name, getattr(self, name)[start:stop])
+        shard.infos = {key: value[start:stop] for key, value in self.infos.items()}
+        shard._index = np.empty(stop - start, dtype=np.int64)
+        shard._objects = np.empty(stop - start, dtype=np.int64)
+        shard._executed = np.empty(stop - start, dtype=np.int64)
+        shard._u = np.empty((2, stop - start))
+        shard._values = np.empty((2, stop - start))
+        shard._success = np.empty(stop - start, dtype=bool)
+        shard._done = np.empty(stop - start, dtype=bool)
+        shard._onehot_offsets = self._onehot_offsets[:stop - start]
+        shard._slice = slice(start, stop)
+        shard._shards = None
+        return shard
+
+    def _seed_shards(self):
+        # Independent random streams of the shards, spawned from the batch one.
+        seeds = np.random.SeedSequence(self._rng.integers(2 ** 63)).spawn(len(self._shards))
+        for shard, seed in zip(self._shards, seeds):
+            shard._rng = np.random.default_rng(seed)
+
+    @property
+    def num_actions(self):
+        """Number of actions of each environment."""
+        return self.compiled.num_actions
+
+    @property
+    def observation_shape(self):
+        """Shape of the observations of all environments."""
+        if self.observation == "index":
+            return (self.num_envs,)
+        elif self.observation == "coord":
+            return (self.num_envs, 3)
+        return (self.num_envs, self.compiled.num_states)
+
+    def _observe(self, states, out):
+        if self.observation == "index":
+            np.copyto(out, states)
+        elif self.observation == "coord":
+            np.take(self.compiled.coords, states, axis=0, out=out, mode="clip")
+        else:
+            out.fill(0)
+            np.add(self._onehot_offsets, states, out=self._index)
+            np.put(out, self._index, 1)
+
+    def reset(self, seed=None, out=None):
+        """Reset all the environments to their initial state.
+
+        Parameters
+        ----------
+        seed : int or numpy.random.Generator (optional, default: None)
+            New random number generator or seed, kept if None.
+
+        out : numpy.ndarray (optional, default: None)
+            Array to write the observations into, of shape
+            ``observation_shape``.
+
+        Returns
+        -------
+        observations : numpy.ndarray
+            Initial observations.
+
+        infos : dict
+            Information arrays, see ``VectorGridWorld``.
+        """
+        if seed is not None:
+            self._rng = np.random.default_rng(seed)
+            if self._shards is not None:
+                self._seed_shards()
+        np.copyto(self.states, self.init_states)
+        self.steps.fill(0)
+        self.returns.fill(0)
+        observations = self.observations if out is None else out
+        self._observe(self.states, observations)
+        return observations, self.infos
+
+    def step(self, actions, out=None):
+        """Step all the environments, resetting the ones whose trial ends.
+
+        Parameters
+        ----------
+        actions : numpy.ndarray of ints of shape (N,)
+            Indices of the intended actions, see ``CompiledWorld.actions``.
+
+        out : tuple of numpy.ndarray (optional, default: None)
+            Arrays ``(observations, rewards, terminated, truncated)`` to
+            write the outputs into.
+
+        Returns
+        -------
+        observations : numpy.ndarray
+            Observations, of the initial states of the next trials where
+            ``terminated | truncated``.
+
+        rewards : numpy.ndarray of floats of shape (N,)
+            Rewards of the movements.
+
+        terminated : numpy.ndarray of bools of shape (N,)
+            Whether the trials ended by reaching an object.
+
+        truncated : numpy.ndarray of bools of shape (N,)
+            Whether the trials reached the time limit.
+
+        infos : dict
+            Information arrays, see ``VectorGridWorld``.
+        """
+        if out is None:
+            observations, rewards, terminated, truncated = \
+                self.observations, self.rewards, self.terminated, self.truncated
+        else:
+            observations, rewards, terminated, truncated = out
+        actions = np.asarray(actions)
+        if actions.shape != (self.num_envs,):
+            msg = "Actions of shape ({},) expected, got {}".format(self.num_envs, actions.shape)
+            raise ValueError(msg)
+        if actions.min() < 0 or actions.max() >= self.num_actions:
+            msg = "Action index out of range [0, {})".format(self.num_actions)
+            raise ValueError(msg)
+
+        if self._shards is None:
+            self._step(actions, observations, rewards, terminated, truncated)
+        else:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.num_threads)
+            futures = [self._executor.submit(shard._step, actions[shard._slice],
+                                             observations[shard._slice],
+                                             rewards[shard._slice],
+                                             terminated[shard._slice],
+                                             truncated[shard._slice])
+                       for shard in self._shards]
+            for future in futures:
+                future.result()
+        return observations, rewards, terminated, truncated, self.infos
+
+    def _step(self, actions, observations, rewards, terminated, truncated):
+        states = self.states
+        index = self._index
+        self._rng.random(out=self._u)
+
+        # Executed actions, sampled from the transition kernels: the executed
+        # action is the number of cumulative probabilities below u.
+        if self._stochastic:
+            executed = self._executed
+            executed.fill(0)
+            np.take(self._kernel_index, states, out=index, mode="clip")
+            np.multiply(actions, self.num_actions, out=self._objects)
+            np.add(index, self._objects, out=index)
+            for b in range(1, self.num_actions):
+                np.take(self._kernel_cdf, index, out=self._values[0], mode="clip")
+                np.greater_equal(self._u[0], self._values[0], out=self._success)
+                np.copyto(executed, b, where=self._success)
+                np.add(index, 1, out=index)
+            actions = executed
+
+        # Movements.
+        np.multiply(states, self.num_actions, out=index)
+        np.add(index, actions, out=index)
+        np.take(self._move_reward, index, out=rewards, mode="clip")
+        np.take(self._next_state, index, out=states, mode="clip")
+
+        # Objects.
+        objects = self._objects
+        np.take(self._object_index, states, out=objects, mode="clip")
+        np.greater_equal(objects, 0, out=terminated)
+        np.take(self._object_prob, objects, out=self._values[0], mode="wrap")
+        np.less(self._u[1], self._values[0], out=self._success)
+        np.take(self._object_punish, objects, out=self._values[0], mode="wrap")
+        np.take(self._object_reward, objects, out=self._values[1], mode="wrap")
+        np.copyto(self._values[0], self._values[1], where=self._success)
+        np.add(rewards, self._values[0], out=rewards)
+
+        # Time limits.
+        self.steps += 1
+        self.returns += rewards
+        if self.max_steps is None:
+            truncated.fill(False)
+        else:
+            np.greater_equal(self.steps, self.max_steps, out=truncated)
+            np.greater(truncated, terminated, out=truncated)
+
+        # Autoreset.
+        done = self._done
+        np.logical_or(terminated, truncated, out=done)
+        self._observe(states, self.infos["final_observation"])
+        np.copyto(self.infos["episode_length"], self.steps, where=done)
+        np.copyto(self.infos["episode_return"], self.returns, where=done)
+        np.copyto(states, self.init_states, where=done)
+        np.copyto(self.steps, 0, where=done)
+        np.copyto(self.returns, 0, where=done)
+        self._observe(states, observations)
+
+    def close(self):
+        """Shut down the threads stepping the shards."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __repr__(self):
+        return "VectorGridWorld(num_envs={}, num_states={}, max_steps={}, " \
+               "observation='{}')".format(self.num_envs, self.compiled.num_states,
+                                          self.max_steps, self.observation)
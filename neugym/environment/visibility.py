@@ -0,0 +1,292 @@
+"""Line-of-sight visibility of gridworld states for partial observations."""
+
+import numpy as np
+
+__all__ = [
+    "VisibilityTable"
+]
+
+# Features of the visible states, in the order of the last axis of encodings.
+_FEATURES = ("visible", "blocked", "altitude", "object")
+
+
+class VisibilityTable:
+    r"""Precomputed field of view of each state of a gridworld environment.
+
+    A state sees the states of its area within ``radius`` (Euclidean
+    distance) which are in line of sight: the straight line from the
+    center of the viewer to the center of the target (discretized as the
+    cells closest to the line) must not go through blocked states, nor out
+    of the area. Blocked states are seen, but occlude the states behind
+    them. Lines of sight go through inter-area paths as through windows:
+    when a line reaches the state beyond the border where a path is
+    registered (see ``GridWorld.add_path()``), it continues from the other
+    end of the path, in the same direction.
+
+    The field of view of each state is stored in CSR format, as arrays
+    ``indptr``, ``indices`` and ``slots``, where the states seen from state
+    ``s`` are ``indices[indptr[s]:indptr[s + 1]]``, at the positions
+    ``slots[indptr[s]:indptr[s + 1]]`` of the egocentric window of shape
+    ``(2 * radius + 1, 2 * radius + 1)`` centered on the viewer (the
+    position of a slot being ``(dx + radius) * (2 * radius + 1) + dy + radius``
+    for a target ``(dx, dy)`` away). A state can appear in several slots,
+    e.g. through a path and around it.
+
+    Lines of sight only depend on the world layout, and are traced for all
+    the states and directions at once with array operations. With a
+    ``WorldCache``, tables are saved under the world fingerprint and loaded
+    instead of traced again.
+
+    Parameters
+    ----------
+    env : GridWorld or CompiledWorld
+        Gridworld environment, a ``GridWorld`` when using ``cache``.
+
+    radius : int
+        Maximum distance of the seen states.
+
+    cache : WorldCache (optional, default: None)
+        Cache of the traced tables.
+
+    Attributes
+    ----------
+    compiled : CompiledWorld
+        Array representation of the environment, the source of the
+        features of ``VisibilityTable.encode()``.
+
+    indptr : numpy.ndarray of shape (S + 1,)
+        Index pointers of the field of view of each state.
+
+    indices : numpy.ndarray of shape (nnz,)
+        Ids of the seen states.
+
+    slots : numpy.ndarray of shape (nnz,)
+        Positions of the seen states in the egocentric window.
+
+    Examples
+    --------
+    >>> W = GridWorld((7, 7))
+    >>> W.block((0, 3, 3))
+    >>> W.add_object((0, 6, 6), reward=1, prob=1)
+    >>> table = VisibilityTable(W, radius=5)
+    >>> C = table.compiled
+    >>> C.state_index((0, 5, 5)) in table.visible_states(C.state_index((0, 2, 2)))
+    False
+    >>> observations = table.encode(np.zeros(128, dtype=np.int64))
+    >>> observations.shape
+    (128, 11, 11, 4)
+    """
+
+    def __init__(self, env, radius, cache=None):
+        if not isinstance(radius, (int, np.integer)) or radius < 0:
+            msg = "Non-negative integer 'radius' expected, got {}".format(radius)
+            raise ValueError(msg)
+        self.radius = int(radius)
+
+        if cache is not None:
+            self.compiled = env.compile(cache=cache)
+            table = cache.get_artifact(env, "visibility_r{}".format(self.radius),
+                                       lambda compiled: _trace(compiled, self.radius))
+        else:
+            self.compiled = env.compile() if hasattr(env, "compile") else env
+            table = _trace(self.compiled, self.radius)
+        self.indptr = table["indptr"]
+        self.indices = table["indices"]
+        self.slots = table["slots"]
+
+        compiled = self.compiled
+        self._features = np.stack([
+            np.ones(compiled.num_states),
+            compiled.blocked,
+            compiled.altitude,
+            compiled.object_expected_reward()
+        ], axis=1).astype(np.float32)
+
+    @property
+    def window_shape(self):
+        """Shape of the egocentric window."""
+        return (2 * self.radius + 1, 2 * self.radius + 1)
+
+    @property
+    def feature_names(self):
+        """Names of the features of ``VisibilityTable.encode()``."""
+        return _FEATURES
+
+    def visible_states(self, state):
+        """Get the states seen from one state.
+
+        Parameters
+        ----------
+        state : int
+            Id of the viewer state.
+
+        Returns
+        -------
+        states : numpy.ndarray of ints
+            Sorted ids of the seen states, including ``state``.
+        """
+        return np.unique(self.indices[self.indptr[state]:self.indptr[state + 1]])
+
+    def visibility_matrix(self):
+        """Get the visibility relation between states.
+
+        Returns
+        -------
+        visible : scipy.sparse.csr_matrix of shape (S, S)
+            Boolean matrix, where ``visible[s, t]`` is whether state ``t``
+            is seen from state ``s``.
+        """
+        import scipy.sparse as sp
+
+        num_states = len(self.indptr) - 1
+        rows = np.repeat(np.arange(num_states), np.diff(self.indptr))
+        visible = sp.csr_matrix((np.ones(len(rows), dtype=bool), (rows, self.indices)),
+                                shape=(num_states, num_states))
+        visible.sum_duplicates()
+        return visible
+
+    def encode(self, states, out=None):
+        """Encode the partial observations of many agents.
+
+        Parameters
+        ----------
+        states : array_like of ints of shape (N,)
+            Ids of the states of the agents.
+
+        out : numpy.ndarray (optional, default: None)
+            Array of floats to write the observations into, of the shape
+            of the returned observations.
+
+        Returns
+        -------
+        observations : numpy.ndarray of shape (N, 2 * radius + 1, 2 * radius + 1, 4)
+            Egocentric windows of features of the seen states, zero where
+            nothing is seen. Features (see ``feature_names``) are whether
+            a state is seen, whether it is blocked, its altitude, and the
+            expected reward of its object (zero if there is none).
+        """
+        states = np.asarray(states, dtype=np.int64).ravel()
+        num_agents = len(states)
+        shape = (num_agents,) + self.window_shape + (len(_FEATURES),)
+        if out is None:
+            out = np.zeros(shape, dtype=np.float32)
+        else:
+            if out.shape != shape:
+                msg = "Output array of shape {} expected, got {}".format(shape, out.shape)
+                raise ValueError(msg)
+            out.fill(0)
+
+        # Entries of the fields of view of all agents, concatenated.
+        starts = self.indptr[states]
+        lengths = self.indptr[states + 1] - starts
+        agents = np.repeat(np.arange(num_agents), lengths)
+        entries = np.arange(lengths.sum()) + np.repeat(starts - (np.cumsum(lengths) - lengths),
+                                                       lengths)
+
+        flat = out.reshape(num_agents, -1, len(_FEATURES))
+        flat[agents, self.slots[entries]] = self._features[self.indices[entries]]
+        return out
+
+    def __repr__(self):
+        return "VisibilityTable(num_states={}, radius={}, nnz={})".format(
+            len(self.indptr) - 1, self.radius, len(self.indices))
+
+
+def _rays(radius):
+    # Targets within the radius, and the cells crossed by the line to each
+    # target, as unit steps (dx, dy) of shape (T, radius), zero once reached.
+    r = radius
+    dx, dy = np.meshgrid(np.arange(-r, r + 1), np.arange(-r, r + 1), indexing="ij")
+    inside = (dx ** 2 + dy ** 2 <= r ** 2) & ((dx != 0) | (dy != 0))
+    dx, dy = dx[inside], dy[inside]
+    lengths = np.maximum(np.abs(dx), np.abs(dy))
+
+    k = np.arange(r + 1)
+    fraction = np.minimum(k[None, :] / lengths[:, None], 1)
+    cells_x = np.floor(fraction * dx[:, None] + 0.5).astype(np.int64)
+    cells_y = np.floor(fraction * dy[:, None] + 0.5).astype(np.int64)
+    slots = (dx + r) * (2 * r + 1) + dy + r
+    return np.diff(cells_x, axis=1), np.diff(cells_y, axis=1), lengths, slots
+
+
+def _trace(compiled, radius):
+    # Trace the lines of sight of all states in all directions at once.
+    num_states = compiled.num_states
+    coords = compiled.coords
+    shapes = compiled.area_shapes
+    center = radius * (2 * radius + 1) + radius
+
+    # Doorways: the cell beyond the border from which a move crosses to
+    # another area, keyed by (area, x, y) with x, y possibly out of the area.
+    pad = radius + int(np.abs(np.array(compiled.actions)).max(initial=0)) + 1
+    size = int(shapes.max(initial=1)) + 2 * pad
+
+    def key(area, x, y):
+        return (area * size + x + pad) * size + y + pad
+
+    moves = np.array(compiled.actions, dtype=np.int64).reshape(-1, 2)
+    source, action = np.nonzero(coords[compiled.next_state, 0] != coords[:, None, 0])
+    door_keys = key(coords[source, 0], coords[source, 1] + moves[action, 0],
+                    coords[source, 2] + moves[action, 1])
+    door_keys, first = np.unique(door_keys, return_index=True)
+    door_targets = compiled.next_state[source, action][first]
+
+    steps_x, steps_y, lengths, slots = _rays(radius)
+    num_rays = len(lengths)
+    viewers = np.repeat(np.arange(num_states), num_rays)
+    ray = np.tile(np.arange(num_rays), num_states)
+    area = coords[viewers, 0].copy()
+    x = coords[viewers, 1].copy()
+    y = coords[viewers, 2].copy()
+    alive = np.ones(len(viewers), dtype=bool)
+
+    seen_viewers = [np.arange(num_states)]
+    seen_slots = [np.full(num_states, center)]
+    seen_states = [np.arange(num_states)]
+    for k in range(radius):
+        idx = np.flatnonzero(alive)
+        if len(idx) == 0:
+            break
+        r = ray[idx]
+        a = area[idx]
+        nx = x[idx] + steps_x[r, k]
+        ny = y[idx] + steps_y[r, k]
+        m, n = shapes[a, 0], shapes[a, 1]
+        inside = (nx >= 0) & (nx < m) & (ny >= 0) & (ny < n)
+        state = np.full(len(idx), -1, dtype=np.int64)
+        state[inside] = compiled.area_offsets[a[inside]] + nx[inside] * n[inside] + ny[inside]
+
+        # Lines leaving the area continue through doorways, or stop.
+        outside = np.flatnonzero(~inside)
+        if len(outside) > 0 and len(door_keys) > 0:
+            keys = key(a[outside], nx[outside], ny[outside])
+            pos = np.minimum(np.searchsorted(door_keys, keys), len(door_keys) - 1)
+            through = door_keys[pos] == keys
+            state[outside[through]] = door_targets[pos[through]]
+
+        found = state >= 0
+        reached = found & (lengths[r] == k + 1)
+        seen_viewers.append(viewers[idx[reached]])
+        seen_slots.append(slots[r[reached]])
+        seen_states.append(state[reached])
+
+        # Lines go on through unblocked states, until reaching their target.
+        go_on = found & ~reached & ~compiled.blocked[np.maximum(state, 0)]
+        alive[idx[~go_on]] = False
+        moved = idx[go_on]
+        state = state[go_on]
+        area[moved] = coords[state, 0]
+        x[moved] = coords[state, 1]
+        y[moved] = coords[state, 2]
+
+    seen_viewers = np.concatenate(seen_viewers)
+    seen_slots = np.concatenate(seen_slots)
+    seen_states = np.concatenate(seen_states)
+    order = np.lexsort((seen_slots, seen_viewers))
+    indptr = np.zeros(num_states + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum(np.bincount(seen_viewers, minlength=num_states))
+    return {
+        "indptr": indptr,
+        "indices": seen_states[order],
+        "slots": seen_slots[order]
+    }
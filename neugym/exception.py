@@ -7,7 +7,8 @@ __all__ = [
     "NeuGymConnectivityError",
     "NeuGymCheckpointError",
     "NeuGymOverwriteError",
-    "NeuGymPermissionError"
+    "NeuGymPermissionError",
+    "NeuGymMemoryError"
 ]
 
 
@@ -38,3 +39,6 @@ class NeuGymOverwriteError(NeuGymException):
 class NeuGymPermissionError(NeuGymException):
     """Exception raised when trying to do something not allowed."""
 
+
+class NeuGymMemoryError(NeuGymException):
+    """Exception raised when an operation would exceed the memory budget."""
@@ -0,0 +1,84 @@
+import pickle
+import unittest
+
+import numpy as np
+from neugym.environment import GridWorld, MultiAgentGridWorld, OccupancyCounter
+
+
+class TestOccupancyCounter(unittest.TestCase):
+    """Test streaming occupancy counters."""
+    def _build_world(self):
+        W = GridWorld((3, 3))
+        W.add_area((2, 2))
+        W.add_path((0, 2, 2), (1, 0, 0))
+        W.add_object((1, 1, 1), reward=1, prob=1)
+        return W
+
+    def test_attach(self):
+        W = self._build_world()
+        W.init_agent()
+        counter = OccupancyCounter(W)
+        W.attach_counter(counter)
+        for action in [(0, 1), (0, 1), (0, 1), (1, 0), (1, 0), (1, 0), (1, 0), (0, 1)]:
+            W.step(action)
+        self.assertEqual(counter.num_steps, 8)
+        np.testing.assert_array_equal(counter.get_area_occupancy(0),
+                                      [[1, 1, 2], [0, 0, 1], [0, 0, 1]])
+        np.testing.assert_array_equal(counter.get_area_occupancy(1), [[1, 0], [1, 0]])
+
+        C = W.compile()
+        s = C.state_index((0, 0, 2))
+        self.assertEqual(counter.action_counts[s, C.action_index((0, 1))], 1)
+        T = counter.transition_matrix()
+        self.assertEqual(T[s, s], 1)
+        self.assertEqual(T[C.state_index((0, 2, 2)), C.state_index((1, 0, 0))], 1)
+        self.assertEqual(T[C.state_index((1, 1, 0)), C.state_index((1, 1, 1))], 1)
+        self.assertEqual(T.sum(), 8)
+
+        W.detach_counter(counter)
+        W.step((0, 1))
+        self.assertEqual(counter.num_steps, 8)
+        with self.assertRaises(ValueError):
+            W.detach_counter(counter)
+        with self.assertRaises(ValueError):
+            W.attach_counter(OccupancyCounter(GridWorld((3, 3))))
+
+    def test_batch_and_merge(self):
+        W = self._build_world()
+        C = W.compile()
+        rng = np.random.default_rng(0)
+        counters = []
+        for _ in range(2):
+            counter = OccupancyCounter(C)
+            states = rng.integers(C.num_states, size=(100, 4))
+            actions = rng.integers(C.num_actions, size=(100, 4))
+            next_states, _, _ = C.step(states, actions, rng)
+            counter.update(states, actions, next_states)
+            counters.append(pickle.loads(pickle.dumps(counter)))
+            np.testing.assert_array_equal(counter.state_counts,
+                                          np.bincount(states.ravel(), minlength=C.num_states))
+            self.assertEqual(counter.transition_counts.sum(), 400)
+
+        merged = OccupancyCounter(C)
+        merged += counters[0]
+        merged.merge(counters[1])
+        self.assertEqual(merged.num_steps, 800)
+        np.testing.assert_array_equal(merged.action_counts,
+                                      counters[0].action_counts + counters[1].action_counts)
+        merged.reset()
+        self.assertEqual(merged.num_steps, 0)
+        with self.assertRaises(ValueError):
+            merged.merge(OccupancyCounter(GridWorld((3, 3))))
+
+        # Multi-agent worlds count all agents.
+        M = MultiAgentGridWorld((3, 3))
+        M.init_agents([(0, 0, 0), (0, 2, 2)])
+        counter = OccupancyCounter(M)
+        M.attach_counter(counter)
+        M.step([(0, 1), (0, -1)])
+        np.testing.assert_array_equal(counter.get_area_occupancy(0),
+                                      [[1, 0, 0], [0, 0, 0], [0, 0, 1]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from neugym.environment import GridWorld, slip_kernel
+from neugym.utils import WorldCache
+
+_num_builds = [0]
+
+
+def _build_world(m, n, block=None):
+    _num_builds[0] += 1
+    W = GridWorld((m, n))
+    W.add_area((2, 2), name="room")
+    W.add_path((0, m - 1, n - 1), (1, 0, 0))
+    W.set_altitude(1, np.arange(4, dtype=float).reshape(2, 2))
+    W.add_object((1, 1, 1), reward=1, prob=0.5)
+    if block is not None:
+        W.block(block)
+    return W
+
+
+class TestWorldCache(unittest.TestCase):
+    """Test world fingerprints and on-disk cache."""
+    def test_fingerprint(self):
+        W = _build_world(3, 3)
+        fingerprint = W.fingerprint()
+        V = _build_world(3, 3)
+        V.set_area_name(1, "other")
+        V.init_agent()
+        self.assertEqual(V.fingerprint(), fingerprint)
+
+        for modify in [lambda E: E.block((0, 1, 1)),
+                       lambda E: E.update_object((1, 1, 1), prob=0.6),
+                       lambda E: E.set_altitude(0, np.ones((3, 3))),
+                       lambda E: E.set_transition_kernel(1, slip_kernel(E.actions, 0.1))]:
+            V = _build_world(3, 3)
+            modify(V)
+            self.assertNotEqual(V.fingerprint(), fingerprint)
+
+        # Same connection, different registered action.
+        V = GridWorld((3, 3))
+        V.add_area((2, 2))
+        U = GridWorld((3, 3))
+        U.add_area((2, 2))
+        V.add_path((0, 2, 2), (1, 0, 0), register_action=(1, 0))
+        U.add_path((0, 2, 2), (1, 0, 0), register_action=(0, 1))
+        self.assertNotEqual(V.fingerprint(), U.fingerprint())
+
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = WorldCache(cache_dir)
+            _num_builds[0] = 0
+            W = cache.get_env(_build_world, 3, 4, block=(0, 2, 2))
+            V = WorldCache(cache_dir).get_env(_build_world, 3, 4, block=(0, 2, 2))
+            self.assertEqual(_num_builds[0], 1)
+            self.assertEqual(V.fingerprint(), W.fingerprint())
+            cache.get_env(_build_world, 3, 5)
+            self.assertEqual(_num_builds[0], 2)
+
+            expected = W.compile()
+            C = cache.get_compiled(W)
+            loaded = WorldCache(cache_dir).get_compiled(V)
+            self.assertTrue(os.path.exists(os.path.join(cache_dir, W.fingerprint(),
+                                                        "compiled.npz")))
+            for compiled in (C, loaded):
+                self.assertEqual(compiled.actions, expected.actions)
+                self.assertEqual(compiled.fingerprint(), expected.fingerprint())
+                np.testing.assert_array_equal(compiled.next_state, expected.next_state)
+
+            U = _build_world(3, 4, block=(0, 2, 2))
+            self.assertEqual(U.compile(cache=cache).fingerprint(), expected.fingerprint())
+
+            calls = []
+
+            def expected_reward(compiled):
+                calls.append(1)
+                return compiled.expected_reward()
+
+            R = cache.get_artifact(W, "reward", expected_reward)
+            np.testing.assert_array_equal(cache.get_artifact(V, "reward", expected_reward), R)
+            self.assertEqual(len(calls), 1)
+            arrays = cache.get_artifact(W, "arrays", lambda c: {"a": c.altitude, "b": c.blocked})
+            arrays = cache.get_artifact(W, "arrays", None)
+            np.testing.assert_array_equal(arrays["b"], expected.blocked)
+            with self.assertRaises(ValueError):
+                cache.get_artifact(W, "../reward", expected_reward)
+
+
+if __name__ == '__main__':
+    unittest.main()
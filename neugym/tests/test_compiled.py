@@ -0,0 +1,160 @@
+import unittest
+
+import numpy as np
+import neugym as ng
+from neugym.environment import GridWorld, slip_kernel, drift_kernel
+
+
+def _build_world():
+    W = GridWorld()
+    W.add_area((3, 4))
+    W.add_path((0, 0, 0), (1, 0, 0))
+    W.add_area((2, 2), name="Right")
+    W.add_path((1, 2, 3), (2, 0, 0), register_action=(0, 1))
+    W.set_altitude(1, np.arange(12, dtype=float).reshape(3, 4))
+    W.block((1, 1, 1))
+    W.add_object((2, 1, 1), 10, 0.5, punish=-1)
+    return W
+
+
+class TestCompiledWorld(unittest.TestCase):
+    """Test array representation of GridWorld environment."""
+    def test_compile(self):
+        W = _build_world()
+        C = W.compile()
+        self.assertIs(C, W.compile())
+        self.assertEqual(C.num_states, 17)
+        self.assertEqual(C.num_actions, 5)
+        self.assertEqual(C.state_coord(C.state_index((1, 2, 3))), (1, 2, 3))
+        np.testing.assert_array_equal(C.reshape_area(C.altitude, 1), W.get_area_altitude(1))
+        with self.assertRaises(ValueError):
+            C.state_index((3, 0, 0))
+
+        # Modifications invalidate the cached representation.
+        W.unblock((1, 1, 1))
+        self.assertIsNot(C, W.compile())
+
+    def test_fingerprint(self):
+        W = _build_world()
+        fingerprint = W.compile().fingerprint()
+        self.assertEqual(fingerprint, _build_world().compile().fingerprint())
+        W.block((1, 0, 1))
+        self.assertNotEqual(fingerprint, W.compile().fingerprint())
+        W.unblock((1, 0, 1))
+        self.assertEqual(fingerprint, W.compile().fingerprint())
+
+    def test_next_state(self):
+        # Compiled transitions should agree with 'step'.
+        W = _build_world()
+        C = W.compile()
+        for s, coord in enumerate(C.coords.tolist()):
+            coord = tuple(coord)
+            if C.blocked[s] or C.terminal[s]:
+                continue
+            for a, action in enumerate(W.actions):
+                W.init_agent(coord, overwrite=True)
+                next_state, reward, _ = W.step(action)
+                self.assertEqual(C.state_coord(C.next_state[s, a]), next_state)
+                if not C.terminal[C.next_state[s, a]]:
+                    self.assertAlmostEqual(C.move_reward[s, a], reward)
+
+    def test_batch_step(self):
+        W = _build_world()
+        C = W.compile()
+        s = C.state_index((2, 0, 1))
+        states = np.full(1000, s)
+        actions = np.full(1000, C.action_index((1, 0)))
+        next_states, rewards, dones = C.step(states, actions, rng=0)
+        self.assertTrue(np.all(dones))
+        self.assertTrue(np.all(next_states == C.state_index((2, 1, 1))))
+        self.assertEqual(set(np.unique(rewards)), {10, -1})
+        self.assertAlmostEqual(C.expected_reward()[s, C.action_index((1, 0))], 4.5)
+
+
+class TestTransitionKernel(unittest.TestCase):
+    """Test stochastic transition kernels."""
+    def test_kernels(self):
+        actions = ((0, 0), (1, 0), (-1, 0), (0, 1), (0, -1))
+        K = slip_kernel(actions, 0.2)
+        np.testing.assert_allclose(K.sum(axis=1), 1)
+        self.assertEqual(K[0, 0], 1)
+        self.assertAlmostEqual(K[1, 1], 0.8)
+        self.assertAlmostEqual(K[1, 3], 0.1)
+        self.assertAlmostEqual(K[1, 4], 0.1)
+        self.assertEqual(K[1, 2], 0)
+
+        K = drift_kernel(actions, (1, 0), 0.3)
+        np.testing.assert_allclose(K.sum(axis=1), 1)
+        self.assertAlmostEqual(K[2, 1], 0.3)
+        self.assertAlmostEqual(K[1, 1], 1)
+        with self.assertRaises(ValueError):
+            drift_kernel(actions, (2, 0), 0.3)
+        with self.assertRaises(ValueError):
+            slip_kernel(actions, 1.5)
+
+    def test_set_transition_kernel(self):
+        W = _build_world()
+        with self.assertRaises(ValueError):
+            W.set_transition_kernel(1, np.eye(4))
+        with self.assertRaises(ValueError):
+            W.set_transition_kernel(1, np.eye(5) * 2)
+        with self.assertRaises(ValueError):
+            W.set_transition_kernel((5, 0, 0), np.eye(5))
+        with self.assertRaises(TypeError):
+            W.set_transition_kernel(1.0, np.eye(5))
+
+        drift = drift_kernel(W.actions, (1, 0), 1)
+        W.set_transition_kernel("Right", drift)
+        W.set_transition_kernel((2, 0, 0), np.eye(5))
+        np.testing.assert_array_equal(W.get_transition_kernel((2, 0, 1)), drift)
+        np.testing.assert_array_equal(W.get_transition_kernel((2, 0, 0)), np.eye(5))
+        np.testing.assert_array_equal(W.get_transition_kernel((1, 0, 0)), np.eye(5))
+
+        # Always drift down in area 2.
+        W.init_agent((2, 0, 1))
+        next_state, _, done = W.step((0, -1))
+        self.assertEqual(next_state, (2, 1, 1))
+        self.assertTrue(done)
+
+        C = W.compile()
+        self.assertTrue(C.stochastic)
+        s = C.state_index((2, 0, 1))
+        next_states, _, _ = C.step(np.full(10, s), np.zeros(10, dtype=int))
+        self.assertTrue(np.all(next_states == C.state_index((2, 1, 1))))
+
+        W.remove_transition_kernel((2, 0, 0))
+        with self.assertRaises(ValueError):
+            W.remove_transition_kernel((2, 0, 0))
+
+    def test_transition_matrix(self):
+        W = _build_world()
+        W.set_transition_kernel(1, slip_kernel(W.actions, 0.2))
+        C = W.compile()
+        P = C.transition_matrix()
+        self.assertEqual(P.shape, (C.num_states * C.num_actions, C.num_states))
+        np.testing.assert_allclose(np.asarray(P.sum(axis=1)).ravel(), 1)
+        s = C.state_index((1, 2, 2))
+        row = P[s * C.num_actions + C.action_index((0, 1))].toarray().ravel()
+        self.assertAlmostEqual(row[C.state_index((1, 2, 3))], 0.8)
+        self.assertAlmostEqual(row[C.state_index((1, 1, 2))], 0.1)
+        self.assertAlmostEqual(row[C.state_index((1, 2, 2))], 0.1)
+
+    def test_remove_area_and_reset(self):
+        W = _build_world()
+        W.add_area((2, 2))
+        W.set_transition_kernel(3, slip_kernel(W.actions, 0.2))
+        W.set_transition_kernel((3, 0, 0), np.eye(5))
+        W.set_transition_kernel(1, slip_kernel(W.actions, 0.1))
+        W.set_reset_checkpoint()
+        W.remove_area("Right")
+        self.assertEqual(set(W._area_kernels.keys()), {1, 2})
+        self.assertEqual(set(W._state_kernels.keys()), {(2, 0, 0)})
+        W.reset()
+        self.assertEqual(set(W._area_kernels.keys()), {1, 3})
+        self.assertEqual(W.compile().num_states, 21)
+        with self.assertRaises(ng.NeuGymCheckpointError):
+            GridWorld().reset()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+
+import numpy as np
+from neugym.algorithms import evaluate_policies
+from neugym.environment import GridWorld, slip_kernel
+
+
+def _build_world():
+    W = GridWorld()
+    W.add_area((3, 4))
+    W.add_path((0, 0, 0), (1, 0, 0))
+    W.block((1, 1, 1))
+    W.set_altitude(1, np.arange(12, dtype=float).reshape(3, 4) / 10)
+    W.add_object((1, 2, 3), 10, 0.5, punish=-1)
+    W.set_transition_kernel(1, slip_kernel(W.actions, 0.2))
+    return W
+
+
+class TestEvaluatePolicies(unittest.TestCase):
+    """Test batched policy evaluation."""
+    def test_methods(self):
+        W = _build_world()
+        C = W.compile()
+        rng = np.random.default_rng(0)
+        policies = rng.dirichlet(np.ones(C.num_actions), size=(6, C.num_states))
+
+        # Dense solution of each Bellman equation.
+        P = C.transition_matrix().toarray().reshape(C.num_states, C.num_actions, -1)
+        P = P * ~C.terminal
+        expected = []
+        for policy in policies:
+            P_pi = np.einsum('sa,sat->st', policy, P)
+            r_pi = (policy * C.expected_reward()).sum(axis=1)
+            expected.append(np.linalg.solve(np.eye(C.num_states) - 0.9 * P_pi, r_pi))
+
+        for method in ["iterative", "direct"]:
+            evaluation = evaluate_policies(W, policies, gamma=0.9, method=method, tol=1e-12)
+            self.assertEqual(evaluation.method, method)
+            self.assertEqual(evaluation.num_policies, 6)
+            self.assertTrue(np.all(evaluation.converged))
+            self.assertTrue(np.all(evaluation.residuals < 1e-9))
+            self.assertGreaterEqual(evaluation.solve_time, 0)
+            np.testing.assert_allclose(evaluation.values, expected, atol=1e-9)
+            q = evaluation.q_values()
+            self.assertEqual(q.shape, (6, C.num_states, C.num_actions))
+            np.testing.assert_allclose((q * policies).sum(axis=2), evaluation.values,
+                                       atol=1e-9)
+            if method == "iterative":
+                self.assertTrue(np.all(evaluation.iterations > 0))
+            else:
+                np.testing.assert_array_equal(evaluation.iterations, 0)
+
+    def test_policies(self):
+        W = GridWorld((1, 4))
+        W.add_object((0, 0, 3), reward=1, prob=1)
+        C = W.compile()
+        right = C.action_index((0, 1))
+        stay = C.action_index((0, 0))
+        # Staying at the object state collects its reward again.
+        deterministic = np.array([[right] * 4, [stay] * 4])
+        evaluation = evaluate_policies(W, deterministic, gamma=0.5, method="direct")
+        np.testing.assert_allclose(evaluation.values, [[0.25, 0.5, 1, 1], [0, 0, 0, 1]])
+
+        single = evaluate_policies(W, np.eye(C.num_actions)[deterministic[0]], gamma=0.5)
+        np.testing.assert_allclose(single.values, evaluation.values[:1])
+
+        with self.assertWarns(RuntimeWarning):
+            evaluation = evaluate_policies(W, deterministic, gamma=0.5, max_iter=2)
+        np.testing.assert_array_equal(evaluation.converged, [False, True])
+        np.testing.assert_array_equal(evaluation.iterations, 2)
+
+        with self.assertRaises(ValueError):
+            evaluate_policies(W, deterministic, gamma=1)
+        with self.assertRaises(ValueError):
+            evaluate_policies(W, deterministic, method="exact")
+        with self.assertRaises(ValueError):
+            evaluate_policies(W, deterministic + 10)
+        with self.assertRaises(ValueError):
+            evaluate_policies(W, np.ones((2, 4, C.num_actions)))
+
+
+if __name__ == '__main__':
+    unittest.main()
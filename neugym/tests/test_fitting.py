@@ -0,0 +1,117 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from neugym.algorithms import (BatchedLearner, BehaviorData, LearningModel, best_fits,
+                               choice_log_likelihood, fit_models)
+from neugym.environment import GridWorld
+
+
+class TestFitModels(unittest.TestCase):
+    """Test maximum-likelihood fitting harness."""
+    def _build_data(self, num_subjects, num_steps):
+        W = GridWorld((2, 3))
+        W.add_object((0, 1, 2), reward=1, prob=1)
+        W.init_agent()
+        C = W.compile()
+        learner = BatchedLearner(W, num_subjects, exploration="softmax", alpha=0.5,
+                                 beta=3.0, gamma=0.9, rng=0)
+        states = np.zeros((num_subjects, num_steps), dtype=np.int64)
+        actions = np.zeros((num_subjects, num_steps), dtype=np.int64)
+        for t in range(num_steps):
+            states[:, t] = learner.states
+            actions[:, t] = learner.actions = learner.select_actions(learner.states)
+            learner.step()
+        records = [[(C.state_coord(s), int(a), 0) for s, a in zip(states[i], actions[i])]
+                   for i in range(num_subjects)]
+        return W, BehaviorData.from_records(W, records)
+
+    def test_fit_models(self):
+        W, data = self._build_data(2, 20)
+        models = ["q_learning", LearningModel("sarsa", fixed={"gamma": 0.9}, name="sarsa_g")]
+        self.assertEqual(models[1].free_params, ["alpha", "beta"])
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            progress = []
+            results = fit_models(W, data, models, num_restarts=2, cache_dir=cache_dir,
+                                 num_workers=1, callback=lambda r, i, n: progress.append((i, n)))
+            self.assertEqual(len(results), 8)
+            self.assertEqual(progress[-1], (8, 8))
+            self.assertEqual(len(os.listdir(cache_dir)), 8)
+            self.assertEqual([(r.subject, r.model, r.restart) for r in results][:4],
+                             [(0, "q_learning", 0), (0, "q_learning", 1),
+                              (0, "sarsa_g", 0), (0, "sarsa_g", 1)])
+            for r in results:
+                self.assertFalse(r.cached)
+                algorithm = "q_learning" if r.model == "q_learning" else "sarsa"
+                ll = choice_log_likelihood(W, data.subset(r.subject), algorithm=algorithm,
+                                           **r.params).sum()
+                self.assertAlmostEqual(-ll, r.nll)
+                self.assertTrue(0 <= r.params["alpha"] <= 1)
+            self.assertEqual(results[2].params["gamma"], 0.9)
+
+            # Extending the sweep only runs the new jobs.
+            extended = fit_models(W, data, models, num_restarts=3, cache_dir=cache_dir,
+                                  num_workers=2)
+            self.assertEqual(len(extended), 12)
+            self.assertEqual(sum(r.cached for r in extended), 8)
+            cached = [r for r in extended if r.cached]
+            self.assertEqual([r.nll for r in cached], [r.nll for r in results])
+
+            # Other worlds do not share the cache.
+            W.block((0, 0, 1))
+            other = fit_models(W, data, "q_learning", num_restarts=1, subjects=[1],
+                               cache_dir=cache_dir, num_workers=1)
+            self.assertFalse(other[0].cached)
+
+        best = best_fits(results)
+        self.assertEqual(len(best), 4)
+        self.assertEqual(best[(0, "q_learning")].nll,
+                         min(r.nll for r in results[:2]))
+
+        with self.assertRaises(ValueError):
+            LearningModel("q_learning", fixed={"delta": 1})
+        with self.assertRaises(ValueError):
+            fit_models(W, data, ["q_learning", "q_learning"], num_workers=1)
+
+    def test_cache_reuse(self):
+        W, data = self._build_data(2, 15)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            results = fit_models(W, data, num_restarts=2, cache_dir=cache_dir, num_workers=1)
+            reused = fit_models(W, data, num_restarts=2, cache_dir=cache_dir, num_workers=1)
+            self.assertTrue(all(r.cached for r in reused))
+            self.assertEqual([(r.subject, r.restart, r.nll, r.params) for r in reused],
+                             [(r.subject, r.restart, r.nll, r.params) for r in results])
+
+            # Results follow the subjects when they are reordered.
+            swapped = data.subset([1, 0])
+            reordered = fit_models(W, swapped, num_restarts=2, cache_dir=cache_dir,
+                                   num_workers=1)
+            self.assertTrue(all(r.cached for r in reordered))
+            self.assertEqual([r.subject for r in reordered], [0, 0, 1, 1])
+            fresh = fit_models(W, swapped, num_restarts=2, num_workers=1)
+            self.assertEqual([(r.subject, r.restart, r.nll) for r in reordered],
+                             [(r.subject, r.restart, r.nll) for r in fresh])
+            self.assertEqual([r.nll for r in reordered[:2]], [r.nll for r in results[2:]])
+
+            # Subjects with the same data share their cached results.
+            duplicated = fit_models(W, data.subset([0, 0]), num_restarts=2,
+                                    cache_dir=cache_dir, num_workers=1)
+            self.assertTrue(all(r.cached for r in duplicated))
+            self.assertEqual([r.subject for r in duplicated], [0, 0, 1, 1])
+
+    def test_num_workers(self):
+        W, data = self._build_data(3, 15)
+        models = ["q_learning", LearningModel("sarsa", fixed={"gamma": 0.9})]
+        serial = fit_models(W, data, models, num_restarts=2, num_workers=1)
+        parallel = fit_models(W, data, models, num_restarts=2, num_workers=2)
+        self.assertEqual(len(parallel), 12)
+        for a, b in zip(serial, parallel):
+            self.assertEqual((a.subject, a.model, a.restart), (b.subject, b.model, b.restart))
+            self.assertEqual(a.params, b.params)
+            self.assertEqual(a.nll, b.nll)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components
+from neugym.environment import (perfect_maze, rooms_world, open_field, t_maze, radial_arm_maze,
+                                from_spec, to_spec, CompiledWorld)
+
+
+def _num_open_components(C):
+    # Number of connected components of unblocked states.
+    open_states = np.flatnonzero(~C.blocked)
+    rows = np.repeat(np.arange(C.num_states), C.num_actions)
+    graph = sp.csr_matrix((np.ones(rows.size), (rows, C.next_state.ravel())),
+                          shape=(C.num_states, C.num_states))
+    return connected_components(graph[open_states][:, open_states], directed=True,
+                                connection="strong")[0]
+
+
+class TestGenerators(unittest.TestCase):
+    """Test procedural world generators."""
+    def test_compiled(self):
+        # Generated arrays match the compiled GridWorld built from them.
+        generators = [
+            lambda **kw: perfect_maze((9, 7), **kw),
+            lambda **kw: rooms_world((11, 12), rooms=(2, 3), num_objects=2, **kw),
+            lambda **kw: open_field((8, 9), 0.3, altitude_noise=0.5, **kw),
+            lambda **kw: t_maze(2, 3, **kw),
+            lambda **kw: radial_arm_maze(6, 2, num_baited=2, **kw),
+        ]
+        for generator in generators:
+            worlds = generator(num_worlds=5, rng=0)
+            self.assertEqual(len(worlds), 5)
+            for C in worlds:
+                self.assertIsInstance(C, CompiledWorld)
+                self.assertEqual(from_spec(to_spec(C)).compile().fingerprint(), C.fingerprint())
+                self.assertEqual(_num_open_components(C), 1)
+                self.assertFalse(np.any(C.blocked[C.terminal]))
+            self.assertEqual(generator(rng=1).fingerprint(), generator(rng=1).fingerprint())
+
+    def test_layouts(self):
+        mazes = perfect_maze((11, 15), num_worlds=20, rng=0)
+        self.assertEqual(len(set(C.fingerprint() for C in mazes)), 20)
+        for C in mazes:
+            # A spanning tree of the 6 x 8 cells has 47 edges.
+            self.assertEqual(np.sum(~C.blocked), 6 * 8 + 47)
+
+        C = rooms_world((11, 11), rooms=(2, 2), num_objects=0, rng=0)
+        blocked = C.blocked.reshape(11, 11)
+        self.assertEqual(blocked.sum(), 21 - 4)
+        self.assertEqual(C.object_reward.size, 0)
+
+        C = open_field((6, 6), 0.0, rng=0)
+        self.assertFalse(np.any(C.blocked))
+        self.assertTrue(np.all(C.altitude == 0))
+
+        # Dense fields keep one region, worlds without any are sampled again.
+        fields = open_field((3, 3), 0.7, num_worlds=200, rng=0)
+        for F in fields:
+            self.assertTrue(0 < np.sum(~F.blocked) < 9)
+            self.assertEqual(_num_open_components(F), 1)
+            self.assertFalse(F.blocked[F.terminal].any())
+
+        mazes = t_maze(3, 2, num_worlds=50, reward=2, rng=0)
+        ends = [C.state_index((0, 0, 0)), C.state_index((0, 0, 4))]
+        for C in mazes:
+            self.assertEqual(sorted(C.object_reward), [0, 2])
+            self.assertTrue(np.all(C.terminal[ends]))
+        self.assertTrue(0 < np.mean([C.object_reward[0] for C in mazes]) < 2)
+
+        C = radial_arm_maze(8, 3, num_baited=3, rng=0)
+        self.assertEqual(len(C.area_shapes), 9)
+        self.assertEqual(C.num_states, 4 + 8 * 3)
+        self.assertEqual(C.terminal.sum(), 3)
+        self.assertTrue(np.all(C.coords[C.terminal, 0] > 0))
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            perfect_maze((4, 5))
+        with self.assertRaises(ValueError):
+            rooms_world((4, 4), rooms=(3, 1))
+        with self.assertRaises(ValueError):
+            open_field((3, 3), obstacle_density=1)
+        with self.assertRaises(ValueError):
+            perfect_maze((3, 3), num_objects=8)
+        with self.assertRaises(ValueError):
+            radial_arm_maze(4, num_baited=5)
+        with self.assertRaises(ValueError):
+            t_maze(num_worlds=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
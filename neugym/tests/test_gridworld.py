@@ -484,7 +484,259 @@ class TestGridWorldFunction(unittest.TestCase):
         W.unblock((1, 0, 0))
         next_state, *_ = W.step((1, 0))
         self.assertEqual(next_state, (1, 0, 0))
-    
+
+    def test_schedule_event(self):
+        # Test scheduled environment modifications.
+        W = GridWorld()
+        W.add_area((1, 3))
+        W.add_path((0, 0, 0), (1, 0, 1))
+        W.add_object((1, 0, 0), 1, 1)
+        W.init_agent()
+        with self.assertRaises(ValueError):
+            W.schedule_event(1, "init_agent")
+        with self.assertRaises(ValueError):
+            W.schedule_event(1, "block", (1, 0, 2), unit="episode")
+
+        W.schedule_event(2, "block", (1, 0, 2))
+        W.schedule_event(1, "update_object", (1, 0, 0), unit="trial", reward=-1)
+        W.schedule_event(1, "block", (0, 0, 0))
+        self.assertEqual(len(W.get_scheduled_events()), 3)
+        W.set_reset_checkpoint()
+
+        for _ in range(2):
+            # Blocking the agent state is ignored.
+            with self.assertWarns(RuntimeWarning):
+                W.step((0, 0))
+            self.assertFalse(W._world.nodes[(0, 0, 0)]['blocked'])
+            W.step((1, 0))
+            self.assertTrue(W._world.nodes[(1, 0, 2)]['blocked'])
+            self.assertEqual(W.get_object_attribute((1, 0, 0), 'reward'), 1)
+            _, r, d = W.step((0, -1))
+            self.assertEqual((r, d), (1, True))
+            self.assertEqual(W.num_trial, 1)
+            self.assertEqual(W.get_object_attribute((1, 0, 0), 'reward'), -1)
+            self.assertEqual(len(W.get_scheduled_events()), 0)
+
+            # Pending events are restored on reset.
+            W.reset()
+            self.assertEqual(W.num_trial, 0)
+            self.assertEqual(len(W.get_scheduled_events()), 3)
+            self.assertFalse(W._world.nodes[(1, 0, 2)]['blocked'])
+
+        W.clear_events()
+        self.assertEqual(W.get_scheduled_events(), [])
+
+    def test_reachability(self):
+        # Test reachability queries.
+        W = GridWorld()
+        W.add_area((3, 3))
+        W.add_path((0, 0, 0), (1, 0, 0))
+        W.add_area((2, 2))
+        W.add_object((1, 2, 2), 1, 1)
+        W.add_object((2, 1, 1), 1, 1)
+        with self.assertRaises(ValueError):
+            W.is_reachable((0, 0, 0), (3, 0, 0))
+        self.assertTrue(W.is_reachable((0, 0, 0), (1, 2, 2)))
+        self.assertFalse(W.is_reachable((0, 0, 0), (2, 0, 0)))
+        self.assertEqual(W.get_unreachable_objects(), [(2, 1, 1)])
+
+        W.add_path((1, 2, 2), (2, 0, 0))
+        self.assertEqual(W.get_unreachable_objects(), [])
+        W.block((1, 1, 2))
+        W.block((1, 2, 1))
+        self.assertFalse(W.is_reachable((0, 0, 0), (2, 1, 1)))
+        self.assertEqual(W.get_unreachable_objects((2, 0, 0)), [])
+        W.unblock((1, 1, 2))
+        self.assertTrue(W.is_reachable((0, 0, 0), (2, 1, 1)))
+        W.remove_path((1, 2, 2), (2, 0, 0))
+        self.assertEqual(W.get_unreachable_objects(), [(2, 1, 1)])
+        W.add_area((1, 1))
+        W.add_path((3, 0, 0), (2, 0, 0))
+        W.add_path((3, 0, 0), (1, 0, 2))
+        self.assertTrue(W.is_reachable((0, 0, 0), (2, 1, 1)))
+        W.remove_area(1)
+        self.assertFalse(W.is_reachable((0, 0, 0), (1, 1, 1)))
+
+        # Compare with graph search on random mazes.
+        rng = np.random.default_rng(0)
+        for _ in range(20):
+            W = GridWorld((5, 5))
+            W.add_area((4, 4))
+            W.add_path((0, 4, 4), (1, 0, 0))
+            coords = list(W._world.nodes)
+            for _ in range(15):
+                coord = coords[rng.integers(len(coords))]
+                if rng.random() < 0.7:
+                    W.block(coord)
+                else:
+                    W.unblock(coord)
+                a, b = (coords[i] for i in rng.integers(len(coords), size=2))
+                G = W._world.subgraph([c for c in coords if not W._world.nodes[c]['blocked']])
+                expected = a == b or (a in G and b in G and nx.has_path(G, a, b))
+                self.assertEqual(W.is_reachable(a, b), expected)
+
+        # Partial action sets do not move along all the edges of the graph.
+        W = GridWorld((2, 1), actions=[(0, 0), (1, 0), (-1, 0)])
+        self.assertTrue(W.is_reachable((0, 0, 0), (0, 1, 0)))
+        W.add_area((1, 3))
+        self.assertFalse(W.is_reachable((1, 0, 0), (1, 0, 2)))
+        W = GridWorld((1, 3), actions=[(0, 0), (1, 0), (-1, 0)])
+        self.assertFalse(W.is_reachable((0, 0, 0), (0, 0, 1)))
+        W.block((0, 0, 1))
+        W.unblock((0, 0, 1))
+        self.assertFalse(W.is_reachable((0, 0, 0), (0, 0, 2)))
+        W.add_area((2, 1))
+        W.add_path((0, 0, 0), (1, 1, 0))
+        self.assertTrue(W.is_reachable((0, 0, 0), (1, 0, 0)))
+        self.assertFalse(W.is_reachable((0, 0, 2), (1, 0, 0)))
+
+    def test_area_graph(self):
+        # Test area-level graph, doorways and routes.
+        W = GridWorld()
+        W.add_area((2, 2))
+        W.add_path((0, 0, 0), (1, 0, 0))
+        W.add_area((2, 2), name="Right")
+        W.add_path((1, 1, 1), (2, 0, 0), register_action=(0, 1))
+        W.add_path((2, 1, 0), (1, 0, 1), register_action=(0, -1))
+        W.add_area((1, 1))
+        G = W.area_graph
+        self.assertEqual(set(G.nodes), {0, 1, 2, 3})
+        self.assertEqual(set(G.edges), {(0, 1), (1, 2)})
+        self.assertEqual(W.get_doorways(1, "Right"),
+                         [((1, 1, 1), (0, 1), (2, 0, 0)), ((1, 0, 1), (0, 1), (2, 1, 0))])
+        self.assertEqual(W.get_doorways(2, 1)[0], ((2, 0, 0), (0, -1), (1, 1, 1)))
+        self.assertEqual(W.get_doorways(0, 2), [])
+        self.assertEqual(W.get_area_route(0, "Right"), [0, 1, 2])
+        with self.assertRaises(ng.NeuGymConnectivityError):
+            W.get_area_route(0, 3)
+
+        W.add_path((0, 0, 0), (2, 1, 1))
+        self.assertEqual(W.get_area_route(0, 2), [0, 2])
+        W.remove_path((2, 1, 1), (0, 0, 0))
+        W.remove_path((1, 1, 1), (2, 0, 0))
+        self.assertEqual(W.get_area_route(0, 2), [0, 1, 2])
+        W.remove_path((2, 1, 0), (1, 0, 1))
+        with self.assertRaises(ng.NeuGymConnectivityError):
+            W.get_area_route(0, 2)
+
+        # Area graph follows area removal and reset.
+        W.add_path((3, 0, 0), (2, 0, 0))
+        W.set_reset_checkpoint()
+        W.remove_area(1)
+        self.assertEqual(set(W.area_graph.edges), {(1, 2)})
+        self.assertEqual(W.get_doorways(2, 1), [((2, 0, 0), (1, 0), (1, 0, 0))])
+        W.reset()
+        self.assertEqual(set(W.area_graph.edges), {(0, 1), (2, 3)})
+        self.assertEqual(W.get_area_route(3, "Right"), [3, 2])
+        self.assertTrue("(3, 0, 0) + (1, 0) -> (2, 0, 0)" not in str(W))
+        self.assertTrue("(2, 0, 0) + (-1, 0) -> (3, 0, 0)" in str(W))
+
+    def test_actions(self):
+        # Test configurable action spaces.
+        with self.assertRaises(ValueError):
+            GridWorld(actions="king")
+        with self.assertRaises(ValueError):
+            GridWorld(actions=[(0, 0), (1, 1)])
+        with self.assertRaises(ValueError):
+            GridWorld(actions=[(1, 0), (-1, 0), (1, 0)])
+        with self.assertRaises(TypeError):
+            GridWorld(actions=[1, 2])
+
+        W = GridWorld((3, 3), actions="moore")
+        self.assertEqual(len(W.actions), 9)
+        W.block((0, 1, 1))
+        W.init_agent((0, 0, 0))
+        self.assertEqual(W.step((1, 1))[0], (0, 0, 0))
+        self.assertEqual(W.step((0, 1))[0], (0, 0, 1))
+        self.assertEqual(W.step((1, 1))[0], (0, 1, 2))
+        with self.assertRaises(ValueError):
+            W.step((2, 0))
+        with self.assertRaises(ValueError):
+            W.set_transition_kernel(0, np.eye(5))
+
+        # Diagonal doorways, and reachability through diagonal moves only.
+        W.add_area((2, 2))
+        W.add_path((0, 2, 2), (1, 0, 0), register_action=(1, 1))
+        self.assertEqual(W.get_doorways(0, 1), [((0, 2, 2), (1, 1), (1, 0, 0))])
+        W.block((1, 0, 1))
+        W.block((1, 1, 0))
+        self.assertTrue(W.is_reachable((0, 0, 0), (1, 1, 1)))
+        W.block((1, 1, 1))
+        W.unblock((1, 1, 1))
+        self.assertTrue(W.is_reachable((1, 1, 1), (0, 0, 0)))
+        self.assertEqual(W.step((1, 0))[0], (0, 2, 2))
+        self.assertEqual(W.step((1, 1))[0], (1, 0, 0))
+        self.assertEqual(W.step((-1, -1))[0], (0, 2, 2))
+        W.remove_path((0, 2, 2), (1, 0, 0))
+        self.assertFalse(W.is_reachable((0, 0, 0), (1, 1, 1)))
+
+        # Jumps over one state.
+        W = GridWorld((1, 5), actions=[(0, 2), (0, -2), (0, 0)])
+        W.add_area((1, 1))
+        W.add_path((0, 0, 4), (1, 0, 0))
+        self.assertEqual(W.get_doorways(0, 1), [((0, 0, 4), (0, 2), (1, 0, 0))])
+        W.init_agent((0, 0, 0))
+        self.assertEqual(W.step((0, 2))[0], (0, 0, 2))
+        self.assertEqual(W.step((0, 2))[0], (0, 0, 4))
+        self.assertEqual(W.step((0, 2))[0], (1, 0, 0))
+        self.assertFalse(W.is_reachable((0, 0, 0), (0, 0, 1)))
+
+        # Compiled lookup tables follow the action space.
+        W = GridWorld((3, 4), actions="moore")
+        W.add_area((2, 2))
+        W.add_path((0, 2, 3), (1, 0, 0), register_action=(1, 1))
+        W.block((0, 1, 2))
+        W.add_object((1, 1, 1), reward=1, prob=1)
+        C = W.compile()
+        self.assertEqual(C.actions, W.actions)
+        for s in np.flatnonzero(~C.blocked):
+            for a, action in enumerate(W.actions):
+                W.init_agent(C.state_coord(s), overwrite=True)
+                self.assertEqual(W.step(action)[0], C.state_coord(C.next_state[s, a]))
+
+    def test_memory(self):
+        # Test memory report.
+        W = GridWorld((20, 20))
+        W.add_object((0, 5, 5), reward=1, prob=1)
+        report = W.memory_report()
+        self.assertLess(report["reset_checkpoint"], 0.1 * report["world"])
+        self.assertEqual(report["compiled"], 0)
+        self.assertEqual(report["total"], sum(v for k, v in report.items() if k != "total"))
+        W.set_reset_checkpoint()
+        W.compile()
+        report = W.memory_report()
+        self.assertGreater(report["reset_checkpoint"], 0.5 * report["world"])
+        self.assertGreater(report["compiled"], 0)
+
+        # Test memory estimate.
+        small = GridWorld.estimate_memory([(1, 1), (10, 10)])
+        large = GridWorld.estimate_memory([(1, 1), (100, 100)])
+        self.assertGreater(large, 50 * small)
+        self.assertGreater(GridWorld.estimate_memory([(10, 10)], reset_checkpoint=True,
+                                                     compiled=True),
+                           2 * GridWorld.estimate_memory([(10, 10)]))
+
+        # Test memory budget.
+        with self.assertRaises(ValueError):
+            W.set_memory_budget(1000, on_exceed="ignore")
+        with self.assertRaises(ValueError):
+            W.set_memory_budget(0)
+        W = GridWorld()
+        W.set_memory_budget(GridWorld.estimate_memory([(1, 1), (50, 50)]) * 1.1)
+        W.add_area((50, 50))
+        with self.assertRaises(ng.NeuGymMemoryError):
+            W.add_area((20, 20))
+        self.assertEqual(W.num_area, 1)
+        with self.assertRaises(ng.NeuGymMemoryError):
+            W.set_reset_checkpoint()
+        self.assertFalse(W.has_reset_checkpoint)
+        W.set_memory_budget(W._estimated_bytes() * 1.1, on_exceed="warn")
+        with pytest.warns(RuntimeWarning):
+            W.set_reset_checkpoint()
+        self.assertTrue(W.has_reset_checkpoint)
+        W.set_memory_budget(None)
+        W.add_area((10, 10))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,120 @@
+import tempfile
+import unittest
+
+import numpy as np
+from neugym.algorithms import BehaviorData, MaxEntIRL, state_features
+from neugym.environment import GridWorld
+from neugym.utils import WorldCache
+
+
+def _build_world():
+    W = GridWorld((4, 4))
+    W.add_area((2, 2))
+    W.add_path((0, 3, 3), (1, 0, 0))
+    W.add_object((1, 1, 1), reward=1, prob=1)
+    W.set_altitude(0, np.arange(16, dtype=float).reshape(4, 4) / 16)
+    return W
+
+
+def _sample(C, policy, num_trials, rng, max_steps=40):
+    # Trials from state 0 following a policy, as visited states and steps.
+    trajectories, steps = [], []
+    for _ in range(num_trials):
+        state = 0
+        trajectory = [state]
+        for t in range(max_steps):
+            action = rng.choice(C.num_actions, p=policy[state])
+            next_state = C.step([state], [action], rng)[0][0]
+            done = C.terminal[next_state] or t == max_steps - 1
+            steps.append((state, action, next_state, done))
+            trajectory.append(next_state)
+            state = next_state
+            if done:
+                break
+        trajectories.append(trajectory)
+    return trajectories, steps
+
+
+class TestMaxEntIRL(unittest.TestCase):
+    """Test maximum-entropy inverse reinforcement learning."""
+    def test_state_features(self):
+        W = _build_world()
+        C = W.compile()
+        phi, names = state_features(W)
+        self.assertEqual(names, ["altitude", "object_proximity", "area_0", "area_1"])
+        self.assertEqual(phi.shape, (C.num_states, 4))
+        np.testing.assert_allclose(phi[:, 0], C.altitude)
+        proximity = phi[C.state_indices([(1, 1, 1), (1, 0, 0), (0, 3, 3), (0, 0, 0)]), 1]
+        np.testing.assert_allclose(proximity, [1, 1 / 3, 1 / 4, 1 / 10])
+        np.testing.assert_array_equal(phi[:, 2:].sum(axis=1), 1)
+        with self.assertRaises(ValueError):
+            state_features(W, ["speed"])
+
+    def test_fit(self):
+        W = _build_world()
+        C = W.compile()
+        irl = MaxEntIRL(W, features=("altitude", "object_proximity"), gamma=0.9)
+        true_weights = np.array([[-1.0, 4.0]])
+        values, policy = irl.soft_value_iteration(true_weights @ irl.phi.T)
+        self.assertEqual(policy.shape, (1, C.num_states, C.num_actions))
+        np.testing.assert_allclose(policy.sum(axis=2), 1)
+
+        rng = np.random.default_rng(0)
+        trajectories, _ = _sample(C, policy[0], 300, rng)
+        weights = irl.fit(trajectories, num_iter=500)
+        self.assertLess(irl.gradient_norms[-1][0], 1e-2)
+        np.testing.assert_allclose(weights, true_weights, atol=0.5)
+        self.assertEqual(irl.rewards().shape, (1, C.num_states))
+        self.assertEqual(irl.policy().shape, (1, C.num_states, C.num_actions))
+
+        # Expected visitation frequencies sum to the mean trial length.
+        empirical, start, survival = irl._demonstration_stats(trajectories, False)
+        frequencies = irl.state_visitation(policy, start, survival)
+        self.assertAlmostEqual(empirical.sum(), survival.sum())
+        self.assertLessEqual(frequencies.sum(), survival.sum() + 1e-9)
+
+    def test_fit_by_subject(self):
+        W = _build_world()
+        C = W.compile()
+        irl = MaxEntIRL(C, features=("object_proximity",), gamma=0.9)
+        rng = np.random.default_rng(1)
+        records = []
+        for w in [3.0, -3.0]:
+            policy = irl.soft_value_iteration(w * irl.phi[:, 0])[1][0]
+            records.append(_sample(C, policy, 100, rng)[1])
+
+        num_steps = max(len(r) for r in records)
+        arrays = np.zeros((5, 2, num_steps), dtype=np.int64)
+        for i, record in enumerate(records):
+            arrays[:4, i, :len(record)] = np.array(record).T
+            arrays[4, i, :len(record)] = 1
+        data = BehaviorData(arrays[0], arrays[1], np.zeros((2, num_steps)), arrays[2],
+                            arrays[3].astype(bool), arrays[4].astype(bool))
+        weights = irl.fit(data, by_subject=True, num_iter=300)
+        self.assertEqual(weights.shape, (2, 1))
+        self.assertGreater(weights[0, 0], 1)
+        self.assertLess(weights[1, 0], -1)
+
+        with self.assertRaises(ValueError):
+            irl.fit([[0, 1]], by_subject=True)
+        with self.assertRaises(ValueError):
+            irl.fit([[0, C.num_states]])
+        with self.assertRaises(ValueError):
+            MaxEntIRL(C, features=np.zeros((3, 2)))
+        with self.assertRaises(RuntimeError):
+            MaxEntIRL(C).rewards()
+
+    def test_cache(self):
+        W = _build_world()
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = WorldCache(cache_dir)
+            irl = MaxEntIRL(W, cache=cache)
+            np.testing.assert_array_equal(irl.compiled.next_state, W.compile().next_state)
+            cached = MaxEntIRL(_build_world(), cache=cache)
+            np.testing.assert_array_equal(cached.phi, irl.phi)
+            with self.assertRaises(ValueError):
+                MaxEntIRL(W.compile(), cache=cache)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+
+import numpy as np
+from neugym.algorithms import BatchedLearner
+from neugym.environment import GridWorld
+
+
+class TestBatchedLearner(unittest.TestCase):
+    """Test batched tabular learners."""
+    def _build_world(self):
+        W = GridWorld((3, 4))
+        W.add_object((0, 2, 3), reward=1, prob=1)
+        W.init_agent()
+        return W
+
+    def test_learners(self):
+        W = self._build_world()
+        C = W.compile()
+        start = C.state_index((0, 0, 0))
+        optimal = [C.action_index((1, 0)), C.action_index((0, 1))]
+        for kwargs in [dict(algorithm="q_learning"),
+                       dict(algorithm="sarsa", epsilon=[0.05, 0.1, 0.2, 0.3]),
+                       dict(algorithm="sarsa", lam=0.8),
+                       dict(algorithm="q_learning", lam=0.8, exploration="softmax", beta=20),
+                       dict(algorithm="q_learning", planning_steps=5)]:
+            learner = BatchedLearner(W, 4, alpha=0.5, gamma=0.9, rng=0, **kwargs)
+            rewards, dones = learner.run(3000)
+            self.assertEqual(rewards.shape, (3000, 4))
+            np.testing.assert_array_equal(rewards > 0, dones)
+            self.assertTrue(np.all(dones[-200:].sum(axis=0) > 20))
+            self.assertTrue(np.all(learner.q_values[:, start].max(axis=1) > 0))
+
+        learner = BatchedLearner(W, 4, gamma=0.9, epsilon=0.5, planning_steps=20, rng=0)
+        learner.run(1000)
+        self.assertTrue(np.all(np.isin(learner.greedy_policy()[:, start], optimal)))
+
+        learner = BatchedLearner(W, 2, rng=0)
+        self.assertEqual(learner.q_values.shape, (2, C.num_states, C.num_actions))
+        prob = learner.action_probabilities(learner.states)
+        np.testing.assert_allclose(prob, 1 / C.num_actions)
+
+        # Per-agent hyperparameters.
+        learner = BatchedLearner(W, 3, alpha=[0, 0.5, 1], epsilon=1, rng=0)
+        learner.run(200)
+        self.assertTrue(np.all(learner.q_values[0] == 0))
+        self.assertTrue(np.any(learner.q_values[2] > 0))
+        learner.reset()
+        np.testing.assert_array_equal(learner.states, start)
+
+        with self.assertRaises(ValueError):
+            BatchedLearner(W, 2, algorithm="td")
+        with self.assertRaises(ValueError):
+            BatchedLearner(W, 2, exploration="greedy")
+        with self.assertRaises(ValueError):
+            BatchedLearner(W, 2, alpha=[0.1, 0.2, 0.3])
+
+    def test_sequential_reference(self):
+        # Batched updates match one agent at a time on the same transitions.
+        W = self._build_world()
+        C = W.compile()
+        alpha, gamma, lam = [0.1, 0.5, 0.9], [0.9, 0.8, 0.95], [0.5, 0.8, 0.0]
+        for algorithm, trace in [("q_learning", False), ("sarsa", True)]:
+            learner = BatchedLearner(W, 3, algorithm=algorithm, alpha=alpha, gamma=gamma,
+                                     lam=lam if trace else 0, epsilon=0.3, rng=0)
+            q = np.zeros((3, C.num_states, C.num_actions))
+            e = np.zeros_like(q)
+            for _ in range(300):
+                if learner.actions is None:
+                    learner.actions = learner.select_actions(learner.states)
+                states, actions = learner.states.copy(), learner.actions.copy()
+                rewards, dones = learner.step()
+                for i in range(3):
+                    s, a = states[i], actions[i]
+                    s_next = C.next_state[s, a]
+                    if dones[i]:
+                        target = rewards[i]
+                    elif algorithm == "q_learning":
+                        target = rewards[i] + gamma[i] * q[i, s_next].max()
+                    else:
+                        target = rewards[i] + gamma[i] * q[i, s_next, learner.actions[i]]
+                    delta = target - q[i, s, a]
+                    if trace:
+                        e[i, s, a] += 1
+                        q[i] += alpha[i] * delta * e[i]
+                        e[i] *= 0 if dones[i] else gamma[i] * lam[i]
+                    else:
+                        q[i, s, a] += alpha[i] * delta
+            self.assertGreater(np.abs(q).sum(), 0)
+            np.testing.assert_allclose(learner.q_values, q)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+
+import numpy as np
+from neugym.algorithms import BehaviorData, choice_log_likelihood
+from neugym.environment import GridWorld
+
+
+class TestChoiceLogLikelihood(unittest.TestCase):
+    """Test choice log-likelihood of learning models."""
+    def _build_world(self):
+        W = GridWorld((2, 3))
+        W.add_object((0, 1, 2), reward=1, prob=1)
+        W.init_agent()
+        return W
+
+    def _record(self, W, num_steps, seed):
+        rng = np.random.default_rng(seed)
+        record = []
+        state = W.get_agent_state()
+        for _ in range(num_steps):
+            action = W.actions[rng.integers(len(W.actions))]
+            next_state, reward, done = W.step(action)
+            record.append((state, action, reward))
+            state = W.get_agent_state()
+        W.init_agent(overwrite=True)
+        return record
+
+    def _naive(self, C, record, alpha, beta, gamma):
+        q = np.zeros((C.num_states, C.num_actions))
+        log_prob = []
+        for t, (state, action, reward) in enumerate(record):
+            s, a = C.state_index(state), C.action_index(action)
+            logits = beta * q[s]
+            log_prob.append(logits[a] - np.log(np.exp(logits).sum()))
+            if t + 1 < len(record) and not C.terminal[C.next_state[s, a]] and \
+                    C.state_index(record[t + 1][0]) in C.next_state[s]:
+                target = reward + gamma * q[C.state_index(record[t + 1][0])].max()
+            else:
+                target = reward
+            q[s, a] += alpha * (target - q[s, a])
+        return np.array(log_prob)
+
+    def test_from_records(self):
+        W = self._build_world()
+        C = W.compile()
+        records = [self._record(W, 30, 0), self._record(W, 20, 1), []]
+        data = BehaviorData.from_records(W, records)
+        self.assertEqual((data.num_subjects, data.num_steps), (3, 30))
+        np.testing.assert_array_equal(data.mask.sum(axis=1), [30, 20, 0])
+        np.testing.assert_array_equal(data.dones[0, :-1], data.rewards[0, :-1] > 0)
+        self.assertEqual(data.states[0, 0], C.state_index((0, 0, 0)))
+
+        # Object next to the initial state, the next trial starts one move away.
+        W = GridWorld((1, 2))
+        W.add_object((0, 0, 1), reward=1, prob=1)
+        records = [[((0, 0, 0), (0, 1), 1), ((0, 0, 0), (0, 1), 1), ((0, 0, 0), (0, 0), 0)]]
+        data = BehaviorData.from_records(W, records)
+        np.testing.assert_array_equal(data.dones, [[True, True, True]])
+        np.testing.assert_array_equal(data.next_states, [[1, 1, 0]])
+        records = [[step + (False,) for step in records[0]]]
+        data = BehaviorData.from_records(W, records)
+        np.testing.assert_array_equal(data.dones, [[False, False, True]])
+        np.testing.assert_array_equal(data.next_states, [[0, 0, 0]])
+
+        with self.assertRaises(ValueError):
+            BehaviorData(np.zeros((2, 3)), np.zeros((2, 3)), np.zeros((2, 3)),
+                         np.zeros((2, 3)), np.zeros((2, 4)))
+
+    def test_choice_log_likelihood(self):
+        W = self._build_world()
+        C = W.compile()
+        records = [self._record(W, 60, i) for i in range(4)]
+        data = BehaviorData.from_records(W, records)
+
+        alpha = np.array([0.1, 0.5, 0.9])
+        log_prob = choice_log_likelihood(W, data, alpha=alpha, beta=2.0, gamma=0.9)
+        self.assertEqual(log_prob.shape, (3, 4, 60))
+        for p in range(3):
+            for m in range(4):
+                expected = self._naive(C, records[m], alpha[p], 2.0, 0.9)
+                np.testing.assert_allclose(log_prob[p, m], expected)
+
+        # Chunked replay and per-subject parameters.
+        chunked = choice_log_likelihood(C, data, alpha=alpha, beta=2.0, gamma=0.9, chunk_size=3)
+        np.testing.assert_allclose(chunked, log_prob)
+        per_subject = choice_log_likelihood(W, data, alpha=np.tile(alpha[:, None], (1, 4)),
+                                            beta=[2.0], gamma=0.9)
+        np.testing.assert_allclose(per_subject, log_prob)
+
+        # Without learning, choices are uniform.
+        log_prob = choice_log_likelihood(W, data, alpha=0, beta=5.0, algorithm="sarsa")
+        np.testing.assert_allclose(log_prob, -np.log(C.num_actions))
+
+        with self.assertRaises(ValueError):
+            choice_log_likelihood(W, data, alpha=np.zeros((2, 3)), beta=1.0)
+        with self.assertRaises(ValueError):
+            choice_log_likelihood(W, data, alpha=0.1, beta=1.0, algorithm="td")
+
+
+if __name__ == '__main__':
+    unittest.main()
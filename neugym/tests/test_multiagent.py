@@ -0,0 +1,107 @@
+import unittest
+
+import numpy as np
+import neugym as ng
+from neugym.environment import MultiAgentGridWorld
+
+
+class TestMultiAgentGridWorld(unittest.TestCase):
+    """Test MultiAgentGridWorld environment."""
+    def test_init_agents(self):
+        with self.assertRaises(ValueError):
+            MultiAgentGridWorld(collision="undefined")
+
+        W = MultiAgentGridWorld((2, 2))
+        self.assertEqual(W.num_agents, 0)
+        with self.assertRaises(ValueError):
+            W.init_agents([(0, 0, 0), (0, 2, 2)])
+        with self.assertRaises(RuntimeError):
+            W.init_agents([(0, 0, 0), (0, 0, 0)])
+        W.block((0, 1, 1))
+        with self.assertRaises(RuntimeError):
+            W.init_agents([(0, 1, 1)])
+        W.init_agents([(0, 0, 0), (0, 0, 1)])
+        self.assertEqual(W.num_agents, 2)
+        with self.assertRaises(ng.NeuGymOverwriteError):
+            W.init_agents([(0, 0, 0)])
+        with self.assertRaises(RuntimeError):
+            W.block((0, 0, 1))
+        with self.assertRaises(ng.NeuGymPermissionError):
+            W.init_agent()
+
+        W = MultiAgentGridWorld((2, 2), collision="share")
+        W.init_agents([(0, 0, 0), (0, 0, 0)])
+        np.testing.assert_array_equal(W.get_agent_states("init"), [[0, 0, 0], [0, 0, 0]])
+
+    def test_block_collision(self):
+        W = MultiAgentGridWorld((1, 4), collision="block", rng=0)
+        W.init_agents([(0, 0, 0), (0, 0, 1), (0, 0, 3)])
+        with self.assertRaises(ValueError):
+            W.step([(0, 1), (0, 1)])
+
+        # Agent 0 follows agent 1, agent 2 contests the state with agent 1.
+        next_states, _, _ = W.step([(0, 1), (0, 1), (0, -1)])
+        occupied = [tuple(s) for s in next_states.tolist()]
+        self.assertEqual(len(set(occupied)), 3)
+        self.assertTrue((0, 0, 2) in occupied)
+
+        # Swapping is not allowed.
+        W.init_agents([(0, 0, 1), (0, 0, 2)], overwrite=True)
+        next_states, _, _ = W.step([(0, 1), (0, -1)])
+        np.testing.assert_array_equal(next_states, [[0, 0, 1], [0, 0, 2]])
+
+        # Entering a state held by an agent that stays.
+        next_states, _, _ = W.step([(0, 1), (0, 0)])
+        np.testing.assert_array_equal(next_states, [[0, 0, 1], [0, 0, 2]])
+
+        # Rotation is allowed.
+        W = MultiAgentGridWorld((2, 2), collision="block")
+        W.init_agents([(0, 0, 0), (0, 0, 1), (0, 1, 1), (0, 1, 0)])
+        next_states, _, _ = W.step([(0, 1), (1, 0), (0, -1), (-1, 0)])
+        np.testing.assert_array_equal(next_states, [[0, 0, 1], [0, 1, 1], [0, 1, 0], [0, 0, 0]])
+
+    def test_swap_and_share_collision(self):
+        W = MultiAgentGridWorld((1, 3), collision="swap")
+        W.init_agents([(0, 0, 0), (0, 0, 1), (0, 0, 2)])
+        next_states, _, _ = W.step([(0, 1), (0, -1), (0, -1)])
+        np.testing.assert_array_equal(next_states, [[0, 0, 0], [0, 0, 1], [0, 0, 1]])
+
+        W = MultiAgentGridWorld((1, 2), collision="share")
+        W.init_agents([(0, 0, 0), (0, 0, 1)])
+        next_states, _, _ = W.step(np.array([3, 4]))
+        np.testing.assert_array_equal(next_states, [[0, 0, 1], [0, 0, 0]])
+
+    def test_objects(self):
+        W = MultiAgentGridWorld((1, 3), collision="share", consume_objects=True)
+        W.set_altitude(0, np.array([[0., 0., 1.]]))
+        W.add_object((0, 0, 1), 10, 1)
+        W.init_agents([(0, 0, 0), (0, 0, 2), (0, 0, 0)])
+        W.set_reset_checkpoint()
+        next_states, rewards, dones = W.step([(0, 1), (0, -1), (0, 0)])
+        np.testing.assert_array_equal(dones, [True, True, False])
+        np.testing.assert_array_equal(rewards, [10, 11, 0])
+        np.testing.assert_array_equal(W.get_agent_states(), [[0, 0, 0], [0, 0, 2], [0, 0, 0]])
+
+        # Consumed objects give nothing to the same agent.
+        next_states, rewards, dones = W.step([(0, 1), (0, 0), (0, 1)])
+        np.testing.assert_array_equal(dones, [False, False, True])
+        np.testing.assert_array_equal(rewards, [0, 0, 10])
+        self.assertEqual(W.time, 2)
+
+        W.reset()
+        self.assertEqual(W.time, 0)
+        self.assertFalse(W._agents.consumed.any())
+
+    def test_many_agents(self):
+        W = MultiAgentGridWorld((20, 20), collision="block", rng=1)
+        coords = [(0, x, y) for x in range(0, 20, 2) for y in range(0, 20, 2)]
+        W.init_agents(coords)
+        rng = np.random.default_rng(0)
+        for _ in range(50):
+            W.step(rng.integers(0, 5, W.num_agents))
+            states = W.get_agent_states()
+            self.assertEqual(len(np.unique(states, axis=0)), W.num_agents)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+
+import numpy as np
+from neugym.algorithms import OptionModels
+from neugym.environment import GridWorld, slip_kernel
+
+
+class TestOptionModels(unittest.TestCase):
+    """Test option models of gridworld areas."""
+    def _build_world(self):
+        W = GridWorld()
+        W.add_area((1, 5))
+        W.add_path((0, 0, 0), (1, 0, 0), register_action=(0, 1))
+        W.add_area((1, 1))
+        W.add_path((1, 0, 4), (2, 0, 0), register_action=(0, 1))
+        W.set_altitude(1, np.array([[0., 1., 2., 3., 4.]]))
+        return W
+
+    def test_deterministic(self):
+        W = self._build_world()
+        models = OptionModels(W, gamma=0.5, max_duration=10)
+        M = models[1]
+        C = W.compile()
+        left, right = C.state_index((1, 0, 0)), C.state_index((1, 0, 4))
+        np.testing.assert_array_equal(M.subgoals, [left, right])
+        self.assertEqual(set(M.outcomes), {left, right, C.state_index((0, 0, 0)),
+                                           C.state_index((2, 0, 0))})
+
+        # Walking down the slope from right to left.
+        self.assertAlmostEqual(M.reward[1, 0], 1 + 0.5 + 0.25 + 0.125)
+        self.assertAlmostEqual(M.termination[1, 0, 0], 0.5 ** 4)
+        self.assertAlmostEqual(M.duration[1, 0, 4], 1)
+        self.assertAlmostEqual(M.reward[0, 1], -(1 + 0.5 + 0.25 + 0.125))
+        self.assertAlmostEqual(M.duration[0, 0, 0], 1)
+        self.assertAlmostEqual(M.termination[0, 0, 0], 1)
+
+    def test_stochastic(self):
+        W = self._build_world()
+        W.add_object((1, 0, 2), 1, 1)
+        W.set_transition_kernel(1, slip_kernel(W.actions, 0.2))
+        M = OptionModels(W, gamma=0.9, max_duration=200)[1]
+        self.assertEqual(len(M.subgoals), 3)
+        np.testing.assert_allclose(M.duration.sum(axis=-1), 1, atol=1e-6)
+        # Going right from the left door always ends at the object.
+        goal = list(M.subgoals).index(W.compile().state_index((1, 0, 4)))
+        obj = list(M.subgoals).index(W.compile().state_index((1, 0, 2)))
+        self.assertAlmostEqual(M.termination[0, goal, goal], 0)
+        self.assertGreater(M.termination[0, goal, obj], 0)
+
+    def test_cache(self):
+        W = self._build_world()
+        W.add_area((3, 3))
+        models = OptionModels(W)
+        M1, M3 = models[1], models[3]
+        W.set_altitude(3, np.ones((3, 3)))
+        self.assertIs(models[1], M1)
+        self.assertIsNot(models[3], M3)
+        # Modifying a neighbor area invalidates the model.
+        W.block((2, 0, 0))
+        self.assertIsNot(models[1], M1)
+        M1 = models[1]
+        W.remove_area(3)
+        self.assertIsNot(models[1], M1)
+        with self.assertRaises(ValueError):
+            OptionModels(W, gamma=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
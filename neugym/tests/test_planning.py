@@ -0,0 +1,131 @@
+import unittest
+
+import numpy as np
+from neugym.algorithms import TabularModel, PrioritizedSweeping
+from neugym.environment import GridWorld, slip_kernel
+
+
+def _build_world():
+    W = GridWorld()
+    W.add_area((3, 4))
+    W.add_path((0, 0, 0), (1, 0, 0))
+    W.add_area((2, 2))
+    W.add_path((1, 2, 3), (2, 0, 0), register_action=(0, 1))
+    W.block((1, 1, 1))
+    W.add_object((2, 1, 1), 10, 0.5, punish=-1)
+    W.set_transition_kernel(1, slip_kernel(W.actions, 0.2))
+    return W
+
+
+def _value_iteration(model, gamma, num_iter=2000):
+    q = np.zeros(model.num_pairs)
+    for _ in range(num_iter):
+        v = q.reshape(model.num_states, -1).max(axis=1)
+        q = model.reward + gamma * (model.continuation * v[np.maximum(model.outcomes, 0)]).sum(1)
+    return q.reshape(model.num_states, -1)
+
+
+class TestTabularModel(unittest.TestCase):
+    """Test tabular models and their reverse transition tables."""
+    def test_exact_model(self):
+        W = _build_world()
+        C = W.compile()
+        model = TabularModel.from_world(C)
+        self.assertTrue(model.exact)
+        np.testing.assert_allclose(model.probability.sum(axis=1), 1)
+        np.testing.assert_allclose(model.reward, C.expected_reward().ravel())
+
+        # Outcome probabilities match the transition matrix.
+        P = C.transition_matrix().toarray()
+        dense = np.zeros_like(P)
+        rows = np.repeat(np.arange(model.num_pairs), model.max_outcomes)
+        filled = model.outcomes.ravel() >= 0
+        np.add.at(dense, (rows[filled], model.outcomes.ravel()[filled]),
+                  model.probability.ravel()[filled])
+        np.testing.assert_allclose(dense, P)
+
+        # Predecessors through the inter-area path.
+        door = C.state_index((2, 0, 0))
+        states, actions = model.predecessors(door)
+        pairs = set(zip(states.tolist(), actions.tolist()))
+        self.assertIn((C.state_index((1, 2, 3)), C.action_index((0, 1))), pairs)
+        expected = set(zip(*np.nonzero(P.reshape(C.num_states, -1, C.num_states)[:, :, door])))
+        self.assertEqual(pairs, expected)
+
+        with self.assertRaises(RuntimeError):
+            model.update([0], [0], [0], [0], [False])
+
+    def test_learned_model(self):
+        W = GridWorld((3, 3))
+        W.add_object((0, 2, 2), reward=1, prob=1)
+        C = W.compile()
+        exact = TabularModel.from_world(C)
+        model = TabularModel(C.num_states, C.num_actions)
+        # Threshold low enough to exercise both the pending and rebuilt tables.
+        model._rebuild_size = 7
+        states, actions = np.divmod(np.arange(model.num_pairs), C.num_actions)
+        for _ in range(2):
+            next_states, rewards, dones = C.step(states, actions, 0)
+            pairs = model.update(states, actions, rewards, next_states, dones)
+        np.testing.assert_array_equal(pairs, np.arange(model.num_pairs))
+        np.testing.assert_allclose(model.reward, exact.reward)
+        for state in range(C.num_states):
+            np.testing.assert_array_equal(np.stack(model.predecessors(state)),
+                                          np.stack(exact.predecessors(state)))
+        np.testing.assert_allclose(np.sort(model.probability, axis=1),
+                                   np.sort(exact.probability, axis=1))
+
+        # Outcomes beyond capacity.
+        model = TabularModel(C.num_states, C.num_actions, max_outcomes=1)
+        model.update(0, 0, 0, 1, False)
+        with self.assertRaises(RuntimeError):
+            model.update(0, 0, 0, 2, False)
+        with self.assertRaises(ValueError):
+            model.update(0, 0, 0, C.num_states, False)
+        with self.assertRaises(ValueError):
+            TabularModel(0, 5)
+
+
+class TestPrioritizedSweeping(unittest.TestCase):
+    """Test prioritized sweeping and Dyna planning."""
+    def test_sweep(self):
+        model = TabularModel.from_world(_build_world())
+        planner = PrioritizedSweeping(model, gamma=0.9, theta=1e-10)
+        num_updates = planner.sweep()
+        self.assertGreater(num_updates, 0)
+        self.assertEqual(planner.queue_size, 0)
+        np.testing.assert_allclose(planner.q_values, _value_iteration(model, 0.9), atol=1e-8)
+        np.testing.assert_allclose(planner.values, planner.q_values.max(axis=1))
+        self.assertEqual(planner.sweep(), 0)
+
+    def test_observe_and_plan(self):
+        W = GridWorld((1, 8))
+        W.add_object((0, 0, 7), reward=1, prob=1)
+        C = W.compile()
+        right = C.action_index((0, 1))
+        planner = PrioritizedSweeping(TabularModel(C.num_states, C.num_actions), gamma=0.5)
+
+        # Walk right once, the reward is propagated back when reaching it.
+        for state in range(6):
+            planner.observe(state, right, 0, state + 1, False)
+            self.assertEqual(planner.plan(100), 0)
+        planner.observe(6, right, 1, 7, True)
+        self.assertEqual(planner.plan(100), 7)
+        np.testing.assert_allclose(planner.q_values[:7, right], 0.5 ** np.arange(6, -1, -1))
+
+        # Dyna updates of experienced pairs only.
+        planner = PrioritizedSweeping(TabularModel(C.num_states, C.num_actions), gamma=0.5)
+        planner.observe([5, 6], [right, right], [0, 1], [6, 7], [False, True])
+        pairs = planner.dyna(50, rng=0)
+        self.assertEqual(set(pairs.tolist()), {5 * C.num_actions + right,
+                                               6 * C.num_actions + right})
+        self.assertAlmostEqual(planner.q_values[5, right], 0.5)
+
+        with self.assertRaises(ValueError):
+            PrioritizedSweeping(planner.model, gamma=2)
+        with self.assertRaises(ValueError):
+            PrioritizedSweeping(planner.model, q_values=np.zeros(3))
+
+
+if __name__ == '__main__':
+    unittest.main()
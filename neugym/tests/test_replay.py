@@ -0,0 +1,94 @@
+import io
+import unittest
+
+import numpy as np
+from neugym.algorithms import ReplayBuffer
+
+
+class TestReplayBuffer(unittest.TestCase):
+    """Test array-backed replay buffer."""
+    def test_add_and_nstep(self):
+        buffer = ReplayBuffer(8, num_envs=2, n_step=3, gamma=0.5)
+        self.assertEqual(len(buffer), 0)
+        # Steps of two environments, the first ending its trial at step 1.
+        for t in range(3):
+            buffer.add([t, 10 + t], [0, 1], [1, 2], [t + 1, 11 + t], [t == 1, False])
+        self.assertEqual(len(buffer), 6)
+        self.assertFalse(buffer.full)
+
+        batch = buffer.get([0, 1, 2, 4])
+        np.testing.assert_array_equal(batch["states"], [0, 10, 1, 2])
+        np.testing.assert_allclose(batch["rewards"], [1 + 0.5, 2 + 1 + 0.5, 1, 1])
+        np.testing.assert_array_equal(batch["next_states"], [2, 13, 2, 3])
+        np.testing.assert_array_equal(batch["dones"], [True, False, True, False])
+        np.testing.assert_allclose(batch["discounts"], [0, 0.125, 0, 0.5])
+
+        # Ring wrap, only the latest steps are kept.
+        buffer.add(np.arange(6).reshape(3, 2) + 100, np.zeros((3, 2)), np.zeros((3, 2)),
+                   np.zeros((3, 2)), np.zeros((3, 2), dtype=bool))
+        self.assertTrue(buffer.full)
+        np.testing.assert_array_equal(buffer.states, [102, 103, 104, 105, 2, 12, 100, 101])
+        batch = buffer.get([4, 0])
+        np.testing.assert_array_equal(batch["states"], [2, 102])
+        np.testing.assert_array_equal(batch["rewards"], [1, 0])
+        np.testing.assert_array_equal(batch["next_states"], [0, 0])
+        np.testing.assert_allclose(batch["discounts"], [0.125, 0.25])
+
+        with self.assertRaises(ValueError):
+            buffer.add([0], [0], [0], [0], [False])
+        with self.assertRaises(ValueError):
+            ReplayBuffer(5, num_envs=2)
+
+    def test_sample(self):
+        rng = np.random.default_rng(0)
+        buffer = ReplayBuffer(1000, num_envs=10)
+        with self.assertRaises(RuntimeError):
+            buffer.sample(10)
+        buffer.add(np.arange(50).reshape(5, 10), np.zeros((5, 10)), np.ones((5, 10)),
+                   np.zeros((5, 10)), np.zeros((5, 10), dtype=bool))
+        batch = buffer.sample(1000, rng=rng)
+        self.assertTrue(np.all(batch["indices"] < 50))
+        np.testing.assert_array_equal(batch["states"], batch["indices"])
+        np.testing.assert_array_equal(batch["weights"], 1)
+        with self.assertRaises(RuntimeError):
+            buffer.update_priorities([0], [1])
+
+        buffer = ReplayBuffer(6, num_envs=2, prioritized=True, alpha=1, eps=0)
+        buffer.add(np.arange(4).reshape(2, 2), np.zeros((2, 2)), np.zeros((2, 2)),
+                   np.zeros((2, 2)), np.zeros((2, 2), dtype=bool))
+        buffer.update_priorities([0, 1, 2, 3], [1, 0, 3, 6])
+        batch = buffer.sample(10000, beta=1, rng=rng)
+        freq = np.bincount(batch["indices"], minlength=6) / 10000
+        np.testing.assert_allclose(freq, [0.1, 0, 0.3, 0.6, 0, 0], atol=1e-3)
+        weights = dict(zip(batch["indices"].tolist(), batch["weights"].tolist()))
+        self.assertAlmostEqual(weights[0], 1)
+        self.assertAlmostEqual(weights[3], 1 / 6)
+
+        # New transitions get the largest priority so far.
+        buffer.add([4, 5], [0, 0], [0, 0], [0, 0], [False, False])
+        np.testing.assert_allclose(buffer._tree.get(np.arange(6)), [1, 0, 3, 6, 6, 6])
+        self.assertAlmostEqual(buffer._tree.total, 22)
+
+    def test_save_load(self):
+        rng = np.random.default_rng(0)
+        buffer = ReplayBuffer(64, num_envs=4, n_step=2, prioritized=True)
+        for _ in range(20):
+            buffer.add(rng.integers(10, size=4), rng.integers(5, size=4), rng.random(4),
+                       rng.integers(10, size=4), rng.random(4) < 0.2)
+        buffer.update_priorities(np.arange(10), rng.random(10))
+        f = io.BytesIO()
+        buffer.save(f)
+        f.seek(0)
+        loaded = ReplayBuffer.load(f)
+        self.assertEqual(repr(loaded), repr(buffer))
+        indices = np.arange(len(buffer))
+        for key, value in buffer.get(indices).items():
+            np.testing.assert_array_equal(loaded.get(indices)[key], value)
+        np.testing.assert_allclose(loaded._tree.tree, buffer._tree.tree)
+        batch = buffer.sample(32, rng=1)
+        for key, value in loaded.sample(32, rng=1).items():
+            np.testing.assert_array_equal(batch[key], value)
+
+
+if __name__ == '__main__':
+    unittest.main()
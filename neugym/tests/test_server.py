@@ -0,0 +1,97 @@
+import gc
+import os
+import socket
+import sys
+import tempfile
+import unittest
+import warnings
+
+import numpy as np
+from neugym.environment import GridWorld
+from neugym.utils import EnvServer, EnvClient, benchmark_server
+
+
+@unittest.skipUnless(hasattr(socket, "AF_UNIX"), "Unix-domain sockets not available")
+class TestEnvServer(unittest.TestCase):
+    """Test local environment server."""
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "env.sock")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_step_and_reset(self):
+        W = GridWorld((1, 3))
+        W.add_object((0, 0, 2), reward=1, prob=1)
+        V = GridWorld((2, 2))
+        V.init_agent((0, 1, 1))
+        server = EnvServer([W, W, V], self.path, rng=0)
+        server.start_in_thread()
+        try:
+            right = W.actions.index((0, 1))
+            with EnvClient(self.path) as client, EnvClient(self.path) as other:
+                self.assertEqual(client.info(), {"num_envs": 3, "num_actions": 5,
+                                                 "num_worlds": 2})
+                self.assertEqual(client.step(0, right), ((0, 0, 1), 0.0, False))
+                self.assertEqual(other.step(1, right), ((0, 0, 1), 0.0, False))
+                self.assertEqual(client.step(0, right), ((0, 0, 2), 1.0, True))
+                self.assertEqual(client.step(0, right), ((0, 0, 1), 0.0, False))
+                self.assertEqual(client.reset(0), (0, 0, 0))
+                self.assertEqual(client.reset(2), (0, 1, 1))
+
+                # Repeated environments are stepped in order.
+                coords, rewards, dones = client.step_many([0, 0, 2, 0], [right] * 4)
+                np.testing.assert_array_equal(coords, [[0, 0, 1], [0, 0, 2],
+                                                       [0, 1, 1], [0, 0, 1]])
+                np.testing.assert_array_equal(rewards, [0, 1, 0, 0])
+                np.testing.assert_array_equal(dones, [False, True, False, False])
+
+                with self.assertRaises(ValueError):
+                    client.step(3, 0)
+                with self.assertRaises(ValueError):
+                    client.step(0, 5)
+                self.assertEqual(client.step(1, right), ((0, 0, 2), 1.0, True))
+        finally:
+            server.stop()
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_connection_error(self):
+        # The socket is closed when no server is listening, otherwise its
+        # finalizer warns about the unclosed socket.
+        gc.collect()
+        unraisable = []
+        hook = sys.unraisablehook
+        sys.unraisablehook = unraisable.append
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("error", ResourceWarning)
+                with self.assertRaises(OSError):
+                    EnvClient(self.path, timeout=1)
+                gc.collect()
+        finally:
+            sys.unraisablehook = hook
+        self.assertEqual(unraisable, [])
+
+    def test_benchmark(self):
+        W = GridWorld((3, 3))
+        results = benchmark_server(W, num_envs=8, num_clients=2, num_steps=20, rng=0)
+        self.assertGreater(results["steps_per_second"], 0)
+        self.assertGreaterEqual(results["mean_batch_size"], 1)
+
+        # Errors of the client threads are raised again.
+        def step_many(self, env_ids, actions):
+            raise ConnectionError("Lost connection")
+
+        original = EnvClient.step_many
+        EnvClient.step_many = step_many
+        try:
+            with self.assertRaises(ConnectionError):
+                benchmark_server(W, num_envs=4, num_clients=2, num_steps=5, rng=0)
+        finally:
+            EnvClient.step_many = original
+        self.assertGreaterEqual(results["latency_p99_ms"], results["latency_p50_ms"])
+
+
+if __name__ == '__main__':
+    unittest.main()
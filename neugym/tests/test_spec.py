@@ -0,0 +1,130 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import neugym as ng
+from neugym.environment import (GridWorld, from_spec, to_spec, read_spec, write_spec,
+                                slip_kernel)
+
+
+def _build_world():
+    W = GridWorld((3, 3))
+    W.add_area((2, 4), name="room")
+    W.add_path((0, 2, 2), (1, 0, 0), register_action=(1, 0))
+    W.add_area((1, 2))
+    W.add_path((1, 1, 3), (2, 0, 0))
+    W.set_altitude(1, np.arange(8, dtype=float).reshape(2, 4))
+    W.block((1, 1, 1))
+    W.add_object((1, 1, 2), reward=1, prob=0.8, punish=-1)
+    W.add_object((2, 0, 1), reward=5, prob=0.1)
+    W.set_transition_kernel(2, slip_kernel(W.actions, 0.2))
+    W.set_transition_kernel((0, 1, 1), slip_kernel(W.actions, 0.1))
+    W.init_agent((0, 1, 0))
+    return W
+
+
+class TestSpec(unittest.TestCase):
+    """Test declarative world specification."""
+    def test_round_trip(self):
+        W = _build_world()
+        spec = to_spec(W)
+        self.assertEqual(spec["areas"][1], {"shape": [2, 4], "name": "room",
+                                            "altitude": [[0, 1, 2, 3], [4, 5, 6, 7]],
+                                            "blocked": [[1, 1]]})
+        self.assertEqual(spec["paths"][0], {"from": [0, 2, 2], "to": [1, 0, 0],
+                                            "action": [1, 0]})
+        V = from_spec(spec)
+        self.assertEqual(V.fingerprint(), W.fingerprint())
+        self.assertEqual(to_spec(V), spec)
+        self.assertEqual(V.get_area_index("room"), 1)
+        self.assertEqual(V.get_agent_state("init"), (0, 1, 0))
+        self.assertEqual(V.get_doorways(1, 2), W.get_doorways(1, 2))
+        self.assertTrue(V.is_reachable((0, 0, 0), (2, 0, 1)))
+        self.assertEqual(V.step((0, 1))[0], (0, 1, 1))
+
+        # Boolean masks, scalar altitude and default path actions.
+        spec = {"areas": [{"shape": [1, 1]},
+                          {"shape": [2, 2], "altitude": 1.5,
+                           "blocked": [[False, False], [False, True]]}],
+                "paths": [{"from": [0, 0, 0], "to": [1, 0, 0]}]}
+        V = from_spec(spec)
+        U = GridWorld()
+        U.add_area((2, 2))
+        U.set_altitude(1, np.full((2, 2), 1.5))
+        U.block((1, 1, 1))
+        U.add_path((0, 0, 0), (1, 0, 0))
+        self.assertEqual(V.fingerprint(), U.fingerprint())
+
+    def test_files(self):
+        W = _build_world()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, "world.json")
+            write_spec(W, filename)
+            self.assertEqual(read_spec(filename).fingerprint(), W.fingerprint())
+
+            filename = os.path.join(tmp_dir, "world.toml")
+            with open(filename, "w") as f:
+                f.write('[[areas]]\nshape = [1, 2]\n\n[[areas]]\nshape = [2, 2]\n'
+                        'blocked = [[0, 1]]\n\n[[paths]]\nfrom = [0, 0, 1]\nto = [1, 0, 0]\n'
+                        'action = [0, 1]\n')
+            try:
+                V = read_spec(filename)
+            except ImportError:
+                pass
+            else:
+                self.assertEqual(V.get_doorways(0, 1), [((0, 0, 1), (0, 1), (1, 0, 0))])
+
+    def test_validation(self):
+        invalid = [
+            {"areas": []},
+            {"areas": [{"shape": [0, 2]}]},
+            {"areas": [{"shape": [2, 2], "altitude": [[1, 2, 3]]}]},
+            {"areas": [{"shape": [2, 2], "blocked": [[2, 0]]}]},
+            {"areas": [{"shape": [1, 1]}, {"shape": [1, 1], "name": "origin"}]},
+            {"areas": [{"shape": [2, 2]}], "paths": [{"from": [0, 0, 0], "to": [0, 1, 1]}]},
+            {"areas": [{"shape": [2, 2]}, {"shape": [2, 2]}],
+             "paths": [{"from": [0, 0, 0], "to": [1, 0, 0], "action": [1, 0]}]},
+            {"areas": [{"shape": [1, 1]}], "objects": [{"coord": [1, 0, 0], "reward": 1,
+                                                         "prob": 1}]},
+            {"areas": [{"shape": [1, 2]}], "objects": [{"coord": [0, 0, 1], "prob": 1}]},
+            {"areas": [{"shape": [1, 1]}], "actions": [[0, 0], [1, 0]]},
+            {"areas": [{"shape": [1, 1]}], "kernels": [{"area": 0, "kernel": [[1]]}]},
+            {"areas": [{"shape": [1, 1]}], "version": 2},
+        ]
+        for spec in invalid:
+            with self.assertRaises(ValueError, msg=str(spec)):
+                from_spec(spec)
+        with self.assertRaisesRegex(ValueError, r"paths\[1\]"):
+            from_spec({"areas": [{"shape": [1, 1]}, {"shape": [1, 1]}],
+                       "paths": [{"from": [0, 0, 0], "to": [1, 0, 0]},
+                                 {"from": [0, 0, 0], "to": [1, 0, 0]}]})
+
+        # Specifications follow the rules of the GridWorld methods.
+        rng = np.random.default_rng(0)
+        for actions in ["von_neumann", "moore", [[0, 0], [1, 0], [-1, 0]]]:
+            for _ in range(30):
+                W = GridWorld((3, 3), actions=actions)
+                W.add_area((2, 2))
+                spec = {"actions": actions, "areas": [{"shape": [3, 3]}, {"shape": [2, 2]}],
+                        "paths": []}
+                for _ in range(3):
+                    coord_from = (0, int(rng.integers(3)), int(rng.integers(3)))
+                    coord_to = (1, int(rng.integers(2)), int(rng.integers(2)))
+                    path = {"from": list(coord_from), "to": list(coord_to)}
+                    action = None
+                    if rng.random() < 0.7:
+                        action = W.actions[rng.integers(len(W.actions))]
+                        path["action"] = list(action)
+                    try:
+                        W.add_path(coord_from, coord_to, register_action=action)
+                    except (ValueError, ng.NeuGymException):
+                        with self.assertRaises(ValueError, msg=str(path)):
+                            from_spec(dict(spec, paths=spec["paths"] + [path]))
+                    else:
+                        spec["paths"].append(path)
+                        self.assertEqual(from_spec(spec).fingerprint(), W.fingerprint())
+
+
+if __name__ == '__main__':
+    unittest.main()
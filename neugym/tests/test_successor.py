@@ -0,0 +1,67 @@
+import unittest
+
+import numpy as np
+from neugym.algorithms import successor_representation, successor_eigenvectors
+from neugym.environment import GridWorld
+
+
+class TestSuccessorRepresentation(unittest.TestCase):
+    """Test successor representation."""
+    def _build_world(self):
+        W = GridWorld((3, 3))
+        W.add_area((2, 4))
+        W.add_path((0, 2, 2), (1, 0, 0))
+        W.block((0, 1, 1))
+        return W
+
+    def test_successor_representation(self):
+        W = self._build_world()
+        C = W.compile()
+        P = C.transition_matrix().toarray().reshape(C.num_states, C.num_actions, -1)
+        P_pi = P.mean(axis=1)
+        expected = np.linalg.inv(np.eye(C.num_states) - 0.9 * P_pi)
+
+        M = successor_representation(W, policy="uniform", gamma=0.9, tol=1e-12)
+        np.testing.assert_allclose(M, expected, atol=1e-8)
+        M = successor_representation(C, policy="uniform", gamma=0.9, method="direct",
+                                     states=[0, 5])
+        np.testing.assert_allclose(M, expected[[0, 5]], atol=1e-8)
+        np.testing.assert_allclose(M.sum(axis=1), 10)
+
+        policy = np.zeros((C.num_states, C.num_actions))
+        policy[:, 0] = 1
+        M = successor_representation(W, policy=policy, gamma=0.5, states=[3])
+        self.assertAlmostEqual(M[0, 3], 2)
+
+        M = successor_representation(W, policy="random_walk", states=[0])
+        self.assertEqual(M[0, C.state_index((0, 1, 1))], 0)
+        self.assertEqual(C.reshape_area(M[0], 1).shape, (2, 4))
+
+        with self.assertRaises(ValueError):
+            successor_representation(W, policy="undefined")
+        with self.assertRaises(ValueError):
+            successor_representation(W, policy=np.ones((2, 2)))
+        with self.assertRaises(ValueError):
+            successor_representation(W, method="undefined")
+        with self.assertRaises(ValueError):
+            successor_representation(W, gamma=1)
+
+    def test_successor_eigenvectors(self):
+        W = GridWorld((8, 8))
+        values, vectors = successor_eigenvectors(W, k=3, gamma=0.9)
+        self.assertEqual(vectors.shape, (64, 3))
+        self.assertAlmostEqual(values[0], 10)
+        self.assertTrue(np.all(np.diff(values) <= 1e-9))
+        M = successor_representation(W, gamma=0.9, method="direct")
+        np.testing.assert_allclose(M @ vectors[:, 1], values[1] * vectors[:, 1], atol=1e-6)
+
+        W = self._build_world()
+        values, vectors = successor_eigenvectors(W, k=W.compile().num_states, by_area=True)
+        self.assertEqual(vectors[0].shape, (3, 3, 17))
+        self.assertEqual(vectors[1].shape, (2, 4, 17))
+        with self.assertRaises(ValueError):
+            successor_eigenvectors(W, k=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from neugym.environment import GridWorld, TrackingMap
+
+
+def _build_world():
+    W = GridWorld((4, 6))
+    W.add_area((3, 3), name="Box")
+    W.add_path((0, 3, 5), (1, 0, 0), register_action=(0, 1))
+    return W
+
+
+def _calibrate(tracking):
+    # Cells of 10 cm, the second area rotated by 90 degrees.
+    tracking.set_area(0, x_edges=20 + 10 * np.arange(5), y_edges=35 + 10 * np.arange(7))
+    tracking.set_area("Box", x_edges=10 * np.arange(4), y_edges=10 * np.arange(4),
+                      transform=[[0, -1, 130], [1, 0, -40]])
+
+
+class TestTrackingMap(unittest.TestCase):
+    """Test mapping of tracked positions onto gridworld states."""
+    def test_states(self):
+        W = _build_world()
+        tracking = TrackingMap(W)
+        with self.assertRaises(RuntimeError):
+            tracking.state_indices([[0, 0]])
+        _calibrate(tracking)
+        C = tracking.compiled
+
+        positions = [[25, 40], [55, 90], [55, 96], [45, 125], [45, 105], [65, 100],
+                     [np.nan, 40], [0, 0]]
+        expected = [(0, 0, 0), (0, 3, 5), (1, 0, 0), (1, 0, 0), (1, 2, 0)]
+        states = tracking.state_indices(positions)
+        np.testing.assert_array_equal(states[:5], C.state_indices(expected))
+        np.testing.assert_array_equal(states[5:], -1)
+
+        # Doorways are recovered from the compiled world alone.
+        compiled_tracking = TrackingMap(C)
+        compiled_tracking.set_area(0, x_edges=20 + 10 * np.arange(5),
+                                   y_edges=35 + 10 * np.arange(7))
+        compiled_tracking.set_area(1, x_edges=10 * np.arange(4), y_edges=10 * np.arange(4),
+                                   transform=[[0, -1, 130], [1, 0, -40]])
+        np.testing.assert_array_equal(compiled_tracking.state_indices(positions), states)
+
+        with self.assertRaises(ValueError):
+            tracking.set_area(0, x_edges=np.arange(4))
+        with self.assertRaises(ValueError):
+            tracking.set_area(0, x_edges=[0, 1, 1, 2, 3])
+        with self.assertRaises(ValueError):
+            tracking.set_area(0, transform=np.eye(2))
+        with self.assertRaises(ValueError):
+            compiled_tracking.set_area(2)
+        with self.assertRaises(ValueError):
+            tracking.state_indices(np.zeros((3, 3)))
+
+    def test_actions(self):
+        W = _build_world()
+        tracking = TrackingMap(W)
+        C = tracking.compiled
+        states = C.state_indices([(0, 0, 0), (0, 0, 0), (0, 1, 0), (0, 3, 5), (1, 0, 0)])
+        next_states = np.append(states[1:], -1)
+        actions = tracking.infer_actions(states, next_states)
+        np.testing.assert_array_equal(actions, [C.action_index((0, 0)), C.action_index((1, 0)),
+                                                -1, C.action_index((0, 1)), -1])
+
+    def test_convert_and_stream(self):
+        W = _build_world()
+        tracking = TrackingMap(W)
+        _calibrate(tracking)
+        C = tracking.compiled
+
+        # Walk right along the last row into the second area, with a lost frame.
+        positions = np.array([[55, 40]] * 3 + [[55, 50], [np.nan, np.nan], [55, 60]] +
+                             [[55, 70], [55, 80], [55, 90], [55, 96], [45, 115]])
+        states, actions, frames = tracking.convert(positions)
+        np.testing.assert_array_equal(frames, np.arange(11))
+        self.assertEqual(states[4], -1)
+        self.assertEqual(actions[3], -1)
+        self.assertEqual(actions[-1], -1)
+
+        states, actions, frames = tracking.convert(positions, collapse=True)
+        np.testing.assert_array_equal(frames, [0, 3, 5, 6, 7, 8, 9, 10])
+        np.testing.assert_array_equal(states[:-2], C.state_indices([(0, 3, y) for y in range(6)]))
+        np.testing.assert_array_equal(actions[:-2], C.action_index((0, 1)))
+        np.testing.assert_array_equal(actions[-2:], [C.action_index((1, 0)), -1])
+
+        # Chunked outputs match, from arrays and files.
+        rng = np.random.default_rng(0)
+        walk = np.cumsum(rng.normal(0, 3, (5000, 2)), axis=0) % 100 + [10, 30]
+        for collapse in [False, True]:
+            expected = tracking.convert(walk, collapse=collapse)
+            with tempfile.TemporaryDirectory() as tmp:
+                np.save(os.path.join(tmp, "walk.npy"), walk)
+                np.savetxt(os.path.join(tmp, "walk.csv"), walk, delimiter=",", header="x,y")
+                for source, kwargs in [(walk, {}), (np.array_split(walk, 7), {}),
+                                       (os.path.join(tmp, "walk.npy"), {}),
+                                       (os.path.join(tmp, "walk.csv"), dict(skiprows=1))]:
+                    chunks = list(tracking.stream(source, collapse=collapse, chunk_size=999,
+                                                  **kwargs))
+                    self.assertGreater(len(chunks), 1)
+                    for output, other in zip(expected, zip(*chunks)):
+                        np.testing.assert_array_equal(np.concatenate(other), output)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import unittest
+
+import numpy as np
+from neugym.environment import GridWorld, VectorGridWorld, slip_kernel
+
+
+class TestVectorGridWorld(unittest.TestCase):
+    """Test batched vector environment interface."""
+    def setUp(self):
+        self.W = GridWorld((1, 4))
+        self.W.add_object((0, 0, 3), reward=1, prob=1)
+        self.W.init_agent((0, 0, 0))
+        self.right = self.W.actions.index((0, 1))
+
+    def test_autoreset(self):
+        envs = VectorGridWorld(self.W, 3, max_steps=2, rng=0)
+        observations, infos = envs.reset()
+        np.testing.assert_array_equal(observations, [0, 0, 0])
+
+        stay = self.W.actions.index((0, 0))
+        actions = np.array([self.right, self.right, stay])
+        observations, rewards, terminated, truncated, infos = envs.step(actions)
+        np.testing.assert_array_equal(observations, [1, 1, 0])
+        self.assertFalse(np.any(terminated | truncated))
+
+        # The time limit truncates the trials, which are reset.
+        observations, rewards, terminated, truncated, infos = envs.step(actions)
+        np.testing.assert_array_equal(observations, [0, 0, 0])
+        np.testing.assert_array_equal(truncated, [True, True, True])
+        np.testing.assert_array_equal(infos["final_observation"], [2, 2, 0])
+        np.testing.assert_array_equal(infos["episode_length"], [2, 2, 2])
+        np.testing.assert_array_equal(envs.steps, 0)
+
+        # Reaching the object terminates the trial, not truncated at the same step.
+        envs = VectorGridWorld(self.W, 2, max_steps=3, init_states=[(0, 0, 0), (0, 0, 1)])
+        envs.reset()
+        actions = np.array([self.right, self.right])
+        for _ in range(2):
+            observations, rewards, terminated, truncated, infos = envs.step(actions)
+        np.testing.assert_array_equal(terminated, [False, True])
+        np.testing.assert_array_equal(rewards, [0, 1])
+        np.testing.assert_array_equal(observations, [2, 1])
+        np.testing.assert_array_equal(infos["episode_return"][1], 1)
+        observations, rewards, terminated, truncated, infos = envs.step(actions)
+        np.testing.assert_array_equal(terminated, [True, False])
+        np.testing.assert_array_equal(truncated, [False, False])
+
+        with self.assertRaises(ValueError):
+            envs.step(np.array([0, 5]))
+        with self.assertRaises(ValueError):
+            envs.step(np.array([0]))
+
+    def test_buffers(self):
+        envs = VectorGridWorld(self.W, 4, observation="coord")
+        observations, infos = envs.reset()
+        self.assertEqual(observations.shape, (4, 3))
+        actions = np.full(4, self.right)
+        outputs = envs.step(actions)
+        for output, buffer in zip(outputs, (observations, envs.rewards, envs.terminated,
+                                           envs.truncated, infos)):
+            self.assertIs(output, buffer)
+        np.testing.assert_array_equal(observations[:, 2], 1)
+
+        out = (np.zeros((4, 3), dtype=np.int64), np.zeros(4), np.zeros(4, dtype=bool),
+               np.zeros(4, dtype=bool))
+        outputs = envs.step(actions, out=out)
+        for output, buffer in zip(outputs, out):
+            self.assertIs(output, buffer)
+        np.testing.assert_array_equal(out[0][:, 2], 2)
+
+        envs = VectorGridWorld(self.W, 2, observation="onehot")
+        observations, _ = envs.reset()
+        np.testing.assert_array_equal(observations, [[1, 0, 0, 0]] * 2)
+
+    def test_stochastic(self):
+        W = GridWorld((3, 3))
+        W.set_transition_kernel(0, slip_kernel(W.actions, 0.3))
+        C = W.compile()
+        envs = VectorGridWorld(W, 20000, rng=0)
+        envs.reset()
+        actions = np.full(20000, C.action_index((1, 0)))
+        observations = envs.step(actions)[0]
+        next_states = C.step(np.zeros(20000, dtype=np.int64), actions, rng=1)[0]
+        np.testing.assert_allclose(np.bincount(observations, minlength=9) / 20000,
+                                   np.bincount(next_states, minlength=9) / 20000, atol=0.02)
+
+    def test_shards(self):
+        W = GridWorld((3, 3))
+        W.set_transition_kernel(0, slip_kernel(W.actions, 0.3))
+        W.add_object((0, 2, 2), reward=1, prob=0.5)
+        actions = np.random.default_rng(0).integers(5, size=(20, 1000))
+
+        def run(**kwargs):
+            envs = VectorGridWorld(W, 1000, max_steps=5, observation="onehot", rng=0, **kwargs)
+            envs.reset()
+            outputs = [[np.copy(output) for output in envs.step(a)[:4]] for a in actions]
+            envs.close()
+            return envs, outputs
+
+        envs, single = run(shard_size=300, num_threads=1)
+        self.assertEqual(len(envs._shards), 4)
+        self.assertEqual(envs._shards[-1].num_envs, 100)
+        _, threaded = run(shard_size=300, num_threads=3)
+        for step, other in zip(single, threaded):
+            for output, other_output in zip(step, other):
+                np.testing.assert_array_equal(output, other_output)
+        self.assertTrue(any(np.any(step[2]) for step in single))
+        self.assertTrue(any(np.any(step[3]) for step in single))
+
+        # Same dynamics as unsharded batches.
+        _, unsharded = run()
+        for k in range(2):
+            np.testing.assert_allclose(np.mean([step[k].mean(axis=0) for step in single], axis=0),
+                                       np.mean([step[k].mean(axis=0) for step in unsharded],
+                                               axis=0), atol=0.05)
+
+        with self.assertRaises(ValueError):
+            VectorGridWorld(W, 10, shard_size=0)
+        with self.assertRaises(ValueError):
+            VectorGridWorld(W, 10, shard_size=5, num_threads=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import tempfile
+import unittest
+
+import numpy as np
+from neugym.environment import GridWorld, VisibilityTable
+from neugym.utils import WorldCache
+
+
+class TestVisibilityTable(unittest.TestCase):
+    """Test line-of-sight visibility tables."""
+    def test_occlusion(self):
+        W = GridWorld((5, 5))
+        W.block((0, 2, 2))
+        table = VisibilityTable(W, radius=4)
+        C = table.compiled
+
+        def sees(coord_from, coord_to):
+            return C.state_index(coord_to) in table.visible_states(C.state_index(coord_from))
+
+        self.assertTrue(sees((0, 0, 0), (0, 0, 4)))
+        self.assertTrue(sees((0, 0, 0), (0, 2, 2)))
+        self.assertFalse(sees((0, 0, 0), (0, 3, 3)))
+        self.assertFalse(sees((0, 2, 0), (0, 2, 4)))
+        self.assertTrue(sees((0, 2, 0), (0, 1, 3)))
+        self.assertFalse(sees((0, 0, 0), (0, 4, 4)))  # Out of radius.
+
+        # Radius 0 only sees the viewer.
+        table = VisibilityTable(W, radius=0)
+        np.testing.assert_array_equal(table.indices, np.arange(25))
+        visible = table.visibility_matrix()
+        self.assertEqual(visible.nnz, 25)
+
+    def test_doorways(self):
+        W = GridWorld((1, 3))
+        W.add_area((2, 3))
+        W.add_path((0, 0, 2), (1, 0, 0), register_action=(0, 1))
+        table = VisibilityTable(W, radius=4)
+        C = table.compiled
+        visible = [C.state_coord(s) for s in table.visible_states(C.state_index((0, 0, 0)))]
+        self.assertEqual(visible, [(0, 0, 0), (0, 0, 1), (0, 0, 2), (1, 0, 0), (1, 0, 1)])
+        visible = [C.state_coord(s) for s in table.visible_states(C.state_index((1, 1, 0)))]
+        self.assertIn((0, 0, 2), visible)
+        self.assertNotIn((0, 0, 0), visible)
+
+        # Lines of sight stop at area borders without doorways.
+        W.remove_path((0, 0, 2), (1, 0, 0))
+        table = VisibilityTable(W, radius=4)
+        self.assertEqual(len(table.visible_states(0)), 3)
+
+    def test_encode(self):
+        W = GridWorld((3, 3))
+        W.block((0, 0, 1))
+        W.set_altitude(0, np.arange(9).reshape(3, 3))
+        W.add_object((0, 2, 2), reward=2, prob=0.5)
+        table = VisibilityTable(W, radius=1)
+        self.assertEqual(table.feature_names, ("visible", "blocked", "altitude", "object"))
+
+        observations = table.encode([0, 4])
+        self.assertEqual(observations.shape, (2, 3, 3, 4))
+        np.testing.assert_array_equal(observations[0, :, :, 0], [[0, 0, 0], [0, 1, 1], [0, 1, 0]])
+        np.testing.assert_array_equal(observations[1, :, :, 1], [[0, 1, 0], [0, 0, 0], [0, 0, 0]])
+        np.testing.assert_array_equal(observations[1, :, :, 2], [[0, 1, 0], [3, 4, 5], [0, 7, 0]])
+        self.assertEqual(observations[1, 2, 2, 3], 0)
+
+        table = VisibilityTable(W, radius=2)
+        out = np.ones((1, 5, 5, 4), dtype=np.float32)
+        self.assertIs(table.encode([4], out=out), out)
+        self.assertEqual(out[0, 3, 3, 3], 1)
+        self.assertEqual(out[0, 0, 0, 0], 0)
+        with self.assertRaises(ValueError):
+            table.encode([4, 4], out=out)
+
+    def test_cache(self):
+        W = GridWorld((4, 4))
+        W.block((0, 1, 1))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = WorldCache(tmp_dir)
+            table = VisibilityTable(W, radius=3, cache=cache)
+            cached = VisibilityTable(W, radius=3, cache=cache)
+            reference = VisibilityTable(W.compile(), radius=3)
+            for name in ("indptr", "indices", "slots"):
+                np.testing.assert_array_equal(getattr(table, name), getattr(reference, name))
+                np.testing.assert_array_equal(getattr(cached, name), getattr(reference, name))
+        with self.assertRaises(ValueError):
+            VisibilityTable(W, radius=-1)
+
+
+if __name__ == '__main__':
+    unittest.main()
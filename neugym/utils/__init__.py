@@ -1 +1,3 @@
 from .function import *
+from .server import *
+from .cache import *
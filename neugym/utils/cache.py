@@ -0,0 +1,168 @@
+"""On-disk cache of gridworld environments and their compiled artifacts."""
+
+import hashlib
+import os
+import pickle
+import re
+
+import numpy as np
+
+__all__ = [
+    "WorldCache"
+]
+
+
+class WorldCache:
+    """On-disk cache of environments and derived arrays, keyed by content.
+
+    Compiled worlds (see ``GridWorld.compile()``) and derived arrays (e.g.
+    transition tables or distance fields) are stored under the fingerprint
+    of the environment (see ``GridWorld.fingerprint()``), so that they are
+    shared by all the environments with the same content. Environments
+    themselves can also be cached under the arguments of the function
+    building them, which skips their construction altogether.
+
+    Files are written atomically, so a cache directory can be shared by
+    concurrent processes.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Directory of the cache, created if missing.
+
+    Examples
+    --------
+    >>> cache = WorldCache("world_cache")
+    >>> W = cache.get_env(build_maze, 20, 20, seed=3)
+    >>> C = W.compile(cache=cache)
+    >>> dist = cache.get_artifact(W, "distances", compute_distances)
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _world_dir(self, env):
+        path = os.path.join(self.cache_dir, env.fingerprint())
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def get_compiled(self, env):
+        """Get the array representation of an environment.
+
+        Parameters
+        ----------
+        env : GridWorld
+            Gridworld environment.
+
+        Returns
+        -------
+        compiled : CompiledWorld
+            Array representation, loaded from the cache if possible,
+            otherwise built and saved.
+
+        See Also
+        --------
+        GridWorld.compile : Build or get the array representation.
+        """
+        from neugym.environment.compiled import CompiledWorld
+
+        filename = os.path.join(self._world_dir(env), "compiled.npz")
+        if os.path.exists(filename):
+            try:
+                return CompiledWorld.load(filename)
+            except (OSError, ValueError, KeyError):
+                pass
+        compiled = CompiledWorld.from_gridworld(env)
+        _atomic_write(filename, compiled.save)
+        return compiled
+
+    def get_artifact(self, env, name, func):
+        """Get an array derived from the array representation of an environment.
+
+        Parameters
+        ----------
+        env : GridWorld
+            Gridworld environment.
+
+        name : str
+            Name of the artifact, made of letters, digits, ``_`` and ``-``.
+            Artifacts computed differently should have different names.
+
+        func : callable
+            Called as ``func(compiled)`` with the ``CompiledWorld`` of ``env``
+            when the artifact is not cached, and returning a NumPy array or a
+            dict of NumPy arrays.
+
+        Returns
+        -------
+        artifact : numpy.ndarray or dict of numpy.ndarray
+            Array(s) returned by ``func``.
+
+        Examples
+        --------
+        >>> cache = WorldCache("world_cache")
+        >>> P = cache.get_artifact(W, "expected_reward", lambda C: C.expected_reward())
+        """
+        if not re.fullmatch(r"[\w\-]+", name):
+            msg = "Artifact name of letters, digits, '_' and '-' expected, got '{}'".format(name)
+            raise ValueError(msg)
+
+        filename = os.path.join(self._world_dir(env), "artifact_{}.npz".format(name))
+        if os.path.exists(filename):
+            try:
+                with np.load(filename, allow_pickle=False) as data:
+                    if list(data.keys()) == ["__array__"]:
+                        return data["__array__"]
+                    return {key: data[key] for key in data.keys()}
+            except (OSError, ValueError):
+                pass
+
+        artifact = func(env.compile(cache=self))
+        arrays = artifact if isinstance(artifact, dict) else {"__array__": artifact}
+        _atomic_write(filename, lambda f: np.savez(f, **arrays))
+        return artifact
+
+    def get_env(self, builder, *args, **kwargs):
+        """Get an environment built by a function.
+
+        Parameters
+        ----------
+        builder : callable
+            Function building the environment, called as
+            ``builder(*args, **kwargs)`` when the environment is not cached.
+            It should be deterministic, since its result is cached under
+            its qualified name and the ``repr`` of its arguments.
+
+        args, kwargs : positional and keyword arguments
+            Arguments passed to ``builder``.
+
+        Returns
+        -------
+        env : GridWorld
+            Built environment, loaded from the cache if possible.
+        """
+        key = repr((builder.__module__, builder.__qualname__, args, sorted(kwargs.items())))
+        path = os.path.join(self.cache_dir, "envs")
+        os.makedirs(path, exist_ok=True)
+        filename = os.path.join(path, hashlib.sha256(key.encode()).hexdigest() + ".pkl")
+        if os.path.exists(filename):
+            try:
+                with open(filename, "rb") as f:
+                    return pickle.load(f)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                pass
+
+        env = builder(*args, **kwargs)
+        _atomic_write(filename, lambda f: pickle.dump(env, f, protocol=pickle.HIGHEST_PROTOCOL))
+        return env
+
+    def __repr__(self):
+        return "WorldCache(cache_dir='{}')".format(self.cache_dir)
+
+
+def _atomic_write(filename, write):
+    tmp_filename = "{}.{}.tmp".format(filename, os.getpid())
+    with open(tmp_filename, "wb") as f:
+        write(f)
+    os.replace(tmp_filename, filename)
@@ -104,9 +104,7 @@ def show_area_connection(env, layout='spring'):
         label = '{}\n({})'.format(area_idx, alias) if alias is not None else str(area_idx)
         labels[area_idx] = label
 
-    for start, end in env.world.edges():
-        if start[0] != end[0]:
-            g.add_edge(start[0], end[0])
+    g.add_edges_from(env.area_graph.edges())
 
     if layout == 'circular':
         pos = nx.circular_layout(g)
@@ -124,11 +122,11 @@ def show_area_connection(env, layout='spring'):
     nx.draw_networkx(g, pos=pos, labels=labels)
 
 
-def show_area(env, area, show_altitude=False, figsize=None):
+def show_area(env, area, show_altitude=False, figsize=None, values=None):
     """Show details for one area.
 
     Visualize altitude, objects, and blocks within one area.
-    Grid color indicates state altitude.
+    Grid color indicates state altitude, or ``values`` if provided.
     Blocked states will be marked with black cross.
     Objects are shown in red dots.
 
@@ -142,6 +140,9 @@ def show_area(env, area, show_altitude=False, figsize=None):
         Whether to show state altitude value.
     figsize : tuple of ints (optional, default=None)
         Size of the figure.
+    values : array_like of shape (m, n) or OccupancyCounter (optional, default=None)
+        Per-state values of the area to show as grid color instead of
+        altitude, e.g. the occupancy counts of an ``OccupancyCounter``.
 
     Examples
     -------
@@ -153,6 +154,12 @@ def show_area(env, area, show_altitude=False, figsize=None):
     >>> W.add_object((1, 2, 4), 0.5, 1)
     >>> W.add_object((1, 0, 3), 0.5, 1)
     >>> ng.show_area(W, 1, show_altitude=True)
+
+    Show the occupancy heatmap of an area.
+
+    >>> counter = OccupancyCounter(W)
+    >>> W.attach_counter(counter)
+    >>> ng.show_area(W, 1, values=counter)
     """
 
     import matplotlib.pyplot as plt
@@ -170,8 +177,19 @@ def show_area(env, area, show_altitude=False, figsize=None):
         msg = "Area {} not found".format(area_idx)
         raise ValueError(msg)
 
-    vmin = min(nx.get_node_attributes(env.world, "altitude").values())
-    vmax = max(nx.get_node_attributes(env.world, "altitude").values())
+    altitude_mat = env.get_area_altitude(area_idx)
+    if values is None:
+        mat = altitude_mat
+        vmin = min(nx.get_node_attributes(env.world, "altitude").values())
+        vmax = max(nx.get_node_attributes(env.world, "altitude").values())
+    else:
+        if hasattr(values, "get_area_occupancy"):
+            values = values.get_area_occupancy(area_idx)
+        mat = np.asarray(values)
+        if mat.shape != altitude_mat.shape:
+            msg = "Values of shape {} expected, got {}".format(altitude_mat.shape, mat.shape)
+            raise ValueError(msg)
+        vmin, vmax = mat.min(), mat.max()
 
     shape = env.get_area_shape(area_idx)
     fig, ax = plt.subplots(1, 1, figsize=figsize)
@@ -184,7 +202,6 @@ def show_area(env, area, show_altitude=False, figsize=None):
     else:
         title += " ({})".format(alias)
 
-    mat = env.get_area_altitude(area_idx)
     ax.matshow(mat, cmap='Blues',
                vmin=vmin, vmax=vmax)
     ax.set_title(title)
@@ -196,7 +213,7 @@ def show_area(env, area, show_altitude=False, figsize=None):
             if blocked:
                 ax.scatter(y, x, s=500, color='k', marker='X')
             else:
-                altitude = mat[x, y]
+                altitude = altitude_mat[x, y]
                 if show_altitude:
                     ax.annotate("{}\n{}".format(
                                 coord, np.around(altitude, decimals=2)),
@@ -0,0 +1,510 @@
+"""Local environment server with batched stepping over a Unix socket."""
+
+import asyncio
+import os
+import socket
+import struct
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+__all__ = [
+    "EnvServer",
+    "EnvClient",
+    "benchmark_server"
+]
+
+# Wire protocol, little-endian fixed-size messages.
+# Request: operation (uint8), environment id (uint32), argument (int32).
+# Response: status (uint8), state coordinate (3 * int32), reward (float64), done (uint8).
+_REQUEST = struct.Struct("<BIi")
+_RESPONSE = struct.Struct("<B3idB")
+
+_STEP = 1
+_RESET = 2
+_INFO = 3
+
+_OK = 0
+_ERROR = 1
+
+
+class EnvServer:
+    """Host many gridworld environments behind a Unix-domain socket.
+
+    Clients send fixed-size binary requests (see ``EnvClient``) to step or
+    reset one hosted environment. Requests received together, from any
+    number of clients, are coalesced and stepped as one batch per distinct
+    world with ``CompiledWorld.step()``. Requests of one environment are
+    processed in the order they are received.
+
+    Hosted environments are read once at construction: agent states are
+    then kept by the server in arrays, and the hosted ``GridWorld`` objects
+    are not modified (their scheduled events and counters are not applied).
+
+    .. note::
+        Unix-domain sockets are not available on Windows.
+
+    Parameters
+    ----------
+    envs : list of GridWorld
+        Hosted environments, with environment id the index in the list.
+        The same object can be listed many times to host independent copies.
+        Agents start from the initial state of each environment agent,
+        or ``(0, 0, 0)``.
+
+    path : str
+        Path of the Unix-domain socket.
+
+    rng : int or numpy.random.Generator (optional, default: None)
+        Random number generator or seed.
+
+    Examples
+    --------
+    >>> W = GridWorld((5, 5))
+    >>> W.add_object((0, 4, 4), reward=1, prob=1)
+    >>> server = EnvServer([W] * 100, "/tmp/neugym.sock")
+    >>> server.start_in_thread()
+    >>> with EnvClient("/tmp/neugym.sock") as client:
+    ...     client.step(0, 1)
+    ((0, 1, 0), 0.0, False)
+    >>> server.stop()
+    """
+
+    def __init__(self, envs, path, rng=None):
+        if len(envs) == 0:
+            raise ValueError("At least one environment expected")
+
+        # Environments with the same world share one compiled world.
+        self._compiled = []
+        fingerprints = {}
+        group = []
+        init_states = []
+        for env in envs:
+            compiled = env.compile()
+            fingerprint = compiled.fingerprint()
+            if fingerprint not in fingerprints:
+                fingerprints[fingerprint] = len(self._compiled)
+                self._compiled.append(compiled)
+            group.append(fingerprints[fingerprint])
+            agent = env._agent
+            init_states.append(compiled.state_index((0, 0, 0) if agent is None
+                                                    else agent.init_state))
+
+        self.path = path
+        self.num_envs = len(envs)
+        self.num_requests = 0
+        self.num_batches = 0
+        self._group = np.array(group, dtype=np.int64)
+        self._init_states = np.array(init_states, dtype=np.int64)
+        self._states = self._init_states.copy()
+        self._rng = np.random.default_rng(rng)
+        self._pending = []
+        self._flush_scheduled = False
+        self._server = None
+        self._writers = set()
+        self._loop = None
+        self._thread = None
+
+    async def start(self):
+        """Start listening on the socket, in the running event loop."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self._server = await asyncio.start_unix_server(self._handle, path=self.path)
+
+    async def serve_forever(self):
+        """Start listening on the socket and serve until cancelled."""
+        if self._server is None:
+            await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            self._shutdown()
+
+    def start_in_thread(self):
+        """Serve from a new event loop in a background thread.
+
+        Returns when the server is listening, use ``EnvServer.stop()`` to stop.
+        """
+        if self._thread is not None:
+            raise RuntimeError("Server already running")
+
+        ready = threading.Event()
+        errors = []
+
+        def run():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            self._loop = loop
+            try:
+                loop.run_until_complete(self.start())
+            except Exception as e:
+                errors.append(e)
+                ready.set()
+                loop.close()
+                return
+            ready.set()
+            try:
+                loop.run_forever()
+            finally:
+                # Set up the connections accepted in the last iteration, then
+                # close them all, which ends their handlers.
+                loop.run_until_complete(asyncio.sleep(0))
+                self._shutdown()
+                tasks = asyncio.all_tasks(loop)
+                while tasks:
+                    loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+                    tasks = asyncio.all_tasks(loop)
+                loop.close()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        ready.wait()
+        if errors:
+            self._thread = None
+            raise errors[0]
+
+    def stop(self):
+        """Stop a server started with ``EnvServer.start_in_thread()``."""
+        if self._thread is None:
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._thread = None
+
+    def _shutdown(self):
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        for writer in list(self._writers):
+            writer.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    async def _handle(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        if self._server is None:
+            # Connection accepted while shutting down.
+            writer.close()
+            return
+        self._writers.add(writer)
+        try:
+            while True:
+                data = await reader.readexactly(_REQUEST.size)
+                op, env_id, arg = _REQUEST.unpack(data)
+                self._pending.append((op, env_id, arg, writer))
+                if not self._flush_scheduled:
+                    # Flush after all the requests already received are read.
+                    self._flush_scheduled = True
+                    loop.call_soon(self._flush)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    def _flush(self):
+        self._flush_scheduled = False
+        pending, self._pending = self._pending, []
+        self.num_requests += len(pending)
+        self.num_batches += 1
+
+        # Split into rounds with at most one request per environment.
+        rounds = []
+        count = {}
+        for i, request in enumerate(pending):
+            k = count.get(request[1], 0)
+            count[request[1]] = k + 1
+            if k == len(rounds):
+                rounds.append([])
+            rounds[k].append(i)
+
+        responses = [None] * len(pending)
+        for indices in rounds:
+            for i, response in zip(indices, self._process([pending[i] for i in indices])):
+                responses[i] = response
+
+        # Responses are written in the order of the requests.
+        for (_, _, _, writer), response in zip(pending, responses):
+            if not writer.is_closing():
+                writer.write(response)
+
+    def _process(self, requests):
+        ops = np.array([r[0] for r in requests], dtype=np.int64)
+        env_ids = np.array([r[1] for r in requests], dtype=np.int64)
+        args = np.array([r[2] for r in requests], dtype=np.int64)
+
+        valid = (env_ids >= 0) & (env_ids < self.num_envs)
+        env_ids = np.where(valid, env_ids, 0)
+        group = self._group[env_ids]
+        num_actions = np.array([c.num_actions for c in self._compiled])[group]
+        valid &= (ops != _STEP) | ((args >= 0) & (args < num_actions))
+        valid &= np.isin(ops, (_STEP, _RESET, _INFO))
+
+        coords = np.zeros((len(requests), 3), dtype=np.int64)
+        rewards = np.zeros(len(requests))
+        dones = np.zeros(len(requests), dtype=bool)
+
+        step = valid & (ops == _STEP)
+        for g in np.unique(group[step]):
+            idx = np.flatnonzero(step & (group == g))
+            ids = env_ids[idx]
+            compiled = self._compiled[g]
+            next_states, rewards[idx], dones[idx] = compiled.step(
+                self._states[ids], args[idx], self._rng)
+            coords[idx] = compiled.coords[next_states]
+            self._states[ids] = np.where(dones[idx], self._init_states[ids], next_states)
+
+        reset = valid & (ops == _RESET)
+        if np.any(reset):
+            ids = env_ids[reset]
+            self._states[ids] = self._init_states[ids]
+            for k in np.flatnonzero(reset):
+                coords[k] = self._compiled[group[k]].coords[self._init_states[env_ids[k]]]
+
+        info = valid & (ops == _INFO)
+        coords[info] = np.stack([np.full(info.sum(), self.num_envs), num_actions[info],
+                                 np.full(info.sum(), len(self._compiled))], axis=1)
+
+        return [_RESPONSE.pack(_OK if v else _ERROR, int(c[0]), int(c[1]), int(c[2]),
+                               float(r), bool(d))
+                for v, c, r, d in zip(valid, coords, rewards, dones)]
+
+    def __repr__(self):
+        return "EnvServer(path='{}', num_envs={}, num_worlds={})".format(
+            self.path, self.num_envs, len(self._compiled))
+
+
+class EnvClient:
+    """Thin blocking client of an ``EnvServer``.
+
+    The wire format only uses fixed-size little-endian messages, so clients
+    are easily written for other frameworks: requests are 9 bytes ``<BIi``
+    (operation, environment id, argument) and responses 22 bytes ``<B3idB``
+    (status, state coordinate, reward, done), with operations 1 (step,
+    argument the action index), 2 (reset) and 3 (info).
+
+    Parameters
+    ----------
+    path : str
+        Path of the Unix-domain socket of the server.
+
+    timeout : float (optional, default: None)
+        Socket timeout in seconds.
+
+    Examples
+    --------
+    >>> with EnvClient("/tmp/neugym.sock") as client:
+    ...     client.reset(3)
+    ...     coords, rewards, dones = client.step_many([0, 1, 2], [1, 3, 3])
+    """
+
+    def __init__(self, path, timeout=None):
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.settimeout(timeout)
+        try:
+            self._sock.connect(path)
+        except OSError:
+            self._sock.close()
+            raise
+
+    def _request(self, requests):
+        self._sock.sendall(b"".join(_REQUEST.pack(op, env_id, arg)
+                                    for op, env_id, arg in requests))
+        size = _RESPONSE.size * len(requests)
+        buffer = bytearray(size)
+        view = memoryview(buffer)
+        received = 0
+        while received < size:
+            n = self._sock.recv_into(view[received:])
+            if n == 0:
+                raise ConnectionError("Connection closed by the server")
+            received += n
+
+        responses = list(_RESPONSE.iter_unpack(buffer))
+        for (op, env_id, arg), response in zip(requests, responses):
+            if response[0] != _OK:
+                msg = "Invalid request (operation {}, environment {}, argument {})".format(
+                    op, env_id, arg)
+                raise ValueError(msg)
+        return responses
+
+    def step(self, env_id, action):
+        """Move the agent of one environment.
+
+        Parameters
+        ----------
+        env_id : int
+            Id of the environment.
+
+        action : int
+            Index of the action in the environment action space.
+
+        Returns
+        -------
+        next_state : tuple of ints
+            Next state of the agent, see ``GridWorld.step()``.
+
+        reward : float
+            Reward of the movement.
+
+        done : bool
+            Whether the trial ends.
+        """
+        _, a, x, y, reward, done = self._request([(_STEP, env_id, action)])[0]
+        return (a, x, y), reward, bool(done)
+
+    def step_many(self, env_ids, actions):
+        """Move the agents of many environments with one round trip.
+
+        Parameters
+        ----------
+        env_ids : array_like of ints of shape (N,)
+            Ids of the environments, repeated ids are stepped in order.
+
+        actions : array_like of ints of shape (N,)
+            Action indices.
+
+        Returns
+        -------
+        next_states : numpy.ndarray of shape (N, 3)
+            Next states of the agents.
+
+        rewards : numpy.ndarray of shape (N,)
+            Rewards of the movements.
+
+        dones : numpy.ndarray of shape (N,)
+            Whether each trial ends.
+        """
+        responses = self._request([(_STEP, int(i), int(a)) for i, a in zip(env_ids, actions)])
+        responses = np.array(responses, dtype=float).reshape(-1, 6)
+        return responses[:, 1:4].astype(np.int64), responses[:, 4], responses[:, 5] > 0
+
+    def reset(self, env_id):
+        """Send the agent of one environment back to its initial state.
+
+        Parameters
+        ----------
+        env_id : int
+            Id of the environment.
+
+        Returns
+        -------
+        state : tuple of ints
+            Initial state of the agent.
+        """
+        _, a, x, y, _, _ = self._request([(_RESET, env_id, 0)])[0]
+        return a, x, y
+
+    def info(self):
+        """Get information about the server.
+
+        Returns
+        -------
+        info : dict
+            Number of hosted environments ``"num_envs"``, actions of
+            environment 0 ``"num_actions"``, and distinct worlds ``"num_worlds"``.
+        """
+        _, num_envs, num_actions, num_worlds, _, _ = self._request([(_INFO, 0, 0)])[0]
+        return {"num_envs": num_envs, "num_actions": num_actions, "num_worlds": num_worlds}
+
+    def close(self):
+        """Close the connection."""
+        self._sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def benchmark_server(env, num_envs=64, num_clients=8, num_steps=1000, rng=None):
+    """Measure throughput and latency of an ``EnvServer`` on localhost.
+
+    A server hosting ``num_envs`` copies of ``env`` is started in a
+    background thread, and ``num_clients`` client threads each step their
+    share of the environments ``num_steps`` times with ``step_many()``.
+    Clients run in the same process as the server, so that the results are
+    a lower bound of what separate processes achieve.
+
+    Parameters
+    ----------
+    env : GridWorld
+        Gridworld environment.
+
+    num_envs : int (default: 64)
+        Number of hosted environments.
+
+    num_clients : int (default: 8)
+        Number of clients.
+
+    num_steps : int (default: 1000)
+        Number of round trips per client.
+
+    rng : int or numpy.random.Generator (optional, default: None)
+        Random number generator or seed.
+
+    Returns
+    -------
+    results : dict
+        ``"steps_per_second"`` (environment steps), ``"latency_ms"`` (mean
+        round trip), ``"latency_p50_ms"``, ``"latency_p99_ms"``, and
+        ``"mean_batch_size"`` (requests stepped per server batch).
+
+    Examples
+    --------
+    >>> W = GridWorld((10, 10))
+    >>> W.add_object((0, 9, 9), reward=1, prob=1)
+    >>> results = benchmark_server(W, num_envs=256, num_clients=16)
+    """
+    rng = np.random.default_rng(rng)
+    num_actions = len(env.actions)
+    latencies = [None] * num_clients
+    errors = []
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "server.sock")
+        server = EnvServer([env] * num_envs, path, rng=rng)
+        server.start_in_thread()
+        try:
+            def run_client(k, seed):
+                client_rng = np.random.default_rng(seed)
+                env_ids = np.arange(k, num_envs, num_clients)
+                times = np.zeros(num_steps)
+                try:
+                    with EnvClient(path) as client:
+                        for t in range(num_steps):
+                            actions = client_rng.integers(num_actions, size=len(env_ids))
+                            start = time.perf_counter()
+                            client.step_many(env_ids, actions)
+                            times[t] = time.perf_counter() - start
+                except Exception as e:
+                    # Raised again in the calling thread after all clients finish.
+                    errors.append(e)
+                    return
+                latencies[k] = times
+
+            seeds = rng.integers(2 ** 32, size=num_clients)
+            threads = [threading.Thread(target=run_client, args=(k, seeds[k]))
+                       for k in range(num_clients)]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+        finally:
+            server.stop()
+    if errors:
+        raise errors[0]
+
+    latencies = np.concatenate(latencies) * 1000
+    return {
+        "steps_per_second": server.num_requests / elapsed,
+        "latency_ms": float(latencies.mean()),
+        "latency_p50_ms": float(np.percentile(latencies, 50)),
+        "latency_p99_ms": float(np.percentile(latencies, 99)),
+        "mean_batch_size": server.num_requests / max(server.num_batches, 1)
+    }